@@ -3,7 +3,12 @@ from django.contrib.auth.models import AbstractUser
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 
-class User(AbstractUser):
+from student_management.dirty_fields import DirtyFieldsMixin
+
+# 同步到学生档案的用户字段；real_name 由姓名（没有姓名时为用户名）生成
+PROFILE_SYNC_FIELDS = {'phone', 'email', 'first_name', 'last_name', 'username'}
+
+class User(DirtyFieldsMixin, AbstractUser):
     ROLE_CHOICES = [
         ('admin', '管理员'),
         ('student', '学生'),
@@ -17,6 +22,14 @@ class User(AbstractUser):
     class Meta:
         verbose_name = '用户'
         verbose_name_plural = '用户'
+        indexes = [
+            # 用户列表键集分页的排序键
+            models.Index(fields=['-created_at', 'id'], name='user_created_id'),
+            # 待建档学生列表按角色筛选、按注册时间排序
+            models.Index(fields=['role', '-created_at'], name='user_role_created'),
+            # 注册表单检查邮箱是否已被使用
+            models.Index(fields=['email'], name='user_email'),
+        ]
 
     def __str__(self):
         return self.username
@@ -47,19 +60,29 @@ def create_student_profile(sender, instance, created, **kwargs):
             )
 
 @receiver(post_save, sender=User)
-def save_student_profile(sender, instance, **kwargs):
+def save_student_profile(sender, instance, created, raw=False, update_fields=None, **kwargs):
     """
-    保存用户时，同步更新StudentProfile的联系信息
+    保存用户时，把真正修改过的联系信息和姓名同步到StudentProfile；
+    登录只更新 last_login，不会读写学生档案
     """
-    if instance.role == 'student':
-        from students.models import StudentProfile
-        try:
-            student_profile = StudentProfile.objects.get(user=instance)
-            # 同步基本信息
-            student_profile.phone = instance.phone
-            student_profile.email = instance.email
-            student_profile.real_name = f"{instance.last_name}{instance.first_name}" if instance.first_name and instance.last_name else instance.username
-            student_profile.save()
-        except StudentProfile.DoesNotExist:
-            # 如果不存在档案，则创建一个
-            pass  # create_student_profile 会处理创建逻辑
\ No newline at end of file
+    # 新建用户的档案由 create_student_profile 按当前信息创建
+    if raw or created or instance.role != 'student':
+        return
+    changed = set(instance.dirty_fields()) & PROFILE_SYNC_FIELDS
+    if update_fields is not None:
+        changed &= set(update_fields)
+    if not changed:
+        return
+
+    from students.models import StudentProfile
+    student_profile = StudentProfile.objects.filter(user=instance).first()
+    if student_profile is None:
+        return
+    if 'phone' in changed:
+        student_profile.phone = instance.phone
+    if 'email' in changed:
+        student_profile.email = instance.email
+    if changed & {'first_name', 'last_name', 'username'}:
+        student_profile.real_name = f"{instance.last_name}{instance.first_name}" if instance.first_name and instance.last_name else instance.username
+    # 值与档案中相同时不写数据库
+    student_profile.save_dirty()
@@ -0,0 +1,37 @@
+"""
+用户列表页和用户 API 共用的查询条件构造函数。
+"""
+from django.db.models import Q
+
+
+def filter_users(users, params):
+    """按 type（all / students / admins）和 search 参数筛选用户"""
+    user_type = params.get('type', 'all')
+    search_query = params.get('search', '')
+
+    # 按用户类型过滤
+    if user_type == 'students':
+        users = users.filter(role='student')
+    elif user_type == 'admins':
+        users = users.filter(role='admin')
+
+    # 搜索功能
+    if search_query:
+        users = users.filter(
+            Q(username__icontains=search_query) |
+            Q(first_name__icontains=search_query) |
+            Q(last_name__icontains=search_query) |
+            Q(email__icontains=search_query) |
+            Q(phone__icontains=search_query)
+        )
+    return users
+
+
+def approximate_user_count(params, stats):
+    """用户列表总数的近似值（读取 StatCounter），带搜索条件时返回 None"""
+    if params.get('search'):
+        return None
+    return {
+        'students': stats['total_students'],
+        'admins': stats['total_admins'],
+    }.get(params.get('type', 'all'), stats['total_users'])
@@ -1,7 +1,11 @@
 from django.urls import path
+from django.conf import settings
 from django.contrib.auth import views as auth_views
 from . import views
-from . import views_api
+from . import views_api, views_api_async
+
+# ASGI 下使用异步版本的 JSON 接口，URL 名称不变
+api = views_api_async if settings.ASYNC_API_VIEWS else views_api
 
 app_name = 'accounts'
 
@@ -23,9 +27,11 @@ urlpatterns = [
     path('quick_create_profile/<int:user_id>/', views.quick_create_student_profile, name='quick_create_student_profile'),
 
     # API 端点
-    path('api/pending-profiles-count/', views_api.api_pending_profiles_count, name='api_pending_profiles_count'),
-    path('api/recent-users/', views_api.api_recent_users, name='api_recent_users'),
-    path('api/student-profiles-updates/', views_api.api_student_profiles_updates, name='api_student_profiles_updates'),
-    path('api/notifications/', views_api.api_user_notifications, name='api_user_notifications'),
-    path('api/mark-notifications-read/', views_api.api_mark_notifications_read, name='api_mark_notifications_read'),
+    path('api/pending-profiles-count/', api.api_pending_profiles_count, name='api_pending_profiles_count'),
+    path('api/recent-users/', api.api_recent_users, name='api_recent_users'),
+    path('api/users/', api.api_users, name='api_users'),
+    path('api/student-profiles-updates/', api.api_student_profiles_updates, name='api_student_profiles_updates'),
+    path('api/notifications/', api.api_user_notifications, name='api_user_notifications'),
+    path('api/mark-notifications-read/', api.api_mark_notifications_read, name='api_mark_notifications_read'),
+    path('api/events/', api.api_event_stream, name='api_event_stream'),
 ]
\ No newline at end of file
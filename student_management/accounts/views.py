@@ -8,11 +8,14 @@ from django.urls import reverse_lazy
 from django.views.decorators.http import require_POST
 from django.views.decorators.cache import cache_page
 from django.db.models import Count, Q
-from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
 from django.db import IntegrityError
 from .forms import CustomUserCreationForm
 from .models import User
-from students.models import StudentProfile, Department, Major
+from students.models import StudentProfile, Department, Major, StudentAcademicSummary, StatCounter
+from students.pagination import KeysetPaginator, get_page
+from students.reference import get_reference_data
+from student_management.replica import use_replica
+from .queries import filter_users, approximate_user_count
 from django import forms
 
 class CustomLoginView(LoginView):
@@ -97,7 +100,7 @@ def edit_profile(request):
             pass
 
     # 获取所有院系数据
-    departments = Department.objects.all()
+    departments = get_reference_data().departments
 
     if request.method == 'POST':
         # 更新用户基本信息
@@ -114,9 +117,10 @@ def edit_profile(request):
             # 注意：院系和专业信息由管理员设置，学生无法自行修改
             # 移除了学生修改department和major的逻辑
 
-            student_profile.save()
+            # 只写入真正修改过的字段，没有修改时不更新 updated_at
+            student_profile.save_dirty()
 
-        user.save()
+        user.save_dirty()
         messages.success(request, '个人资料更新成功！')
         return redirect('accounts:profile')
 
@@ -129,24 +133,23 @@ def edit_profile(request):
 
 @login_required
 @cache_page(60)  # 缓存1分钟
+@use_replica
 def admin_dashboard(request):
     if request.user.role != 'admin':
         messages.error(request, '您没有权限访问此页面！')
         return redirect('students:home')
 
-    # 优化：使用单个查询获取所有统计数据
-    stats = User.objects.aggregate(
-        total_users=Count('id'),
-        total_students=Count('id', filter=Q(role='student'))
-    )
-    total_student_profiles = StudentProfile.objects.count()
-
-    # 优化：限制查询数量
-    students_without_profiles = User.objects.filter(
-        role='student'
-    ).exclude(
-        id__in=StudentProfile.objects.values_list('user_id', flat=True)
-    ).order_by('-created_at')[:5]  # 只取前5个
+    # 统计数据直接读取反规范化的计数器
+    stats = StatCounter.dashboard_stats()
+
+    # 没有待处理学生时跳过反连接查询
+    students_without_profiles = []
+    if stats['pending_profiles']:
+        students_without_profiles = User.objects.filter(
+            role='student'
+        ).exclude(
+            id__in=StudentProfile.objects.values_list('user_id', flat=True)
+        ).order_by('-created_at')[:5]  # 只取前5个
 
     # 优化：减少查询时间范围和数量
     from django.utils import timezone
@@ -159,9 +162,9 @@ def admin_dashboard(request):
     context = {
         'total_users': stats['total_users'],
         'total_students': stats['total_students'],
-        'total_student_profiles': total_student_profiles,
+        'total_student_profiles': stats['total_student_profiles'],
         'students_without_profiles': students_without_profiles,
-        'students_without_profiles_count': len(students_without_profiles),
+        'students_without_profiles_count': stats['pending_profiles'],
         'recent_users': recent_users,
     }
     return render(request, 'accounts/admin_dashboard.html', context)
@@ -173,51 +176,19 @@ def student_dashboard(request):
         return redirect('students:home')
 
     try:
-        student_profile = StudentProfile.objects.get(user=request.user)
-        enrollments = student_profile.enrollment_set.all().order_by('-academic_year', '-semester')
+        student_profile = StudentProfile.objects.select_related('department', 'academic_summary').get(user=request.user)
+        enrollments = student_profile.enrollment_set.select_related('course', 'major').order_by('-academic_year', '-semester')
 
-        # 计算平均成绩
-        average_grade = None
-        average_score = None
-        graded_enrollments = enrollments.exclude(grade__isnull=True).exclude(grade='')
-
-        # 统计有成绩的课程数
-        total_graded_courses = graded_enrollments.count()
-
-        if graded_enrollments.exists():
-            # 计算等级制的平均GPA
-            grade_points = {'A': 4.0, 'B': 3.0, 'C': 2.0, 'D': 1.0, 'F': 0.0}
-            total_points = 0
-            total_scores = 0
-            score_count = 0
-
-            for enrollment in graded_enrollments:
-                # 等级成绩计算GPA
-                if enrollment.grade in grade_points:
-                    total_points += grade_points[enrollment.grade]
-
-                # 分数成绩计算平均分
-                if enrollment.score is not None:
-                    total_scores += float(enrollment.score)
-                    score_count += 1
-
-            # 计算平均GPA并转换为等级
-            if total_graded_courses > 0:
-                average_gpa = total_points / total_graded_courses
-                if average_gpa >= 3.7:
-                    average_grade = 'A'
-                elif average_gpa >= 2.7:
-                    average_grade = 'B'
-                elif average_gpa >= 1.7:
-                    average_grade = 'C'
-                elif average_gpa >= 1.0:
-                    average_grade = 'D'
-                else:
-                    average_grade = 'F'
-
-            # 计算平均分
-            if score_count > 0:
-                average_score = round(total_scores / score_count, 1)
+        # 成绩统计直接读取物化的成绩汇总表，不再逐条遍历选课记录
+        try:
+            summary = student_profile.academic_summary
+        except StudentAcademicSummary.DoesNotExist:
+            summary = StudentAcademicSummary(student=student_profile, semester_breakdown={})
+
+        average_grade = summary.average_grade
+        average_score = summary.average_score
+        total_graded_courses = summary.graded_count
+        enrollment_count = summary.enrollment_count
 
         # 计算当前学期课程数
         from django.utils import timezone
@@ -226,10 +197,7 @@ def student_dashboard(request):
         current_semester = '第2学期' if current_month >= 9 or current_month <= 2 else '第1学期'
         current_academic_year = f"{current_year-1}-{current_year}" if current_month <= 8 else f"{current_year}-{current_year+1}"
 
-        current_semester_courses = enrollments.filter(
-            semester=current_semester,
-            academic_year=current_academic_year
-        ).count()
+        current_semester_courses = summary.semester_course_count(current_academic_year, current_semester)
 
     except StudentProfile.DoesNotExist:
         student_profile = None
@@ -237,11 +205,13 @@ def student_dashboard(request):
         average_grade = None
         average_score = None
         total_graded_courses = 0
+        enrollment_count = 0
         current_semester_courses = 0
 
     context = {
         'student_profile': student_profile,
         'enrollments': enrollments,
+        'enrollment_count': enrollment_count,
         'average_grade': average_grade,
         'average_score': average_score,
         'total_graded_courses': total_graded_courses,
@@ -250,6 +220,7 @@ def student_dashboard(request):
     return render(request, 'accounts/student_dashboard.html', context)
 
 @login_required
+@use_replica
 def user_list(request):
     if request.user.role != 'admin':
         messages.error(request, '您没有权限访问此页面！')
@@ -259,48 +230,21 @@ def user_list(request):
     search_query = request.GET.get('search', '')
     title = '所有用户'
 
-    # 基础查询集
-    users = User.objects.all()
-
-    # 按用户类型过滤
-    if user_type == 'students':
-        users = users.filter(role='student')
+    # 按用户类型和搜索条件过滤
+    users = filter_users(User.objects.all(), request.GET)
+    if search_query:
+        title = f'搜索结果: "{search_query}"'
+    elif user_type == 'students':
         title = '学生用户'
     elif user_type == 'admins':
-        users = users.filter(role='admin')
         title = '管理员用户'
-    else:
-        title = '所有用户'
 
-    # 搜索功能
-    if search_query:
-        users = users.filter(
-            Q(username__icontains=search_query) |
-            Q(first_name__icontains=search_query) |
-            Q(last_name__icontains=search_query) |
-            Q(email__icontains=search_query) |
-            Q(phone__icontains=search_query)
-        )
-        title = f'搜索结果: "{search_query}"'
+    # 统计信息读取计数器
+    stats = StatCounter.dashboard_stats()
 
-    # 排序：按注册时间倒序
-    users = users.order_by('-created_at')
-
-    # 分页功能
-    paginator = Paginator(users, 10)  # 每页显示10条记录
-    page = request.GET.get('page', 1)
-
-    try:
-        users_page = paginator.page(page)
-    except PageNotAnInteger:
-        users_page = paginator.page(1)
-    except EmptyPage:
-        users_page = paginator.page(paginator.num_pages)
-
-    # 计算统计信息
-    total_users = User.objects.count()
-    total_students = User.objects.filter(role='student').count()
-    total_admins = User.objects.filter(role='admin').count()
+    # 键集分页：按 (-created_at, id) 定位，不再执行 COUNT(*) 和 OFFSET
+    paginator = KeysetPaginator(users, 10, approximate_count=approximate_user_count(request.GET, stats))
+    users_page = get_page(paginator, request.GET.get('cursor'))
 
     # 为模板添加角色过滤函数
     def filter_role(user_list, role):
@@ -311,11 +255,11 @@ def user_list(request):
         'title': title,
         'user_type': user_type,
         'search_query': search_query,
-        'total_users': total_users,
-        'total_students': total_students,
-        'total_admins': total_admins,
+        'total_users': stats['total_users'],
+        'total_students': stats['total_students'],
+        'total_admins': stats['total_admins'],
         'filter_role': filter_role,
-        'is_paginated': paginator.num_pages > 1,
+        'is_paginated': users_page.has_other_pages(),
     }
     return render(request, 'accounts/user_list.html', context)
 
@@ -325,7 +269,8 @@ def student_profile_list_admin(request):
         messages.error(request, '您没有权限访问此页面！')
         return redirect('students:home')
 
-    students = StudentProfile.objects.select_related('user').all()
+    # 模板逐行显示院系和专业，一并取出，避免每行两次查询
+    students = StudentProfile.objects.select_related('user', 'department', 'major').all()
     context = {
         'students': students,
     }
@@ -364,7 +309,8 @@ def quick_create_student_profile(request, user_id):
         pass
 
     # 获取所有院系
-    departments = Department.objects.all()
+    reference = get_reference_data()
+    departments = reference.departments
 
     if request.method == 'POST':
         student_id = request.POST.get('student_id')
@@ -378,8 +324,12 @@ def quick_create_student_profile(request, user_id):
         major_id = request.POST.get('major')
 
         try:
-            department = Department.objects.get(id=department_id) if department_id else None
-            major = Major.objects.get(id=major_id) if major_id else None
+            department = reference.department_by_id.get(int(department_id)) if department_id else None
+            major = reference.major_by_id.get(int(major_id)) if major_id else None
+            if department_id and department is None:
+                raise Department.DoesNotExist('所选院系不存在')
+            if major_id and major is None:
+                raise Major.DoesNotExist('所选专业不存在')
 
             student_profile = StudentProfile.objects.create(
                 user=user,
@@ -1,13 +1,20 @@
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse
 from django.contrib.auth.decorators import login_required
 from django.views.decorators.http import require_http_methods
 from django.core.cache import cache
 from django.utils import timezone
 from datetime import timedelta
 from .models import User
-from students.models import StudentProfile
+from students.models import StudentProfile, StatCounter
+from students.realtime import broadcaster
+from students.pagination import KeysetPaginator, InvalidCursor, page_size
+from .queries import filter_users, approximate_user_count
+from student_management.replica import use_replica
 import json
 
+# SSE 心跳间隔（秒），防止代理断开空闲连接
+EVENT_STREAM_HEARTBEAT = 15
+
 @login_required
 @require_http_methods(["GET"])
 def api_pending_profiles_count(request):
@@ -26,7 +33,7 @@ def api_pending_profiles_count(request):
         id__in=StudentProfile.objects.values_list('user_id', flat=True)
     ).order_by('-created_at')
 
-    count = students_without_profiles.count()
+    count = StatCounter.dashboard_stats()['pending_profiles']
 
     # 检查是否有新注册的学生（对比上次检查时间）
     new_students_count = 0
@@ -60,12 +67,13 @@ def api_recent_users(request):
     cache_key = f'user_stats_{request.user.id}'
     cached_stats = cache.get(cache_key, {})
 
-    # 获取当前统计数据
-    total_users = User.objects.count()
-    total_students = User.objects.filter(role='student').count()
-    total_teachers = User.objects.filter(role='teacher').count()
-    total_admins = User.objects.filter(role='admin').count()
-    total_student_profiles = StudentProfile.objects.count()
+    # 获取当前统计数据（读取计数器）
+    stats = StatCounter.dashboard_stats()
+    total_users = stats['total_users']
+    total_students = stats['total_students']
+    total_teachers = stats['total_teachers']
+    total_admins = stats['total_admins']
+    total_student_profiles = stats['total_student_profiles']
 
     # 检查是否有更新
     has_updates = (
@@ -78,9 +86,14 @@ def api_recent_users(request):
     # 获取最近注册的用户
     from datetime import datetime, timedelta
     three_days_ago = timezone.now() - timedelta(days=3)
-    recent_users = User.objects.filter(
+    recent_users = list(User.objects.filter(
         created_at__gte=three_days_ago
-    ).order_by('-created_at')[:5]
+    ).order_by('-created_at')[:5])
+
+    # 一次查询取出有档案的用户，避免逐个 exists()
+    users_with_profile = set(StudentProfile.objects.filter(
+        user__in=recent_users
+    ).values_list('user_id', flat=True))
 
     recent_users_data = [{
         'id': user.id,
@@ -88,7 +101,7 @@ def api_recent_users(request):
         'full_name': user.get_full_name() or user.username,
         'role': user.role,
         'created_at': user.created_at.isoformat(),
-        'has_profile': StudentProfile.objects.filter(user=user).exists() if user.role == 'student' else True
+        'has_profile': user.id in users_with_profile if user.role == 'student' else True
     } for user in recent_users]
 
     # 更新缓存
@@ -111,6 +124,46 @@ def api_recent_users(request):
         'timestamp': timezone.now().isoformat()
     })
 
+def users_page(params):
+    """api_users 的响应数据，同步和异步视图共用；游标无效时抛出 InvalidCursor"""
+    users = filter_users(User.objects.all(), params).values(
+        'id', 'username', 'first_name', 'last_name', 'email', 'role', 'created_at'
+    )
+    paginator = KeysetPaginator(
+        users, page_size(params),
+        approximate_count=approximate_user_count(params, StatCounter.dashboard_stats()),
+    )
+    page = paginator.page(params.get('cursor'))
+
+    return {
+        'results': [{
+            'id': user['id'],
+            'username': user['username'],
+            'full_name': f"{user['first_name']} {user['last_name']}".strip() or user['username'],
+            'email': user['email'],
+            'role': user['role'],
+            'created_at': user['created_at'].isoformat(),
+        } for user in page],
+        'next_cursor': page.next_cursor,
+        'previous_cursor': page.previous_cursor,
+        'approximate_count': page.approximate_count,
+    }
+
+@login_required
+@require_http_methods(["GET"])
+@use_replica
+def api_users(request):
+    """
+    API: 用户列表（键集分页，?cursor=&limit=&type=&search=）
+    """
+    if request.user.role != 'admin':
+        return JsonResponse({'error': '无权限'}, status=403)
+
+    try:
+        return JsonResponse(users_page(request.GET))
+    except InvalidCursor as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
 @login_required
 @require_http_methods(["GET"])
 def api_student_profiles_updates(request):
@@ -169,9 +222,7 @@ def api_user_notifications(request):
 
     if user.role == 'admin':
         # 管理员通知
-        pending_count = User.objects.filter(role='student').exclude(
-            id__in=StudentProfile.objects.values_list('user_id', flat=True)
-        ).count()
+        pending_count = StatCounter.dashboard_stats()['pending_profiles']
 
         if pending_count > 0:
             notifications.append({
@@ -246,4 +297,46 @@ def api_mark_notifications_read(request):
     return JsonResponse({
         'status': 'success',
         'message': '通知已标记为已读'
-    })
\ No newline at end of file
+    })
+
+@login_required
+@require_http_methods(["GET"])
+async def api_event_stream(request):
+    """
+    API: 管理员实时事件流（Server-Sent Events，需在 ASGI 下运行）
+    """
+    from django.core.handlers.asgi import ASGIRequest
+
+    user = await request.auser()
+    if user.role != 'admin':
+        return JsonResponse({'error': '无权限'}, status=403)
+
+    # WSGI 无法保持长连接，告诉前端退回轮询
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse({'error': '事件流需要ASGI服务器', 'fallback': 'polling'}, status=503)
+
+    try:
+        last_event_id = int(request.headers.get('Last-Event-ID', ''))
+    except ValueError:
+        last_event_id = None
+
+    subscription = broadcaster.subscribe(last_event_id)
+
+    async def stream():
+        try:
+            # 告诉浏览器断线后3秒重连
+            yield b'retry: 3000\n\n'
+            while True:
+                message = await subscription.get(EVENT_STREAM_HEARTBEAT)
+                if message is None:
+                    break
+                yield message or b': heartbeat\n\n'
+        finally:
+            subscription.close()
+
+    response = StreamingHttpResponse(stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    # 客户端断开时由 ASGIHandler 调用 response.close()，确保订阅被回收
+    response._resource_closers.append(subscription.close)
+    return response
@@ -0,0 +1,268 @@
+"""
+JSON 接口的异步版本，返回内容与 views_api 中的同步视图完全相同（说明见 students/views_api_async.py）。
+"""
+import asyncio
+
+from django.http import JsonResponse
+from django.contrib.auth.decorators import login_required
+from django.views.decorators.http import require_http_methods
+from django.core.cache import cache
+from django.utils import timezone
+from datetime import timedelta
+from .models import User
+from .views_api import users_page, api_event_stream  # noqa: F401  事件流本身就是异步视图
+from students.models import StudentProfile, StatCounter
+from students.pagination import InvalidCursor
+from student_management import async_db
+from student_management.replica import use_replica
+
+@login_required
+@require_http_methods(["GET"])
+async def api_pending_profiles_count(request):
+    """
+    API: 获取待处理学生档案数量
+    """
+    user = await request.auser()
+    if user.role != 'admin':
+        return JsonResponse({'error': '无权限'}, status=403)
+
+    # 获取缓存的上次查询时间
+    cache_key = 'pending_profiles_last_check'
+    last_check = await cache.aget(cache_key, None)
+
+    # 查找没有学生档案的学生用户
+    students_without_profiles = User.objects.filter(role='student').exclude(
+        id__in=StudentProfile.objects.values_list('user_id', flat=True)
+    )
+
+    # 计数器和新注册学生数同时查询；首次检查只显示总数
+    stats, new_students_count = await async_db.gather(
+        StatCounter.dashboard_stats,
+        lambda: students_without_profiles.filter(created_at__gt=last_check).count() if last_check else None,
+    )
+    count = stats['pending_profiles']
+    if new_students_count is None:
+        new_students_count = count
+
+    # 更新缓存
+    await cache.aset(cache_key, timezone.now(), timeout=300)  # 缓存5分钟
+
+    return JsonResponse({
+        'count': count,
+        'new_students': new_students_count,
+        'has_updates': new_students_count > 0,
+        'timestamp': timezone.now().isoformat()
+    })
+
+@login_required
+@require_http_methods(["GET"])
+async def api_recent_users(request):
+    """
+    API: 获取最近用户信息和统计数据
+    """
+    user = await request.auser()
+    if user.role != 'admin':
+        return JsonResponse({'error': '无权限'}, status=403)
+
+    cache_key = f'user_stats_{user.id}'
+
+    # 缓存、计数器和最近注册的用户（连同其档案）同时读取
+    def recent_users_with_profiles():
+        recent_users = list(User.objects.filter(
+            created_at__gte=timezone.now() - timedelta(days=3)
+        ).order_by('-created_at')[:5])
+        # 一次查询取出有档案的用户，避免逐个 exists()
+        users_with_profile = set(StudentProfile.objects.filter(
+            user__in=recent_users
+        ).values_list('user_id', flat=True))
+        return recent_users, users_with_profile
+
+    cached_stats, (stats, (recent_users, users_with_profile)) = await asyncio.gather(
+        cache.aget(cache_key, {}),
+        async_db.gather(StatCounter.dashboard_stats, recent_users_with_profiles),
+    )
+
+    total_users = stats['total_users']
+    total_students = stats['total_students']
+    total_teachers = stats['total_teachers']
+    total_admins = stats['total_admins']
+    total_student_profiles = stats['total_student_profiles']
+
+    # 检查是否有更新
+    has_updates = (
+        cached_stats.get('total_users') != total_users or
+        cached_stats.get('total_students') != total_students or
+        cached_stats.get('total_teachers') != total_teachers or
+        cached_stats.get('total_student_profiles') != total_student_profiles
+    )
+
+    recent_users_data = [{
+        'id': recent_user.id,
+        'username': recent_user.username,
+        'full_name': recent_user.get_full_name() or recent_user.username,
+        'role': recent_user.role,
+        'created_at': recent_user.created_at.isoformat(),
+        'has_profile': recent_user.id in users_with_profile if recent_user.role == 'student' else True
+    } for recent_user in recent_users]
+
+    # 更新缓存
+    await cache.aset(cache_key, {
+        'total_users': total_users,
+        'total_students': total_students,
+        'total_teachers': total_teachers,
+        'total_admins': total_admins,
+        'total_student_profiles': total_student_profiles,
+    }, timeout=300)  # 缓存5分钟
+
+    return JsonResponse({
+        'total_users': total_users,
+        'total_students': total_students,
+        'total_teachers': total_teachers,
+        'total_admins': total_admins,
+        'total_student_profiles': total_student_profiles,
+        'has_updates': has_updates,
+        'recent_users': recent_users_data,
+        'timestamp': timezone.now().isoformat()
+    })
+
+@login_required
+@require_http_methods(["GET"])
+@use_replica
+async def api_users(request):
+    """
+    API: 用户列表（键集分页，?cursor=&limit=&type=&search=）
+    """
+    user = await request.auser()
+    if user.role != 'admin':
+        return JsonResponse({'error': '无权限'}, status=403)
+
+    try:
+        return JsonResponse(await async_db.run(users_page, request.GET))
+    except InvalidCursor as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+@login_required
+@require_http_methods(["GET"])
+async def api_student_profiles_updates(request):
+    """
+    API: 检查学生档案更新
+    """
+    user = await request.auser()
+    if user.role != 'admin':
+        return JsonResponse({'error': '无权限'}, status=403)
+
+    cache_key = f'profiles_last_check_{user.id}'
+    last_check = await cache.aget(cache_key)
+    check_time = last_check or timezone.now() - timedelta(minutes=5)  # 默认检查5分钟内的更新
+
+    # 查找最近更新的学生档案（取出列表后判断，省去一次 exists 查询）
+    updated_profiles = await async_db.run(lambda: list(StudentProfile.objects.filter(
+        updated_at__gt=check_time
+    ).select_related('user').order_by('-updated_at')[:10]))
+
+    # 更新缓存
+    await cache.aset(cache_key, timezone.now(), timeout=300)  # 缓存5分钟
+
+    updated_data = [{
+        'id': profile.id,
+        'student_id': profile.student_id,
+        'name': profile.real_name,
+        'username': profile.user.username,
+        'updated_at': profile.updated_at.isoformat()
+    } for profile in updated_profiles]
+
+    return JsonResponse({
+        'has_updates': bool(updated_data),
+        'updated_profiles': updated_data,
+        'count': len(updated_data),
+        'timestamp': timezone.now().isoformat()
+    })
+
+@login_required
+@require_http_methods(["GET"])
+async def api_user_notifications(request):
+    """
+    API: 获取用户通知和状态更新
+    """
+    notifications = []
+    user = await request.auser()
+
+    if user.role == 'admin':
+        # 待处理档案数和最近24小时的新用户数同时查询
+        yesterday = timezone.now() - timedelta(hours=24)
+        stats, new_users_count = await async_db.gather(
+            StatCounter.dashboard_stats,
+            lambda: User.objects.filter(created_at__gte=yesterday).count(),
+        )
+        pending_count = stats['pending_profiles']
+
+        if pending_count > 0:
+            notifications.append({
+                'type': 'warning',
+                'title': '待处理学生档案',
+                'message': f'有 {pending_count} 名学生的档案需要创建',
+                'action_url': '/accounts/pending_student_profiles/'
+            })
+
+        if new_users_count > 0:
+            notifications.append({
+                'type': 'info',
+                'title': '新用户注册',
+                'message': f'最近24小时有 {new_users_count} 名新用户注册',
+                'action_url': '/accounts/users/'
+            })
+
+    elif user.role == 'student':
+        # 学生通知
+        def profile_and_recent_count():
+            profile = StudentProfile.objects.get(user=user)
+            recent_count = profile.enrollment_set.filter(
+                created_at__gte=timezone.now() - timedelta(days=7)
+            ).count()
+            return profile, recent_count
+
+        try:
+            profile, recent_count = await async_db.run(profile_and_recent_count)
+
+            # 检查档案完整性
+            if not profile.department_id or not profile.major_id:
+                notifications.append({
+                    'type': 'warning',
+                    'title': '档案信息不完整',
+                    'message': '请完善您的院系和专业信息',
+                    'action_url': '/accounts/edit_profile/'
+                })
+
+            # 最近的选课记录
+            if recent_count:
+                notifications.append({
+                    'type': 'success',
+                    'title': '选课成功',
+                    'message': f'您最近成功选了 {recent_count} 门课程',
+                    'action_url': '/students/my_enrollments/'
+                })
+
+        except StudentProfile.DoesNotExist:
+            notifications.append({
+                'type': 'error',
+                'title': '缺少学生档案',
+                'message': '您还没有学生档案，请联系管理员创建',
+                'action_url': '/accounts/profile/'
+            })
+
+    return JsonResponse({
+        'notifications': notifications,
+        'count': len(notifications),
+        'timestamp': timezone.now().isoformat()
+    })
+
+@login_required
+@require_http_methods(["POST"])
+async def api_mark_notifications_read(request):
+    """
+    API: 标记通知为已读（可扩展功能）
+    """
+    return JsonResponse({
+        'status': 'success',
+        'message': '通知已标记为已读'
+    })
@@ -1,16 +1,77 @@
-// 实时数据同步功能 - 已禁用以提升性能
+// 实时数据同步功能 - 优先使用服务端推送（SSE），轮询仅作为降级方案
 class RealtimeSync {
     constructor(options = {}) {
-        // 禁用实时同步，大幅提升页面性能
-        this.enabled = false;
-        console.log('Real-time sync disabled for better performance');
-        return;
+        this.endpoints = options.endpoints || {};
+        this.callbacks = options.callbacks || {};
+        this.pollInterval = options.pollInterval || 30000;
+        this.maxRetries = options.maxRetries || 3;
+        this.currentRetry = 0;
+        this.lastUpdate = new Date();
+        this.isPolling = false;
+        this.pollTimer = null;
+        this.eventSource = null;
+
+        // 轮询会给共享数据库带来大量查询，默认禁用，只在页面显式开启时作为降级
+        this.pollingFallback = options.pollingFallback || false;
+        this.enabled = Boolean(this.endpoints.stream) || this.pollingFallback;
+        if (!this.enabled) {
+            console.log('Real-time sync disabled for better performance');
+            return;
+        }
+        this.init();
     }
 
     init() {
-        console.log('RealtimeSync initialized with', this.pollInterval, 'ms interval');
-        this.startPolling();
-        this.setupVisibilityHandling();
+        if (this.endpoints.stream && window.EventSource) {
+            this.startStream();
+        } else if (this.pollingFallback) {
+            console.log('RealtimeSync initialized with', this.pollInterval, 'ms interval');
+            this.startPolling();
+            this.setupVisibilityHandling();
+        }
+    }
+
+    startStream() {
+        if (this.eventSource) return;
+
+        console.log('Connecting to realtime event stream...');
+        this.eventSource = new EventSource(this.endpoints.stream);
+
+        ['user', 'studentprofile', 'enrollment', 'course'].forEach((eventType) => {
+            this.eventSource.addEventListener(eventType, (event) => {
+                this.lastUpdate = new Date();
+                try {
+                    this.handleEvent(eventType, JSON.parse(event.data));
+                } catch (error) {
+                    console.error('Failed to handle event:', error);
+                }
+            });
+        });
+
+        this.eventSource.onerror = () => {
+            // 浏览器会自动重连；连接被服务器拒绝（如运行在WSGI下）时才降级为轮询
+            if (this.eventSource && this.eventSource.readyState === EventSource.CLOSED) {
+                console.warn('Event stream unavailable');
+                this.stopStream();
+                if (this.pollingFallback) {
+                    this.startPolling();
+                    this.setupVisibilityHandling();
+                }
+            }
+        };
+    }
+
+    stopStream() {
+        if (this.eventSource) {
+            this.eventSource.close();
+            this.eventSource = null;
+        }
+    }
+
+    handleEvent(eventType, data) {
+        if (this.callbacks.onEvent) {
+            this.callbacks.onEvent(eventType, data);
+        }
     }
 
     setupVisibilityHandling() {
@@ -160,6 +221,12 @@ class RealtimeSync {
     // 手动触发同步
     forceSync() {
         console.log('Force sync triggered');
+        if (this.eventSource) {
+            // 推送模式下数据已是最新，重连即可补齐断线期间的事件
+            this.stopStream();
+            this.startStream();
+            return;
+        }
         this.performSync();
     }
 
@@ -174,6 +241,7 @@ class RealtimeSync {
 
     // 销毁实例
     destroy() {
+        this.stopStream();
         this.stopPolling();
         console.log('RealtimeSync destroyed');
     }
@@ -193,11 +261,23 @@ document.addEventListener('DOMContentLoaded', function() {
     if (path.includes('/admin_dashboard')) {
         // 管理员仪表板页面
         syncConfig.endpoints = {
+            stream: '/accounts/api/events/',
             pendingProfiles: '/accounts/api/pending-profiles-count/',
             userList: '/accounts/api/recent-users/'
         };
 
         syncConfig.callbacks = {
+            onEvent: function(eventType, data) {
+                // 每条事件都附带服务端只计算一次的面板统计
+                if (data.stats) {
+                    this.onUserListUpdate(data.stats);
+                    this.onPendingProfilesUpdate({
+                        count: data.stats.pending_profiles,
+                        new_students: eventType === 'user' && data.action === 'created' && data.role === 'student' ? 1 : 0
+                    });
+                }
+            },
+
             onPendingProfilesUpdate: function(data) {
                 // 更新待处理学生档案数量
                 const badge = document.getElementById('pending-profiles-badge');
@@ -228,10 +308,17 @@ document.addEventListener('DOMContentLoaded', function() {
     } else if (path.includes('/student_profiles')) {
         // 学生档案列表页面
         syncConfig.endpoints = {
+            stream: '/accounts/api/events/',
             studentData: '/accounts/api/student-profiles-updates/'
         };
 
         syncConfig.callbacks = {
+            onEvent: function(eventType, data) {
+                if (eventType === 'studentprofile') {
+                    this.onStudentDataUpdate({updated_profiles: [data]});
+                }
+            },
+
             onStudentDataUpdate: function(data) {
                 if (data.updated_profiles && data.updated_profiles.length > 0) {
                     showNotification(`${data.updated_profiles.length} 个学生档案已更新`, 'success');
@@ -3,6 +3,11 @@ ASGI config for student_management project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+实时事件流（/accounts/api/events/）依赖 ASGI 长连接，需使用 ASGI 服务器启动，例如：
+    uvicorn student_management.asgi:application --host 0.0.0.0 --port 8000
+事件广播器在进程内运行，单进程即可服务所有在线管理员。
+ASGI 下默认使用异步版本的 JSON 接口（DJANGO_ASYNC_API=0 可关闭），轮询请求等待数据库时不占用线程。
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
 """
@@ -12,5 +17,6 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'student_management.settings')
+os.environ.setdefault('DJANGO_ASYNC_API', '1')
 
 application = get_asgi_application()
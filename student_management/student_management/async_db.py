@@ -0,0 +1,65 @@
+"""
+异步视图中的并发查询。
+
+Django 的异步 ORM（aget、acount、async for 等）把同一个请求的所有查询交给同一个线程依次执行，
+用 asyncio.gather 组合多个异步 ORM 调用并不会真正并发。这里提供：
+
+- run(func, *args)：在数据库线程池中执行一段同步 ORM 代码（查询要在函数内求值，如 list()、count()）；
+- gather(*funcs)：在线程池中同时执行多个互不依赖的只读查询，按顺序返回结果。
+
+每个线程使用自己的数据库连接，SQLite WAL 模式下多个读连接可以同时读取。线程池大小 ASYNC_DB_WORKERS
+即每个进程最多同时打开的连接数；线程中的连接按 CONN_MAX_AGE 复用，副本连接每次用完即关闭，
+刷新后立即读到新文件。上下文变量（副本标记、查询记录）随调用传入线程。
+
+内存数据库（测试）无法在连接之间共享未提交的数据，此时退回到请求线程中依次执行。
+"""
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections, connections
+
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+
+
+def executor():
+    """本进程的数据库线程池；fork 出的子进程不能沿用父进程的线程"""
+    global _executor, _executor_pid
+    with _executor_lock:
+        if _executor is None or _executor_pid != os.getpid():
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'ASYNC_DB_WORKERS', 8), thread_name_prefix='async-db',
+            )
+            _executor_pid = os.getpid()
+        return _executor
+
+
+def concurrent_reads_supported():
+    return not connections['default'].is_in_memory_db()
+
+
+def _call(func, args):
+    try:
+        return func(*args)
+    finally:
+        # 与请求结束时相同：关闭超过 CONN_MAX_AGE 或已经出错的连接
+        close_old_connections()
+
+
+async def run(func, *args):
+    """在数据库线程池中执行 func(*args)"""
+    if not concurrent_reads_supported():
+        return await sync_to_async(func)(*args)
+    return await sync_to_async(_call, thread_sensitive=False, executor=executor())(func, args)
+
+
+async def gather(*funcs):
+    """同时执行多个无参函数，返回结果列表"""
+    if not concurrent_reads_supported():
+        return await sync_to_async(lambda: [func() for func in funcs])()
+    return await asyncio.gather(*(run(func) for func in funcs))
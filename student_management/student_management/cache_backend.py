@@ -0,0 +1,449 @@
+"""
+本机多进程共享的缓存后端，不需要 Redis / Memcached 等外部服务。
+
+两级结构：
+- 共享层：一个开启 WAL 的 SQLite 文件，同一台机器上的所有进程共用，
+  读操作不会被写操作阻塞，一次 get 只是一次主键查询，不再像 FileBasedCache 那样每次打开文件、
+  淘汰时还要列出整个目录；
+- 本地层：每个进程内的 LRU（保存序列化后的字节，取出时反序列化，调用方修改返回值不会影响缓存）。
+  本进程的写入会同步更新本地层；其他进程的写入最多在 LOCAL_TIMEOUT 秒后可见。
+
+在 Django 缓存接口之外还支持：
+- 标签失效：cache.set(key, value, tags=['courses'])，cache.invalidate_tags(['courses'])；
+- 单飞重算：cache.get_or_set(key, callable) 在缓存未命中时，全部进程中只有一个调用方执行 callable，
+  其他调用方等待结果（超过 LOCK_TIMEOUT 仍未完成时自己计算）；
+- 概率提前过期（XFetch）：get_or_set 根据上次重算耗时，在临近过期时以逐渐升高的概率提前重算，
+  此时其他调用方继续读取旧值，热点 key 不会在同一时刻集体过期。
+
+配置示例：
+    CACHES = {
+        'default': {
+            'BACKEND': 'student_management.cache_backend.SQLiteCache',
+            'LOCATION': SHARED_DATA_DIR / 'cache.sqlite3',
+            'OPTIONS': {'MAX_ENTRIES': 10000, 'LOCAL_MAX_ENTRIES': 1000, 'LOCAL_TIMEOUT': 1},
+        }
+    }
+"""
+import math
+import os
+import pickle
+import random
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+from . import metrics
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache_entry (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    expires REAL,
+    delta REAL NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS cache_tag (
+    tag TEXT NOT NULL,
+    key TEXT NOT NULL,
+    PRIMARY KEY (tag, key)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS cache_tag_key ON cache_tag (key);
+CREATE TABLE IF NOT EXISTS cache_lease (
+    key TEXT PRIMARY KEY,
+    expires REAL NOT NULL
+);
+"""
+
+# 未命中时等待其他调用方完成重算的轮询间隔（秒）
+LEASE_POLL_INTERVAL = 0.02
+# 每个进程每写入多少次检查一次是否需要淘汰
+CULL_EVERY = 100
+
+
+class LocalTier:
+    """
+    进程内 LRU。Django 为每个线程创建独立的缓存实例，
+    所以本地层按 LOCATION 放在模块级字典中，由同一进程的所有线程共享（与 LocMemCache 相同）。
+    """
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()  # key -> (序列化后的值, 过期时间, 重算耗时, 读入时间)
+        self.lock = threading.Lock()
+        self.flights = {}  # key -> 进程内单飞锁
+        self.writes = 0
+
+    def get(self, key, now, local_timeout):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            _, expires, _, loaded_at = entry
+            if now - loaded_at >= local_timeout or (expires is not None and expires <= now):
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return entry
+
+    def put(self, key, value, expires, delta, now):
+        if self.max_entries <= 0:
+            return
+        with self.lock:
+            self.entries[key] = (value, expires, delta, now)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def discard(self, *keys):
+        with self.lock:
+            for key in keys:
+                self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def flight(self, key):
+        with self.lock:
+            lock = self.flights.get(key)
+            if lock is None:
+                lock = self.flights[key] = threading.Lock()
+            return lock
+
+    def finish_flight(self, key, lock):
+        with self.lock:
+            if self.flights.get(key) is lock and not lock.locked():
+                del self.flights[key]
+
+    def count_write(self):
+        with self.lock:
+            self.writes += 1
+            return self.writes % CULL_EVERY == 0
+
+
+_tiers = {}
+_tiers_lock = threading.Lock()
+
+
+class SQLiteCache(BaseCache):
+    pickle_protocol = pickle.HIGHEST_PROTOCOL
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._path = str(location)
+        self._local_timeout = float(options.get('LOCAL_TIMEOUT', 1))
+        self._lock_timeout = float(options.get('LOCK_TIMEOUT', 10))
+        self._early_expiry_beta = float(options.get('EARLY_EXPIRY_BETA', 1))
+        with _tiers_lock:
+            tier = _tiers.get(self._path)
+            if tier is None:
+                tier = _tiers[self._path] = LocalTier(int(options.get('LOCAL_MAX_ENTRIES', 1000)))
+        self._tier = tier
+        self._connections = threading.local()
+
+    # ------------------------------------------------------------------
+    # 连接
+    # ------------------------------------------------------------------
+
+    @property
+    def _db(self):
+        # 每个线程一个连接；fork 出的子进程不能沿用父进程的连接
+        connection = getattr(self._connections, 'connection', None)
+        if connection is None or self._connections.pid != os.getpid():
+            directory = os.path.dirname(self._path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(self._path, timeout=30, isolation_level=None, check_same_thread=False)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.executescript(SCHEMA)
+            self._connections.connection = connection
+            self._connections.pid = os.getpid()
+        return connection
+
+    def _write(self, statements):
+        """在一个 IMMEDIATE 事务中执行多条语句，返回最后一条影响的行数"""
+        db = self._db
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            rowcount = 0
+            for sql, args in statements:
+                rowcount = db.execute(sql, args).rowcount
+            db.execute('COMMIT')
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+        if self._tier.count_write():
+            self._cull()
+        return rowcount
+
+    # ------------------------------------------------------------------
+    # 读取
+    # ------------------------------------------------------------------
+
+    def _load(self, key, now=None):
+        """返回 (序列化后的值, 过期时间, 重算耗时)，不存在或已过期返回 None"""
+        now = time.time() if now is None else now
+        entry = self._tier.get(key, now, self._local_timeout)
+        if entry is not None:
+            return entry[:3]
+        row = self._db.execute(
+            'SELECT value, expires, delta FROM cache_entry WHERE key = ? AND (expires IS NULL OR expires > ?)',
+            (key, now),
+        ).fetchone()
+        if row is None:
+            return None
+        self._tier.put(key, row[0], row[1], row[2], now)
+        return row
+
+    def _record_lookup(self, key, entry):
+        metrics.inc('django_cache_requests_total', {
+            'prefix': metrics.cache_key_prefix(key), 'result': 'miss' if entry is None else 'hit',
+        })
+
+    def get(self, key, default=None, version=None):
+        raw_key = key
+        key = self.make_and_validate_key(key, version=version)
+        entry = self._load(key)
+        self._record_lookup(raw_key, entry)
+        if entry is None:
+            return default
+        return pickle.loads(entry[0])
+
+    def get_many(self, keys, version=None):
+        found = {}
+        for key in keys:
+            value = self.get(key, self, version=version)
+            if value is not self:
+                found[key] = value
+        return found
+
+    def has_key(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        return self._load(key) is not None
+
+    # ------------------------------------------------------------------
+    # 写入
+    # ------------------------------------------------------------------
+
+    def _set_statements(self, key, value, expires, delta, tags, only_if_missing=False, now=None):
+        sql = ('INSERT INTO cache_entry (key, value, expires, delta) VALUES (?, ?, ?, ?) '
+               'ON CONFLICT (key) DO UPDATE SET value = excluded.value, expires = excluded.expires, delta = excluded.delta')
+        args = [key, value, expires, delta]
+        if only_if_missing:
+            sql += ' WHERE cache_entry.expires IS NOT NULL AND cache_entry.expires <= ?'
+            args.append(now)
+        statements = [('DELETE FROM cache_tag WHERE key = ?', (key,))]
+        statements += [('INSERT OR IGNORE INTO cache_tag (tag, key) VALUES (?, ?)', (tag, key)) for tag in tags or ()]
+        statements.append((sql, args))
+        return statements
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None, tags=None, delta=0):
+        key = self.make_and_validate_key(key, version=version)
+        self._store(key, value, timeout, tags, delta)
+
+    def _store(self, key, value, timeout, tags=None, delta=0):
+        expires = self.get_backend_timeout(timeout)
+        if expires is not None and expires <= time.time():
+            self._delete(key)
+            return
+        pickled = pickle.dumps(value, self.pickle_protocol)
+        self._write(self._set_statements(key, pickled, expires, delta, tags))
+        self._tier.put(key, pickled, expires, delta, time.time())
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None, tags=None):
+        key = self.make_and_validate_key(key, version=version)
+        expires = self.get_backend_timeout(timeout)
+        now = time.time()
+        pickled = pickle.dumps(value, self.pickle_protocol)
+        # 只有 key 不存在或已过期时才写入；标签语句放在同一事务里，未写入时随值一起回滚
+        db = self._db
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            statements = self._set_statements(key, pickled, expires, 0, tags, only_if_missing=True, now=now)
+            for sql, args in statements[:-1]:
+                db.execute(sql, args)
+            added = db.execute(*statements[-1]).rowcount == 1
+            db.execute('COMMIT' if added else 'ROLLBACK')
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+        if added:
+            self._tier.put(key, pickled, expires, 0, now)
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        expires = self.get_backend_timeout(timeout)
+        self._tier.discard(key)
+        return self._write([(
+            'UPDATE cache_entry SET expires = ? WHERE key = ? AND (expires IS NULL OR expires > ?)',
+            (expires, key, time.time()),
+        )]) == 1
+
+    def incr(self, key, delta=1, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        db = self._db
+        # 读取和写回放在同一个 IMMEDIATE 事务中，多个进程同时 incr 不会丢失更新
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            row = db.execute(
+                'SELECT value, expires FROM cache_entry WHERE key = ? AND (expires IS NULL OR expires > ?)',
+                (key, time.time()),
+            ).fetchone()
+            if row is None:
+                raise ValueError(f"Key '{key}' not found.")
+            value = pickle.loads(row[0]) + delta
+            pickled = pickle.dumps(value, self.pickle_protocol)
+            db.execute('UPDATE cache_entry SET value = ? WHERE key = ?', (pickled, key))
+            db.execute('COMMIT')
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+        self._tier.put(key, pickled, row[1], 0, time.time())
+        return value
+
+    def delete(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        return self._delete(key)
+
+    def _delete(self, key):
+        self._tier.discard(key)
+        return self._write([
+            ('DELETE FROM cache_tag WHERE key = ?', (key,)),
+            ('DELETE FROM cache_entry WHERE key = ?', (key,)),
+        ]) == 1
+
+    def clear(self):
+        self._tier.clear()
+        self._write([
+            ('DELETE FROM cache_tag', ()),
+            ('DELETE FROM cache_lease', ()),
+            ('DELETE FROM cache_entry', ()),
+        ])
+
+    # ------------------------------------------------------------------
+    # 标签
+    # ------------------------------------------------------------------
+
+    def invalidate_tags(self, tags):
+        """删除带有任一标签的全部 key，返回删除的条数"""
+        tags = list(tags)
+        if not tags:
+            return 0
+        placeholders = ', '.join('?' * len(tags))
+        db = self._db
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            keys = [row[0] for row in db.execute(
+                f'SELECT DISTINCT key FROM cache_tag WHERE tag IN ({placeholders})', tags)]
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                key_placeholders = ', '.join('?' * len(chunk))
+                db.execute(f'DELETE FROM cache_entry WHERE key IN ({key_placeholders})', chunk)
+                db.execute(f'DELETE FROM cache_tag WHERE key IN ({key_placeholders})', chunk)
+            db.execute('COMMIT')
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+        self._tier.discard(*keys)
+        return len(keys)
+
+    # ------------------------------------------------------------------
+    # 单飞重算与概率提前过期
+    # ------------------------------------------------------------------
+
+    def _expires_early(self, expires, delta, now):
+        """XFetch：重算耗时越长、离过期越近，提前重算的概率越高"""
+        if expires is None or delta <= 0:
+            return False
+        return now - delta * self._early_expiry_beta * math.log(1 - random.random()) >= expires
+
+    def _acquire_lease(self, key):
+        now = time.time()
+        return self._write([(
+            'INSERT INTO cache_lease (key, expires) VALUES (?, ?) '
+            'ON CONFLICT (key) DO UPDATE SET expires = excluded.expires WHERE cache_lease.expires <= ?',
+            (key, now + self._lock_timeout, now),
+        )]) == 1
+
+    def _release_lease(self, key):
+        self._write([('DELETE FROM cache_lease WHERE key = ?', (key,))])
+
+    def get_or_set(self, key, default, timeout=DEFAULT_TIMEOUT, version=None, tags=None):
+        raw_key = key
+        key = self.make_and_validate_key(key, version=version)
+        entry = self._load(key)
+        self._record_lookup(raw_key, entry)
+        if entry is not None and not self._expires_early(entry[1], entry[2], time.time()):
+            return pickle.loads(entry[0])
+        if not callable(default):
+            self._store(key, default, timeout, tags)
+            return default
+
+        flight = self._tier.flight(key)
+        try:
+            if not flight.acquire(blocking=entry is None):
+                # 本进程已有线程在提前重算，先返回旧值
+                return pickle.loads(entry[0])
+            try:
+                return self._recompute(key, entry, default, timeout, tags)
+            finally:
+                flight.release()
+        finally:
+            self._tier.finish_flight(key, flight)
+
+    def _recompute(self, key, stale, default, timeout, tags):
+        deadline = time.time() + self._lock_timeout
+        while True:
+            current = self._load(key)
+            if current is not None and (stale is None or current[1] != stale[1]):
+                # 等待期间已有其他调用方写入了新值
+                return pickle.loads(current[0])
+            if self._acquire_lease(key):
+                break
+            if stale is not None:
+                # 其他进程正在提前重算，旧值仍然有效
+                return pickle.loads(stale[0])
+            if time.time() >= deadline:
+                # 持有租约的进程可能已经退出，不再等待
+                break
+            time.sleep(LEASE_POLL_INTERVAL)
+            self._tier.discard(key)
+
+        try:
+            started = time.monotonic()
+            value = default()
+            self._store(key, value, timeout, tags, delta=time.monotonic() - started)
+        finally:
+            self._release_lease(key)
+        return value
+
+    # ------------------------------------------------------------------
+    # 淘汰
+    # ------------------------------------------------------------------
+
+    def _cull(self):
+        now = time.time()
+        db = self._db
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            db.execute('DELETE FROM cache_entry WHERE expires IS NOT NULL AND expires <= ?', (now,))
+            db.execute('DELETE FROM cache_lease WHERE expires <= ?', (now,))
+            count = db.execute('SELECT COUNT(*) FROM cache_entry').fetchone()[0]
+            if count > self._max_entries:
+                # 与 Django 内置后端一致：超出上限时删除 1/CULL_FREQUENCY，优先删除最早过期的
+                limit = count if self._cull_frequency == 0 else count // self._cull_frequency
+                db.execute(
+                    'DELETE FROM cache_entry WHERE key IN ('
+                    'SELECT key FROM cache_entry ORDER BY expires IS NULL, expires LIMIT ?)',
+                    (limit,),
+                )
+            db.execute('DELETE FROM cache_tag WHERE key NOT IN (SELECT key FROM cache_entry)')
+            db.execute('COMMIT')
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
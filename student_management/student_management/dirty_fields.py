@@ -0,0 +1,66 @@
+"""
+模型字段修改跟踪：实例从数据库加载（或保存、刷新）时记录字段值快照，之后可以判断哪些字段真正被修改。
+
+- dirty_fields() 返回与快照不同的字段名；新建的实例或不是从数据库加载的实例没有快照，视为所有字段都已修改；
+- save_dirty() 只用 update_fields 保存被修改的字段（连同 auto_now 字段），没有修改时不写数据库；
+- 延迟加载（defer/only）且未被访问的字段不在快照中，不会被判断为已修改。
+
+post_save 信号在快照更新之前触发，信号处理函数中 dirty_fields() 得到的是本次保存修改的字段。
+"""
+
+
+class DirtyFieldsMixin:
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._snapshot_fields()
+        return instance
+
+    def _snapshot_fields(self, fields=None):
+        if fields is None or not hasattr(self, '_loaded_values'):
+            self._loaded_values = {}
+        for field in self._meta.concrete_fields:
+            if field.attname not in self.__dict__:
+                continue
+            if fields is None or field.name in fields or field.attname in fields:
+                self._loaded_values[field.name] = self.__dict__[field.attname]
+
+    def dirty_fields(self):
+        """与快照不同的字段名，按模型字段顺序排列"""
+        loaded = getattr(self, '_loaded_values', None)
+        fields = [field for field in self._meta.concrete_fields if not field.primary_key]
+        if self._state.adding or loaded is None:
+            return [field.name for field in fields]
+        return [
+            field.name for field in fields
+            if field.attname in self.__dict__
+            and (field.name not in loaded or loaded[field.name] != self.__dict__[field.attname])
+        ]
+
+    def is_dirty(self, *names):
+        """names 中任一字段被修改；不传字段名时判断是否有任何字段被修改"""
+        dirty = self.dirty_fields()
+        if not names:
+            return bool(dirty)
+        return any(name in dirty for name in names)
+
+    def save_dirty(self, **kwargs):
+        """只保存被修改的字段，返回是否写入了数据库"""
+        if self._state.adding or getattr(self, '_loaded_values', None) is None:
+            self.save(**kwargs)
+            return True
+        dirty = self.dirty_fields()
+        if not dirty:
+            return False
+        auto_now = [field.name for field in self._meta.concrete_fields if getattr(field, 'auto_now', False)]
+        self.save(update_fields=dirty + [name for name in auto_now if name not in dirty], **kwargs)
+        return True
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self._snapshot_fields(kwargs.get('update_fields'))
+
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        super().refresh_from_db(using=using, fields=fields, from_queryset=from_queryset)
+        self._snapshot_fields(fields)
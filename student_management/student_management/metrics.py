@@ -0,0 +1,439 @@
+"""
+Prometheus 文本格式的运行指标：视图耗时、数据库查询、缓存命中、模板渲染和 SQLite 忙重试。
+
+多进程汇总：
+- 每个进程在内存中累加自己的计数，最多每 METRICS_FLUSH_INTERVAL 秒把全部数值原子写入
+  METRICS_DIR 下自己的文件（process-<主机名>-<pid>-<启动时间>.json），请求路径上不加锁、不写数据库；
+- /metrics 读取目录中所有进程的文件相加后输出。已退出进程的文件并入 archive.json，
+  计数器在工作进程重启后不会回退。目录可能由多台主机共享，进程是否存活只能在本机判断，
+  所以每台主机只合并自己的文件；
+- fork 出的子进程丢弃从父进程继承的数值，从零开始计数。
+
+访问控制：只允许 METRICS_ALLOWED_IPS 中的地址，或携带 Authorization: Bearer <METRICS_TOKEN> 的请求。
+"""
+import atexit
+import glob
+import hmac
+import json
+import logging
+import os
+import socket
+import threading
+import time
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+from django.template import TemplateDoesNotExist
+from django.template.backends import django as django_backend
+
+from .query_budget import record_queries
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+# 指标名 -> (类型, 说明, 直方图分桶)
+METRICS = {
+    'django_http_requests_total': ('counter', '按视图、方法和状态码统计的请求数', None),
+    'django_http_request_duration_seconds': ('histogram', '请求处理耗时（秒），包含中间件', LATENCY_BUCKETS),
+    'django_db_queries_total': ('counter', '按视图和数据库别名统计的 SQL 语句数', None),
+    'django_db_query_duration_seconds_total': ('counter', 'SQL 语句执行总耗时（秒）', None),
+    'django_db_queries_per_request': ('histogram', '每个请求执行的 SQL 语句数', QUERY_COUNT_BUCKETS),
+    'django_cache_requests_total': ('counter', '按键前缀统计的缓存读取，result 为 hit 或 miss', None),
+    'django_template_render_seconds': ('histogram', '模板渲染耗时（秒）', LATENCY_BUCKETS),
+    'sqlite_busy_retries_total': ('counter', 'SQLite 数据库被锁时的重试次数', None),
+    'sqlite_busy_errors_total': ('counter', '重试后仍然失败的 database is locked 次数', None),
+}
+
+KNOWN_METHODS = {'GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'}
+ARCHIVE_NAME = 'archive.json'
+HOSTNAME = socket.gethostname()
+
+
+def metrics_enabled():
+    return getattr(settings, 'METRICS_ENABLED', False)
+
+
+def metrics_dir():
+    return str(settings.METRICS_DIR)
+
+
+def cache_key_prefix(key):
+    """缓存键的统计前缀：第一个冒号之前的部分，去掉结尾的数字编号（如 course_updates_12）"""
+    prefix = str(key).split(':', 1)[0]
+    return prefix.rstrip('0123456789').rstrip('_') or prefix
+
+
+class Registry:
+    """本进程的指标数值；直方图保存为各分桶（不累计）的计数加上总和"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self.pid = os.getpid()
+        self.started = int(time.time() * 1000)
+        self.values = {}
+        self.dirty = False
+        self.flushed_at = 0.0
+
+    def _entry(self, name, labels):
+        if self.pid != os.getpid():
+            self._reset()
+        return (name, tuple(sorted(labels.items())))
+
+    def inc(self, name, labels, amount=1):
+        with self._lock:
+            key = self._entry(name, labels)
+            self.values[key] = self.values.get(key, 0) + amount
+            self.dirty = True
+
+    def observe(self, name, labels, value):
+        buckets = METRICS[name][2]
+        with self._lock:
+            key = self._entry(name, labels)
+            entry = self.values.get(key)
+            if entry is None:
+                entry = self.values[key] = [0] * (len(buckets) + 2)
+            index = next((i for i, bound in enumerate(buckets) if value <= bound), len(buckets))
+            entry[index] += 1
+            entry[-1] += value
+            self.dirty = True
+
+    @property
+    def path(self):
+        return os.path.join(metrics_dir(), f'process-{HOSTNAME}-{self.pid}-{self.started}.json')
+
+    def flush(self, force=False):
+        """把数值写入本进程的文件；未强制时最多每 METRICS_FLUSH_INTERVAL 秒写一次"""
+        interval = getattr(settings, 'METRICS_FLUSH_INTERVAL', 1)
+        with self._lock:
+            if self.pid != os.getpid():
+                self._reset()
+            if not self.dirty or (not force and time.monotonic() - self.flushed_at < interval):
+                return
+            payload = _dump(self.values)
+            path = self.path
+            self.dirty = False
+            self.flushed_at = time.monotonic()
+        try:
+            _write_atomic(path, payload)
+        except OSError:
+            # Windows 上 /metrics 正在读取目标文件时 os.replace 会失败；指标不能影响请求，下次再写
+            logger.warning('写入指标文件 %s 失败', path, exc_info=True)
+            with self._lock:
+                self.dirty = True
+
+
+registry = Registry()
+
+
+def inc(name, labels, amount=1):
+    if metrics_enabled():
+        registry.inc(name, labels, amount)
+
+
+def observe(name, labels, value):
+    if metrics_enabled():
+        registry.observe(name, labels, value)
+
+
+@atexit.register
+def _flush_at_exit():
+    try:
+        if metrics_enabled():
+            registry.flush(force=True)
+    except Exception:
+        pass
+
+
+# ----------------------------------------------------------------------
+# 多进程汇总
+# ----------------------------------------------------------------------
+
+def _dump(values):
+    return json.dumps([[name, list(labels), value] for (name, labels), value in values.items()])
+
+
+def _load(path):
+    try:
+        with open(path, encoding='utf-8') as f:
+            rows = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return {(name, tuple(tuple(pair) for pair in labels)): value for name, labels, value in rows}
+
+
+def _write_atomic(path, payload):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temporary = f'{path}.{os.getpid()}.tmp'
+    with open(temporary, 'w', encoding='utf-8') as f:
+        f.write(payload)
+    try:
+        os.replace(temporary, path)
+    except OSError:
+        os.remove(temporary)
+        raise
+
+
+def _merge(total, values):
+    for key, value in values.items():
+        current = total.get(key)
+        if current is None:
+            total[key] = list(value) if isinstance(value, list) else value
+        elif isinstance(value, list):
+            for i, item in enumerate(value):
+                current[i] += item
+        else:
+            total[key] = current + value
+
+
+def _file_owner(path):
+    """
+    进程文件名中的 (主机名, pid)；主机名本身可能含有 -，从右侧拆分。
+    无法识别时返回 None（如不带主机名的旧格式 process-<pid>-<启动时间>.json）
+    """
+    name = os.path.basename(path)[len('process-'):-len('.json')]
+    parts = name.rsplit('-', 2)
+    if len(parts) != 3:
+        return None
+    try:
+        return parts[0], int(parts[1])
+    except ValueError:
+        return None
+
+
+def _pid_alive(pid):
+    if os.name == 'nt':
+        # Windows 上 os.kill 会直接结束进程，改为查询进程的退出码
+        import ctypes
+
+        kernel32 = ctypes.WinDLL('kernel32', use_last_error=True)
+        handle = kernel32.OpenProcess(0x1000, False, pid)  # PROCESS_QUERY_LIMITED_INFORMATION
+        if not handle:
+            return ctypes.get_last_error() == 5  # 拒绝访问说明进程存在
+        try:
+            code = ctypes.c_ulong()
+            if not kernel32.GetExitCodeProcess(handle, ctypes.byref(code)):
+                return True
+            return code.value == 259  # STILL_ACTIVE
+        finally:
+            kernel32.CloseHandle(handle)
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _process_alive(path):
+    """
+    文件对应的进程是否仍在运行。其他主机的文件无法判断，一律视为存活；
+    无法识别的旧格式文件不会再被任何进程写入，视为已退出，归档一次后删除
+    """
+    owner = _file_owner(path)
+    if owner is None:
+        return False
+    if owner[0] != HOSTNAME:
+        return True
+    pid = owner[1]
+    if pid == os.getpid():
+        return True
+    return _pid_alive(pid)
+
+
+@contextmanager
+def _directory_lock(directory):
+    """目录内的排他锁：POSIX 用 flock，Windows 用 msvcrt.locking 锁住锁文件的第一个字节"""
+    os.makedirs(directory, exist_ok=True)
+    fd = os.open(os.path.join(directory, '.lock'), os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+        else:
+            while True:
+                try:
+                    # LK_LOCK 自己会重试 10 秒，超时后抛出 OSError，继续等待
+                    msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    continue
+        try:
+            yield
+        finally:
+            if fcntl is None:
+                os.lseek(fd, 0, os.SEEK_SET)
+                msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+    finally:
+        os.close(fd)
+
+
+def collect():
+    """所有进程（包括已退出进程）的指标之和"""
+    registry.flush(force=True)
+    directory = metrics_dir()
+    archive = os.path.join(directory, ARCHIVE_NAME)
+    # 合并已退出进程的文件需要读改写 archive.json，同一时间只允许一个进程执行
+    with _directory_lock(directory):
+        total = _load(archive)
+        dead = []
+        for path in glob.glob(os.path.join(directory, 'process-*.json')):
+            values = _load(path)
+            _merge(total, values)
+            if not _process_alive(path):
+                dead.append(path)
+        if dead:
+            archived = _load(archive)
+            for path in dead:
+                _merge(archived, _load(path))
+            _write_atomic(archive, _dump(archived))
+            for path in dead:
+                os.remove(path)
+    return total
+
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (
+        '{}="{}"'.format(key, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for key, value in pairs
+    )
+    return '{' + ','.join(escaped) + '}'
+
+
+def _format_number(value):
+    if isinstance(value, float):
+        return repr(value)
+    return str(value)
+
+
+def render_text(values):
+    """Prometheus 文本格式（0.0.4）"""
+    lines = []
+    for name, (kind, help_text, buckets) in METRICS.items():
+        series = sorted((labels, value) for (metric, labels), value in values.items() if metric == name)
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        for labels, value in series:
+            if kind != 'histogram':
+                lines.append(f'{name}{_format_labels(labels)} {_format_number(value)}')
+                continue
+            cumulative = 0
+            for bound, count in zip(list(buckets) + ['+Inf'], value[:-1]):
+                cumulative += count
+                lines.append(f'{name}_bucket{_format_labels(labels, [("le", bound)])} {cumulative}')
+            lines.append(f'{name}_sum{_format_labels(labels)} {_format_number(value[-1])}')
+            lines.append(f'{name}_count{_format_labels(labels)} {cumulative}')
+    return '\n'.join(lines) + '\n'
+
+
+# ----------------------------------------------------------------------
+# 采集点
+# ----------------------------------------------------------------------
+
+class MetricsMiddleware:
+    """记录每个请求的耗时和 SQL；应放在中间件列表的最前面，耗时包含其他中间件"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not metrics_enabled():
+            return self.get_response(request)
+
+        started = time.perf_counter()
+        with record_queries() as recorder:
+            response = self.get_response(request)
+        self._record(request, response, recorder, time.perf_counter() - started)
+        return response
+
+    async def __acall__(self, request):
+        if not metrics_enabled():
+            return await self.get_response(request)
+
+        started = time.perf_counter()
+        with record_queries() as recorder:
+            response = await self.get_response(request)
+        self._record(request, response, recorder, time.perf_counter() - started)
+        return response
+
+    @staticmethod
+    def _record(request, response, recorder, elapsed):
+        match = getattr(request, 'resolver_match', None)
+        # 未匹配的路径统一记为 unresolved，避免任意 URL 产生无限多的标签
+        view = match.view_name if match is not None else 'unresolved'
+        method = request.method if request.method in KNOWN_METHODS else 'other'
+        registry.inc('django_http_requests_total', {'view': view, 'method': method, 'status': str(response.status_code)})
+        registry.observe('django_http_request_duration_seconds', {'view': view, 'method': method}, elapsed)
+        registry.observe('django_db_queries_per_request', {'view': view}, len(recorder.queries))
+        by_alias = {}
+        for query in recorder.queries:
+            count, duration = by_alias.get(query.alias, (0, 0.0))
+            by_alias[query.alias] = (count + 1, duration + query.duration)
+        for alias, (count, duration) in by_alias.items():
+            registry.inc('django_db_queries_total', {'view': view, 'alias': alias}, count)
+            registry.inc('django_db_query_duration_seconds_total', {'view': view, 'alias': alias}, duration)
+
+        registry.flush()
+
+
+class TimedTemplate(django_backend.Template):
+
+    def render(self, context=None, request=None):
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            observe('django_template_render_seconds', {'template': self.origin.template_name or '<string>'},
+                    time.perf_counter() - started)
+
+
+class TimedDjangoTemplates(django_backend.DjangoTemplates):
+    """Django 模板引擎，额外记录每个页面模板（不含 include 的子模板）的渲染耗时"""
+
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return TimedTemplate(self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            django_backend.reraise(exc, self)
+
+
+def _authorized(request):
+    token = getattr(settings, 'METRICS_TOKEN', None)
+    if token:
+        header = request.headers.get('Authorization', '')
+        if hmac.compare_digest(header.encode(), f'Bearer {token}'.encode()):
+            return True
+    return request.META.get('REMOTE_ADDR') in getattr(settings, 'METRICS_ALLOWED_IPS', ())
+
+
+def metrics_view(request):
+    """Prometheus 抓取端点"""
+    if not _authorized(request):
+        return HttpResponseForbidden('禁止访问')
+    if not metrics_enabled():
+        return HttpResponse('指标采集未启用\n', content_type='text/plain; charset=utf-8', status=404)
+    return HttpResponse(render_text(collect()), content_type='text/plain; version=0.0.4; charset=utf-8')
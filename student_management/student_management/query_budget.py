@@ -0,0 +1,201 @@
+"""
+按视图的查询预算：记录一次请求执行的全部 SQL，检查查询次数、耗时和 N+1 模式。
+
+- 预算在 settings.QUERY_BUDGETS 中按 URL 名称（如 'students:enrollment_list'）配置为
+  (最多查询次数, 最长耗时毫秒)，耗时为 None 表示不限制（如事件流）；
+- 只是参数不同的 SELECT 语句归为同一个指纹，同一指纹在一次请求中出现
+  QUERY_BUDGET_REPEAT_THRESHOLD 次及以上视为 N+1（逐行访问外键、逐个 exists() 等）；
+- QUERY_BUDGET_MODE：off 不检查，log 记录警告日志，raise 抛出 QueryBudgetExceeded。
+
+测试中使用 assert_query_budget：
+
+    with assert_query_budget('students:enrollment_list'):
+        self.client.get(reverse('students:enrollment_list'))
+
+流式响应（导出、事件流）只统计视图返回之前的查询。
+
+记录范围跟随上下文变量：异步视图通过 sync_to_async 或 async_db 在其他线程中执行的查询
+同样计入当前请求；每个数据库连接建立时都安装同一个执行包装器，没有记录器时直接执行。
+"""
+import logging
+import re
+import time
+from collections import Counter, namedtuple
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_REPEAT_THRESHOLD = 5
+
+Budget = namedtuple('Budget', ['queries', 'milliseconds'])
+RecordedQuery = namedtuple('RecordedQuery', ['alias', 'sql', 'duration'])
+
+_NORMALIZERS = [
+    (re.compile(r"'(?:[^']|'')*'"), '?'),  # 字符串常量
+    (re.compile(r'\b\d+(?:\.\d+)?\b'), '?'),  # 数字常量，不会匹配标识符中的数字
+    (re.compile(r'%s'), '?'),  # 参数占位符
+    (re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)'), '(?)'),  # 长度不同的 IN 列表
+]
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def fingerprint(sql):
+    """去掉参数和常量后的 SQL，参数不同的同一条语句得到相同的指纹"""
+    for pattern, replacement in _NORMALIZERS:
+        sql = pattern.sub(replacement, sql)
+    return ' '.join(sql.split())
+
+
+def budget_mode():
+    return getattr(settings, 'QUERY_BUDGET_MODE', 'off')
+
+
+def get_budget(view_name):
+    """URL 名称对应的预算，没有配置时返回 None"""
+    budget = getattr(settings, 'QUERY_BUDGETS', {}).get(view_name)
+    return Budget(*budget) if budget is not None else None
+
+
+class QueryRecorder:
+    """一段代码执行的语句：连接别名、SQL 和耗时"""
+
+    def __init__(self):
+        self.queries = []
+
+    def repeated(self, threshold=None):
+        """出现次数达到阈值的 SELECT 指纹及其次数"""
+        if threshold is None:
+            threshold = getattr(settings, 'QUERY_BUDGET_REPEAT_THRESHOLD', DEFAULT_REPEAT_THRESHOLD)
+        counts = Counter(
+            fingerprint(query.sql) for query in self.queries
+            if query.sql.lstrip()[:6].upper() == 'SELECT'
+        )
+        return {statement: count for statement, count in counts.items() if count >= threshold}
+
+
+# 当前上下文中正在记录的 QueryRecorder（可以嵌套，如指标和预算中间件同时记录）
+_active_recorders = ContextVar('active_query_recorders', default=())
+
+
+def _record_execute(execute, sql, params, many, context):
+    recorders = _active_recorders.get()
+    if not recorders:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        query = RecordedQuery(context['connection'].alias, sql, time.perf_counter() - started)
+        for recorder in recorders:
+            recorder.queries.append(query)
+
+
+def install(connection):
+    if _record_execute not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_execute)
+
+
+def _install_on_connect(sender, connection, **kwargs):
+    install(connection)
+
+
+connection_created.connect(_install_on_connect, dispatch_uid='query_budget_install')
+
+
+@contextmanager
+def record_queries():
+    """记录代码块执行的 SQL，包括在复制了当前上下文的其他线程中执行的查询"""
+    # 本模块导入之前已经建立的连接收不到 connection_created
+    for connection in connections.all():
+        install(connection)
+    recorder = QueryRecorder()
+    token = _active_recorders.set(_active_recorders.get() + (recorder,))
+    try:
+        yield recorder
+    finally:
+        _active_recorders.reset(token)
+
+
+def check_budget(view_name, recorder, elapsed):
+    """返回超出预算的问题列表，没有配置预算的视图不检查"""
+    budget = get_budget(view_name)
+    if budget is None:
+        return []
+    problems = []
+    if len(recorder.queries) > budget.queries:
+        problems.append(f'执行了 {len(recorder.queries)} 条查询，预算 {budget.queries} 条')
+    if budget.milliseconds is not None and elapsed * 1000 > budget.milliseconds:
+        problems.append(f'耗时 {elapsed * 1000:.0f}ms，预算 {budget.milliseconds}ms')
+    for statement, count in recorder.repeated().items():
+        problems.append(f'疑似 N+1，同一查询重复 {count} 次：{statement[:200]}')
+    return problems
+
+
+def report(view_name, problems, mode):
+    if not problems:
+        return
+    message = f'{view_name} 超出查询预算：\n  ' + '\n  '.join(problems)
+    if mode == 'raise':
+        raise QueryBudgetExceeded(message)
+    logger.warning(message)
+
+
+@contextmanager
+def assert_query_budget(view_name):
+    """测试辅助：代码块中的查询超出 view_name 的预算或出现 N+1 时失败"""
+    if get_budget(view_name) is None:
+        raise QueryBudgetExceeded(f'{view_name} 没有在 QUERY_BUDGETS 中配置预算')
+    started = time.perf_counter()
+    with record_queries() as recorder:
+        yield recorder
+    report(view_name, check_budget(view_name, recorder, time.perf_counter() - started), 'raise')
+
+
+class QueryBudgetMiddleware:
+    """按 URL 名称检查每个请求的查询预算；应放在其他会查询数据库的中间件之前"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        mode = budget_mode()
+        if mode == 'off':
+            return self.get_response(request)
+
+        started = time.perf_counter()
+        with record_queries() as recorder:
+            response = self.get_response(request)
+        self._check(request, recorder, time.perf_counter() - started, mode)
+        return response
+
+    async def __acall__(self, request):
+        mode = budget_mode()
+        if mode == 'off':
+            return await self.get_response(request)
+
+        started = time.perf_counter()
+        with record_queries() as recorder:
+            response = await self.get_response(request)
+        self._check(request, recorder, time.perf_counter() - started, mode)
+        return response
+
+    @staticmethod
+    def _check(request, recorder, elapsed, mode):
+        match = getattr(request, 'resolver_match', None)
+        if match is not None:
+            report(match.view_name, check_budget(match.view_name, recorder, elapsed), mode)
@@ -0,0 +1,216 @@
+"""
+只读副本：把报表、面板和大列表的读取从主库移到一个快照副本上。
+
+- 副本是主库的完整拷贝，由 SQLite 在线备份 API 生成：先备份到临时文件，再原子替换副本文件。
+  主库是 WAL 模式，备份只持有一个读事务，不会阻塞选课、注册等写入；
+- 用 @use_replica 标记的视图在副本足够新（不超过 REPLICA_MAX_STALENESS 秒）时读取副本，
+  否则读取主库，并在后台触发一次刷新（REPLICA_AUTO_REFRESH）；
+- 读己之写：用户提交过写请求后，在副本刷新之前，这个用户的读取仍然走主库；
+- 写入始终走主库，迁移只在主库上执行；
+- 只在 Linux / macOS 上启用：Windows 不能替换被打开的文件，刷新会因 PermissionError 失败。
+
+定时刷新：python manage.py refresh_replica --interval 30
+"""
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextvars import ContextVar
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections
+from django.template.response import SimpleTemplateResponse
+
+logger = logging.getLogger(__name__)
+
+REPLICA_ALIAS = 'replica'
+REFRESHED_AT_KEY = 'replica:refreshed_at'
+REFRESH_LOCK_KEY = 'replica:refreshing'
+LAST_WRITE_KEY = 'replica:last_write:{}'
+
+_reading_replica = ContextVar('reading_replica', default=False)
+
+
+def _cache():
+    # 刷新时间和写入标记需要在所有进程中立即可见，应配置为没有进程内 LRU 的缓存
+    return caches[getattr(settings, 'REPLICA_CACHE_ALIAS', 'default')]
+
+
+def max_staleness():
+    return getattr(settings, 'REPLICA_MAX_STALENESS', 60)
+
+
+def replica_configured():
+    # Windows 上只要有请求打开着副本，os.replace 就会失败，副本会悄悄停止刷新，因此不启用，全部读取主库
+    if os.name == 'nt':
+        return False
+    # 测试使用内存数据库（副本配置为 MIRROR），不需要也无法备份
+    return REPLICA_ALIAS in settings.DATABASES and not connections['default'].is_in_memory_db()
+
+
+def replica_refreshed_at():
+    """副本对应的主库时间点（备份开始时间），没有副本时返回 None"""
+    return _cache().get(REFRESHED_AT_KEY)
+
+
+def refresh_replica():
+    """
+    把主库备份到副本，返回副本对应的时间点；其他进程正在刷新时返回 None。
+    先写临时文件再 os.replace：POSIX 上正在读取旧副本的连接继续读旧文件，新连接读到新副本；
+    Windows 上副本被打开时无法替换，见 replica_configured。
+    """
+    cache = _cache()
+    if not cache.add(REFRESH_LOCK_KEY, os.getpid(), 300):
+        return None
+    try:
+        primary = str(connections['default'].settings_dict['NAME'])
+        target = str(connections[REPLICA_ALIAS].settings_dict['NAME'])
+        temporary = f'{target}.tmp'
+        if os.path.exists(temporary):
+            os.remove(temporary)
+
+        started = time.time()
+        source = sqlite3.connect(primary, timeout=30)
+        destination = sqlite3.connect(temporary)
+        try:
+            # 一次复制全部页面：分步复制时主库的每次写入都会让备份从头开始
+            source.backup(destination)
+            # 副本以回滚日志模式只读打开，不能带着主库的 WAL 标记被替换
+            destination.execute('PRAGMA journal_mode=DELETE')
+        finally:
+            destination.close()
+            source.close()
+        os.replace(temporary, target)
+
+        cache.set(REFRESHED_AT_KEY, started, None)
+        return started
+    finally:
+        cache.delete(REFRESH_LOCK_KEY)
+
+
+def _refresh_in_background():
+    try:
+        refresh_replica()
+    except Exception:
+        logger.exception('刷新只读副本失败')
+
+
+def can_read_replica(user):
+    """当前请求能否读取副本：副本存在且足够新，并且不会读不到这个用户自己刚写入的数据"""
+    if not replica_configured():
+        return False
+    refreshed_at = replica_refreshed_at()
+    if refreshed_at is None or time.time() - refreshed_at > max_staleness():
+        if getattr(settings, 'REPLICA_AUTO_REFRESH', True) and _cache().get(REFRESH_LOCK_KEY) is None:
+            threading.Thread(target=_refresh_in_background, daemon=True).start()
+        return False
+    if user is not None and user.is_authenticated:
+        last_write = _cache().get(LAST_WRITE_KEY.format(user.pk))
+        if last_write is not None and last_write >= refreshed_at:
+            return False
+    return True
+
+
+def record_write(user):
+    """记录用户最近一次写入的时间；副本刷新到这个时间点之后，该用户才重新读取副本"""
+    # 超过 max_staleness 后副本要么已刷新、要么已过期不再使用，标记不必保留更久
+    _cache().set(LAST_WRITE_KEY.format(user.pk), time.time(), max_staleness() + 1)
+
+
+def _stream_from_replica(content):
+    token = _reading_replica.set(True)
+    try:
+        yield from content
+    finally:
+        _reading_replica.reset(token)
+
+
+def use_replica(view):
+    """视图装饰器：本次请求的读取在副本可用时走副本"""
+    if iscoroutinefunction(view):
+        # 异步视图返回的 JSON 已在视图内生成；副本标记随上下文传入 sync_to_async 执行的查询
+        @wraps(view)
+        async def async_wrapper(request, *args, **kwargs):
+            user = await request.auser() if hasattr(request, 'auser') else None
+            if not await sync_to_async(can_read_replica)(user):
+                return await view(request, *args, **kwargs)
+            token = _reading_replica.set(True)
+            try:
+                return await view(request, *args, **kwargs)
+            finally:
+                _reading_replica.reset(token)
+        return async_wrapper
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not can_read_replica(getattr(request, 'user', None)):
+            return view(request, *args, **kwargs)
+        token = _reading_replica.set(True)
+        try:
+            response = view(request, *args, **kwargs)
+            # 模板和流式响应在视图返回之后才执行查询，需要在副本上下文中完成
+            if isinstance(response, SimpleTemplateResponse) and not response.is_rendered:
+                response.render()
+            if response.streaming:
+                response.streaming_content = _stream_from_replica(response.streaming_content)
+            return response
+        finally:
+            _reading_replica.reset(token)
+    return wrapper
+
+
+class ReplicaRouter:
+    """标记为读取副本的请求把读操作路由到副本，其余一律使用主库"""
+
+    def db_for_read(self, model, **hints):
+        if _reading_replica.get():
+            return REPLICA_ALIAS
+        return None
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # 副本与主库是同一份数据
+        if {obj1._state.db, obj2._state.db} <= {'default', REPLICA_ALIAS}:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db == REPLICA_ALIAS:
+            return False
+        return None
+
+
+class ReadYourWritesMiddleware:
+    """已登录用户提交写请求（POST 等）后记录时间，保证随后的列表和报表能看到自己的修改"""
+
+    SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS', 'TRACE')
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        response = self.get_response(request)
+        user = getattr(request, 'user', None)
+        if request.method not in self.SAFE_METHODS and replica_configured() and user is not None and user.is_authenticated:
+            record_write(user)
+        return response
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        if request.method not in self.SAFE_METHODS and replica_configured() and hasattr(request, 'auser'):
+            user = await request.auser()
+            if user.is_authenticated:
+                await sync_to_async(record_write)(user)
+        return response
@@ -0,0 +1,125 @@
+"""
+合并写入的会话后端。
+
+原来使用数据库会话并开启 SESSION_SAVE_EVERY_REQUEST，每次页面访问和每次轮询都会
+UPDATE 一次 django_session，所有用户在共享 SQLite 文件的写锁上排队。
+
+本后端：
+- 会话数据缓存在 SESSION_CACHE_ALIAS 指向的缓存中（进程内 LRU + 本机共享层），读取不查数据库；
+- 写入数据库时把过期时间多延长 SESSION_EXPIRY_REFRESH_THRESHOLD 秒作为余量。
+  之后的请求如果会话数据没有变化、按滑动过期计算的新过期时间仍在已保存的过期时间之内，
+  就不写数据库也不写缓存，每个活跃会话最多每 SESSION_EXPIRY_REFRESH_THRESHOLD 秒写一次；
+- 浏览器端的 Cookie 仍然每次请求按 SESSION_COOKIE_AGE 刷新，空闲超时的体验不变，
+  服务器端的会话记录最多比 Cookie 晚 SESSION_EXPIRY_REFRESH_THRESHOLD 秒过期。
+
+过期会话用 clearsessions 或 sweep_sessions 分批清理，每批一个短事务，不会长时间占用写锁。
+"""
+import time
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.sessions.backends.cached_db import SessionStore as CachedDBStore
+from django.utils import timezone
+
+# 以冒号结尾，缓存指标按冒号前的部分归类，不会把每个会话键记成单独的前缀
+KEY_PREFIX = 'student_management.sessions:'
+
+# 每批删除的过期会话数
+SWEEP_BATCH_SIZE = 500
+
+
+def refresh_threshold():
+    return getattr(settings, 'SESSION_EXPIRY_REFRESH_THRESHOLD', 60)
+
+
+class SessionStore(CachedDBStore):
+    cache_key_prefix = KEY_PREFIX
+
+    def __init__(self, session_key=None):
+        super().__init__(session_key)
+        # 最近一次与数据库同步时的 (序列化后的会话数据, 数据库中的过期时间戳)
+        self._persisted = None
+
+    def _payload(self, data):
+        return self.serializer().dumps(data)
+
+    def load(self):
+        try:
+            entry = self._cache.get(self.cache_key)
+        except Exception:
+            entry = None
+
+        if entry is not None:
+            data, expires = entry
+            if expires > time.time():
+                self._persisted = (self._payload(data), expires)
+                return data
+
+        s = self._get_session_from_db()
+        if not s:
+            self._persisted = None
+            return {}
+        data = self.decode(s.session_data)
+        self._remember(data, s.expire_date.timestamp())
+        return data
+
+    def _remember(self, data, expires):
+        self._persisted = (self._payload(data), expires)
+        try:
+            self._cache.set(self.cache_key, (data, expires), max(int(expires - time.time()), 1))
+        except Exception:
+            pass
+
+    def create_model_instance(self, data):
+        obj = super().create_model_instance(data)
+        # 预留刷新余量：之后的请求在余量用完之前都不需要再写数据库
+        obj.expire_date += timedelta(seconds=refresh_threshold())
+        return obj
+
+    def save(self, must_create=False):
+        if self.session_key is None:
+            return self.create()
+        data = self._get_session(no_load=must_create)
+        if not must_create and self._persisted is not None:
+            payload, expires = self._persisted
+            if payload == self._payload(data) and self.get_expiry_date().timestamp() <= expires:
+                return
+
+        # 直接调用数据库后端的 save，缓存由 _remember 写入（格式与 cached_db 不同）
+        expires = self.get_expiry_date() + timedelta(seconds=refresh_threshold())
+        super(CachedDBStore, self).save(must_create)
+        self._remember(data, expires.timestamp())
+
+    def delete(self, session_key=None):
+        super().delete(session_key)
+        if session_key is None or session_key == self.session_key:
+            self._persisted = None
+
+    # 异步接口复用同步实现，保证缓存中的数据格式一致
+    async def aload(self):
+        return await sync_to_async(self.load)()
+
+    async def asave(self, must_create=False):
+        return await sync_to_async(self.save)(must_create)
+
+    async def adelete(self, session_key=None):
+        return await sync_to_async(self.delete)(session_key)
+
+    @classmethod
+    def clear_expired(cls, batch_size=SWEEP_BATCH_SIZE, max_batches=None):
+        """分批删除过期会话，返回删除的条数；每批按 expire_date 索引取一批主键再删除"""
+        model = cls.get_model_class()
+        now = timezone.now()
+        deleted = batches = 0
+        while max_batches is None or batches < max_batches:
+            keys = list(
+                model.objects.filter(expire_date__lt=now)
+                .order_by('expire_date')
+                .values_list('session_key', flat=True)[:batch_size]
+            )
+            if not keys:
+                break
+            deleted += model.objects.filter(session_key__in=keys).delete()[0]
+            batches += 1
+        return deleted
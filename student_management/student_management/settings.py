@@ -61,11 +61,14 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'student_management.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'student_management.query_budget.QueryBudgetMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'student_management.replica.ReadYourWritesMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -74,7 +77,8 @@ ROOT_URLCONF = 'student_management.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # Django 模板引擎，额外记录页面模板的渲染耗时（student_management/metrics.py）
+        'BACKEND': 'student_management.metrics.TimedDjangoTemplates',
         'DIRS': [BASE_DIR / 'templates'],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -95,37 +99,188 @@ WSGI_APPLICATION = 'student_management.wsgi.application'
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
 # 团队共享数据库配置
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': SHARED_DB_PATH,
-        'OPTIONS': {
-            # SQLite团队共享优化配置
-            'timeout': 30,  # 设置超时时间为30秒
-            'check_same_thread': False,  # 允许多线程访问
+# SQLite 运行模式（环境变量 DJANGO_SQLITE_MODE）：
+# - compat（默认）：原来的回滚日志模式。团队成员通过网络共享目录访问 shared_data 时只能使用这种模式，
+#   WAL 依赖共享内存，在网络文件系统上会损坏数据库；
+# - production：WAL、按连接调优的 PRAGMA、写事务 BEGIN IMMEDIATE、忙错误带抖动退避重试，
+#   见 student_management/sqlite_backend；只能在数据库文件位于运行服务器的本机磁盘时启用，
+#   数据库在网络文件系统上时后端拒绝连接。
+#   设置 DJANGO_SQLITE_SINGLE_WRITER=1 后本机所有进程的写事务通过文件锁排队（仅 Linux / macOS）。
+#   并发性能对比：python manage.py benchmark_database
+SQLITE_MODE = os.environ.get('DJANGO_SQLITE_MODE', 'compat')
+
+if SQLITE_MODE == 'compat':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': SHARED_DB_PATH,
+            'OPTIONS': {
+                # SQLite团队共享优化配置
+                'timeout': 30,  # 设置超时时间为30秒
+                'check_same_thread': False,  # 允许多线程访问
+            },
+            # 连接设置优化
+            'CONN_MAX_AGE': 60,  # 连接最大生存时间60秒
+        }
+    }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'student_management.sqlite_backend',
+            'NAME': SHARED_DB_PATH,
+            'OPTIONS': {
+                'timeout': 5,  # SQLite 内部忙等待时间（秒），超时后由后端退避重试
+                'transaction_mode': 'IMMEDIATE',
+                'init_command': (
+                    'PRAGMA journal_mode=WAL;'
+                    'PRAGMA synchronous=NORMAL;'  # WAL 下 NORMAL 不会损坏数据库，只在断电时可能丢失最后几个事务
+                    'PRAGMA cache_size=-16000;'  # 每个连接 16MB 页缓存
+                    'PRAGMA temp_store=MEMORY;'
+                    'PRAGMA mmap_size=134217728'  # 128MB 内存映射读
+                ),
+                'busy_retries': 5,
+                'single_writer': os.environ.get('DJANGO_SQLITE_SINGLE_WRITER') == '1',
+            },
+            'CONN_MAX_AGE': 60,  # 连接最大生存时间60秒
+        },
+        # 报表、面板和大列表使用的只读快照副本（仅 Linux / macOS），见 student_management/replica.py
+        'replica': {
+            'ENGINE': 'student_management.sqlite_backend',
+            'NAME': SHARED_DATA_DIR / 'team_shared_replica.db',
+            'OPTIONS': {
+                'timeout': 5,
+                'init_command': (
+                    'PRAGMA query_only=ON;'
+                    'PRAGMA cache_size=-16000;'
+                    'PRAGMA temp_store=MEMORY;'
+                    'PRAGMA mmap_size=134217728'
+                ),
+            },
+            'CONN_MAX_AGE': 0,  # 每个请求重新打开，副本刷新后立即读到新文件
+            'TEST': {'MIRROR': 'default'},
         },
-        # 连接设置优化
-        'CONN_MAX_AGE': 60,  # 连接最大生存时间60秒
     }
-}
+    DATABASE_ROUTERS = ['student_management.replica.ReplicaRouter']
+    REPLICA_MAX_STALENESS = 60  # 副本最多落后主库的秒数，超过后读取主库
+    REPLICA_AUTO_REFRESH = True  # 副本过期时由请求在后台触发刷新
+    REPLICA_CACHE_ALIAS = 'sessions'  # 刷新时间、写入标记需要在所有进程中立即可见，使用没有进程内 LRU 的缓存
 
 # 会话配置（支持多实例共享）
-SESSION_ENGINE = 'django.contrib.sessions.backends.db'  # 使用数据库存储会话
+# 会话读写走缓存，数据库只在数据变化或过期时间余量用完时写入，见 student_management/session_backend.py
+SESSION_ENGINE = 'student_management.session_backend'
+SESSION_CACHE_ALIAS = 'sessions'
 SESSION_COOKIE_AGE = 600  # 会话保持10分钟（600秒）
-SESSION_SAVE_EVERY_REQUEST = True  # 每次请求都更新会话过期时间
+SESSION_SAVE_EVERY_REQUEST = True  # 每次请求都刷新 Cookie 过期时间（服务器端按下面的余量合并写入）
+SESSION_EXPIRY_REFRESH_THRESHOLD = 60  # 数据库中的过期时间余量（秒），每个活跃会话最多每60秒写一次
 # 启用会话安全设置
 SESSION_COOKIE_SECURE = False  # 开发环境设为False，生产环境设为True
 SESSION_COOKIE_HTTPONLY = True
 SESSION_COOKIE_SAMESITE = 'Lax'
 
 # 缓存配置（可选，用于提升性能）
+# 本机多进程共享的 SQLite(WAL) 缓存，带进程内 LRU、标签失效和单飞重算，见 student_management/cache_backend.py
+# 与原 FileBasedCache 的性能对比：python manage.py benchmark_cache
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
-        'LOCATION': SHARED_DATA_DIR / 'cache',
-    }
+        'BACKEND': 'student_management.cache_backend.SQLiteCache',
+        'LOCATION': SHARED_DATA_DIR / 'cache.sqlite3',
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+            'LOCAL_MAX_ENTRIES': 1000,  # 每个进程内 LRU 的容量
+            'LOCAL_TIMEOUT': 1,  # 其他进程的写入最多延迟多少秒可见
+        },
+    },
+    # 会话缓存：单独的文件，关闭进程内 LRU，登录、退出在所有进程中立即生效
+    'sessions': {
+        'BACKEND': 'student_management.cache_backend.SQLiteCache',
+        'LOCATION': SHARED_DATA_DIR / 'session_cache.sqlite3',
+        'OPTIONS': {
+            'MAX_ENTRIES': 100000,
+            'LOCAL_MAX_ENTRIES': 0,
+        },
+    },
+}
+
+# 查询预算（student_management/query_budget.py）
+# off 不检查；log 记录警告日志；raise 抛出 QueryBudgetExceeded。开发环境默认 log
+QUERY_BUDGET_MODE = os.environ.get('DJANGO_QUERY_BUDGET', 'log' if DEBUG else 'off')
+QUERY_BUDGET_REPEAT_THRESHOLD = 5  # 同一 SELECT 指纹重复多少次视为 N+1
+# URL 名称 -> (最多查询次数, 最长耗时毫秒)，耗时为 None 表示不限制。
+# 次数包含会话、当前用户、缓存失效后重新加载参考数据等查询，以及 POST 的校验和写入
+QUERY_BUDGETS = {
+    'students:home': (8, 300),
+    'students:department_list': (8, 300),
+    'students:department_create': (12, 500),
+    'students:department_update': (12, 500),
+    'students:department_delete': (12, 500),
+    'students:major_list': (10, 300),
+    'students:major_create': (12, 500),
+    'students:major_update': (12, 500),
+    'students:major_delete': (12, 500),
+    'students:course_list': (10, 300),
+    'students:course_create': (12, 500),
+    'students:course_update': (12, 500),
+    'students:course_delete': (15, 500),
+    'students:student_profile_list': (10, 500),
+    'students:student_profile_create': (25, 1000),
+    'students:student_import': (200, 30000),  # 按批 bulk_create，次数与批数成正比
+    'students:student_profile_export': (10, 500),  # 流式导出，只统计开始输出之前的查询
+    'students:student_profile_update': (25, 1000),
+    'students:student_profile_delete': (25, 1000),
+    'students:enrollment_list': (10, 500),
+    'students:enrollment_create': (25, 1000),
+    'students:enrollment_update': (20, 1000),
+    'students:enrollment_delete': (20, 1000),
+    'students:enrollment_export': (10, 500),
+    'students:enrollment_grade_list': (10, 500),
+    'students:grade_update': (20, 1000),
+    'students:grade_sheet': (30, 5000),  # 成绩单批量保存，按批 bulk_update
+    'students:my_enrollments': (8, 300),
+    'students:course_selection': (10, 500),
+    'students:course_selection_submit': (25, 1000),
+    'students:api_student_status': (10, 300),
+    'students:api_course_updates': (8, 300),
+    'students:api_enrollment_changes': (10, 300),
+    'students:api_changes': (6, 300),
+    'students:api_student_profiles': (8, 300),
+    'students:api_student_search': (6, 300),
+    'accounts:login': (10, 1000),  # 包含密码哈希
+    'accounts:register': (35, 1000),  # 包含密码哈希和自动建档
+    'accounts:logout': (6, 300),
+    'accounts:profile': (8, 300),
+    'accounts:edit_profile': (20, 1000),  # 只保存修改过的用户和学生档案字段
+    'accounts:admin_dashboard': (10, 300),
+    'accounts:student_dashboard': (8, 300),
+    'accounts:user_list': (8, 500),
+    'accounts:edit_user': (15, 1000),
+    'accounts:delete_user': (40, 1000),  # 级联删除档案和选课记录
+    'accounts:student_profile_list_admin': (8, 1000),
+    'accounts:pending_student_profiles': (8, 300),
+    'accounts:quick_create_student_profile': (25, 1000),
+    'accounts:api_pending_profiles_count': (8, 300),
+    'accounts:api_recent_users': (8, 300),
+    'accounts:api_users': (8, 300),
+    'accounts:api_student_profiles_updates': (8, 300),
+    'accounts:api_user_notifications': (10, 300),
+    'accounts:api_mark_notifications_read': (6, 300),
+    'accounts:api_event_stream': (6, None),  # 长连接，只统计建立连接时的查询
 }
 
+# 运行指标（student_management/metrics.py），Prometheus 从 /metrics 抓取
+METRICS_ENABLED = os.environ.get('DJANGO_METRICS', '1') != '0'
+METRICS_DIR = SHARED_DATA_DIR / 'metrics'  # 各进程的指标文件，所有工作进程必须指向同一目录
+METRICS_FLUSH_INTERVAL = 1  # 每个进程最多每隔多少秒把指标写入文件
+METRICS_ALLOWED_IPS = ['127.0.0.1', '::1']  # 允许抓取 /metrics 的地址
+METRICS_TOKEN = os.environ.get('DJANGO_METRICS_TOKEN')  # 其他地址需携带 Authorization: Bearer <token>
+
+# 异步 JSON 接口（*/views_api_async.py），asgi.py 默认开启；WSGI 下保持同步视图
+ASYNC_API_VIEWS = os.environ.get('DJANGO_ASYNC_API') == '1'
+ASYNC_DB_WORKERS = int(os.environ.get('DJANGO_ASYNC_DB_WORKERS', 8))  # 每个进程并发查询的线程数（即最多的数据库连接数）
+
+# 变更日志配置
+CHANGELOG_RETENTION_DAYS = 7  # compact_changelog 默认保留天数
+CHANGELOG_PAGE_SIZE = 500  # /api/changes/ 每次最多返回的变更条数
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -234,5 +389,10 @@ LOGGING = {
             'level': 'INFO',
             'propagate': True,
         },
+        'student_management': {
+            'handlers': ['file'],
+            'level': 'INFO',
+            'propagate': True,
+        },
     },
 }
@@ -0,0 +1,218 @@
+"""
+共享 SQLite 数据库的生产模式后端。
+
+在 Django 自带的 sqlite3 后端之上增加：
+- 忙重试：数据库被其他进程锁住（database is locked / busy）时，按带随机抖动的指数退避重试。
+  只重试不在事务中的语句和 BEGIN 本身，事务内的语句失败会原样抛出，由调用方整体重试；
+- 单写者（可选，仅 POSIX）：所有本机进程的写事务先获取同一个文件锁，按操作系统的排队顺序依次写入，
+  不再由 SQLite 的忙等待轮询争抢写锁；WAL 模式下读操作不受影响。
+
+WAL、同步级别等 PRAGMA 通过 OPTIONS['init_command'] 设置，写事务通过
+OPTIONS['transaction_mode'] = 'IMMEDIATE' 在 BEGIN 时就获取写锁，
+避免“先读后写”的事务在升级写锁时直接失败。
+
+WAL 依赖共享内存，不能用于网络文件系统（SMB/CIFS、NFS 等）上的数据库文件，
+init_command 中开启 WAL 而数据库位于网络路径时，建立连接前抛出 ImproperlyConfigured。
+
+额外的 OPTIONS：
+    busy_retries       忙重试次数，默认 5
+    busy_backoff       第一次重试前的最长等待（秒），之后每次翻倍，默认 0.05
+    busy_backoff_max   单次等待的上限（秒），默认 1
+    single_writer      是否启用单写者文件锁，默认 False
+"""
+import os
+import random
+import sqlite3
+import time
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.sqlite3 import base
+
+from student_management import metrics
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+WRITE_STATEMENTS = ('INSERT', 'UPDATE', 'DELETE', 'REPLACE')
+
+NETWORK_FILESYSTEMS = {'nfs', 'nfs4', 'cifs', 'smb3', 'smbfs', 'fuse.sshfs', 'afs', '9p', 'ceph', 'glusterfs'}
+
+
+def is_network_path(path, mounts_file='/proc/mounts'):
+    """数据库文件是否位于网络文件系统：Windows UNC 路径，或 Linux 上所在挂载点的文件系统类型"""
+    path = str(path)
+    if path.startswith(('\\\\', '//')):
+        return True
+    try:
+        with open(mounts_file, encoding='utf-8') as f:
+            mounts = [line.split()[1:3] for line in f if len(line.split()) >= 3]
+    except OSError:
+        return False
+    path = os.path.realpath(path)
+    best, fstype = '', None
+    for mount_point, kind in mounts:
+        mount_point = mount_point.replace('\\040', ' ')
+        if (path == mount_point or path.startswith(mount_point.rstrip('/') + '/')) and len(mount_point) > len(best):
+            best, fstype = mount_point, kind
+    return fstype in NETWORK_FILESYSTEMS
+
+
+def is_busy_error(error):
+    if not isinstance(error, sqlite3.OperationalError):
+        return False
+    code = getattr(error, 'sqlite_errorcode', None)
+    if code is not None:
+        return code & 0xff in (sqlite3.SQLITE_BUSY, sqlite3.SQLITE_LOCKED)
+    message = str(error)
+    return 'database is locked' in message or 'database is busy' in message or 'table is locked' in message
+
+
+class WriterLock:
+    """基于 flock 的本机单写者锁，锁文件与数据库文件放在一起"""
+
+    def __init__(self, path, timeout):
+        self.path = path
+        self.timeout = timeout
+        self.fd = None
+        self.held = False
+
+    def acquire(self):
+        if self.held:
+            return
+        if self.fd is None:
+            self.fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        deadline = time.monotonic() + self.timeout
+        delay = 0.001
+        while True:
+            try:
+                fcntl.flock(self.fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                self.held = True
+                return
+            except BlockingIOError:
+                if time.monotonic() >= deadline:
+                    raise sqlite3.OperationalError('database is locked (writer lock timeout)')
+                time.sleep(random.uniform(0, delay))
+                delay = min(delay * 2, 0.02)
+
+    def release(self):
+        if self.held:
+            fcntl.flock(self.fd, fcntl.LOCK_UN)
+            self.held = False
+
+    def close(self):
+        self.release()
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    def get_connection_params(self):
+        options = self.settings_dict['OPTIONS']
+        self.busy_retries = int(options.get('busy_retries', 5))
+        self.busy_backoff = float(options.get('busy_backoff', 0.05))
+        self.busy_backoff_max = float(options.get('busy_backoff_max', 1))
+        single_writer = options.get('single_writer', False)
+        if single_writer and fcntl is None:
+            raise ImproperlyConfigured('single_writer 依赖 fcntl.flock，只能在 Linux / macOS 上启用')
+
+        if (
+            'journal_mode=wal' in options.get('init_command', '').lower().replace(' ', '')
+            and not self.is_in_memory_db() and is_network_path(self.settings_dict['NAME'])
+        ):
+            raise ImproperlyConfigured(
+                f'数据库 {self.settings_dict["NAME"]} 位于网络文件系统上，不能使用 WAL（生产模式），'
+                '请设置 DJANGO_SQLITE_MODE=compat 或把数据库放到本机磁盘'
+            )
+
+        kwargs = super().get_connection_params()
+        for key in ('busy_retries', 'busy_backoff', 'busy_backoff_max', 'single_writer'):
+            kwargs.pop(key, None)
+
+        self.writer_lock = None
+        if single_writer and not self.is_in_memory_db():
+            self.writer_lock = WriterLock(f'{self.settings_dict["NAME"]}.writer.lock', kwargs.get('timeout', 5))
+        return kwargs
+
+    def create_cursor(self, name=None):
+        cursor = self.connection.cursor(factory=RetryingCursorWrapper)
+        cursor.db = self
+        return cursor
+
+    def retry_busy(self, operation):
+        """执行 operation，遇到忙错误时按带抖动的指数退避重试"""
+        attempt = 0
+        while True:
+            try:
+                return operation()
+            except sqlite3.OperationalError as e:
+                if not is_busy_error(e):
+                    raise
+                if attempt >= self.busy_retries:
+                    metrics.inc('sqlite_busy_errors_total', {'alias': self.alias})
+                    raise
+                metrics.inc('sqlite_busy_retries_total', {'alias': self.alias})
+                delay = min(self.busy_backoff * (2 ** attempt), self.busy_backoff_max)
+                time.sleep(random.uniform(0, delay))
+                attempt += 1
+
+    def _start_transaction_under_autocommit(self):
+        if self.writer_lock is not None:
+            self.writer_lock.acquire()
+        try:
+            super()._start_transaction_under_autocommit()
+        except BaseException:
+            self._release_writer_lock()
+            raise
+
+    def _release_writer_lock(self):
+        if self.writer_lock is not None:
+            self.writer_lock.release()
+
+    def _commit(self):
+        try:
+            return super()._commit()
+        finally:
+            self._release_writer_lock()
+
+    def _rollback(self):
+        try:
+            return super()._rollback()
+        finally:
+            self._release_writer_lock()
+
+    def _close(self):
+        try:
+            return super()._close()
+        finally:
+            if getattr(self, 'writer_lock', None) is not None:
+                self.writer_lock.close()
+
+
+class RetryingCursorWrapper(base.SQLiteCursorWrapper):
+
+    def _run(self, method, query, *args):
+        db = self.db
+        if db.in_atomic_block:
+            # 事务内的语句不能单独重试，BEGIN IMMEDIATE 已经持有写锁，这里不会遇到忙错误
+            return method(query, *args)
+        is_write = query.lstrip()[:7].upper().startswith(WRITE_STATEMENTS)
+        if is_write and db.writer_lock is not None and not db.writer_lock.held:
+            db.writer_lock.acquire()
+            try:
+                return db.retry_busy(lambda: method(query, *args))
+            finally:
+                db.writer_lock.release()
+        return db.retry_busy(lambda: method(query, *args))
+
+    def execute(self, query, params=None):
+        if params is None:
+            return self._run(super().execute, query)
+        return self._run(super().execute, query, params)
+
+    def executemany(self, query, param_list):
+        # 生成器只能遍历一次，重试前先转为列表
+        return self._run(super().executemany, query, list(param_list))
@@ -18,8 +18,11 @@ from django.contrib import admin
 from django.urls import path, include
 from django.shortcuts import redirect
 
+from student_management.metrics import metrics_view
+
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('metrics', metrics_view, name='metrics'),  # Prometheus 抓取端点
     path('accounts/', include('accounts.urls')),
     path('', include('students.urls')),  # 主页由students app处理
     # 移除重复的students URL，避免命名空间冲突
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import StudentProfile, Department, Major, Course, Enrollment
+from .models import StudentProfile, Department, Major, Course, Enrollment, CourseWaitlist, StudentAcademicSummary, ChangeLog, StatCounter
 
 @admin.register(StudentProfile)
 class StudentProfileAdmin(admin.ModelAdmin):
@@ -23,14 +23,39 @@ class MajorAdmin(admin.ModelAdmin):
 
 @admin.register(Course)
 class CourseAdmin(admin.ModelAdmin):
-    list_display = ('name', 'code', 'course_type', 'credits', 'hours', 'created_at')
-    list_filter = ('course_type', 'credits')
+    list_display = ('name', 'code', 'course_type', 'credits', 'hours', 'capacity', 'enrolled_count', 'created_at')
+    list_filter = ('course_type', 'credits', 'waitlist_enabled')
     search_fields = ('name', 'code')
-    readonly_fields = ('created_at', 'updated_at')
+    readonly_fields = ('enrolled_count', 'created_at', 'updated_at')
 
 @admin.register(Enrollment)
 class EnrollmentAdmin(admin.ModelAdmin):
     list_display = ('student', 'course', 'major', 'semester', 'academic_year', 'grade', 'score')
     list_filter = ('semester', 'academic_year', 'grade')
     search_fields = ('student__real_name', 'course__name', 'major__name')
-    readonly_fields = ('created_at', 'updated_at')
\ No newline at end of file
+    readonly_fields = ('created_at', 'updated_at')
+
+@admin.register(CourseWaitlist)
+class CourseWaitlistAdmin(admin.ModelAdmin):
+    list_display = ('course', 'student', 'semester', 'academic_year', 'created_at')
+    list_filter = ('semester', 'academic_year')
+    search_fields = ('student__real_name', 'student__student_id', 'course__name')
+    readonly_fields = ('created_at',)
+
+@admin.register(StudentAcademicSummary)
+class StudentAcademicSummaryAdmin(admin.ModelAdmin):
+    list_display = ('student', 'enrollment_count', 'total_credits', 'graded_count', 'gpa', 'average_score', 'updated_at')
+    search_fields = ('student__student_id', 'student__real_name')
+    readonly_fields = ('updated_at',)
+
+@admin.register(ChangeLog)
+class ChangeLogAdmin(admin.ModelAdmin):
+    list_display = ('seq', 'model', 'object_id', 'action', 'created_at')
+    list_filter = ('model', 'action')
+    readonly_fields = ('seq', 'model', 'object_id', 'action', 'payload', 'created_at')
+
+@admin.register(StatCounter)
+class StatCounterAdmin(admin.ModelAdmin):
+    list_display = ('key', 'value', 'updated_at')
+    search_fields = ('key',)
+    readonly_fields = ('updated_at',)
@@ -0,0 +1,73 @@
+"""
+可选课程目录缓存。
+
+同一学期、同一年级的学生看到的候选课程完全相同，因此按 (学年, 学期, 年级) 预先计算目录，
+存入共享缓存，所有学生和所有进程共用。缓存 key 中带有目录版本号，
+Course 保存或删除时由 students.signals 递增版本号，旧目录随即失效。
+
+每个学生只需要再查询一次自己已选的课程 ID（按 student_id 走索引），在内存中排除。
+目录中的已选人数是快照（最多 CATALOG_TIMEOUT 秒），真正的名额以提交时的条件 UPDATE 为准。
+"""
+import time
+
+from django.core.cache import cache
+
+from .models import Course, Enrollment
+
+CATALOG_VERSION_KEY = 'course_catalog:version'
+CATALOG_TIMEOUT = 60
+
+# 只设置了年级时，按年级匹配对应学期
+GRADE_SEMESTERS = {
+    '1': ['1', '2'],  # 大一：第1、2学期
+    '2': ['3', '4'],  # 大二：第3、4学期
+    '3': ['5', '6'],  # 大三：第5、6学期
+    '4': ['7', '8'],  # 大四：第7、8学期
+}
+
+
+def catalog_version():
+    version = cache.get(CATALOG_VERSION_KEY)
+    if version is None:
+        # 用时间戳作为初始值：缓存被清空后不会与残留的旧目录版本号重复
+        cache.add(CATALOG_VERSION_KEY, int(time.time() * 1000), None)
+        version = cache.get(CATALOG_VERSION_KEY)
+    return version
+
+
+def bump_catalog_version():
+    try:
+        cache.incr(CATALOG_VERSION_KEY)
+    except ValueError:
+        catalog_version()
+
+
+def catalog_scope(student):
+    """学生对应的目录范围 (学年, 学期, 年级)，与 AdminEnrollmentForm 原有的筛选规则一致"""
+    if student.current_semester and student.current_academic_year:
+        return student.current_academic_year, student.current_semester, None
+    if student.grade_level in GRADE_SEMESTERS:
+        return None, None, student.grade_level
+    return None, None, None
+
+
+def _build_catalog(academic_year, semester, grade_level):
+    courses = Course.objects.all()
+    if academic_year and semester:
+        courses = courses.filter(academic_year=academic_year, semester=semester)
+    elif grade_level:
+        courses = courses.filter(semester__in=GRADE_SEMESTERS[grade_level])
+    return list(courses.order_by('course_type', 'name'))
+
+
+def get_catalog(academic_year=None, semester=None, grade_level=None):
+    """返回该范围内的全部课程（已排序的 Course 列表），优先读缓存"""
+    key = f'course_catalog:{catalog_version()}:{academic_year or "-"}:{semester or "-"}:{grade_level or "-"}'
+    # 缓存后端支持单飞重算时，目录过期的瞬间只有一个请求重新查询
+    return cache.get_or_set(key, lambda: _build_catalog(academic_year, semester, grade_level), CATALOG_TIMEOUT)
+
+
+def available_courses_for(student):
+    """学生可选的课程：目录减去已选课程，只产生一次按学生索引的查询"""
+    enrolled = set(Enrollment.objects.filter(student=student).values_list('course_id', flat=True))
+    return [course for course in get_catalog(*catalog_scope(student)) if course.id not in enrolled]
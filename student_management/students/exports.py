@@ -0,0 +1,114 @@
+"""
+学生档案和成绩单导出。
+
+数据通过 values_list(...).iterator(chunk_size=...) 在服务端分块读取，不实例化模型对象，
+CSV 逐行生成并交给 StreamingHttpResponse，内存占用与行数无关，首字节立即返回。
+"""
+import csv
+
+from .models import StudentProfile, Enrollment
+
+EXPORT_CHUNK_SIZE = 2000
+
+# (表头, values_list 路径)
+STUDENT_PROFILE_COLUMNS = [
+    ('学号', 'student_id'),
+    ('真实姓名', 'real_name'),
+    ('用户名', 'user__username'),
+    ('性别', 'gender'),
+    ('出生日期', 'birth_date'),
+    ('民族', 'nationality'),
+    ('手机号码', 'phone'),
+    ('个人邮箱', 'email'),
+    ('所属院系', 'department__name'),
+    ('专业', 'major__name'),
+    ('年级', 'grade_level'),
+    ('当前学年', 'current_academic_year'),
+    ('当前学期', 'current_semester'),
+    ('学籍状态', 'enrollment_status'),
+    ('政治面貌', 'political_status'),
+    ('入学日期', 'enrollment_date'),
+    ('预计毕业日期', 'graduation_date'),
+    ('家庭住址', 'address'),
+    ('紧急联系人1', 'emergency_contact'),
+    ('紧急联系电话1', 'emergency_phone'),
+]
+
+ENROLLMENT_COLUMNS = [
+    ('学号', 'student__student_id'),
+    ('真实姓名', 'student__real_name'),
+    ('课程代码', 'course__code'),
+    ('课程名称', 'course__name'),
+    ('学分', 'course__credits'),
+    ('专业', 'major__name'),
+    ('学年', 'academic_year'),
+    ('学期', 'semester'),
+    ('成绩等级', 'grade'),
+    ('分数', 'score'),
+    ('选课时间', 'enrollment_date'),
+]
+
+
+def _display_maps(model, columns):
+    """把选项字段的代码转换为显示文字，如 M -> 男"""
+    maps = {}
+    for index, (_, path) in enumerate(columns):
+        if '__' in path:
+            continue
+        field = model._meta.get_field(path)
+        if field.choices:
+            maps[index] = dict(field.flatchoices)
+    return maps
+
+
+class Echo:
+    """csv.writer 需要的类文件对象，write 直接返回写入内容"""
+
+    def write(self, value):
+        return value
+
+
+def iter_rows(queryset, columns, chunk_size=EXPORT_CHUNK_SIZE):
+    """分块迭代导出行（元组），选项字段已转换为显示文字"""
+    maps = _display_maps(queryset.model, columns)
+    rows = queryset.values_list(*[path for _, path in columns]).iterator(chunk_size=chunk_size)
+    for row in rows:
+        if maps:
+            row = list(row)
+            for index, choices in maps.items():
+                row[index] = choices.get(row[index], row[index])
+        yield row
+
+
+def iter_csv(queryset, columns, chunk_size=EXPORT_CHUNK_SIZE):
+    """逐行生成 CSV 文本，第一段带 BOM 以便 Excel 正确识别 UTF-8"""
+    writer = csv.writer(Echo())
+    yield '\ufeff' + writer.writerow([header for header, _ in columns])
+    for row in iter_rows(queryset, columns, chunk_size):
+        yield writer.writerow(['' if value is None else value for value in row])
+
+
+def write_xlsx(output, queryset, columns, chunk_size=EXPORT_CHUNK_SIZE):
+    """以 openpyxl 的 write_only 模式写出 XLSX（逐行写盘，内存占用恒定）"""
+    try:
+        from openpyxl import Workbook
+    except ImportError:
+        raise RuntimeError('导出 XLSX 需要安装 openpyxl：pip install openpyxl')
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append([header for header, _ in columns])
+    count = 0
+    for row in iter_rows(queryset, columns, chunk_size):
+        sheet.append(list(row))
+        count += 1
+    workbook.save(output)
+    return count
+
+
+def student_profile_queryset():
+    return StudentProfile.objects.order_by('id')
+
+
+def enrollment_queryset():
+    return Enrollment.objects.order_by('student_id', 'academic_year', 'semester', 'id')
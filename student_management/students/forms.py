@@ -1,5 +1,6 @@
 from django import forms
 from .models import StudentProfile, Department, Major, Course, Enrollment
+from .reference import get_reference_data, ENROLLMENT_SEMESTER_CHOICES, ENROLLMENT_ACADEMIC_YEAR_CHOICES
 
 class StudentProfileForm(forms.ModelForm):
     def __init__(self, *args, **kwargs):
@@ -10,14 +11,10 @@ class StudentProfileForm(forms.ModelForm):
         self.fields['political_status'].empty_label = "请选择政治面貌"
         self.fields['enrollment_status'].empty_label = "请选择学籍状态"
 
-        # 显示所有专业，不分院系
-        self.fields['major'].queryset = Major.objects.all().order_by('department__name', 'name')
-
-        # 为专业字段添加院系信息到选项中
-        major_choices = [('', '请选择专业')]
-        for major in self.fields['major'].queryset:
-            major_choices.append((major.id, f'{major.name} ({major.department.name})'))
-        self.fields['major'].choices = major_choices
+        # 下拉选项来自参考数据快照（专业带院系名称，不分院系显示），提交时仍按 queryset 校验
+        reference = get_reference_data()
+        self.fields['department'].choices = [('', '请选择院系')] + reference.department_choices
+        self.fields['major'].choices = [('', '请选择专业')] + reference.major_choices
 
         # 为所有字段添加Bootstrap样式
         for field_name, field in self.fields.items():
@@ -142,8 +139,10 @@ class CourseForm(forms.ModelForm):
 
     class Meta:
         model = Course
-        fields = ['name', 'code', 'course_type', 'credits', 'hours', 'semester', 'academic_year', 'description']
+        fields = ['name', 'code', 'course_type', 'credits', 'hours', 'semester', 'academic_year', 'capacity', 'waitlist_enabled', 'description']
         widgets = {
+            'capacity': forms.NumberInput(attrs={'min': 1, 'placeholder': '留空表示不限人数', 'class': 'form-control'}),
+            'waitlist_enabled': forms.CheckboxInput(attrs={'class': 'form-check-input'}),
             'description': forms.Textarea(attrs={'rows': 4, 'class': 'form-control', 'placeholder': '请输入课程描述，包括课程目标、主要内容、考核方式等...'}),
             'name': forms.TextInput(attrs={'placeholder': '请输入课程名称', 'class': 'form-control'}),
             'code': forms.TextInput(attrs={'placeholder': '请输入课程代码，如：CS101', 'class': 'form-control'}),
@@ -160,6 +159,8 @@ class CourseForm(forms.ModelForm):
             'hours': '学时',
             'semester': '开设学期',
             'academic_year': '学年',
+            'capacity': '课程容量',
+            'waitlist_enabled': '允许候补',
             'description': '课程描述',
         }
 
@@ -169,38 +170,17 @@ class EnrollmentForm(forms.ModelForm):
         # 为字段添加Bootstrap样式
         for field in self.fields.values():
             field.widget.attrs.update({'class': 'form-control'})
+        # 课程选项来自参考数据快照，提交时仍按 queryset 校验
+        self.fields['course'].choices = [('', self.fields['course'].empty_label)] + get_reference_data().course_choices
 
-        # 设置学期选项
-        semester_choices = [
-            ('', '请选择学期'),
-            ('第1学期', '第1学期（大一上）'),
-            ('第2学期', '第2学期（大一下）'),
-            ('第3学期', '第3学期（大二上）'),
-            ('第4学期', '第4学期（大二下）'),
-            ('第5学期', '第5学期（大三上）'),
-            ('第6学期', '第6学期（大三下）'),
-            ('第7学期', '第7学期（大四上）'),
-            ('第8学期', '第8学期（大四下）'),
-        ]
+        # 学期、学年选项是模块级常量，不必每次实例化时重新生成
         self.fields['semester'] = forms.ChoiceField(
-            choices=semester_choices,
+            choices=ENROLLMENT_SEMESTER_CHOICES,
             widget=forms.Select(attrs={'class': 'form-select'}),
             label='学期'
         )
-
-        # 设置学年选项 - 扩展范围，从2020年到2030年
-        import datetime
-        current_year = datetime.datetime.now().year
-        academic_years = []
-
-        # 添加从2020年到2030年的学年选项
-        for year in range(2020, 2031):
-            academic_year = f"{year}-{year + 1}"
-            academic_years.append((academic_year, f"{academic_year}学年"))
-
-        academic_year_choices = [('', '请选择学年')] + academic_years
         self.fields['academic_year'] = forms.ChoiceField(
-            choices=academic_year_choices,
+            choices=ENROLLMENT_ACADEMIC_YEAR_CHOICES,
             widget=forms.Select(attrs={'class': 'form-select'}),
             label='学年'
         )
@@ -219,6 +199,11 @@ class AdminEnrollmentForm(forms.ModelForm):
         self.fields['course'].widget.attrs.update({'class': 'form-select'})
         self.fields['major'].widget.attrs.update({'class': 'form-select'})
 
+        # 默认显示所有课程和专业，选项来自参考数据快照，提交时仍按 queryset 校验
+        reference = get_reference_data()
+        self.fields['course'].choices = [('', self.fields['course'].empty_label)] + reference.course_choices
+        self.fields['major'].choices = [('', self.fields['major'].empty_label)] + reference.major_choices
+
         # 如果已选择学生，根据学生的学业状态筛选课程
         if 'student' in self.data and self.data['student']:
             try:
@@ -230,76 +215,36 @@ class AdminEnrollmentForm(forms.ModelForm):
         elif self.instance and self.instance.pk:
             # 编辑已有选课记录
             self.filter_courses_for_student(self.instance.student)
-        else:
-            # 新建表单，显示所有课程
-            self.fields['course'].queryset = Course.objects.all().order_by('name')
 
-        # 设置专业选项的queryset
-        self.fields['major'].queryset = Major.objects.all().order_by('department__name', 'name')
-
-        # 设置学期选项
-        semester_choices = [
-            ('', '请选择学期'),
-            ('第1学期', '第1学期（大一上）'),
-            ('第2学期', '第2学期（大一下）'),
-            ('第3学期', '第3学期（大二上）'),
-            ('第4学期', '第4学期（大二下）'),
-            ('第5学期', '第5学期（大三上）'),
-            ('第6学期', '第6学期（大三下）'),
-            ('第7学期', '第7学期（大四上）'),
-            ('第8学期', '第8学期（大四下）'),
-        ]
+        # 学期、学年选项是模块级常量，不必每次实例化时重新生成
         self.fields['semester'] = forms.ChoiceField(
-            choices=semester_choices,
+            choices=ENROLLMENT_SEMESTER_CHOICES,
             widget=forms.Select(attrs={'class': 'form-select'}),
             label='学期'
         )
-
-        # 设置学年选项 - 扩展范围，从2020年到2030年
-        import datetime
-        current_year = datetime.datetime.now().year
-        academic_years = []
-
-        # 添加从2020年到2030年的学年选项
-        for year in range(2020, 2031):
-            academic_year = f"{year}-{year + 1}"
-            academic_years.append((academic_year, f"{academic_year}学年"))
-
-        academic_year_choices = [('', '请选择学年')] + academic_years
         self.fields['academic_year'] = forms.ChoiceField(
-            choices=academic_year_choices,
+            choices=ENROLLMENT_ACADEMIC_YEAR_CHOICES,
             widget=forms.Select(attrs={'class': 'form-select'}),
             label='学年'
         )
 
     def filter_courses_for_student(self, student):
-        """根据学生的学业状态筛选合适的课程"""
-        courses = Course.objects.all()
-
-        # 如果学生有设置当前学期和学年，优先按此筛选
-        if student.current_semester and student.current_academic_year:
-            courses = courses.filter(
-                semester=student.current_semester,
-                academic_year=student.current_academic_year
-            )
-        # 如果只设置了年级，按年级匹配对应学期
-        elif student.grade_level:
-            grade_semester_mapping = {
-                '1': ['1', '2'],  # 大一：第1、2学期
-                '2': ['3', '4'],  # 大二：第3、4学期
-                '3': ['5', '6'],  # 大三：第5、6学期
-                '4': ['7', '8'],  # 大四：第7、8学期
-            }
-            if student.grade_level in grade_semester_mapping:
-                semesters = grade_semester_mapping[student.grade_level]
-                courses = courses.filter(semester__in=semesters)
-
-        # 排除学生已选的课程
-        enrolled_courses = Enrollment.objects.filter(student=student).values_list('course_id', flat=True)
-        courses = courses.exclude(id__in=enrolled_courses)
-
-        # 设置筛选后的课程queryset
-        self.fields['course'].queryset = courses.order_by('course_type', 'name')
+        """根据学生的学业状态筛选合适的课程（读取缓存的课程目录，已选课程在内存中排除）"""
+        from .catalog import available_courses_for
+
+        courses = available_courses_for(student)
+        if self.instance and self.instance.pk and self.instance.course_id:
+            # 编辑已有选课记录时保留当前课程
+            current = self.instance.course
+            if all(course.id != current.id for course in courses):
+                courses = [current] + courses
+
+        # 下拉选项直接使用目录中的课程，提交时才按 ID 校验
+        course_ids = [course.id for course in courses]
+        self.fields['course'].queryset = Course.objects.filter(id__in=course_ids)
+        self.fields['course'].choices = [('', self.fields['course'].empty_label)] + [
+            (course.id, str(course)) for course in courses
+        ]
 
     class Meta:
         model = Enrollment
@@ -332,4 +277,45 @@ class GradeForm(forms.ModelForm):
         labels = {
             'grade': '成绩等级',
             'score': '分数',
-        }
\ No newline at end of file
+        }
+
+class StudentImportForm(forms.ModelForm):
+    """
+    批量导入时逐行校验使用的表单。
+    字段和校验规则与 StudentProfileForm 一致，但院系/专业改为从预加载的字典中匹配（可填ID、代码或名称），
+    唯一性由导入器按批次统一检查，避免每行产生额外查询。
+    """
+    department = forms.CharField(required=False, label='所属院系')
+    major = forms.CharField(required=False, label='专业')
+    username = forms.CharField(max_length=150, required=False, label='用户名')
+    password = forms.CharField(required=False, label='密码')
+
+    def __init__(self, *args, department_lookup=None, major_lookup=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.department_lookup = department_lookup or {}
+        self.major_lookup = major_lookup or {}
+
+    def clean_department(self):
+        value = (self.cleaned_data.get('department') or '').strip()
+        if not value:
+            return None
+        if value not in self.department_lookup:
+            raise forms.ValidationError(f'院系“{value}”不存在')
+        return self.department_lookup[value]
+
+    def clean_major(self):
+        value = (self.cleaned_data.get('major') or '').strip()
+        if not value:
+            return None
+        if value not in self.major_lookup:
+            raise forms.ValidationError(f'专业“{value}”不存在')
+        return self.major_lookup[value]
+
+    def validate_unique(self):
+        # 学号、身份证号的唯一性由导入器按批次检查
+        pass
+
+    class Meta:
+        model = StudentProfile
+        fields = [name for name in StudentProfileForm.Meta.fields if name not in ('department', 'major')]
+        labels = StudentProfileForm.Meta.labels
@@ -0,0 +1,197 @@
+"""
+按课程批量录入成绩。
+
+整门课的分数（名单表单或上传的 CSV）一次提交：根据分数推导成绩等级，
+只把真正变化的记录在一个事务里 bulk_update 写回，
+然后每批只刷新一次成绩汇总、变更日志和实时事件，而不是每行一次。
+"""
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Enrollment, StudentAcademicSummary, ChangeLog
+
+GRADE_SHEET_BATCH_SIZE = 500
+
+
+class GradeSheetError(Exception):
+    pass
+
+
+def parse_score(value):
+    """把输入的分数转换为 Decimal，空值返回 None，非法值抛出 ValueError"""
+    if value is None:
+        return None
+    value = str(value).strip()
+    if not value:
+        return None
+    try:
+        score = Decimal(value).quantize(Decimal('0.01'))
+    except InvalidOperation:
+        raise ValueError(f'分数 “{value}” 不是有效的数字')
+    if score < 0 or score > 100:
+        raise ValueError(f'分数 {value} 超出 0-100 的范围')
+    return score
+
+
+class GradeChange:
+    def __init__(self, enrollment, old_score, old_grade):
+        self.enrollment = enrollment
+        self.old_score = old_score
+        self.old_grade = old_grade
+
+    @property
+    def new_score(self):
+        return self.enrollment.score
+
+    @property
+    def new_grade(self):
+        return self.enrollment.grade
+
+
+class GradeSheetResult:
+    def __init__(self, dry_run=False):
+        self.dry_run = dry_run
+        self.changes = []
+        self.unchanged = 0
+        self.errors = []  # [(学号或行号, 错误信息)]
+
+    @property
+    def updated(self):
+        return len(self.changes)
+
+    def add_error(self, key, message):
+        self.errors.append((key, message))
+
+    def summary(self):
+        action = '将更新' if self.dry_run else '更新'
+        return f'{action} {self.updated} 条成绩，{self.unchanged} 条未变化，{len(self.errors)} 条错误'
+
+
+class GradeSheet:
+    """
+    用法：
+        sheet = GradeSheet(course, academic_year='2024-2025', semester='1')
+        result = sheet.apply({enrollment_id: '92.5', ...})
+        result = sheet.apply_csv(upload)
+    """
+
+    def __init__(self, course, academic_year=None, semester=None):
+        self.course = course
+        self.academic_year = academic_year
+        self.semester = semester
+
+    def roster(self):
+        enrollments = Enrollment.objects.filter(course=self.course)
+        if self.academic_year:
+            enrollments = enrollments.filter(academic_year=self.academic_year)
+        if self.semester:
+            enrollments = enrollments.filter(semester=self.semester)
+        return enrollments.select_related('student').only(
+            'id', 'score', 'grade', 'semester', 'academic_year', 'updated_at',
+            'student_id', 'course_id', 'student__student_id', 'student__real_name',
+        ).order_by('student__student_id')
+
+    def apply(self, scores, dry_run=False, originals=None):
+        """
+        scores 为 {选课记录ID: 分数}，把已有的分数清空表示清除成绩。
+        originals 为表单渲染时各行的分数，与之相同的行视为没有修改，不写入
+        （不会覆盖只有等级没有分数的成绩，也不会覆盖别人在此期间录入的成绩）。
+        """
+        result = GradeSheetResult(dry_run=dry_run)
+        originals = originals or {}
+        parsed = {}
+        for enrollment_id, value in scores.items():
+            try:
+                score = parse_score(value)
+            except ValueError as e:
+                result.add_error(enrollment_id, str(e))
+                continue
+            if str(enrollment_id) in originals:
+                try:
+                    if parse_score(originals[str(enrollment_id)]) == score:
+                        result.unchanged += 1
+                        continue
+                except ValueError:
+                    pass
+            parsed[int(enrollment_id)] = score
+        return self._write(parsed, result, dry_run)
+
+    def apply_csv(self, file, dry_run=False):
+        """
+        CSV 两列：学号、分数（表头也可以写 student_id、score）。
+        分数为空的行跳过；不在本课程名单中的学号报错。
+        """
+        from .importers import read_csv
+
+        result = GradeSheetResult(dry_run=dry_run)
+        enrollment_ids = {student_id: pk for pk, student_id in self.roster().values_list('id', 'student__student_id')}
+        parsed = {}
+        try:
+            for row_number, row in enumerate(read_csv(file), start=2):
+                row = {(key or '').strip(): value for key, value in row.items()}
+                student_id = (row.get('学号') or row.get('student_id') or '').strip()
+                raw_score = row.get('分数', row.get('score'))
+                if not student_id:
+                    result.add_error(row_number, '缺少学号')
+                    continue
+                if raw_score is None or not str(raw_score).strip():
+                    continue
+                if student_id not in enrollment_ids:
+                    result.add_error(student_id, '不在本课程的选课名单中')
+                    continue
+                try:
+                    parsed[enrollment_ids[student_id]] = parse_score(raw_score)
+                except ValueError as e:
+                    result.add_error(student_id, str(e))
+        except (UnicodeDecodeError, ValueError) as e:
+            raise GradeSheetError(f'无法读取 CSV 文件：{e}')
+        return self._write(parsed, result, dry_run)
+
+    def _write(self, parsed, result, dry_run):
+        with transaction.atomic():
+            enrollments = self.roster().filter(id__in=parsed.keys()).select_for_update(of=('self',))
+            found = set()
+            for enrollment in enrollments:
+                found.add(enrollment.id)
+                score = parsed[enrollment.id]
+                grade = Enrollment.grade_for_score(score)
+                # 空分数只清除已有的分数，原本就没有分数的行保留其等级
+                if enrollment.score == score and (score is None or enrollment.grade == grade):
+                    result.unchanged += 1
+                    continue
+                result.changes.append(GradeChange(enrollment, enrollment.score, enrollment.grade))
+                enrollment.score = score
+                enrollment.grade = grade
+            for enrollment_id in parsed.keys() - found:
+                result.add_error(enrollment_id, '选课记录不存在或不属于本课程')
+
+            if result.changes and not dry_run:
+                self._save(result.changes)
+        return result
+
+    def _save(self, changes):
+        """bulk_update 不触发信号，派生数据在这里按批次补齐"""
+        from .signals import serialize_change
+        from .realtime import broadcaster
+
+        now = timezone.now()
+        enrollments = [change.enrollment for change in changes]
+        for enrollment in enrollments:
+            enrollment.updated_at = now
+        Enrollment.objects.bulk_update(enrollments, ['score', 'grade', 'updated_at'], batch_size=GRADE_SHEET_BATCH_SIZE)
+
+        StudentAcademicSummary.rebuild({enrollment.student_id for enrollment in enrollments})
+
+        ChangeLog.objects.bulk_create(
+            [ChangeLog(model=enrollment._meta.label_lower, object_id=enrollment.pk, action='updated',
+                       payload=serialize_change(enrollment))
+             for enrollment in enrollments],
+            batch_size=GRADE_SHEET_BATCH_SIZE,
+        )
+
+        # 整批只推送一条事件
+        if broadcaster.has_subscribers():
+            data = {'course_id': self.course.pk, 'updated': len(enrollments), 'action': 'updated'}
+            transaction.on_commit(lambda: broadcaster.publish('grades', data))
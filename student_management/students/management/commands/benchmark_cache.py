@@ -0,0 +1,135 @@
+import multiprocessing
+import random
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.management.base import BaseCommand
+
+from student_management.cache_backend import SQLiteCache
+
+
+def build_backends(directory):
+    """在临时目录中创建待比较的缓存后端，不影响 shared_data 中的正式缓存"""
+    options = {'MAX_ENTRIES': 100000}
+    return {
+        'FileBasedCache': lambda: FileBasedCache(str(directory / 'filebased'), {'OPTIONS': options}),
+        'SQLiteCache': lambda: SQLiteCache(directory / 'sqlite.db', {'OPTIONS': options}),
+        'SQLiteCache(无本地层)': lambda: SQLiteCache(
+            directory / 'sqlite_nolocal.db', {'OPTIONS': {**options, 'LOCAL_MAX_ENTRIES': 0}}),
+    }
+
+
+def mixed_workload(factory, operations, keys, seed, results):
+    """90% 读、10% 写，模拟轮询接口的访问模式"""
+    cache = factory()
+    rng = random.Random(seed)
+    started = time.perf_counter()
+    for _ in range(operations):
+        key = f'poll:{rng.randrange(keys)}'
+        if rng.random() < 0.9:
+            cache.get(key)
+        else:
+            cache.set(key, {'last_check': time.time(), 'ids': list(range(20))}, 300)
+    results.put(time.perf_counter() - started)
+
+
+class Command(BaseCommand):
+    help = '比较 FileBasedCache 与 SQLiteCache 缓存后端的性能（在临时目录中运行）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--operations', type=int, default=5000, help='每个场景的操作次数')
+        parser.add_argument('--keys', type=int, default=500, help='使用的 key 数量')
+        parser.add_argument('--processes', type=int, default=4, help='混合读写场景的并发进程数')
+        parser.add_argument('--threads', type=int, default=16, help='缓存击穿场景的并发线程数')
+        parser.add_argument('--compute-ms', type=int, default=50, help='缓存击穿场景中每次重算的耗时（毫秒）')
+
+    def handle(self, *args, **options):
+        operations = options['operations']
+        keys = options['keys']
+        value = {'id': 1, 'name': '数据结构', 'students': list(range(50))}
+
+        with tempfile.TemporaryDirectory() as directory:
+            backends = build_backends(Path(directory))
+            scenarios = {}
+
+            for name, factory in backends.items():
+                cache = factory()
+                for i in range(keys):
+                    cache.set(f'key:{i}', value, 300)
+                cache.set('counter', 0, None)
+                rng = random.Random(0)
+
+                timings = {}
+                timings['get（命中）'] = self.per_operation(
+                    lambda: cache.get(f'key:{rng.randrange(keys)}'), operations)
+                timings['get（未命中）'] = self.per_operation(
+                    lambda: cache.get(f'missing:{rng.randrange(keys)}'), operations)
+                timings['set'] = self.per_operation(
+                    lambda: cache.set(f'key:{rng.randrange(keys)}', value, 300), operations)
+                timings['incr'] = self.per_operation(lambda: cache.incr('counter'), operations)
+                timings[f'混合读写（{options["processes"]} 进程）'] = self.mixed(factory, operations, keys, options['processes'])
+                scenarios[name] = timings
+
+                computations = self.stampede(factory(), options['threads'], options['compute_ms'] / 1000)
+                scenarios[name]['缓存击穿重算次数'] = computations
+
+        names = list(backends)
+        self.stdout.write(f'{"场景":<24}' + ''.join(f'{name:>24}' for name in names))
+        for scenario in scenarios[names[0]]:
+            row = f'{scenario:<24}'
+            for name in names:
+                result = scenarios[name][scenario]
+                row += f'{result:>24}' if isinstance(result, int) else f'{result:>20.1f} µs'
+            self.stdout.write(row)
+        self.stdout.write(self.style.SUCCESS(
+            f'除“缓存击穿重算次数”外，数值为每次操作的平均耗时（越小越好）；'
+            f'击穿场景为 {options["threads"]} 个线程同时读取一个已过期的 key。'))
+
+    def per_operation(self, operation, count):
+        started = time.perf_counter()
+        for _ in range(count):
+            operation()
+        return (time.perf_counter() - started) / count * 1e6
+
+    def mixed(self, factory, operations, keys, processes):
+        """多个进程同时读写同一个缓存，返回每次操作的平均墙钟耗时"""
+        context = multiprocessing.get_context('fork')
+        results = context.Queue()
+        workers = [
+            context.Process(target=mixed_workload, args=(factory, operations, keys, seed, results))
+            for seed in range(processes)
+        ]
+        started = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - started
+        return elapsed / (operations * processes) * 1e6
+
+    def stampede(self, cache, threads, compute_seconds):
+        """多个线程同时读取同一个已过期的 key，统计实际重算的次数"""
+        computations = []
+        lock = threading.Lock()
+
+        def compute():
+            with lock:
+                computations.append(1)
+            time.sleep(compute_seconds)
+            return {'generated_at': time.time()}
+
+        barrier = threading.Barrier(threads)
+
+        def worker():
+            barrier.wait()
+            cache.get_or_set('hot', compute, 60)
+
+        workers = [threading.Thread(target=worker) for _ in range(threads)]
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        return len(computations)
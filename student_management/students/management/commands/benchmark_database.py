@@ -0,0 +1,145 @@
+import multiprocessing
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections, transaction, OperationalError
+
+ROWS = 1000
+
+# 待比较的数据库配置；production 与 settings.py 中的生产模式一致
+MODES = {
+    'compat': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'OPTIONS': {'timeout': 5},
+    },
+    'production': {
+        'ENGINE': 'student_management.sqlite_backend',
+        'OPTIONS': {
+            'timeout': 5,
+            'transaction_mode': 'IMMEDIATE',
+            'init_command': 'PRAGMA journal_mode=WAL;PRAGMA synchronous=NORMAL;PRAGMA cache_size=-16000;PRAGMA temp_store=MEMORY',
+            'busy_retries': 5,
+        },
+    },
+    'production+single_writer': {
+        'ENGINE': 'student_management.sqlite_backend',
+        'OPTIONS': {
+            'timeout': 5,
+            'transaction_mode': 'IMMEDIATE',
+            'init_command': 'PRAGMA journal_mode=WAL;PRAGMA synchronous=NORMAL;PRAGMA cache_size=-16000;PRAGMA temp_store=MEMORY',
+            'busy_retries': 5,
+            'single_writer': True,
+        },
+    },
+}
+
+
+def register(alias, mode, path):
+    configured = connections.configure_settings({
+        'default': settings.DATABASES['default'],
+        alias: {**MODES[mode], 'NAME': str(path)},
+    })
+    connections.settings[alias] = configured[alias]
+
+
+def client(alias, mode, path, duration, write_ratio, seed, results):
+    """一个客户端进程：按比例执行只读查询和“先读后写”的事务，记录耗时和错误"""
+    register(alias, mode, path)
+    connection = connections[alias]
+    rng = random.Random(seed)
+    reads = writes = errors = 0
+    latencies = []
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        row_id = rng.randint(1, ROWS)
+        started = time.perf_counter()
+        try:
+            if rng.random() < write_ratio:
+                with transaction.atomic(using=alias):
+                    with connection.cursor() as cursor:
+                        cursor.execute('SELECT counter FROM bench_row WHERE id = %s', [row_id])
+                        counter = cursor.fetchone()[0]
+                        cursor.execute('UPDATE bench_row SET counter = %s WHERE id = %s', [counter + 1, row_id])
+                writes += 1
+            else:
+                with connection.cursor() as cursor:
+                    cursor.execute('SELECT id, counter, payload FROM bench_row WHERE id = %s', [row_id])
+                    cursor.fetchone()
+                reads += 1
+        except OperationalError:
+            errors += 1
+        latencies.append(time.perf_counter() - started)
+    connection.close()
+    results.put((reads, writes, errors, latencies))
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0
+    values = sorted(values)
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+
+class Command(BaseCommand):
+    help = '用 N 个并发客户端比较共享 SQLite 数据库在兼容模式和生产模式下的吞吐量（在临时数据库上运行）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=8, help='并发客户端（进程）数')
+        parser.add_argument('--duration', type=float, default=5, help='每种模式运行的秒数')
+        parser.add_argument('--write-ratio', type=float, default=0.2, help='写事务所占比例')
+        parser.add_argument('--modes', nargs='+', choices=list(MODES), default=list(MODES), help='要比较的模式')
+
+    def handle(self, *args, **options):
+        context = multiprocessing.get_context('fork')
+        self.stdout.write(
+            f'{options["clients"]} 个客户端，每种模式 {options["duration"]} 秒，写事务占 {options["write_ratio"]:.0%}'
+        )
+        self.stdout.write(f'{"模式":<28}{"读/秒":>10}{"写/秒":>10}{"错误":>8}{"p50(ms)":>10}{"p95(ms)":>10}{"p99(ms)":>10}')
+
+        with tempfile.TemporaryDirectory() as directory:
+            for mode in options['modes']:
+                path = Path(directory) / f'{mode}.db'
+                alias = f'benchmark_{mode}'
+                self.prepare(alias, mode, path)
+
+                results = context.Queue()
+                workers = [
+                    context.Process(target=client, args=(alias, mode, path, options['duration'],
+                                                         options['write_ratio'], seed, results))
+                    for seed in range(options['clients'])
+                ]
+                for worker in workers:
+                    worker.start()
+                collected = [results.get() for _ in workers]
+                for worker in workers:
+                    worker.join()
+
+                reads = sum(item[0] for item in collected)
+                writes = sum(item[1] for item in collected)
+                errors = sum(item[2] for item in collected)
+                latencies = [value for item in collected for value in item[3]]
+                self.stdout.write(
+                    f'{mode:<28}{reads / options["duration"]:>10.0f}{writes / options["duration"]:>10.0f}{errors:>8}'
+                    f'{percentile(latencies, 0.5) * 1000:>10.2f}{percentile(latencies, 0.95) * 1000:>10.2f}'
+                    f'{percentile(latencies, 0.99) * 1000:>10.2f}'
+                )
+                del connections.settings[alias]
+
+        self.stdout.write(self.style.SUCCESS('“错误”为重试后仍然失败的 database is locked 次数。'))
+
+    def prepare(self, alias, mode, path):
+        register(alias, mode, path)
+        connection = connections[alias]
+        with connection.cursor() as cursor:
+            cursor.execute('CREATE TABLE bench_row (id INTEGER PRIMARY KEY, counter INTEGER NOT NULL, payload TEXT NOT NULL)')
+            cursor.executemany(
+                'INSERT INTO bench_row (id, counter, payload) VALUES (%s, 0, %s)',
+                [(i, 'x' * 200) for i in range(1, ROWS + 1)],
+            )
+        # 子进程各自建立连接，fork 前关闭父进程的连接
+        connection.close()
+        del connections[alias]
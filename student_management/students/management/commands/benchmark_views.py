@@ -0,0 +1,492 @@
+"""
+热点页面和 API 的基准测试：在生成的数据集（generate_load_data）上逐个请求视图，
+统计 p50/p95/p99 延迟、每个请求的 SQL 条数和进程峰值内存，结果写成 JSON 基线，
+之后的运行与基线比较并标出回归。
+
+三种运行方式（--server）：
+- client：Django 测试客户端，不经过网络，反映视图本身的开销；
+- wsgi：在本进程的线程中启动标准库 wsgiref 多线程服务器，经 HTTP 请求；
+- asgi：用 uvicorn 在线程中运行 ASGI 应用（需要安装 uvicorn），事件流接口只在此模式下测量首字节时间。
+
+会写数据的场景：course_selection_submit 每次提交后删除新建的选课和候补记录，只归还名额、不补选候补，
+数据集保持不变；api_mark_notifications_read 以第一个管理员的身份提交（该接口目前不写入数据）。
+
+SQL 条数取自 MetricsMiddleware 的 django_db_queries_total，运行期间临时启用指标采集，
+写入临时目录，不影响正式的 METRICS_DIR。
+"""
+import http.client
+import json
+import os
+import platform
+import random
+import resource
+import socket
+import socketserver
+import sys
+import tempfile
+import threading
+import time
+from collections import namedtuple
+from importlib import import_module
+from urllib.parse import urlencode
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+import django
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.crypto import get_random_string
+
+from accounts.models import User
+from student_management import metrics
+from students.catalog import available_courses_for
+from students.models import Course, CourseWaitlist, Department, Enrollment, StudentProfile
+
+# 场景：名称、URL 名称、登录角色、请求方法、查询参数、支持的运行方式
+Scenario = namedtuple('Scenario', ['name', 'view', 'role', 'method', 'params', 'servers'])
+
+ALL_SERVERS = ('client', 'wsgi', 'asgi')
+
+# 基线比较时忽略小于该值的 p95 变化（毫秒），避免极快的接口因抖动被误报
+MIN_REGRESSION_MS = 2.0
+
+
+def percentile(values, fraction):
+    """最近秩百分位数"""
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, int(round(fraction * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def peak_rss_mb():
+    """本进程（含进程内服务器）的峰值常驻内存，Linux 上 ru_maxrss 单位为 KB，macOS 上为字节"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    divisor = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    return round(peak / divisor, 1)
+
+
+def build_scenarios(search_term, department_id):
+    """需要覆盖的热点视图；course_selection_submit 的表单数据在运行时按学生生成"""
+    return [
+        Scenario('student_dashboard', 'accounts:student_dashboard', 'student', 'GET', {}, ALL_SERVERS),
+        Scenario('admin_dashboard', 'accounts:admin_dashboard', 'admin', 'GET', {}, ALL_SERVERS),
+        Scenario('student_profile_list', 'students:student_profile_list', 'admin', 'GET', {}, ALL_SERVERS),
+        Scenario('student_profile_list:search', 'students:student_profile_list', 'admin', 'GET',
+                 {'search': search_term}, ALL_SERVERS),
+        Scenario('student_profile_list:filter', 'students:student_profile_list', 'admin', 'GET',
+                 {'status': 'enrolled', 'department': department_id}, ALL_SERVERS),
+        Scenario('course_selection', 'students:course_selection', 'student', 'GET', {}, ALL_SERVERS),
+        Scenario('course_selection_submit', 'students:course_selection_submit', 'student', 'POST', {}, ALL_SERVERS),
+        Scenario('enrollment_grade_list', 'students:enrollment_grade_list', 'admin', 'GET', {}, ALL_SERVERS),
+        # students/views_api.py
+        Scenario('api_student_status', 'students:api_student_status', 'student', 'GET', {}, ALL_SERVERS),
+        Scenario('api_course_updates', 'students:api_course_updates', 'student', 'GET', {}, ALL_SERVERS),
+        Scenario('api_enrollment_changes', 'students:api_enrollment_changes', 'admin', 'GET', {}, ALL_SERVERS),
+        Scenario('api_changes', 'students:api_changes', 'admin', 'GET', {}, ALL_SERVERS),
+        Scenario('api_changes:student', 'students:api_changes', 'student', 'GET', {}, ALL_SERVERS),
+        Scenario('api_student_profiles', 'students:api_student_profiles', 'admin', 'GET', {}, ALL_SERVERS),
+        Scenario('api_student_search', 'students:api_student_search', 'admin', 'GET',
+                 {'q': search_term}, ALL_SERVERS),
+        # accounts/views_api.py
+        Scenario('api_pending_profiles_count', 'accounts:api_pending_profiles_count', 'admin', 'GET', {}, ALL_SERVERS),
+        Scenario('api_recent_users', 'accounts:api_recent_users', 'admin', 'GET', {}, ALL_SERVERS),
+        Scenario('api_users', 'accounts:api_users', 'admin', 'GET', {}, ALL_SERVERS),
+        Scenario('api_student_profiles_updates', 'accounts:api_student_profiles_updates', 'admin', 'GET', {},
+                 ALL_SERVERS),
+        Scenario('api_user_notifications', 'accounts:api_user_notifications', 'admin', 'GET', {}, ALL_SERVERS),
+        Scenario('api_user_notifications:student', 'accounts:api_user_notifications', 'student', 'GET', {},
+                 ALL_SERVERS),
+        # 以第一个管理员的身份提交。该接口目前不写入任何数据；以后实现已读状态时，
+        # 会把这个（可能是真实的）管理员的通知标为已读，届时应只在生成的数据集上运行
+        Scenario('api_mark_notifications_read', 'accounts:api_mark_notifications_read', 'admin', 'POST', {},
+                 ALL_SERVERS),
+        # WSGI 下事件流直接返回 503 降级响应，没有测量意义；ASGI 下测量到第一条事件的时间
+        Scenario('api_event_stream', 'accounts:api_event_stream', 'admin', 'GET', {}, ('asgi',)),
+    ]
+
+
+# ----------------------------------------------------------------------
+# 请求方式
+# ----------------------------------------------------------------------
+
+class ClientSession:
+    """测试客户端会话：force_login 登录，不检查 CSRF"""
+
+    def __init__(self, user):
+        self.client = Client(raise_request_exception=False)
+        self.client.force_login(user)
+
+    def request(self, method, path, data=None, stream=False):
+        if method == 'POST':
+            response = self.client.post(path, data or {})
+        else:
+            response = self.client.get(path)
+        if response.streaming:
+            # 只取第一块内容，事件流不会结束
+            next(iter(response.streaming_content), None)
+            response.close()
+        return response.status_code
+
+
+class HTTPSession:
+    """经 HTTP 访问服务器的会话：直接在会话存储中创建登录会话，POST 携带 CSRF 令牌"""
+
+    def __init__(self, user, host, port):
+        self.host = host
+        self.port = port
+        self.csrf_token = get_random_string(32)
+        self.cookies = {
+            settings.SESSION_COOKIE_NAME: self._create_session(user),
+            settings.CSRF_COOKIE_NAME: self.csrf_token,
+        }
+        self.connection = None
+
+    @staticmethod
+    def _create_session(user):
+        engine = import_module(settings.SESSION_ENGINE)
+        session = engine.SessionStore()
+        session[SESSION_KEY] = user._meta.pk.value_to_string(user)
+        session[BACKEND_SESSION_KEY] = 'django.contrib.auth.backends.ModelBackend'
+        session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+        session.save()
+        return session.session_key
+
+    def _connect(self):
+        if self.connection is None:
+            self.connection = http.client.HTTPConnection(self.host, self.port, timeout=60)
+        return self.connection
+
+    def request(self, method, path, data=None, stream=False):
+        headers = {
+            'Cookie': '; '.join(f'{name}={value}' for name, value in self.cookies.items()),
+            'Host': f'{self.host}:{self.port}',
+        }
+        body = None
+        if method == 'POST':
+            body = urlencode(data or {})
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+            headers['X-CSRFToken'] = self.csrf_token
+            headers['Referer'] = f'http://{self.host}:{self.port}/'
+        connection = self._connect()
+        try:
+            connection.request(method, path, body=body, headers=headers)
+            response = connection.getresponse()
+            if stream:
+                response.readline()
+                self.close()
+            else:
+                response.read()
+                if response.will_close:
+                    self.close()
+        except (OSError, http.client.HTTPException):
+            self.close()
+            raise
+        return response.status
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+
+class ThreadingWSGIServer(socketserver.ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+
+
+class QuietHandler(WSGIRequestHandler):
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_wsgi_server():
+    from student_management.wsgi import application
+
+    server = make_server('127.0.0.1', 0, application, server_class=ThreadingWSGIServer, handler_class=QuietHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server.server_address[1], server.shutdown
+
+
+def start_asgi_server():
+    try:
+        import uvicorn
+    except ImportError:
+        raise CommandError('--server asgi 需要安装 uvicorn：pip install uvicorn')
+    from student_management.asgi import application
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind(('127.0.0.1', 0))
+    config = uvicorn.Config(application, lifespan='off', log_level='warning', access_log=False)
+    server = uvicorn.Server(config)
+    # 服务器运行在子线程中，信号处理留给主线程
+    server.install_signal_handlers = lambda: None
+    thread = threading.Thread(target=server.run, kwargs={'sockets': [sock]}, daemon=True)
+    thread.start()
+    deadline = time.monotonic() + 10
+    while not server.started:
+        if time.monotonic() > deadline or not thread.is_alive():
+            raise CommandError('uvicorn 启动失败')
+        time.sleep(0.05)
+
+    def stop():
+        server.should_exit = True
+        thread.join(timeout=10)
+        sock.close()
+
+    return sock.getsockname()[1], stop
+
+
+# ----------------------------------------------------------------------
+# 统计
+# ----------------------------------------------------------------------
+
+def queries_snapshot():
+    """本进程各视图累计执行的 SQL 条数"""
+    totals = {}
+    for (name, labels), value in list(metrics.registry.values.items()):
+        if name == 'django_db_queries_total':
+            view = dict(labels)['view']
+            totals[view] = totals.get(view, 0) + value
+    return totals
+
+
+def summarize(latencies, statuses, queries, requests):
+    # 场景都以有权限的角色登录，4xx 同样说明请求没有按预期完成
+    errors = sum(1 for status in statuses if status >= 400)
+    return {
+        'requests': requests,
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+        'mean_ms': round(sum(latencies) / len(latencies) * 1000, 2) if latencies else 0.0,
+        'queries_per_request': round(queries / requests, 2) if requests else 0.0,
+        'errors': errors,
+        'statuses': sorted(set(statuses)),
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+
+def compare(results, baseline, tolerance):
+    """与基线比较，返回 (每个场景的比较行, 回归说明列表)"""
+    rows = []
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get('results', {}).get(name)
+        if previous is None:
+            rows.append((name, current, None, '新增'))
+            continue
+        problems = []
+        limit = previous['p95_ms'] * (1 + tolerance)
+        if current['p95_ms'] > limit and current['p95_ms'] - previous['p95_ms'] > MIN_REGRESSION_MS:
+            problems.append(f"p95 {previous['p95_ms']}ms -> {current['p95_ms']}ms")
+        if current['queries_per_request'] > previous['queries_per_request'] + 0.5:
+            problems.append(f"SQL {previous['queries_per_request']} -> {current['queries_per_request']} 条/请求")
+        if current['errors'] > previous['errors']:
+            problems.append(f"错误 {previous['errors']} -> {current['errors']}")
+        if problems:
+            regressions.append(f'{name}：' + '；'.join(problems))
+        rows.append((name, current, previous, '回归' if problems else ''))
+    return rows, regressions
+
+
+class Command(BaseCommand):
+    help = '热点页面和 API 的基准测试：延迟百分位、每请求 SQL 条数和峰值内存，可保存基线并比较回归'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--server', choices=ALL_SERVERS, default='client',
+                            help='client 测试客户端（默认）、wsgi 进程内 wsgiref 服务器、asgi 进程内 uvicorn')
+        parser.add_argument('--iterations', type=int, default=50, help='每个场景计时的请求数（默认 50）')
+        parser.add_argument('--warmup', type=int, default=5, help='每个场景计时前的预热请求数（默认 5）')
+        parser.add_argument('--students', type=int, default=20, help='轮流登录的学生数量（默认 20）')
+        parser.add_argument('--only', nargs='+', metavar='场景', help='只运行指定的场景')
+        parser.add_argument('--seed', type=int, default=42, help='选择学生和课程的随机种子（默认 42）')
+        parser.add_argument('--output', help='把本次结果写入 JSON 文件（可作为新的基线）')
+        parser.add_argument('--compare', help='与该 JSON 基线比较，出现回归时以非零状态退出')
+        parser.add_argument('--tolerance', type=float, default=0.2,
+                            help='p95 超过基线的比例阈值（默认 0.2，即 20%%）')
+
+    def handle(self, *args, **options):
+        if options['iterations'] < 1:
+            raise CommandError('--iterations 必须大于 0')
+
+        admin = User.objects.filter(role='admin', is_active=True).order_by('id').first()
+        if admin is None:
+            raise CommandError('没有可用的管理员账户，请先创建管理员')
+        profiles = list(
+            StudentProfile.objects.filter(user__is_active=True, major__isnull=False)
+            .select_related('user').order_by('id')[:options['students']]
+        )
+        if not profiles:
+            raise CommandError('没有带专业的学生档案，请先运行 generate_load_data 生成数据')
+
+        department = Department.objects.order_by('id').first()
+        scenarios = build_scenarios(profiles[0].real_name[:2], department.id if department else '')
+        scenarios = [s for s in scenarios if options['server'] in s.servers]
+        if options['only']:
+            unknown = set(options['only']) - {s.name for s in scenarios}
+            if unknown:
+                raise CommandError(f"未知的场景：{', '.join(sorted(unknown))}")
+            scenarios = [s for s in scenarios if s.name in options['only']]
+
+        baseline = None
+        if options['compare']:
+            try:
+                with open(options['compare'], encoding='utf-8') as f:
+                    baseline = json.load(f)
+            except (OSError, ValueError) as e:
+                raise CommandError(f'无法读取基线文件：{e}')
+
+        with tempfile.TemporaryDirectory() as directory, \
+                override_settings(METRICS_ENABLED=True, METRICS_DIR=directory, ALLOWED_HOSTS=['*']):
+            results = self.run_scenarios(scenarios, admin, profiles, options)
+
+        report = {
+            'meta': {
+                'server': options['server'],
+                'iterations': options['iterations'],
+                'warmup': options['warmup'],
+                'created_at': timezone.now().isoformat(),
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'platform': platform.platform(),
+                'cpu_count': os.cpu_count(),
+                'dataset': {
+                    'users': User.objects.count(),
+                    'student_profiles': StudentProfile.objects.count(),
+                    'courses': Course.objects.count(),
+                    'enrollments': Enrollment.objects.count(),
+                },
+            },
+            'results': results,
+        }
+        self.print_results(results)
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"结果已写入 {options['output']}"))
+
+        if baseline is not None:
+            self.check_baseline(report, baseline, options['tolerance'])
+
+    def run_scenarios(self, scenarios, admin, profiles, options):
+        server = options['server']
+        stop = None
+        if server == 'wsgi':
+            port, stop = start_wsgi_server()
+        elif server == 'asgi':
+            port, stop = start_asgi_server()
+
+        def open_session(user):
+            if server == 'client':
+                return ClientSession(user)
+            return HTTPSession(user, '127.0.0.1', port)
+
+        rng = random.Random(options['seed'])
+        sessions = {}
+
+        def session_for(user):
+            if user.pk not in sessions:
+                sessions[user.pk] = open_session(user)
+            return sessions[user.pk]
+
+        results = {}
+        try:
+            for scenario in scenarios:
+                self.stdout.write(f'{scenario.name} ...', ending='')
+                self.stdout.flush()
+                results[scenario.name] = self.run_scenario(scenario, admin, profiles, session_for, rng, options)
+                self.stdout.write(f" p95 {results[scenario.name]['p95_ms']}ms")
+        finally:
+            for session in sessions.values():
+                if isinstance(session, HTTPSession):
+                    session.close()
+            if stop is not None:
+                stop()
+        return results
+
+    def run_scenario(self, scenario, admin, profiles, session_for, rng, options):
+        path = reverse(scenario.view)
+        if scenario.params:
+            path = f'{path}?{urlencode(scenario.params)}'
+        stream = scenario.name == 'api_event_stream'
+        total = options['warmup'] + options['iterations']
+
+        latencies = []
+        statuses = []
+        queries_before = None
+        for i in range(total):
+            if i == options['warmup']:
+                queries_before = queries_snapshot().get(scenario.view, 0)
+            profile = profiles[i % len(profiles)]
+            user = profile.user if scenario.role == 'student' else admin
+            data = None
+            created_after = None
+            if scenario.name == 'course_selection_submit':
+                data = self.pick_course(profile, rng)
+                created_after = timezone.now()
+
+            session = session_for(user)
+            started = time.perf_counter()
+            try:
+                status = session.request(scenario.method, path, data, stream=stream)
+            except (OSError, http.client.HTTPException):
+                status = 599
+            elapsed = time.perf_counter() - started
+
+            if created_after is not None:
+                # 撤销本次选课（计时之外），保持数据集不变，下一轮可重复运行：
+                # 只归还本次占用的名额，不补选候补队列中的其他学生
+                CourseWaitlist.objects.filter(student=profile, created_at__gte=created_after).delete()
+                for enrollment in Enrollment.objects.filter(student=profile, created_at__gte=created_after):
+                    enrollment._seat_skip_promotion = True
+                    enrollment.delete()
+            if i >= options['warmup']:
+                latencies.append(elapsed)
+                statuses.append(status)
+
+        metrics.registry.flush(force=True)
+        queries = queries_snapshot().get(scenario.view, 0) - (queries_before or 0)
+        return summarize(latencies, statuses, queries, options['iterations'])
+
+    @staticmethod
+    def pick_course(profile, rng):
+        courses = available_courses_for(profile)
+        if not courses:
+            return {'course': ''}
+        return {'course': rng.choice(courses).id}
+
+    def print_results(self, results):
+        self.stdout.write('')
+        self.stdout.write(f"{'场景':<32}{'p50':>9}{'p95':>9}{'p99':>9}{'SQL/请求':>10}{'错误':>6}{'峰值内存':>10}")
+        for name, row in results.items():
+            self.stdout.write(
+                f"{name:<32}{row['p50_ms']:>8.1f}ms{row['p95_ms']:>7.1f}ms{row['p99_ms']:>7.1f}ms"
+                f"{row['queries_per_request']:>10.1f}{row['errors']:>6}{row['peak_rss_mb']:>8.1f}MB"
+            )
+
+    def check_baseline(self, report, baseline, tolerance):
+        if baseline.get('meta', {}).get('dataset') != report['meta']['dataset']:
+            self.stdout.write(self.style.WARNING('注意：数据集规模与基线不同，比较结果仅供参考'))
+        if baseline.get('meta', {}).get('server') != report['meta']['server']:
+            self.stdout.write(self.style.WARNING('注意：运行方式与基线不同，比较结果仅供参考'))
+
+        rows, regressions = compare(report['results'], baseline, tolerance)
+        self.stdout.write('')
+        self.stdout.write(f"{'场景':<32}{'基线 p95':>11}{'本次 p95':>11}{'基线 SQL':>10}{'本次 SQL':>10}")
+        for name, current, previous, flag in rows:
+            before_p95 = f"{previous['p95_ms']:.1f}ms" if previous else '-'
+            before_sql = f"{previous['queries_per_request']:.1f}" if previous else '-'
+            line = (f"{name:<32}{before_p95:>11}{current['p95_ms']:>9.1f}ms"
+                    f"{before_sql:>10}{current['queries_per_request']:>10.1f}  {flag}")
+            self.stdout.write(self.style.ERROR(line) if flag == '回归' else line)
+
+        if regressions:
+            raise CommandError('与基线相比出现回归：\n  ' + '\n  '.join(regressions))
+        self.stdout.write(self.style.SUCCESS(f'与基线相比没有回归（容差 {tolerance:.0%}）'))
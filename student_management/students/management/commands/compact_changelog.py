@@ -0,0 +1,25 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from students.models import ChangeLog
+
+
+class Command(BaseCommand):
+    help = '按保留期压缩变更日志，删除过期记录'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=getattr(settings, 'CHANGELOG_RETENTION_DAYS', 7),
+                            help='保留最近多少天的变更日志')
+        parser.add_argument('--batch-size', type=int, default=5000, help='每批删除的记录数')
+
+    def handle(self, *args, **options):
+        before = timezone.now() - timedelta(days=options['days'])
+        self.stdout.write(f'开始压缩 {before:%Y-%m-%d %H:%M} 之前的变更日志...')
+
+        try:
+            deleted = ChangeLog.compact(before, batch_size=options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(f'成功删除 {deleted} 条过期变更日志！'))
+        except Exception as e:
+            self.stdout.write(self.style.ERROR(f'压缩变更日志失败: {e}'))
@@ -0,0 +1,55 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from students.exports import (STUDENT_PROFILE_COLUMNS, ENROLLMENT_COLUMNS, EXPORT_CHUNK_SIZE,
+                              iter_csv, write_xlsx, student_profile_queryset, enrollment_queryset)
+from students.queries import filter_student_profiles, filter_enrollments
+
+
+class Command(BaseCommand):
+    help = '离线导出学生档案或成绩单（CSV/XLSX），筛选参数与学生列表页一致'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', '-o', help='输出文件路径，默认输出到标准输出（仅CSV）')
+        parser.add_argument('--format', choices=['csv', 'xlsx'], default='csv', help='导出格式')
+        parser.add_argument('--transcripts', action='store_true', help='导出选课成绩单而不是学生档案')
+        parser.add_argument('--chunk-size', type=int, default=EXPORT_CHUNK_SIZE, help='每次从数据库读取的行数')
+        # 学生档案筛选
+        parser.add_argument('--search', help='按学号、姓名、用户名搜索')
+        parser.add_argument('--department', help='院系ID')
+        parser.add_argument('--status', help='学籍状态')
+        parser.add_argument('--gender', help='性别')
+        # 成绩单筛选
+        parser.add_argument('--student', help='学生档案ID')
+        parser.add_argument('--course', help='课程ID')
+        parser.add_argument('--academic-year', dest='academic_year', help='学年')
+        parser.add_argument('--semester', help='学期')
+
+    def handle(self, *args, **options):
+        if options['transcripts']:
+            queryset = filter_enrollments(enrollment_queryset(), options)
+            columns = ENROLLMENT_COLUMNS
+        else:
+            queryset = filter_student_profiles(student_profile_queryset(), options)
+            columns = STUDENT_PROFILE_COLUMNS
+
+        if options['format'] == 'xlsx':
+            if not options['output']:
+                raise CommandError('导出 XLSX 时必须指定 --output')
+            try:
+                count = write_xlsx(options['output'], queryset, columns, options['chunk_size'])
+            except RuntimeError as e:
+                raise CommandError(str(e))
+            self.stderr.write(self.style.SUCCESS(f'成功导出 {count} 行到 {options["output"]}'))
+            return
+
+        handle = open(options['output'], 'w', encoding='utf-8', newline='') if options['output'] else sys.stdout
+        count = -1  # 不计表头
+        try:
+            for line in iter_csv(queryset, columns, options['chunk_size']):
+                handle.write(line)
+                count += 1
+        finally:
+            if handle is not sys.stdout:
+                handle.close()
+        self.stderr.write(self.style.SUCCESS(f'成功导出 {count} 行'))
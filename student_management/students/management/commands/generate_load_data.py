@@ -0,0 +1,324 @@
+import random
+import re
+import time
+import zlib
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import signals
+
+from students import search
+from students.catalog import bump_catalog_version
+from students.importers import DEFAULT_PASSWORD
+from students.models import (
+    Major, Course, StudentProfile, Enrollment, CourseWaitlist, StudentAcademicSummary, StatCounter,
+)
+from students.reference import bump_reference_version
+from students.seats import recount_enrolled
+
+User = get_user_model()
+
+# 默认以固定日期作为“今天”，同一个种子在任何一天生成的数据都完全相同
+DEFAULT_AS_OF = '2025-10-01'
+
+SURNAMES = '王李张刘陈杨黄赵吴周徐孙马朱胡郭何高林罗郑梁谢宋唐许韩冯邓曹彭曾肖田董袁潘于蒋蔡余杜叶程苏魏吕丁任沈姚卢姜崔钟谭陆汪范金石廖贾夏韦付方白邹孟熊秦邱江尹薛闫段雷侯龙史陶黎贺顾毛郝龚邵万钱严覃武戴莫孔向汤'
+GIVEN_NAMES = '伟芳娜敏静丽强磊军洋勇艳杰娟涛明超秀霞平刚桂英华玉萍红兰鹏飞辉建国文斌宇浩然子涵欣怡梓萱一诺思远嘉怡晨曦雨轩俊杰博文天佑'
+COURSE_SUBJECTS = [
+    '高等数学', '线性代数', '概率论与数理统计', '大学物理', '大学英语', '程序设计基础', '数据结构', '离散数学',
+    '计算机组成原理', '操作系统', '计算机网络', '数据库系统', '软件工程', '编译原理', '人工智能导论', '机器学习',
+    '电路分析', '信号与系统', '数字电子技术', '通信原理', '工程力学', '机械设计', '工程制图', '材料科学基础',
+    '微观经济学', '宏观经济学', '会计学原理', '管理学', '市场营销', '大学语文', '中国近现代史纲要', '体育',
+]
+COURSE_TYPES = [('required', 6), ('elective', 3), ('practical', 1)]
+ENROLLMENT_STATUSES = [('enrolled', 94), ('suspended', 3), ('dropped_out', 2), ('transferred', 1)]
+
+
+@contextmanager
+def signals_suppressed():
+    """暂时断开模型信号：逐行的计数器、变更日志、检索索引在生成结束后统一重建，
+    删除时也不再逐行触发信号，而是直接执行批量 DELETE"""
+    saved = []
+    for signal in (signals.pre_save, signals.post_save, signals.pre_delete, signals.post_delete):
+        with signal.lock:
+            saved.append((signal, signal.receivers))
+            signal.receivers = []
+            signal.sender_receivers_cache.clear()
+    try:
+        yield
+    finally:
+        for signal, receivers in saved:
+            with signal.lock:
+                signal.receivers = receivers
+                signal.sender_receivers_cache.clear()
+
+
+@contextmanager
+def explicit_timestamps(*models):
+    """关闭 auto_now / auto_now_add，使用生成器给出的时间，保证结果可重复"""
+    fields = [
+        field for model in models for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)
+    ]
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def generated_id_regex(prefix):
+    """生成的学号/用户名：前缀 + 4 位入学年份 + 7 位序号"""
+    return rf'^{re.escape(prefix)}[0-9]{{11}}$'
+
+
+def generated_code_regex(prefix):
+    """生成的课程代码：前缀 + 至少 4 位序号"""
+    return rf'^{re.escape(prefix)}[0-9]{{4,}}$'
+
+
+def generated_users(prefix):
+    # SQLite 的 LIKE（startswith）不区分大小写，会误删 ld 开头的真实用户，这里用区分大小写的完整格式匹配
+    return User.objects.filter(username__regex=generated_id_regex(prefix))
+
+
+def generated_students(prefix):
+    return StudentProfile.objects.filter(student_id__regex=generated_id_regex(prefix))
+
+
+def generated_courses(prefix):
+    return Course.objects.filter(code__regex=generated_code_regex(prefix))
+
+
+def weighted(rng, choices):
+    values, weights = zip(*choices)
+    return rng.choices(values, weights)[0]
+
+
+def semester_start(year, number):
+    """第 number 学期（1-8）开始的日期：入学年份 year 的 9 月为第1学期"""
+    offset, spring = divmod(number - 1, 2)
+    return date(year + offset + spring, 2 if spring else 9, 20 if spring else 1)
+
+
+def aware(day, rng):
+    return datetime(day.year, day.month, day.day, rng.randint(8, 21), rng.randint(0, 59), rng.randint(0, 59),
+                    tzinfo=dt_timezone.utc)
+
+
+class Command(BaseCommand):
+    help = '按种子生成可重复的大规模压测数据（用户、学生档案、课程和选课记录），用于性能基准测试'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--students', type=int, default=1000, help='学生数（例如 100000）')
+        parser.add_argument('--enrollments', type=int, default=50000, help='选课记录总数（例如 5000000）')
+        parser.add_argument('--courses', type=int, default=480, help='课程数，平均分配到8个学期')
+        parser.add_argument('--seed', type=int, default=42, help='随机种子，相同种子和参数生成完全相同的数据')
+        parser.add_argument('--as-of', default=DEFAULT_AS_OF, help='生成数据时视为“今天”的日期，决定各学生所处年级')
+        parser.add_argument('--prefix', default='LD', help='生成数据的学号/用户名/课程代码前缀')
+        parser.add_argument('--batch-size', type=int, default=5000, help='每批 bulk_create 的行数')
+        parser.add_argument('--password', default=DEFAULT_PASSWORD, help='所有生成用户的登录密码（只哈希一次）')
+        parser.add_argument('--clear', action='store_true', help='先删除同一前缀下已生成的数据')
+        parser.add_argument('--skip-derived', action='store_true', help='不重建计数器、成绩汇总和检索索引')
+
+    def handle(self, *args, **options):
+        self.prefix = options['prefix']
+        self.batch_size = options['batch_size']
+        self.as_of = date.fromisoformat(options['as_of'])
+        self.checksum = 0
+        started = time.monotonic()
+
+        if options['clear']:
+            self.clear()
+        elif generated_users(self.prefix).exists():
+            raise CommandError(f'已存在前缀为 {self.prefix} 的数据，请使用 --clear 重新生成或换一个 --prefix')
+
+        if not Major.objects.exists():
+            call_command('init_sample_data', stdout=self.stdout)
+        majors = list(Major.objects.order_by('id'))
+        if not majors:
+            raise CommandError('没有可用的专业，请先执行 init_sample_data')
+
+        self.stdout.write(
+            f'种子 {options["seed"]}：{options["students"]} 名学生、约 {options["enrollments"]} 条选课记录、'
+            f'{options["courses"]} 门课程，今天视为 {self.as_of}'
+        )
+        # 课程、学生、选课各用独立的随机数序列，调整其中一项的规模不影响其余数据
+        with signals_suppressed(), explicit_timestamps(User, StudentProfile, Course, Enrollment):
+            courses = self.create_courses(random.Random(f'{options["seed"]}:courses'), options['courses'])
+            students = self.create_students(random.Random(f'{options["seed"]}:students'), options['students'],
+                                            majors, options['password'])
+            enrollments = self.create_enrollments(random.Random(f'{options["seed"]}:enrollments'), students,
+                                                  courses, options['enrollments'])
+
+        if not options['skip_derived']:
+            self.rebuild_derived()
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'生成完成：{len(students)} 名学生、{len(courses)} 门课程、{enrollments} 条选课记录，'
+            f'耗时 {elapsed:.1f} 秒，数据校验和 {self.checksum:08x}'
+        ))
+
+    def feed(self, *values):
+        """数据校验和：同一种子和参数应得到相同的值，用来确认基准测试使用的是同一份数据"""
+        self.checksum = zlib.crc32('|'.join(map(str, values)).encode(), self.checksum)
+
+    def clear(self):
+        self.stdout.write(f'删除前缀为 {self.prefix} 的已生成数据...')
+        with signals_suppressed(), transaction.atomic():
+            students = generated_students(self.prefix)
+            courses = generated_courses(self.prefix)
+            Enrollment.objects.filter(student__in=students).delete()
+            Enrollment.objects.filter(course__in=courses).delete()
+            CourseWaitlist.objects.filter(student__in=students).delete()
+            CourseWaitlist.objects.filter(course__in=courses).delete()
+            StudentAcademicSummary.objects.filter(student__in=students).delete()
+            students.delete()
+            generated_users(self.prefix).delete()
+            courses.delete()
+
+    def create_courses(self, rng, count):
+        academic_year = self.current_academic_year()
+        courses = []
+        for i in range(count):
+            credits = Decimal(rng.choice(['1.0', '1.5', '2.0', '2.0', '3.0', '3.0', '4.0']))
+            created = aware(date(2020, 8, 1) + timedelta(days=rng.randint(0, 30)), rng)
+            courses.append(Course(
+                name=f'{rng.choice(COURSE_SUBJECTS)}（{i // len(COURSE_SUBJECTS) + 1}）',
+                code=f'{self.prefix}{i + 1:04d}',
+                course_type=weighted(rng, COURSE_TYPES),
+                credits=credits,
+                hours=int(credits * 16),
+                semester=str(i % 8 + 1),
+                academic_year=academic_year,
+                created_at=created,
+                updated_at=created,
+            ))
+            self.feed(courses[-1].code, courses[-1].course_type, credits)
+        with transaction.atomic():
+            Course.objects.bulk_create(courses, batch_size=self.batch_size)
+        self.stdout.write(f'  课程：{len(courses)}')
+        return courses
+
+    def current_academic_year(self):
+        year = self.as_of.year if self.as_of.month >= 9 else self.as_of.year - 1
+        return f'{year}-{year + 1}'
+
+    def current_semester(self, entry_year):
+        """入学年份对应的当前学期（1-8），已毕业返回 None"""
+        year = self.as_of.year if self.as_of.month >= 9 else self.as_of.year - 1
+        spring = 2 <= self.as_of.month <= 8
+        number = (year - entry_year) * 2 + (2 if spring else 1)
+        return number if number <= 8 else None
+
+    def create_students(self, rng, count, majors, password):
+        # 入学年份取学年选项中不晚于今天的年份，越近的年级人数越多
+        first_year = int(StudentProfile.ACADEMIC_YEAR_CHOICES[0][0][:4])
+        entry_years = list(range(first_year, self.as_of.year + (1 if self.as_of.month >= 9 else 0)))
+        year_weights = [1 + i * 0.05 for i in range(len(entry_years))]
+        hashed = make_password(password)
+
+        # 只保留生成选课记录需要的 (档案ID, 学号, 专业ID, 入学年份)，10万学生也不必把模型对象留在内存中
+        students = []
+        for start in range(0, count, self.batch_size):
+            users, profiles = [], []
+            for i in range(start, min(start + self.batch_size, count)):
+                entry_year = rng.choices(entry_years, year_weights)[0]
+                major = rng.choice(majors)
+                student_id = f'{self.prefix}{entry_year}{i + 1:07d}'
+                name = rng.choice(SURNAMES) + ''.join(rng.choice(GIVEN_NAMES) for _ in range(rng.choice((1, 2, 2))))
+                semester = self.current_semester(entry_year)
+                status = 'graduated' if semester is None else weighted(rng, ENROLLMENT_STATUSES)
+                joined = aware(date(entry_year, 8, 20) + timedelta(days=rng.randint(0, 14)), rng)
+                phone = f'1{rng.choice("3578")}{rng.randint(0, 999999999):09d}'
+                users.append(User(
+                    username=student_id, email=f'{student_id.lower()}@example.com', password=hashed,
+                    first_name=name[:1], last_name=name[1:], phone=phone, role='student',
+                    date_joined=joined, created_at=joined, updated_at=joined,
+                ))
+                profiles.append(StudentProfile(
+                    student_id=student_id, real_name=name, gender=rng.choice('MF'),
+                    birth_date=date(entry_year - 18, 1, 1) + timedelta(days=rng.randint(0, 729)),
+                    phone=phone, email=f'{student_id.lower()}@example.com',
+                    enrollment_date=date(entry_year, 9, 1), graduation_date=date(entry_year + 4, 6, 30),
+                    enrollment_status=status, department_id=major.department_id, major=major,
+                    current_semester=str(semester) if semester else None,
+                    current_academic_year=self.current_academic_year() if semester else None,
+                    grade_level=str((semester + 1) // 2) if semester else None,
+                    created_at=joined, updated_at=joined,
+                ))
+                self.feed(student_id, name, status, major.pk)
+            with transaction.atomic():
+                User.objects.bulk_create(users, batch_size=self.batch_size)
+                for user, profile in zip(users, profiles):
+                    profile.user_id = user.pk
+                StudentProfile.objects.bulk_create(profiles, batch_size=self.batch_size)
+            students.extend(
+                (profile.pk, profile.student_id, profile.major_id, profile.enrollment_date.year) for profile in profiles
+            )
+            self.stdout.write(f'  学生：{len(students)}/{count}')
+        return students
+
+    def create_enrollments(self, rng, students, courses, target):
+        by_semester = {number: [c.pk for c in courses if c.semester == str(number)] for number in range(1, 9)}
+        codes = {c.pk: c.code for c in courses}
+        # 把目标选课数平均分摊到每个学生修过（或正在修）的每个学期
+        terms = sum(self.current_semester(entry_year) or 8 for _, _, _, entry_year in students)
+        per_term = target / max(terms, 1)
+
+        total = 0
+        batch = []
+        for profile_id, student_id, major_id, entry_year in students:
+            current = self.current_semester(entry_year)
+            # 学生自身水平叠加逐门课程的波动，分数整体呈以 78 分为中心的正态分布
+            ability = rng.gauss(0, 6)
+            for number in range(1, (current or 8) + 1):
+                pool = by_semester[number]
+                k = min(int(per_term) + (rng.random() < per_term % 1), len(pool))
+                start = semester_start(entry_year, number)
+                year = entry_year + (number - 1) // 2
+                for course_id in rng.sample(pool, k):
+                    created = aware(start - timedelta(days=rng.randint(0, 14)), rng)
+                    score = None
+                    # 当前学期尚未出成绩，往届课程也有少量缺考或未录入
+                    if number != current and rng.random() > 0.03:
+                        score = Decimal(str(round(max(0, min(100, rng.gauss(78 + ability, 9))) * 2) / 2))
+                    batch.append(Enrollment(
+                        student_id=profile_id, course_id=course_id, major_id=major_id,
+                        semester=f'第{number}学期', academic_year=f'{year}-{year + 1}',
+                        score=score, grade=Enrollment.grade_for_score(score),
+                        enrollment_date=created.date(), created_at=created,
+                        updated_at=created + timedelta(days=120) if score is not None else created,
+                    ))
+                    self.feed(student_id, codes[course_id], score)
+                if len(batch) >= self.batch_size:
+                    total = self.flush_enrollments(batch, total)
+                    batch = []
+        return self.flush_enrollments(batch, total)
+
+    def flush_enrollments(self, batch, total):
+        if batch:
+            with transaction.atomic():
+                Enrollment.objects.bulk_create(batch, batch_size=self.batch_size)
+            if (total + len(batch)) // 100000 != total // 100000:
+                self.stdout.write(f'  选课记录：{total + len(batch)}')
+        return total + len(batch)
+
+    def rebuild_derived(self):
+        """生成时跳过了信号，这里一次性重建依赖它们的派生数据"""
+        self.stdout.write('重建统计计数器、课程已选人数、成绩汇总和检索索引...')
+        StatCounter.reconcile()
+        recount_enrolled()
+        StudentAcademicSummary.rebuild()
+        search.rebuild_index()
+        bump_reference_version()
+        bump_catalog_version()
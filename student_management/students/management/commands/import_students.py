@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+from students.importers import StudentImporter, ImportFileError, read_rows, DEFAULT_BATCH_SIZE, DEFAULT_PASSWORD
+
+
+class Command(BaseCommand):
+    help = '从 CSV/XLSX 批量导入学生（同时创建用户和学生档案）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV 或 XLSX 文件路径，表头可用字段名或中文标签')
+        parser.add_argument('--format', choices=['csv', 'xlsx'], help='文件格式，默认按后缀判断')
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help='每批写入的行数')
+        parser.add_argument('--workers', type=int, default=None, help='密码哈希进程数，默认为CPU核数')
+        parser.add_argument('--default-password', default=DEFAULT_PASSWORD, help='文件中未提供密码时使用的默认密码')
+        parser.add_argument('--dry-run', action='store_true', help='只校验，不写入数据库')
+
+    def handle(self, *args, **options):
+        self.stdout.write(f'开始导入 {options["path"]} ...')
+
+        def progress(result):
+            self.stdout.write(f'  已导入 {result.created} 名学生...')
+
+        importer = StudentImporter(
+            batch_size=options['batch_size'],
+            workers=options['workers'],
+            default_password=options['default_password'],
+            dry_run=options['dry_run'],
+            progress=progress,
+        )
+        try:
+            result = importer.run(read_rows(options['path'], options['format']))
+        except (ImportFileError, OSError) as e:
+            raise CommandError(f'导入失败: {e}')
+
+        for row_number, message in result.errors:
+            self.stdout.write(self.style.WARNING(f'第 {row_number} 行: {message}'))
+        prefix = '[仅校验] ' if options['dry_run'] else ''
+        self.stdout.write(self.style.SUCCESS(prefix + result.summary()))
@@ -0,0 +1,671 @@
+"""
+选课日压测：对本地运行的服务器（runserver、gunicorn、uvicorn 等）模拟选课当天的流量。
+
+虚拟学生按脚本执行完整流程：打开登录页 → 登录（CustomLoginView）→ 学生面板及其状态轮询 →
+打开选课页 → 提交若干次选课（course_selection_submit，按比例模拟重复点击）→ 退出；
+同时有若干管理员停留在管理面板，按 realtime_sync.js 的间隔轮询 api/* 接口。
+
+- 负载曲线（--profile / --stages）：在线虚拟用户数随时间线性变化，编号超过当前目标的用户暂停；
+- 思考时间：两步之间按均值为 --think-time 的指数分布等待，上限为均值的 3 倍；
+- 报告：各请求的吞吐量、错误率和延迟百分位，按时间窗口的变化，选课结果分类
+  （成功、候补、重复提交被拒绝、已满、数据库被锁等），服务器指标中的 SQLite 忙重试/锁错误；
+- 结束后检查数据库：同一学生同一课程的重复选课、已选人数与选课记录不一致、超出容量，
+  并删除本次压测产生的选课和候补记录（--keep 保留）。检查和清理要求与被测服务器使用同一个数据库。
+
+学生账号来自 generate_load_data（用户名即学号，默认密码与其 --password 相同）。
+"""
+import http.client
+import json
+import multiprocessing
+import random
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+from http.cookies import SimpleCookie
+from urllib.parse import urlencode, urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count, F
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.models import User
+from students.importers import DEFAULT_PASSWORD
+from students.management.commands.generate_load_data import generated_users
+from students.models import Course, CourseWaitlist, Enrollment
+
+# realtime_sync.js 中的轮询间隔（秒）
+ADMIN_POLL_INTERVAL = 30
+STUDENT_POLL_INTERVAL = 15
+
+CSRF_INPUT = re.compile(r'name="csrfmiddlewaretoken" value="([^"]+)"')
+COURSE_BUTTON = re.compile(r'selectCourse\((\d+),')
+
+# 选课提交后跳转页面中的提示 -> 结果分类，按顺序匹配
+OUTCOMES = [
+    ('database is locked', 'sqlite_locked'),
+    ('成功选择课程', 'enrolled'),
+    ('已进入候补队列', 'waitlisted'),
+    ('您已经选择了该课程', 'duplicate_rejected'),
+    ('您已在该课程的候补队列中', 'duplicate_rejected'),
+    ('已满员', 'course_full'),
+    ('选课失败', 'failed'),
+]
+
+OUTCOME_LABELS = {
+    'enrolled': '成功选课',
+    'waitlisted': '进入候补',
+    'duplicate_rejected': '重复提交被拒绝',
+    'course_full': '课程已满',
+    'sqlite_locked': 'SQLite 锁错误',
+    'failed': '其他选课失败',
+    'http_error': 'HTTP 错误',
+    'unknown': '无法识别的结果',
+    'login_failed': '登录失败',
+    'no_courses': '没有可选课程',
+    'admin_login_failed': '管理员登录失败',
+}
+
+PROFILES = {
+    # (时长比例, 目标用户比例)，从 0 个用户开始
+    'ramp': [(0.25, 1.0), (0.5, 1.0), (0.25, 0.0)],
+    'spike': [(0.05, 1.0), (0.75, 1.0), (0.2, 0.0)],
+    'steady': [(0.0, 1.0), (1.0, 1.0)],
+}
+
+
+def parse_duration(text):
+    """30、30s、2m、1h -> 秒"""
+    match = re.fullmatch(r'(\d+(?:\.\d+)?)([smh]?)', text.strip())
+    if not match:
+        raise CommandError(f'无法解析时长：{text}')
+    return float(match.group(1)) * {'': 1, 's': 1, 'm': 60, 'h': 3600}[match.group(2)]
+
+
+def parse_stages(text):
+    """'30s:100,2m:100,30s:0' -> [(30, 100), (120, 100), (30, 0)]"""
+    stages = []
+    for part in text.split(','):
+        duration, _, target = part.partition(':')
+        if not target.strip().isdigit():
+            raise CommandError(f'无法解析阶段：{part}，格式为 时长:用户数')
+        stages.append((parse_duration(duration), int(target)))
+    return stages
+
+
+def target_users(stages, elapsed):
+    """elapsed 秒时应在线的虚拟用户数，阶段内线性插值"""
+    current = 0
+    for duration, target in stages:
+        if elapsed < duration:
+            return int(round(current + (target - current) * elapsed / duration))
+        elapsed -= duration
+        current = target
+    return current
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, int(round(fraction * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+# ----------------------------------------------------------------------
+# 虚拟用户
+# ----------------------------------------------------------------------
+
+class Browser:
+    """一个虚拟用户的 HTTP 会话：保持连接和 Cookie，记录每个请求的耗时和状态"""
+
+    def __init__(self, base, started, records, timeout):
+        self.base = base
+        self.started = started
+        self.records = records
+        self.timeout = timeout
+        self.cookies = {}
+        self.connection = None
+
+    def clone(self):
+        """共享 Cookie、使用独立连接的会话，用于模拟同时发出的重复提交"""
+        other = Browser(self.base, self.started, self.records, self.timeout)
+        other.cookies = dict(self.cookies)
+        return other
+
+    def _connect(self):
+        if self.connection is None:
+            factory = http.client.HTTPSConnection if self.base.scheme == 'https' else http.client.HTTPConnection
+            self.connection = factory(self.base.hostname, self.base.port, timeout=self.timeout)
+        return self.connection
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+    def _store_cookies(self, response):
+        for header in response.headers.get_all('Set-Cookie') or ():
+            for name, morsel in SimpleCookie(header).items():
+                if morsel.value and morsel['max-age'] != '0':
+                    self.cookies[name] = morsel.value
+                else:
+                    self.cookies.pop(name, None)
+
+    def request(self, label, method, path, data=None):
+        """返回 (状态码, 页面内容, 跳转地址)；连接失败时状态码为 0"""
+        headers = {'Referer': f'{self.base.scheme}://{self.base.netloc}{path}'}
+        if self.cookies:
+            headers['Cookie'] = '; '.join(f'{name}={value}' for name, value in self.cookies.items())
+        body = None
+        if method == 'POST':
+            body = urlencode(data or {})
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+            if 'csrftoken' in self.cookies:
+                headers['X-CSRFToken'] = self.cookies['csrftoken']
+
+        started = time.perf_counter()
+        status, content, location, error = 0, '', None, ''
+        try:
+            connection = self._connect()
+            connection.request(method, path, body=body, headers=headers)
+            response = connection.getresponse()
+            content = response.read().decode('utf-8', errors='replace')
+            status = response.status
+            location = response.getheader('Location')
+            self._store_cookies(response)
+            if response.will_close:
+                self.close()
+        except TimeoutError:
+            error = 'timeout'
+            self.close()
+        except (OSError, http.client.HTTPException):
+            error = 'connection'
+            self.close()
+        finished = time.perf_counter()
+
+        if not error and status >= 500:
+            error = 'sqlite_locked' if 'database is locked' in content else f'http_{status}'
+        elif not error and status >= 400:
+            error = f'http_{status}'
+        self.records.append((label, started - self.started, finished - started, status, error))
+        return status, content, location
+
+    def follow(self, label, location):
+        if not location:
+            return 0, '', None
+        parts = urlsplit(location)
+        path = parts.path + (f'?{parts.query}' if parts.query else '')
+        return self.request(label, 'GET', path)
+
+
+class VirtualUser:
+
+    def __init__(self, index, config, paths, started, records, outcomes, stop):
+        self.index = index
+        self.config = config
+        self.paths = paths
+        self.started = started
+        self.records = records
+        self.outcomes = outcomes
+        self.stop = stop
+        self.rng = random.Random(config['seed'] * 100003 + index)
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def remaining(self):
+        return self.config['duration'] - self.elapsed()
+
+    def think(self, mean=None):
+        mean = self.config['think_time'] if mean is None else mean
+        if mean <= 0:
+            return not self.stop.is_set()
+        delay = min(self.rng.expovariate(1 / mean), mean * 3, max(self.remaining(), 0))
+        return not self.stop.wait(delay)
+
+    def browser(self):
+        return Browser(self.config['base'], self.started, self.records, self.config['timeout'])
+
+    def login(self, browser, username, password):
+        status, content, _ = browser.request('login_page', 'GET', self.paths['login'])
+        match = CSRF_INPUT.search(content)
+        token = match.group(1) if match else browser.cookies.get('csrftoken', '')
+        status, _, location = browser.request('login_submit', 'POST', self.paths['login'], {
+            'csrfmiddlewaretoken': token, 'username': username, 'password': password,
+        })
+        # 登录成功时 302 跳转到对应的面板，失败时 200 重新显示登录页
+        if status != 302:
+            return None
+        return location
+
+
+class StudentUser(VirtualUser):
+    """按负载曲线上线的学生：每轮使用一个新的学生账号走完一次选课流程"""
+
+    def run(self):
+        stages = self.config['stages']
+        accounts = self.config['students']
+        round_number = 0
+        while not self.stop.is_set() and self.remaining() > 0:
+            if self.index >= target_users(stages, self.elapsed()):
+                self.stop.wait(0.25)
+                continue
+            username = accounts[(self.index + round_number * self.config['users']) % len(accounts)]
+            round_number += 1
+            self.journey(username)
+
+    def journey(self, username):
+        browser = self.browser()
+        try:
+            location = self.login(browser, username, self.config['password'])
+            if location is None:
+                self.outcomes.append('login_failed')
+                return
+            browser.follow('student_dashboard', location)
+            browser.request('api_student_status', 'GET', self.paths['api_student_status'])
+            if not self.think():
+                return
+
+            _, content, _ = browser.request('course_selection', 'GET', self.paths['course_selection'])
+            courses = [int(course_id) for course_id in COURSE_BUTTON.findall(content)]
+            for _ in range(self.config['courses_per_student']):
+                if not courses:
+                    self.outcomes.append('no_courses')
+                    break
+                if not self.think():
+                    return
+                course_id = self.choose(courses)
+                courses.remove(course_id)
+                self.submit(browser, course_id)
+
+            if self.remaining() > STUDENT_POLL_INTERVAL and self.think():
+                browser.request('api_student_status', 'GET', self.paths['api_student_status'])
+            browser.request('logout', 'GET', self.paths['logout'])
+        finally:
+            browser.close()
+
+    def choose(self, courses):
+        # 选课日的提交集中在少数热门课程（列表靠前的必修课）上
+        if self.rng.random() < self.config['hot_ratio']:
+            return self.rng.choice(courses[:5])
+        return self.rng.choice(courses)
+
+    def submit(self, browser, course_id):
+        data = {'course': course_id}
+        duplicate = None
+        if self.rng.random() < self.config['double_submit']:
+            # 重复点击：另一个连接几乎同时提交同一门课
+            twin = browser.clone()
+            duplicate = threading.Thread(target=self._submit_and_classify, args=(twin, data, True))
+            duplicate.start()
+        self._submit_and_classify(browser, data, False)
+        if duplicate is not None:
+            duplicate.join()
+
+    def _submit_and_classify(self, browser, data, is_twin):
+        try:
+            status, content, location = browser.request('course_selection_submit', 'POST',
+                                                        self.paths['course_selection_submit'], data)
+            if status != 302:
+                outcome = 'sqlite_locked' if 'database is locked' in content else 'http_error'
+            else:
+                # 结果通过消息框显示在跳转后的页面上
+                _, content, _ = browser.follow('submit_redirect', location)
+                outcome = next((name for text, name in OUTCOMES if text in content), 'unknown')
+            self.outcomes.append(outcome)
+        finally:
+            if is_twin:
+                browser.close()
+
+
+class AdminUser(VirtualUser):
+    """停留在管理面板的管理员，按 realtime_sync.js 的间隔轮询"""
+
+    def run(self):
+        browser = self.browser()
+        try:
+            location = self.login(browser, self.config['admin_username'], self.config['admin_password'])
+            if location is None:
+                self.outcomes.append('admin_login_failed')
+                return
+            browser.follow('admin_dashboard', location)
+            # 各管理员错开第一次轮询的时间
+            if self.stop.wait(self.rng.uniform(0, self.config['poll_interval'])):
+                return
+            while not self.stop.is_set() and self.remaining() > 0:
+                for name in ('api_pending_profiles_count', 'api_recent_users',
+                             'api_student_profiles_updates', 'api_user_notifications'):
+                    browser.request(name, 'GET', self.paths[name])
+                if self.stop.wait(self.config['poll_interval']):
+                    return
+        finally:
+            browser.close()
+
+
+def worker(process_index, config, paths, started_at, results):
+    """一个压测进程：运行编号对进程数取余等于 process_index 的虚拟用户"""
+    # 各进程用同一个墙上时间作为起点，换算成本进程的 perf_counter 起点
+    started = time.perf_counter() - (time.time() - started_at)
+    records = []
+    outcomes = []
+    stop = threading.Event()
+    users = [
+        StudentUser(index, config, paths, started, records, outcomes, stop)
+        for index in range(process_index, config['users'], config['processes'])
+    ]
+    if process_index == 0:
+        users += [AdminUser(index, config, paths, started, records, outcomes, stop)
+                  for index in range(config['admins'])]
+    threads = [threading.Thread(target=user.run, daemon=True) for user in users]
+    for thread in threads:
+        thread.start()
+    # 到时间后停止发起新请求，进行中的请求最多再等待一个超时时间
+    stop.wait(max(config['duration'] - (time.perf_counter() - started), 0))
+    stop.set()
+    for thread in threads:
+        thread.join(config['timeout'])
+    results.put((records, dict(Counter(outcomes))))
+
+
+# ----------------------------------------------------------------------
+# 服务器指标与数据库检查
+# ----------------------------------------------------------------------
+
+def scrape_sqlite_metrics(base, token=None):
+    """读取服务器 /metrics 中的 SQLite 忙重试和锁错误计数，未启用或无权访问时返回 None"""
+    factory = http.client.HTTPSConnection if base.scheme == 'https' else http.client.HTTPConnection
+    connection = factory(base.hostname, base.port, timeout=10)
+    headers = {'Authorization': f'Bearer {token}'} if token else {}
+    try:
+        connection.request('GET', reverse('metrics'), headers=headers)
+        response = connection.getresponse()
+        text = response.read().decode('utf-8', errors='replace')
+    except (OSError, http.client.HTTPException):
+        return None
+    finally:
+        connection.close()
+    if response.status != 200:
+        return None
+    totals = {'sqlite_busy_retries_total': 0.0, 'sqlite_busy_errors_total': 0.0}
+    for line in text.splitlines():
+        name = line.split('{', 1)[0].split(' ', 1)[0]
+        if name in totals:
+            totals[name] += float(line.rsplit(' ', 1)[1])
+    return totals
+
+
+def check_database(usernames, since):
+    """压测涉及的学生和课程的数据一致性问题"""
+    enrollments = Enrollment.objects.filter(student__user__username__in=usernames)
+    duplicates = (
+        enrollments.values('student_id', 'course_id').annotate(rows=Count('id')).filter(rows__gt=1).count()
+    )
+    course_ids = set(
+        Enrollment.objects.filter(student__user__username__in=usernames, created_at__gte=since)
+        .values_list('course_id', flat=True)
+    )
+    courses = Course.objects.filter(id__in=course_ids).annotate(actual=Count('enrollment'))
+    return {
+        'duplicate_enrollments': duplicates,
+        'count_mismatches': courses.exclude(enrolled_count=F('actual')).count(),
+        'over_capacity': courses.filter(capacity__isnull=False, actual__gt=F('capacity')).count(),
+    }
+
+
+def cleanup(usernames, since):
+    """
+    删除压测期间创建的候补和选课记录。
+    先删候补：逐条删除选课会释放名额，事务提交后补选候补队列，先删掉本次的候补才不会补选出新的选课记录；
+    再循环删除直到没有剩余，补选出的记录（created_at 同样晚于 since）也一并删除。
+    """
+    waitlisted, _ = CourseWaitlist.objects.filter(
+        student__user__username__in=usernames, created_at__gte=since).delete()
+    removed = 0
+    while True:
+        enrollments = list(Enrollment.objects.filter(student__user__username__in=usernames, created_at__gte=since))
+        if not enrollments:
+            break
+        for enrollment in enrollments:
+            enrollment.delete()
+            removed += 1
+    return removed, waitlisted
+
+
+# ----------------------------------------------------------------------
+# 报告
+# ----------------------------------------------------------------------
+
+def summarize(records, duration, window):
+    by_label = defaultdict(list)
+    for record in records:
+        by_label[record[0]].append(record)
+
+    requests = {}
+    for label, rows in sorted(by_label.items()):
+        latencies = [row[2] for row in rows]
+        errors = Counter(row[4] for row in rows if row[4])
+        requests[label] = {
+            'count': len(rows),
+            'rps': round(len(rows) / duration, 2),
+            'error_rate': round(sum(errors.values()) / len(rows), 4),
+            'errors': dict(errors),
+            'p50_ms': round(percentile(latencies, 0.50) * 1000, 1),
+            'p95_ms': round(percentile(latencies, 0.95) * 1000, 1),
+            'p99_ms': round(percentile(latencies, 0.99) * 1000, 1),
+        }
+
+    timeline = []
+    buckets = defaultdict(list)
+    for record in records:
+        buckets[int(record[1] // window)].append(record)
+    for bucket in range(int(duration // window) + 1):
+        rows = buckets.get(bucket, [])
+        latencies = [row[2] for row in rows]
+        timeline.append({
+            'start_s': bucket * window,
+            'rps': round(len(rows) / window, 2),
+            'errors': sum(1 for row in rows if row[4]),
+            'p95_ms': round(percentile(latencies, 0.95) * 1000, 1),
+        })
+
+    total_errors = Counter(record[4] for record in records if record[4])
+    return {
+        'total_requests': len(records),
+        'rps': round(len(records) / duration, 2) if duration else 0.0,
+        'error_rate': round(sum(total_errors.values()) / len(records), 4) if records else 0.0,
+        'errors': dict(total_errors),
+        'requests': requests,
+        'timeline': timeline,
+    }
+
+
+class Command(BaseCommand):
+    help = '选课日压测：模拟学生登录、选课、重复提交和管理员轮询，报告吞吐量、错误率和 SQLite 锁错误'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000', help='被测服务器地址（默认 http://127.0.0.1:8000）')
+        parser.add_argument('--users', type=int, default=200, help='同时在线的虚拟学生峰值（默认 200）')
+        parser.add_argument('--admins', type=int, default=2, help='轮询管理面板的管理员数量（默认 2）')
+        parser.add_argument('--duration', default='2m', help='压测时长，如 90s、5m（默认 2m；使用 --stages 时为各阶段之和）')
+        parser.add_argument('--profile', choices=sorted(PROFILES), default='ramp',
+                            help='负载曲线：ramp 逐步上升-保持-下降，spike 开放选课瞬间涌入，steady 恒定（默认 ramp）')
+        parser.add_argument('--stages', help="自定义负载阶段，如 '30s:100,2m:1000,30s:0'，覆盖 --profile")
+        parser.add_argument('--think-time', type=float, default=3.0, help='两步之间的平均思考时间（秒，指数分布，默认 3）')
+        parser.add_argument('--courses-per-student', type=int, default=3, help='每个学生提交的选课次数（默认 3）')
+        parser.add_argument('--double-submit', type=float, default=0.1, help='重复点击提交按钮的概率（默认 0.1）')
+        parser.add_argument('--hot-ratio', type=float, default=0.5, help='选择热门课程（列表前 5 门）的概率（默认 0.5）')
+        parser.add_argument('--poll-interval', type=float, default=ADMIN_POLL_INTERVAL,
+                            help=f'管理员轮询间隔（秒，默认 {ADMIN_POLL_INTERVAL}，与 realtime_sync.js 一致）')
+        parser.add_argument('--prefix', default='LD', help='参与压测的学生学号前缀（默认 LD，与 generate_load_data 一致）')
+        parser.add_argument('--password', default=DEFAULT_PASSWORD, help='学生账号密码')
+        parser.add_argument('--admin-username', default='admin', help='管理员用户名（默认 admin）')
+        parser.add_argument('--admin-password', default='admin123', help='管理员密码（默认 admin123）')
+        parser.add_argument('--processes', type=int, default=1, help='压测进程数，虚拟用户平均分配（默认 1）')
+        parser.add_argument('--timeout', type=float, default=30, help='单个请求的超时时间（秒，默认 30）')
+        parser.add_argument('--window', type=float, default=10, help='时间线统计窗口（秒，默认 10）')
+        parser.add_argument('--seed', type=int, default=42, help='随机种子（默认 42）')
+        parser.add_argument('--metrics-token', help='读取服务器 /metrics 使用的令牌（METRICS_TOKEN）')
+        parser.add_argument('--no-db', action='store_true', help='不检查也不清理数据库（被测服务器使用其他数据库时）')
+        parser.add_argument('--keep', action='store_true', help='保留压测产生的选课和候补记录')
+        parser.add_argument('--output', help='把完整报告写入 JSON 文件')
+
+    def handle(self, *args, **options):
+        base = urlsplit(options['url'])
+        if base.scheme not in ('http', 'https') or not base.hostname:
+            raise CommandError(f"无效的服务器地址：{options['url']}")
+        if options['stages']:
+            stages = parse_stages(options['stages'])
+            peak = max(target for _, target in stages)
+        else:
+            duration = parse_duration(options['duration'])
+            peak = options['users']
+            stages = [(duration * share, int(round(peak * ratio))) for share, ratio in PROFILES[options['profile']]]
+        duration = sum(seconds for seconds, _ in stages)
+        if duration <= 0 or peak <= 0:
+            raise CommandError('压测时长和用户数必须大于 0')
+
+        students = list(
+            generated_users(options['prefix']).filter(role='student', is_active=True,
+                                                     studentprofile__major__isnull=False)
+            .order_by('id').values_list('username', flat=True)
+        )
+        if not students:
+            raise CommandError(f"没有学号以 {options['prefix']} 开头且设置了专业的学生，请先运行 generate_load_data")
+        if len(students) < peak:
+            self.stdout.write(self.style.WARNING(
+                f'只有 {len(students)} 个学生账号，少于 {peak} 个虚拟用户，部分账号会被同时使用'))
+
+        paths = {
+            'login': reverse('accounts:login'),
+            'logout': reverse('accounts:logout'),
+            'course_selection': reverse('students:course_selection'),
+            'course_selection_submit': reverse('students:course_selection_submit'),
+            'api_student_status': reverse('students:api_student_status'),
+            'api_pending_profiles_count': reverse('accounts:api_pending_profiles_count'),
+            'api_recent_users': reverse('accounts:api_recent_users'),
+            'api_student_profiles_updates': reverse('accounts:api_student_profiles_updates'),
+            'api_user_notifications': reverse('accounts:api_user_notifications'),
+        }
+        config = {
+            'base': base,
+            'stages': stages,
+            'duration': duration,
+            'users': peak,
+            'admins': options['admins'],
+            'students': students,
+            'password': options['password'],
+            'admin_username': options['admin_username'],
+            'admin_password': options['admin_password'],
+            'think_time': options['think_time'],
+            'courses_per_student': options['courses_per_student'],
+            'double_submit': options['double_submit'],
+            'hot_ratio': options['hot_ratio'],
+            'poll_interval': options['poll_interval'],
+            'processes': max(1, min(options['processes'], peak)),
+            'timeout': options['timeout'],
+            'seed': options['seed'],
+        }
+
+        stage_text = ' → '.join(f'{seconds:g}s:{target}' for seconds, target in stages)
+        self.stdout.write(f"压测 {options['url']}：峰值 {peak} 个学生 + {options['admins']} 个管理员，"
+                          f"{duration:g} 秒（{stage_text}），{config['processes']} 个进程")
+
+        metrics_before = scrape_sqlite_metrics(base, options['metrics_token'])
+        since = timezone.now()
+        started_at = time.time()
+        results = multiprocessing.Queue()
+        processes = [
+            multiprocessing.Process(target=worker, args=(i, config, paths, started_at, results))
+            for i in range(config['processes'])
+        ]
+        for process in processes:
+            process.start()
+        records = []
+        outcomes = Counter()
+        for _ in processes:
+            process_records, process_outcomes = results.get()
+            records.extend(process_records)
+            outcomes.update(process_outcomes)
+        for process in processes:
+            process.join()
+        elapsed = time.time() - started_at
+        metrics_after = scrape_sqlite_metrics(base, options['metrics_token'])
+
+        report = summarize(records, elapsed, options['window'])
+        report['meta'] = {
+            'url': options['url'],
+            'stages': stages,
+            'peak_users': peak,
+            'admins': options['admins'],
+            'processes': config['processes'],
+            'think_time': options['think_time'],
+            'duration_s': round(elapsed, 1),
+            'created_at': since.isoformat(),
+        }
+        report['enrollment_outcomes'] = dict(outcomes)
+        if metrics_before is not None and metrics_after is not None:
+            report['server_sqlite'] = {
+                'busy_retries': metrics_after['sqlite_busy_retries_total'] - metrics_before['sqlite_busy_retries_total'],
+                'lock_errors': metrics_after['sqlite_busy_errors_total'] - metrics_before['sqlite_busy_errors_total'],
+            }
+        if not options['no_db']:
+            report['database'] = check_database(students, since)
+
+        self.print_report(report, stages)
+
+        if not options['no_db'] and not options['keep']:
+            removed, waitlisted = cleanup(students, since)
+            self.stdout.write(f'已清理压测产生的 {removed} 条选课记录和 {waitlisted} 条候补记录')
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"报告已写入 {options['output']}"))
+
+    def print_report(self, report, stages):
+        self.stdout.write('')
+        self.stdout.write(f"{'请求':<30}{'次数':>8}{'吞吐/s':>9}{'错误率':>9}{'p50':>10}{'p95':>10}{'p99':>10}")
+        for label, row in report['requests'].items():
+            self.stdout.write(
+                f"{label:<30}{row['count']:>8}{row['rps']:>9.2f}{row['error_rate']:>9.2%}"
+                f"{row['p50_ms']:>8.0f}ms{row['p95_ms']:>8.0f}ms{row['p99_ms']:>8.0f}ms"
+            )
+        style = self.style.ERROR if report['error_rate'] else self.style.SUCCESS
+        self.stdout.write(style(
+            f"合计 {report['total_requests']} 个请求，{report['rps']:.2f} 请求/秒，错误率 {report['error_rate']:.2%}"
+        ))
+        if report['errors']:
+            self.stdout.write('错误分类：' + '，'.join(f'{name} {count}' for name, count in sorted(report['errors'].items())))
+
+        self.stdout.write('')
+        self.stdout.write(f"{'时间':>8}{'目标用户':>10}{'吞吐/s':>9}{'错误':>7}{'p95':>10}")
+        for row in report['timeline']:
+            users = target_users(stages, row['start_s'])
+            self.stdout.write(f"{row['start_s']:>7.0f}s{users:>10}{row['rps']:>9.2f}{row['errors']:>7}{row['p95_ms']:>8.0f}ms")
+
+        self.stdout.write('')
+        self.stdout.write('选课结果：')
+        for name, count in sorted(report['enrollment_outcomes'].items(), key=lambda item: -item[1]):
+            line = f'  {OUTCOME_LABELS.get(name, name)}：{count}'
+            bad = name in ('sqlite_locked', 'failed', 'http_error', 'unknown', 'login_failed', 'admin_login_failed')
+            self.stdout.write(self.style.ERROR(line) if bad else line)
+
+        server = report.get('server_sqlite')
+        if server is not None:
+            style = self.style.ERROR if server['lock_errors'] else self.style.SUCCESS
+            self.stdout.write(style(
+                f"服务器 SQLite：忙重试 {server['busy_retries']:.0f} 次，重试后仍失败 {server['lock_errors']:.0f} 次"))
+        else:
+            self.stdout.write('服务器 SQLite：无法读取 /metrics（需要 DJANGO_METRICS=1，并允许本机访问或提供 --metrics-token）')
+
+        database = report.get('database')
+        if database is not None:
+            problems = {key: value for key, value in database.items() if value}
+            if problems:
+                self.stdout.write(self.style.ERROR(
+                    f"数据检查：重复选课 {database['duplicate_enrollments']}，"
+                    f"已选人数不一致 {database['count_mismatches']}，超出容量 {database['over_capacity']}"))
+            else:
+                self.stdout.write(self.style.SUCCESS('数据检查：没有重复选课，已选人数与选课记录一致，没有超出容量'))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from students.models import StudentAcademicSummary
+
+
+class Command(BaseCommand):
+    help = '根据选课记录批量重建所有学生的成绩汇总'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--student', type=int, action='append', dest='student_ids',
+                            help='只重建指定学生档案ID（可重复使用）')
+        parser.add_argument('--batch-size', type=int, default=1000, help='每批写入的记录数')
+
+    def handle(self, *args, **options):
+        self.stdout.write('开始重建学生成绩汇总...')
+
+        try:
+            count = StudentAcademicSummary.rebuild(
+                student_ids=options['student_ids'],
+                batch_size=options['batch_size'],
+            )
+            self.stdout.write(self.style.SUCCESS(f'成功重建 {count} 名学生的成绩汇总！'))
+        except Exception as e:
+            self.stdout.write(self.style.ERROR(f'重建成绩汇总失败: {e}'))
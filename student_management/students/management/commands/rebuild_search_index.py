@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from students import search
+
+
+class Command(BaseCommand):
+    help = '全量重建学生档案全文检索索引'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=2000, help='每次从数据库读取的档案数')
+
+    def handle(self, *args, **options):
+        self.stdout.write('开始重建学生档案检索索引...')
+
+        try:
+            count = search.rebuild_index(chunk_size=options['chunk_size'])
+            self.stdout.write(self.style.SUCCESS(f'成功索引 {count} 个学生档案！'))
+        except Exception as e:
+            self.stdout.write(self.style.ERROR(f'重建检索索引失败: {e}'))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from students.models import StatCounter
+from students.seats import recount_enrolled
+
+
+class Command(BaseCommand):
+    help = '校正面板统计计数器，修复信号遗漏（批量操作、手工改库等）造成的漂移'
+
+    def handle(self, *args, **kwargs):
+        self.stdout.write('开始校正统计计数器...')
+
+        try:
+            drift = StatCounter.reconcile()
+            for key, (old, new) in sorted(drift.items()):
+                self.stdout.write(f'  {key}: {old} -> {new}')
+            courses = recount_enrolled()
+            self.stdout.write(self.style.SUCCESS(f'校正完成，修复了 {len(drift)} 个计数器、{courses} 门课程的已选人数！'))
+        except Exception as e:
+            self.stdout.write(self.style.ERROR(f'校正统计计数器失败: {e}'))
@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from student_management.replica import refresh_replica, replica_configured
+
+
+class Command(BaseCommand):
+    help = '用 SQLite 在线备份把主库复制到只读副本；指定 --interval 时按间隔持续刷新'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=None, help='刷新间隔（秒），不指定时只刷新一次')
+
+    def handle(self, *args, **options):
+        if not replica_configured():
+            self.stdout.write(self.style.ERROR('未配置只读副本（需要在 Linux / macOS 上以生产模式运行，并配置 DATABASES["replica"]）'))
+            return
+
+        while True:
+            try:
+                started = time.monotonic()
+                refreshed_at = refresh_replica()
+                if refreshed_at is None:
+                    self.stdout.write(self.style.WARNING('其他进程正在刷新副本，本次跳过'))
+                else:
+                    self.stdout.write(self.style.SUCCESS(f'副本已刷新，耗时 {time.monotonic() - started:.2f} 秒'))
+            except Exception as e:
+                self.stdout.write(self.style.ERROR(f'刷新副本失败: {e}'))
+            if options['interval'] is None:
+                break
+            time.sleep(options['interval'])
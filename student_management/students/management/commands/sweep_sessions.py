@@ -0,0 +1,48 @@
+import inspect
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils.module_loading import import_string
+
+from student_management.session_backend import SWEEP_BATCH_SIZE
+
+
+def supports_batches(store):
+    """会话引擎的 clear_expired 是否接受 batch_size / max_batches 参数"""
+    try:
+        parameters = inspect.signature(store.clear_expired).parameters
+    except (AttributeError, TypeError, ValueError):
+        return False
+    return {'batch_size', 'max_batches'} <= parameters.keys()
+
+
+class Command(BaseCommand):
+    help = '分批清理过期会话，每批一个短事务，可以在业务高峰期定时执行'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=SWEEP_BATCH_SIZE, help='每批删除的会话数')
+        parser.add_argument('--max-batches', type=int, default=None, help='本次最多执行的批数，默认清理完为止')
+        parser.add_argument('--pause', type=float, default=0.05, help='两批之间暂停的秒数，让出写锁')
+
+    def handle(self, *args, **options):
+        store = import_string(f'{settings.SESSION_ENGINE}.SessionStore')
+        if not supports_batches(store):
+            self.stdout.write(self.style.ERROR(f'当前会话引擎 {settings.SESSION_ENGINE} 不支持分批清理，请使用 clearsessions'))
+            return
+        batch_size = options['batch_size']
+        max_batches = options['max_batches']
+
+        self.stdout.write('开始清理过期会话...')
+        try:
+            deleted = batches = 0
+            while max_batches is None or batches < max_batches:
+                count = store.clear_expired(batch_size=batch_size, max_batches=1)
+                deleted += count
+                batches += 1
+                if count < batch_size:
+                    break
+                time.sleep(options['pause'])
+            self.stdout.write(self.style.SUCCESS(f'清理完成，共删除 {deleted} 个过期会话（{batches} 批）！'))
+        except Exception as e:
+            self.stdout.write(self.style.ERROR(f'清理过期会话失败: {e}'))
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('students', '0008_studentprofile_current_academic_year_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StudentAcademicSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('enrollment_count', models.IntegerField(default=0, verbose_name='选课门数')),
+                ('total_credits', models.DecimalField(decimal_places=1, default=0, max_digits=6, verbose_name='总学分')),
+                ('graded_count', models.IntegerField(default=0, verbose_name='已出成绩门数')),
+                ('grade_points_total', models.DecimalField(decimal_places=2, default=0, max_digits=8, verbose_name='绩点合计')),
+                ('score_total', models.DecimalField(decimal_places=2, default=0, max_digits=10, verbose_name='分数合计')),
+                ('score_count', models.IntegerField(default=0, verbose_name='有分数门数')),
+                ('gpa', models.DecimalField(blank=True, decimal_places=2, max_digits=3, null=True, verbose_name='平均绩点')),
+                ('average_score', models.DecimalField(blank=True, decimal_places=1, max_digits=5, null=True, verbose_name='平均分')),
+                ('semester_breakdown', models.JSONField(blank=True, default=dict, verbose_name='学期明细')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='更新时间')),
+                ('student', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='academic_summary', to='students.studentprofile', verbose_name='学生')),
+            ],
+            options={
+                'verbose_name': '学生成绩汇总',
+                'verbose_name_plural': '学生成绩汇总',
+            },
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:07
+
+import django.core.serializers.json
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('students', '0009_studentacademicsummary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeLog',
+            fields=[
+                ('seq', models.BigAutoField(primary_key=True, serialize=False, verbose_name='序号')),
+                ('model', models.CharField(max_length=50, verbose_name='模型')),
+                ('object_id', models.BigIntegerField(verbose_name='对象ID')),
+                ('action', models.CharField(choices=[('created', '新增'), ('updated', '修改'), ('deleted', '删除')], max_length=10, verbose_name='操作')),
+                ('payload', models.JSONField(blank=True, default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder, verbose_name='变更数据')),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='创建时间')),
+            ],
+            options={
+                'verbose_name': '变更日志',
+                'verbose_name_plural': '变更日志',
+                'ordering': ['seq'],
+            },
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:23
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_enrolled_count(apps, schema_editor):
+    Course = apps.get_model('students', 'Course')
+    Enrollment = apps.get_model('students', 'Enrollment')
+    counts = {}
+    for course_id in Enrollment.objects.values_list('course_id', flat=True).iterator():
+        counts[course_id] = counts.get(course_id, 0) + 1
+    for course_id, count in counts.items():
+        Course.objects.filter(pk=course_id).update(enrolled_count=count)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('students', '0014_enrollment_created_id_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='capacity',
+            field=models.PositiveIntegerField(blank=True, help_text='留空表示不限人数', null=True, verbose_name='课程容量'),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='enrolled_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='已选人数'),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='waitlist_enabled',
+            field=models.BooleanField(default=False, help_text='满员后学生进入候补队列，有空位时按先后顺序自动补选', verbose_name='允许候补'),
+        ),
+        migrations.CreateModel(
+            name='CourseWaitlist',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('semester', models.CharField(max_length=20, verbose_name='学期')),
+                ('academic_year', models.CharField(max_length=10, verbose_name='学年')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='加入时间')),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='waitlist', to='students.course', verbose_name='课程')),
+                ('major', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='students.major', verbose_name='专业')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='students.studentprofile', verbose_name='学生')),
+            ],
+            options={
+                'verbose_name': '课程候补',
+                'verbose_name_plural': '课程候补',
+                'ordering': ['id'],
+                'unique_together': {('student', 'course', 'semester')},
+            },
+        ),
+        migrations.RunPython(backfill_enrolled_count, migrations.RunPython.noop),
+    ]
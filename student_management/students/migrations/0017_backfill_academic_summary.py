@@ -0,0 +1,48 @@
+from types import SimpleNamespace
+
+from django.db import migrations
+
+SUMMARY_FIELDS = [
+    'enrollment_count', 'total_credits', 'graded_count', 'grade_points_total',
+    'score_total', 'score_count', 'gpa', 'average_score', 'semester_breakdown',
+]
+
+
+def backfill_academic_summary(apps, schema_editor):
+    """0009 只建了表：为已有学生按选课记录计算汇总，否则之后的增量更新都建立在空汇总上"""
+    # 累加和均值的计算沿用模型上的方法，写入时只使用本迁移时的字段
+    from students.models import StudentAcademicSummary as Calculator
+
+    StudentProfile = apps.get_model('students', 'StudentProfile')
+    Enrollment = apps.get_model('students', 'Enrollment')
+    StudentAcademicSummary = apps.get_model('students', 'StudentAcademicSummary')
+
+    summaries = {
+        student_id: Calculator(student_id=student_id, semester_breakdown={})
+        for student_id in StudentProfile.objects.values_list('id', flat=True).iterator()
+    }
+    rows = Enrollment.objects.values_list(
+        'student_id', 'academic_year', 'semester', 'grade', 'score', 'course__credits'
+    ).iterator()
+    for student_id, academic_year, semester, grade, score, credits in rows:
+        summary = summaries.get(student_id)
+        if summary is not None:
+            row = SimpleNamespace(academic_year=academic_year, semester=semester, grade=grade, score=score)
+            summary.apply(Calculator.contribution(row, credits))
+
+    StudentAcademicSummary.objects.all().delete()
+    StudentAcademicSummary.objects.bulk_create([
+        StudentAcademicSummary(student_id=student_id, **{field: getattr(summary, field) for field in SUMMARY_FIELDS})
+        for student_id, summary in summaries.items()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('students', '0016_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_academic_summary, migrations.RunPython.noop),
+    ]
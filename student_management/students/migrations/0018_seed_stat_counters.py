@@ -0,0 +1,21 @@
+from django.db import migrations
+
+
+def seed_stat_counters(apps, schema_editor):
+    """0011 只建了表：按业务表的真实数量写入计数器，之后信号的 ±1 才建立在正确的初始值上"""
+    # 计数逻辑沿用 StatCounter.compute；统计只涉及各表中早已存在的字段
+    from students.models import StatCounter
+
+    StatCounter.reconcile()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0004_user_role_email_indexes'),
+        ('students', '0017_backfill_academic_summary'),
+    ]
+
+    operations = [
+        migrations.RunPython(seed_stat_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,20 @@
+from django.db import migrations
+
+
+def backfill_search_index(apps, schema_editor):
+    """0012 只建了空索引：把已有的学生档案全部写入，否则列表页搜索在迁移后查不到任何老数据"""
+    # 文档内容沿用 search.rebuild_index；用到的学号、姓名、用户名、手机号都是早已存在的字段
+    from students import search
+
+    search.rebuild_index()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('students', '0018_seed_stat_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_search_index, migrations.RunPython.noop),
+    ]
@@ -1,5 +1,10 @@
 from django.db import models
 from django.contrib.auth import get_user_model
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from student_management.dirty_fields import DirtyFieldsMixin
 
 User = get_user_model()
 
@@ -35,7 +40,7 @@ class Major(models.Model):
     def __str__(self):
         return f"{self.name} ({self.department.name})"
 
-class StudentProfile(models.Model):
+class StudentProfile(DirtyFieldsMixin, models.Model):
     GENDER_CHOICES = [
         ('M', '男'),
         ('F', '女'),
@@ -142,6 +147,14 @@ class StudentProfile(models.Model):
     class Meta:
         verbose_name = '学生档案'
         verbose_name_plural = '学生档案'
+        indexes = [
+            # 列表页键集分页的排序键
+            models.Index(fields=['-created_at', 'id'], name='studentprofile_created_id'),
+            # 按学籍状态筛选后仍按创建时间分页
+            models.Index(fields=['enrollment_status', '-created_at', 'id'], name='studentprofile_status_created'),
+            # 实时接口轮询最近更新的档案
+            models.Index(fields=['-updated_at'], name='studentprofile_updated_at'),
+        ]
 
     def __str__(self):
         return f"{self.student_id} - {self.real_name}"
@@ -174,16 +187,43 @@ class Course(models.Model):
     semester = models.CharField(max_length=2, default='1', choices=SEMESTER_CHOICES, verbose_name='开设学期')
     academic_year = models.CharField(max_length=10, default='2024-2025', choices=ACADEMIC_YEAR_CHOICES, verbose_name='学年')
     description = models.TextField(blank=True, null=True, verbose_name='课程描述')
+    capacity = models.PositiveIntegerField(blank=True, null=True, verbose_name='课程容量', help_text='留空表示不限人数')
+    enrolled_count = models.PositiveIntegerField(default=0, editable=False, verbose_name='已选人数')
+    waitlist_enabled = models.BooleanField(default=False, verbose_name='允许候补', help_text='满员后学生进入候补队列，有空位时按先后顺序自动补选')
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='创建时间')
     updated_at = models.DateTimeField(auto_now=True, verbose_name='更新时间')
 
     class Meta:
         verbose_name = '课程'
         verbose_name_plural = '课程'
+        indexes = [
+            # 实时接口轮询最近更新的课程
+            models.Index(fields=['-updated_at'], name='course_updated_at'),
+        ]
 
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        # enrolled_count 只能通过条件 UPDATE 增减，整行保存时不能用内存中的旧值覆盖
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != 'enrolled_count'
+            ]
+        super().save(*args, **kwargs)
+
+    @property
+    def remaining_seats(self):
+        """剩余名额，不限人数时返回 None"""
+        if self.capacity is None:
+            return None
+        return max(self.capacity - self.enrolled_count, 0)
+
+    @property
+    def is_full(self):
+        return self.capacity is not None and self.enrolled_count >= self.capacity
+
 class Enrollment(models.Model):
     GRADE_CHOICES = [
         ('A', '优秀 (90-100)'),
@@ -193,6 +233,15 @@ class Enrollment(models.Model):
         ('F', '不及格 (<60)'),
     ]
 
+    # 与 GRADE_CHOICES 对应的分数下限，从高到低排列
+    GRADE_BANDS = [
+        (90, 'A'),
+        (80, 'B'),
+        (70, 'C'),
+        (60, 'D'),
+        (0, 'F'),
+    ]
+
     student = models.ForeignKey(StudentProfile, on_delete=models.CASCADE, verbose_name='学生')
     course = models.ForeignKey(Course, on_delete=models.CASCADE, verbose_name='课程')
     major = models.ForeignKey(Major, on_delete=models.CASCADE, verbose_name='专业')
@@ -208,6 +257,481 @@ class Enrollment(models.Model):
         verbose_name = '选课记录'
         verbose_name_plural = '选课记录'
         unique_together = ['student', 'course', 'semester']
+        indexes = [
+            # 选课列表和成绩列表键集分页的排序键
+            models.Index(fields=['-created_at', 'id'], name='enrollment_created_id'),
+            # 学生面板、选课页按学生统计当前学年学期的选课
+            models.Index(fields=['student', 'academic_year', 'semester'], name='enrollment_student_term'),
+            # 选课变更接口按选课日期统计当天/本周/本月的数量
+            models.Index(fields=['enrollment_date'], name='enrollment_date'),
+        ]
+
+    def __str__(self):
+        return f"{self.student.real_name} - {self.course.name} ({self.semester})"
+
+    @classmethod
+    def grade_for_score(cls, score):
+        """根据分数推导成绩等级，没有分数时返回 None"""
+        if score is None:
+            return None
+        for lower_bound, grade in cls.GRADE_BANDS:
+            if score >= lower_bound:
+                return grade
+        return cls.GRADE_BANDS[-1][1]
+
+class CourseWaitlist(models.Model):
+    """课程候补队列，按 id 先进先出"""
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='waitlist', verbose_name='课程')
+    student = models.ForeignKey(StudentProfile, on_delete=models.CASCADE, verbose_name='学生')
+    major = models.ForeignKey(Major, on_delete=models.CASCADE, verbose_name='专业')
+    semester = models.CharField(max_length=20, verbose_name='学期')
+    academic_year = models.CharField(max_length=10, verbose_name='学年')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='加入时间')
+
+    class Meta:
+        verbose_name = '课程候补'
+        verbose_name_plural = '课程候补'
+        unique_together = ['student', 'course', 'semester']
+        ordering = ['id']
+
+    def __str__(self):
+        return f"{self.student.real_name} - {self.course.name}（候补）"
+
+    @property
+    def position(self):
+        """在候补队列中的位置（从1开始）"""
+        return CourseWaitlist.objects.filter(course_id=self.course_id, id__lt=self.id).count() + 1
+
+class StudentAcademicSummary(models.Model):
+    """学生成绩汇总（物化表），由选课记录的信号增量维护"""
+
+    # 等级制成绩对应的绩点
+    GRADE_POINTS = {'A': 4.0, 'B': 3.0, 'C': 2.0, 'D': 1.0, 'F': 0.0}
+
+    student = models.OneToOneField(StudentProfile, on_delete=models.CASCADE, related_name='academic_summary', verbose_name='学生')
+    enrollment_count = models.IntegerField(default=0, verbose_name='选课门数')
+    total_credits = models.DecimalField(max_digits=6, decimal_places=1, default=0, verbose_name='总学分')
+    graded_count = models.IntegerField(default=0, verbose_name='已出成绩门数')
+    grade_points_total = models.DecimalField(max_digits=8, decimal_places=2, default=0, verbose_name='绩点合计')
+    score_total = models.DecimalField(max_digits=10, decimal_places=2, default=0, verbose_name='分数合计')
+    score_count = models.IntegerField(default=0, verbose_name='有分数门数')
+    gpa = models.DecimalField(max_digits=3, decimal_places=2, blank=True, null=True, verbose_name='平均绩点')
+    average_score = models.DecimalField(max_digits=5, decimal_places=1, blank=True, null=True, verbose_name='平均分')
+    # 按学期汇总：{"学年|学期": {"courses": n, "credits": x, "graded": n, "points": x, "score_total": x, "score_count": n}}
+    semester_breakdown = models.JSONField(default=dict, blank=True, verbose_name='学期明细')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='更新时间')
+
+    class Meta:
+        verbose_name = '学生成绩汇总'
+        verbose_name_plural = '学生成绩汇总'
+
+    def __str__(self):
+        return f"{self.student_id} - GPA {self.gpa}"
+
+    @staticmethod
+    def semester_key(academic_year, semester):
+        return f"{academic_year}|{semester}"
+
+    @classmethod
+    def contribution(cls, enrollment, credits):
+        """计算单条选课记录对汇总的贡献值"""
+        graded = bool(enrollment.grade)
+        has_score = graded and enrollment.score is not None
+        return {
+            'key': cls.semester_key(enrollment.academic_year, enrollment.semester),
+            'courses': 1,
+            'credits': float(credits or 0),
+            'graded': 1 if graded else 0,
+            'points': cls.GRADE_POINTS.get(enrollment.grade, 0.0) if graded else 0.0,
+            'score_total': float(enrollment.score) if has_score else 0.0,
+            'score_count': 1 if has_score else 0,
+        }
+
+    def apply(self, contribution, sign=1):
+        """把一条贡献值加到（sign=1）或减出（sign=-1）汇总中"""
+        from decimal import Decimal
+
+        self.enrollment_count += sign * contribution['courses']
+        self.total_credits += Decimal(str(contribution['credits'])) * sign
+        self.graded_count += sign * contribution['graded']
+        self.grade_points_total += Decimal(str(contribution['points'])) * sign
+        self.score_total += Decimal(str(contribution['score_total'])) * sign
+        self.score_count += sign * contribution['score_count']
+
+        breakdown = dict(self.semester_breakdown or {})
+        bucket = dict(breakdown.get(contribution['key'], {}))
+        for field in ('courses', 'credits', 'graded', 'points', 'score_total', 'score_count'):
+            bucket[field] = round(bucket.get(field, 0) + sign * contribution[field], 2)
+        if bucket['courses'] <= 0:
+            breakdown.pop(contribution['key'], None)
+        else:
+            breakdown[contribution['key']] = bucket
+        self.semester_breakdown = breakdown
+        self.refresh_derived()
+
+    def refresh_derived(self):
+        """根据累计值重新计算平均绩点和平均分"""
+        from decimal import Decimal
+
+        if self.graded_count > 0:
+            self.gpa = (self.grade_points_total / self.graded_count).quantize(Decimal('0.01'))
+        else:
+            self.gpa = None
+        if self.score_count > 0:
+            self.average_score = (self.score_total / self.score_count).quantize(Decimal('0.1'))
+        else:
+            self.average_score = None
+
+    @property
+    def average_grade(self):
+        """把平均绩点转换为等级"""
+        if self.gpa is None:
+            return None
+        gpa = float(self.gpa)
+        if gpa >= 3.7:
+            return 'A'
+        elif gpa >= 2.7:
+            return 'B'
+        elif gpa >= 1.7:
+            return 'C'
+        elif gpa >= 1.0:
+            return 'D'
+        return 'F'
+
+    def semester_course_count(self, academic_year, semester):
+        bucket = (self.semester_breakdown or {}).get(self.semester_key(academic_year, semester), {})
+        return int(bucket.get('courses', 0))
+
+    @classmethod
+    def rebuild(cls, student_ids=None, batch_size=1000):
+        """
+        从选课记录全量重建汇总。
+        student_ids 为 None 时重建所有学生，否则只重建指定学生。
+        """
+        from django.db import transaction
+
+        enrollments = Enrollment.objects.all()
+        students = StudentProfile.objects.all()
+        if student_ids is not None:
+            student_ids = list(student_ids)
+            enrollments = enrollments.filter(student_id__in=student_ids)
+            students = students.filter(id__in=student_ids)
+
+        summaries = {}
+        for student_id in students.values_list('id', flat=True).iterator(chunk_size=batch_size):
+            summaries[student_id] = cls(student_id=student_id, semester_breakdown={})
+
+        rows = enrollments.values_list(
+            'student_id', 'academic_year', 'semester', 'grade', 'score', 'course__credits'
+        ).iterator(chunk_size=batch_size)
+        for student_id, academic_year, semester, grade, score, credits in rows:
+            summary = summaries.get(student_id)
+            if summary is None:
+                continue
+            row = Enrollment(academic_year=academic_year, semester=semester, grade=grade, score=score)
+            summary.apply(cls.contribution(row, credits))
+
+        with transaction.atomic():
+            cls.objects.bulk_create(
+                summaries.values(),
+                batch_size=batch_size,
+                update_conflicts=True,
+                unique_fields=['student'],
+                update_fields=[
+                    'enrollment_count', 'total_credits', 'graded_count', 'grade_points_total',
+                    'score_total', 'score_count', 'gpa', 'average_score', 'semester_breakdown',
+                ],
+            )
+        return len(summaries)
+
+
+
+class ChangeLog(models.Model):
+    """只追加的变更日志，seq 单调递增，供增量同步接口按游标读取"""
+
+    ACTION_CHOICES = [
+        ('created', '新增'),
+        ('updated', '修改'),
+        ('deleted', '删除'),
+    ]
+
+    seq = models.BigAutoField(primary_key=True, verbose_name='序号')
+    model = models.CharField(max_length=50, verbose_name='模型')
+    object_id = models.BigIntegerField(verbose_name='对象ID')
+    action = models.CharField(max_length=10, choices=ACTION_CHOICES, verbose_name='操作')
+    payload = models.JSONField(default=dict, blank=True, encoder=DjangoJSONEncoder, verbose_name='变更数据')
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='创建时间')
+
+    class Meta:
+        verbose_name = '变更日志'
+        verbose_name_plural = '变更日志'
+        ordering = ['seq']
+
+    def __str__(self):
+        return f"#{self.seq} {self.model}:{self.object_id} {self.action}"
+
+    def as_delta(self):
+        """接口返回的紧凑格式"""
+        return {
+            'seq': self.seq,
+            'model': self.model,
+            'id': self.object_id,
+            'action': self.action,
+            'data': self.payload,
+        }
+
+    @classmethod
+    def compact(cls, before, batch_size=5000):
+        """按保留期删除旧日志，按序号分批删除以免长时间锁表；返回删除条数"""
+        boundary = cls.objects.filter(created_at__lt=before).order_by('-seq').values_list('seq', flat=True).first()
+        if boundary is None:
+            return 0
+        deleted = 0
+        start = cls.objects.order_by('seq').values_list('seq', flat=True).first()
+        while start is not None and start <= boundary:
+            end = min(start + batch_size - 1, boundary)
+            count, _ = cls.objects.filter(seq__gte=start, seq__lte=end).delete()
+            deleted += count
+            start = end + 1
+        return deleted
+
+
+class StatCounter(models.Model):
+    """
+    面板统计计数器（反规范化），由信号增减，reconcile_counters 定期校正。
+    键的格式：
+        users / users:role:<role>
+        profiles / profiles:status:<status> / profiles:department:<id> / profiles:major:<id>
+        profiles:student_users（用户角色为学生的档案数）
+        departments / majors
+    """
+
+    key = models.CharField(max_length=100, unique=True, verbose_name='键')
+    value = models.BigIntegerField(default=0, verbose_name='值')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='更新时间')
+
+    class Meta:
+        verbose_name = '统计计数器'
+        verbose_name_plural = '统计计数器'
 
     def __str__(self):
-        return f"{self.student.real_name} - {self.course.name} ({self.semester})"
\ No newline at end of file
+        return f"{self.key} = {self.value}"
+
+    @classmethod
+    def increment(cls, deltas):
+        """原子地批量增减计数，deltas 形如 {'users': 1, 'users:role:student': 1}"""
+        from django.db import IntegrityError, transaction
+        from django.db.models import F
+
+        with transaction.atomic():
+            for key, delta in deltas.items():
+                if not delta:
+                    continue
+                if cls.objects.filter(key=key).update(value=F('value') + delta):
+                    continue
+                try:
+                    with transaction.atomic():
+                        cls.objects.create(key=key, value=delta)
+                except IntegrityError:
+                    # 并发情况下另一个请求刚刚创建了该键
+                    cls.objects.filter(key=key).update(value=F('value') + delta)
+
+    @classmethod
+    def get_many(cls, keys):
+        """一次主键范围内的查询读取多个计数，不存在的键返回0"""
+        values = dict(cls.objects.filter(key__in=keys).values_list('key', 'value'))
+        return {key: values.get(key, 0) for key in keys}
+
+    @classmethod
+    def get(cls, key):
+        return cls.get_many([key])[key]
+
+    @classmethod
+    def dashboard_stats(cls):
+        """管理员面板和各列表页共用的统计数据"""
+        counters = cls.get_many([
+            'users', 'users:role:student', 'users:role:admin', 'users:role:teacher',
+            'profiles', 'profiles:status:enrolled', 'profiles:student_users',
+            'departments', 'majors',
+        ])
+        return {
+            'total_users': counters['users'],
+            'total_students': counters['users:role:student'],
+            'total_admins': counters['users:role:admin'],
+            'total_teachers': counters['users:role:teacher'],
+            'total_student_profiles': counters['profiles'],
+            'enrolled_students': counters['profiles:status:enrolled'],
+            'pending_profiles': max(counters['users:role:student'] - counters['profiles:student_users'], 0),
+            'total_departments': counters['departments'],
+            'total_majors': counters['majors'],
+        }
+
+    @classmethod
+    def compute(cls):
+        """直接从业务表统计出所有计数的真实值"""
+        from django.db.models import Count
+
+        values = {
+            'users': User.objects.count(),
+            'profiles': StudentProfile.objects.count(),
+            'profiles:student_users': StudentProfile.objects.filter(user__role='student').count(),
+            'departments': Department.objects.count(),
+            'majors': Major.objects.count(),
+        }
+        for role, count in User.objects.values_list('role').annotate(n=Count('id')):
+            values[f'users:role:{role}'] = count
+        for status, count in StudentProfile.objects.values_list('enrollment_status').annotate(n=Count('id')):
+            values[f'profiles:status:{status}'] = count
+        for department_id, count in StudentProfile.objects.filter(department__isnull=False).values_list('department_id').annotate(n=Count('id')):
+            values[f'profiles:department:{department_id}'] = count
+        for major_id, count in StudentProfile.objects.filter(major__isnull=False).values_list('major_id').annotate(n=Count('id')):
+            values[f'profiles:major:{major_id}'] = count
+        return values
+
+    @classmethod
+    def reconcile(cls):
+        """把计数校正为真实值，返回发生漂移的键 {key: (旧值, 新值)}"""
+        from django.db import transaction
+
+        with transaction.atomic():
+            actual = cls.compute()
+            stored = dict(cls.objects.values_list('key', 'value'))
+            drift = {}
+            for key in set(actual) | set(stored):
+                old, new = stored.get(key, 0), actual.get(key, 0)
+                if old != new:
+                    drift[key] = (old, new)
+            stale = [key for key in stored if key not in actual]
+            cls.objects.filter(key__in=stale).delete()
+            cls.objects.bulk_create(
+                [cls(key=key, value=value) for key, value in actual.items()],
+                update_conflicts=True,
+                unique_fields=['key'],
+                update_fields=['value', 'updated_at'],
+            )
+        return drift
+
+def _enrollment_contribution(enrollment):
+    if Enrollment.course.is_cached(enrollment):
+        credits = enrollment.course.credits
+    else:
+        credits = Course.objects.filter(pk=enrollment.course_id).values_list('credits', flat=True).first()
+    return StudentAcademicSummary.contribution(enrollment, credits)
+
+
+def _apply_to_summary(student_id, contribution, sign, create=True):
+    from django.db import transaction
+
+    with transaction.atomic():
+        summary = StudentAcademicSummary.objects.select_for_update().filter(student_id=student_id).first()
+        if summary is None:
+            # 还没有汇总时从该学生的全部选课记录重建（已包含本次保存），不能只从这一条开始累加；
+            # 删除时不创建，避免级联删除学生档案的过程中又插入汇总
+            if create:
+                StudentAcademicSummary.rebuild(student_ids=[student_id])
+            return
+        summary.apply(contribution, sign)
+        summary.save()
+
+
+@receiver(pre_save, sender=Enrollment)
+def remember_enrollment_contribution(sender, instance, raw=False, **kwargs):
+    """
+    保存选课记录前，记下修改前的贡献值，用于增量更新汇总
+    """
+    instance._summary_previous = None
+    if raw or not instance.pk:
+        return
+    previous = Enrollment.objects.select_related('course').filter(pk=instance.pk).first()
+    if previous is not None:
+        instance._summary_previous = (previous.student_id, _enrollment_contribution(previous))
+        instance._seat_previous_course_id = previous.course_id
+
+
+@receiver(post_save, sender=Enrollment)
+def update_summary_on_enrollment_save(sender, instance, raw=False, **kwargs):
+    """
+    选课记录新增或修改（包括成绩录入）后，增量更新学生成绩汇总
+    """
+    if raw:
+        return
+    previous = getattr(instance, '_summary_previous', None)
+    if previous is not None:
+        _apply_to_summary(previous[0], previous[1], -1, create=False)
+    _apply_to_summary(instance.student_id, _enrollment_contribution(instance), 1)
+    instance._summary_previous = None
+
+
+@receiver(post_delete, sender=Enrollment)
+def update_summary_on_enrollment_delete(sender, instance, **kwargs):
+    """
+    删除选课记录后，从学生成绩汇总中扣除
+    """
+    _apply_to_summary(instance.student_id, _enrollment_contribution(instance), -1, create=False)
+
+
+@receiver(post_save, sender=Enrollment)
+def count_enrollment_seat(sender, instance, created, raw=False, **kwargs):
+    """
+    维护 Course.enrolled_count。通过 seats.enroll 选课时名额已经在条件 UPDATE 中占用，
+    这里只处理其他途径（管理员添加、修改课程）产生的变化。
+    """
+    from . import seats
+
+    if raw:
+        return
+    if created:
+        if not getattr(instance, '_seat_claimed', False):
+            seats.adjust_enrolled_count(instance.course_id, 1)
+        return
+    previous_course_id = getattr(instance, '_seat_previous_course_id', None)
+    instance._seat_previous_course_id = None
+    if previous_course_id is not None and previous_course_id != instance.course_id:
+        seats.adjust_enrolled_count(instance.course_id, 1)
+        seats.release_seat(previous_course_id)
+
+
+@receiver(post_delete, sender=Enrollment)
+def release_enrollment_seat(sender, instance, **kwargs):
+    """退课后释放名额，并在事务提交后按顺序补选候补学生（实例上设置 _seat_skip_promotion 时不补选）"""
+    from . import seats
+
+    seats.release_seat(instance.course_id, promote=not getattr(instance, '_seat_skip_promotion', False))
+
+
+@receiver(pre_save, sender=Course)
+def remember_course_credits(sender, instance, raw=False, **kwargs):
+    instance._previous_credits = None
+    instance._previous_capacity = None
+    if not raw and instance.pk:
+        previous = Course.objects.filter(pk=instance.pk).values_list('credits', 'capacity').first()
+        if previous is not None:
+            instance._previous_credits, instance._previous_capacity = previous
+
+
+@receiver(post_save, sender=Course)
+def rebuild_summaries_on_credit_change(sender, instance, created, raw=False, **kwargs):
+    """
+    课程学分变更时，重建选了该课程的学生的汇总（学分变更很少发生）
+    """
+    previous = getattr(instance, '_previous_credits', None)
+    if raw or created or previous is None or previous == instance.credits:
+        return
+    student_ids = Enrollment.objects.filter(course=instance).values_list('student_id', flat=True).distinct()
+    StudentAcademicSummary.rebuild(student_ids=student_ids)
+
+
+@receiver(post_save, sender=Course)
+def promote_waitlist_on_capacity_increase(sender, instance, created, raw=False, **kwargs):
+    """
+    课程扩容（或改为不限人数）后，事务提交时按顺序补选候补学生
+    """
+    from django.db import transaction
+    from . import seats
+
+    previous = getattr(instance, '_previous_capacity', None)
+    if raw or created or previous is None:
+        return
+    if instance.capacity is None or instance.capacity > previous:
+        course_id = instance.pk
+        transaction.on_commit(lambda: seats.promote_waitlist(course_id))
@@ -0,0 +1,183 @@
+"""
+键集（seek）分页。
+
+按 (-created_at, id) 之类的唯一排序键翻页：下一页的条件是“排在上一页最后一条之后”，
+而不是 OFFSET。数据库可以直接沿索引定位，第 1000 页和第 1 页的代价相同，
+也不需要 COUNT(*)；需要显示总数时由调用方传入计数器中的近似值。
+
+游标对外是不透明的 base64 字符串，内容为排序键的值和翻页方向：
+    page = KeysetPaginator(queryset, 20).page(request.GET.get('cursor'))
+    page.next_cursor / page.previous_cursor
+"""
+import base64
+import json
+from functools import reduce
+
+from django.db.models import Q
+
+DEFAULT_ORDERING = ('-created_at', 'id')
+
+# 游标方向：n 取游标之后的一页，p 取游标之前的一页
+FORWARD = 'n'
+BACKWARD = 'p'
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(values, direction=FORWARD):
+    raw = json.dumps({'v': values, 'd': direction}, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        data = json.loads(raw)
+        values, direction = data['v'], data['d']
+    except (ValueError, TypeError, KeyError):
+        raise InvalidCursor('无效的分页游标')
+    if direction not in (FORWARD, BACKWARD) or (values is not None and not isinstance(values, list)):
+        raise InvalidCursor('无效的分页游标')
+    return values, direction
+
+
+class KeysetPage:
+    def __init__(self, paginator, object_list, has_next, has_previous):
+        self.paginator = paginator
+        self.object_list = object_list
+        self.has_next_page = has_next
+        self.has_previous_page = has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.has_next_page
+
+    def has_previous(self):
+        return self.has_previous_page
+
+    def has_other_pages(self):
+        return self.has_next_page or self.has_previous_page
+
+    @property
+    def next_cursor(self):
+        if not self.has_next_page or not self.object_list:
+            return None
+        return self.paginator.cursor_for(self.object_list[-1], FORWARD)
+
+    @property
+    def previous_cursor(self):
+        if not self.has_previous_page or not self.object_list:
+            return None
+        return self.paginator.cursor_for(self.object_list[0], BACKWARD)
+
+    @property
+    def last_cursor(self):
+        """跳到末页的游标（倒序取第一页）"""
+        return encode_cursor(None, BACKWARD)
+
+    @property
+    def approximate_count(self):
+        return self.paginator.approximate_count
+
+
+class KeysetPaginator:
+    """
+    queryset 可以是模型查询集，也可以是 values() 查询集（此时排序字段必须包含在 values 中）。
+    ordering 的最后一个字段必须唯一（通常是 id），保证翻页不重不漏。
+    """
+
+    def __init__(self, queryset, per_page, ordering=DEFAULT_ORDERING, approximate_count=None):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.ordering = tuple(ordering)
+        self.fields = [name.lstrip('-') for name in self.ordering]
+        self.approximate_count = approximate_count
+
+    def cursor_for(self, obj, direction):
+        values = []
+        for name in self.fields:
+            value = obj[name] if isinstance(obj, dict) else getattr(obj, name)
+            values.append(value.isoformat() if hasattr(value, 'isoformat') else value)
+        return encode_cursor(values, direction)
+
+    def _parse_values(self, values):
+        if len(values) != len(self.fields):
+            raise InvalidCursor('无效的分页游标')
+        model = self.queryset.model
+        try:
+            return [model._meta.get_field(name).to_python(value) for name, value in zip(self.fields, values)]
+        except Exception:
+            raise InvalidCursor('无效的分页游标')
+
+    def _seek_filter(self, values, direction):
+        """生成“排在游标之后（或之前）”的条件：(a < x) OR (a = x AND b > y) ..."""
+        conditions = []
+        for index, name in enumerate(self.ordering):
+            field = name.lstrip('-')
+            descending = name.startswith('-')
+            if direction == BACKWARD:
+                descending = not descending
+            lookup = f'{field}__lt' if descending else f'{field}__gt'
+            equal = {self.fields[i]: values[i] for i in range(index)}
+            conditions.append(Q(**equal, **{lookup: values[index]}))
+        return reduce(lambda left, right: left | right, conditions)
+
+    def page(self, cursor=None):
+        """返回游标所在的一页；cursor 为空时返回第一页，无效时抛出 InvalidCursor"""
+        values, direction = decode_cursor(cursor) if cursor else (None, FORWARD)
+
+        if direction == BACKWARD:
+            ordering = [name[1:] if name.startswith('-') else '-' + name for name in self.ordering]
+        else:
+            ordering = list(self.ordering)
+
+        queryset = self.queryset
+        if values is not None:
+            queryset = queryset.filter(self._seek_filter(self._parse_values(values), direction))
+        rows = list(queryset.order_by(*ordering)[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+
+        if direction == BACKWARD:
+            rows.reverse()
+            return KeysetPage(self, rows, has_next=values is not None, has_previous=has_more)
+        return KeysetPage(self, rows, has_next=has_more, has_previous=values is not None)
+
+
+def get_page(paginator, cursor):
+    """视图用：游标无效时回到第一页，与原 Paginator 遇到非法页码的处理一致"""
+    try:
+        return paginator.page(cursor)
+    except InvalidCursor:
+        return paginator.page(None)
+
+
+class KeysetPaginationMixin:
+    """
+    ListView 用的键集分页：设置 paginate_by 后，以 ?cursor= 翻页。
+    模板中的 page_obj 为 KeysetPage，提供 next_cursor / previous_cursor。
+    """
+    keyset_ordering = DEFAULT_ORDERING
+
+    def paginate_queryset(self, queryset, page_size):
+        paginator = KeysetPaginator(queryset, page_size, ordering=self.keyset_ordering)
+        page = get_page(paginator, self.request.GET.get('cursor'))
+        return paginator, page, page.object_list, page.has_other_pages()
+
+
+def page_size(params, default=20, maximum=100):
+    """读取 JSON 接口的 limit 参数"""
+    try:
+        return max(1, min(int(params.get('limit', default)), maximum))
+    except (TypeError, ValueError):
+        return default
@@ -0,0 +1,108 @@
+"""
+列表页、导出等共用的查询条件构造函数，保证同样的筛选参数得到同样的结果集。
+"""
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from . import search
+
+
+def filter_student_profiles(students, params):
+    """按 search / department / status / gender 参数筛选学生档案"""
+    search_query = (params.get('search') or '').strip()
+    department_id = params.get('department') or ''
+    status = params.get('status') or ''
+    gender = params.get('gender') or ''
+
+    # 搜索功能：优先走全文检索索引，不支持的数据库退回 icontains
+    if search_query:
+        match = search.get_backend().match_sql(search_query)
+        if match is not None:
+            students = students.filter(id__in=RawSQL(*match))
+        else:
+            students = students.filter(
+                Q(student_id__icontains=search_query) |
+                Q(real_name__icontains=search_query) |
+                Q(user__username__icontains=search_query)
+            )
+
+    # 院系筛选
+    if department_id:
+        students = students.filter(department_id=department_id)
+
+    # 学籍状态筛选
+    if status:
+        students = students.filter(enrollment_status=status)
+
+    # 性别筛选
+    if gender:
+        students = students.filter(gender=gender)
+
+    return students
+
+
+def approximate_profile_count(params, stats=None):
+    """
+    列表总数的近似值，直接读取 StatCounter；筛选条件无法由计数器表示时返回 None。
+    只按学籍状态或只按院系筛选时也能给出总数。
+    """
+    from .models import StatCounter
+
+    active = {key for key in ('search', 'department', 'status', 'gender') if params.get(key)}
+    if not active:
+        stats = stats or StatCounter.dashboard_stats()
+        return stats['total_student_profiles']
+    if active == {'status'}:
+        return StatCounter.get(f'profiles:status:{params["status"]}')
+    if active == {'department'}:
+        return StatCounter.get(f'profiles:department:{params["department"]}')
+    return None
+
+
+def filter_enrollments(enrollments, params):
+    """按 student / course / academic_year / semester / department / grade_status 参数筛选选课记录"""
+    for param, lookup in (
+        ('student', 'student_id'),
+        ('course', 'course_id'),
+        ('academic_year', 'academic_year'),
+        ('semester', 'semester'),
+        ('department', 'student__department_id'),
+    ):
+        value = params.get(param)
+        if value:
+            enrollments = enrollments.filter(**{lookup: value})
+
+    # 成绩状态：graded 已录入 / ungraded 未录入 / 具体等级 A-F
+    grade_status = params.get('grade_status')
+    if grade_status == 'graded':
+        enrollments = enrollments.filter(grade__isnull=False).exclude(grade='')
+    elif grade_status == 'ungraded':
+        enrollments = enrollments.filter(Q(grade__isnull=True) | Q(grade=''))
+    elif grade_status:
+        enrollments = enrollments.filter(grade=grade_status)
+    return enrollments
+
+
+def filter_courses(courses, params):
+    """按 academic_year / semester / course_type 参数筛选课程"""
+    for param in ('academic_year', 'semester', 'course_type'):
+        value = params.get(param)
+        if value:
+            courses = courses.filter(**{param: value})
+    return courses
+
+
+# 选课列表和成绩列表模板实际用到的字段，避免读取整行学生档案
+ENROLLMENT_LIST_FIELDS = (
+    'id', 'semester', 'academic_year', 'grade', 'score', 'enrollment_date', 'created_at',
+    'student', 'student__real_name', 'student__student_id',
+    'course', 'course__name', 'course__code', 'course__credits',
+    'major', 'major__name',
+)
+
+
+def enrollment_list_queryset(params):
+    from .models import Enrollment
+
+    enrollments = Enrollment.objects.select_related('student', 'course', 'major').only(*ENROLLMENT_LIST_FIELDS)
+    return filter_enrollments(enrollments, params)
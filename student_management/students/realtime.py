@@ -0,0 +1,108 @@
+"""
+进程内事件广播器：把模型变更事件推送给所有已连接的 SSE 客户端。
+
+不依赖任何外部消息中间件。每条事件只序列化一次，
+同一份字节数据被放入所有订阅者的队列，
+因此数据库和 CPU 开销不会随在线管理员数量增长。
+"""
+import asyncio
+import itertools
+import json
+import threading
+from collections import deque
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+
+def format_sse(event_id, event_type, data):
+    """按 text/event-stream 格式编码一条事件"""
+    payload = json.dumps(data, cls=DjangoJSONEncoder, ensure_ascii=False)
+    return f"id: {event_id}\nevent: {event_type}\ndata: {payload}\n\n".encode('utf-8')
+
+
+class Subscription:
+    """单个 SSE 连接的订阅，消息通过所属事件循环的队列传递"""
+
+    def __init__(self, broadcaster, loop, max_pending):
+        self.broadcaster = broadcaster
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=max_pending)
+        self.closed = False
+
+    def push(self, message):
+        # publish 可能在同步视图的线程中被调用，必须切回订阅者所在的事件循环
+        try:
+            self.loop.call_soon_threadsafe(self._put, message)
+        except RuntimeError:
+            # 事件循环已关闭
+            self.closed = True
+
+    def _put(self, message):
+        if self.closed:
+            return
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            # 客户端消费太慢，断开它，让浏览器用 Last-Event-ID 重连补齐
+            self.closed = True
+
+    async def get(self, timeout):
+        """等待下一条消息；超时返回 b''（用于发送心跳），连接被踢出时返回 None"""
+        if self.closed and self.queue.empty():
+            return None
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return b''
+
+    def close(self):
+        self.closed = True
+        self.broadcaster.unsubscribe(self)
+
+
+class Broadcaster:
+    """线程安全的进程内发布/订阅中心"""
+
+    def __init__(self, history_size=200, max_pending=100):
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self._history = deque(maxlen=history_size)
+        self._ids = itertools.count(1)
+        self.max_pending = max_pending
+
+    @property
+    def subscriber_count(self):
+        return len(self._subscribers)
+
+    def has_subscribers(self):
+        return bool(self._subscribers)
+
+    def publish(self, event_type, data):
+        """编码一次事件并分发给所有订阅者，返回事件ID"""
+        with self._lock:
+            event_id = next(self._ids)
+            message = format_sse(event_id, event_type, data)
+            self._history.append((event_id, message))
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            subscription.push(message)
+        return event_id
+
+    def subscribe(self, last_event_id=None):
+        """在当前事件循环中创建订阅；提供 last_event_id 时先补发历史事件"""
+        subscription = Subscription(self, asyncio.get_running_loop(), self.max_pending)
+        with self._lock:
+            if last_event_id is not None:
+                for event_id, message in self._history:
+                    if event_id > last_event_id and not subscription.queue.full():
+                        subscription.queue.put_nowait(message)
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+
+# 进程级单例
+broadcaster = Broadcaster()
@@ -0,0 +1,94 @@
+"""
+院系、专业、课程参考数据的进程内缓存。
+
+这三张表很小、很少修改，却几乎在每个表单和列表页都要整表读取。
+每个进程在内存中保存一份快照（包括预先生成的下拉选项），共享缓存里只保存一个版本号；
+Department / Major / Course 保存或删除时由 students.signals 递增版本号。
+读取快照前先比较版本号（一次缓存读取，不查数据库），不一致时重新加载，
+因此任何进程中的修改，其他进程在下一次请求时就能看到。
+
+快照中的模型实例由所有请求共享，只能读取，不要修改或保存；
+课程的已选人数通过条件 UPDATE 维护，不会使快照失效，需要准确人数时请直接查询。
+"""
+import threading
+import time
+
+from django.core.cache import cache
+from django.db.models import Prefetch
+
+from .models import Department, Major, Course
+
+REFERENCE_VERSION_KEY = 'reference_data:version'
+
+# 选课表单使用的学期、学年选项（与选课记录中保存的取值一致）
+ENROLLMENT_SEMESTER_CHOICES = [
+    ('', '请选择学期'),
+    ('第1学期', '第1学期（大一上）'),
+    ('第2学期', '第2学期（大一下）'),
+    ('第3学期', '第3学期（大二上）'),
+    ('第4学期', '第4学期（大二下）'),
+    ('第5学期', '第5学期（大三上）'),
+    ('第6学期', '第6学期（大三下）'),
+    ('第7学期', '第7学期（大四上）'),
+    ('第8学期', '第8学期（大四下）'),
+]
+ENROLLMENT_ACADEMIC_YEAR_CHOICES = [('', '请选择学年')] + [
+    (f'{year}-{year + 1}', f'{year}-{year + 1}学年') for year in range(2020, 2031)
+]
+
+
+class ReferenceData:
+    """某一版本的参考数据快照"""
+
+    def __init__(self, version):
+        self.version = version
+        # 预取各院系的专业：模板中的院系-专业联动（dept.major_set.all）和 major.department 都不再逐个查询
+        self.departments = list(
+            Department.objects.order_by('name').prefetch_related(Prefetch('major_set', Major.objects.order_by('name')))
+        )
+        self.department_by_id = {department.id: department for department in self.departments}
+
+        self.majors = [major for department in self.departments for major in department.major_set.all()]
+        self.major_by_id = {major.id: major for major in self.majors}
+
+        self.courses = list(Course.objects.order_by('code'))
+        self.course_by_id = {course.id: course for course in self.courses}
+
+        self.department_choices = [(department.id, department.name) for department in self.departments]
+        self.major_choices = [(major.id, str(major)) for major in self.majors]
+        self.course_choices = [
+            (course.id, str(course)) for course in sorted(self.courses, key=lambda course: course.name)
+        ]
+
+
+_lock = threading.Lock()
+_snapshot = None
+
+
+def reference_version():
+    version = cache.get(REFERENCE_VERSION_KEY)
+    if version is None:
+        # 用时间戳作为初始值：缓存被清空后不会与某个进程中残留的旧版本号重复
+        cache.add(REFERENCE_VERSION_KEY, int(time.time() * 1000), None)
+        version = cache.get(REFERENCE_VERSION_KEY)
+    return version
+
+
+def bump_reference_version():
+    try:
+        cache.incr(REFERENCE_VERSION_KEY)
+    except ValueError:
+        reference_version()
+
+
+def get_reference_data():
+    """返回当前版本的参考数据快照，版本号变化后重新加载"""
+    global _snapshot
+    version = reference_version()
+    snapshot = _snapshot
+    if snapshot is None or snapshot.version != version:
+        with _lock:
+            snapshot = _snapshot
+            if snapshot is None or snapshot.version != version:
+                snapshot = _snapshot = ReferenceData(version)
+    return snapshot
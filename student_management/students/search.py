@@ -0,0 +1,242 @@
+"""
+学生档案全文检索索引。
+
+- SQLite：FTS5 虚拟表 students_search_fts（rowid 即学生档案ID）；
+- PostgreSQL：students_search_index 表中的 tsvector 列 + GIN 索引；
+- 其他数据库：退回到 icontains 查询。
+
+索引内容包括学号、姓名（逐字切分，支持任意连续片段）、用户名、拼音全拼和首字母
+（需要安装 pypinyin）以及手机号后缀（输入尾号即可命中）。索引由 students.signals 中的信号维护，
+可用 rebuild_search_index 命令全量重建。
+"""
+import re
+
+from django.db import connection
+
+SQLITE_TABLE = 'students_search_fts'
+POSTGRES_TABLE = 'students_search_index'
+
+# SQLite bm25 的列权重：学号、姓名、用户名、拼音、手机号
+SQLITE_COLUMN_WEIGHTS = (10.0, 8.0, 4.0, 3.0, 2.0)
+
+_CJK = re.compile(r'[\u3400-\u9fff]')
+_TOKEN = re.compile(r'[\w\u3400-\u9fff]+')
+
+
+def _pinyin(name):
+    """返回 (全拼, 首字母)，未安装 pypinyin 时返回空串"""
+    try:
+        from pypinyin import lazy_pinyin, Style
+    except ImportError:
+        return '', ''
+    return ''.join(lazy_pinyin(name)), ''.join(lazy_pinyin(name, style=Style.FIRST_LETTER))
+
+
+def _phone_suffixes(phone):
+    digits = re.sub(r'\D', '', phone or '')
+    return [digits[i:] for i in range(len(digits) - 3)]
+
+
+def build_document(student_id, real_name, username, phone):
+    """生成各列的索引文本，所有词之间以空格分隔"""
+    real_name = real_name or ''
+    full_pinyin, initials = _pinyin(real_name)
+    return {
+        'sid': (student_id or '').lower(),
+        # 逐字切分后用短语匹配，可以查到姓名中任意连续的字
+        'name': ' '.join(list(real_name.replace(' ', ''))),
+        'username': (username or '').lower(),
+        'pinyin': ' '.join(filter(None, [full_pinyin.lower(), initials.lower()])),
+        'phone': ' '.join(_phone_suffixes(phone)),
+    }
+
+
+def _terms(query):
+    return [term.lower() for term in _TOKEN.findall(query or '')]
+
+
+class BaseSearchBackend:
+    available = False
+
+    def index(self, profile_id, document):
+        pass
+
+    def remove(self, profile_id):
+        pass
+
+    def clear(self):
+        pass
+
+    def match_sql(self, query):
+        """返回 (sql, params)，sql 查询出匹配的学生档案ID；不支持时返回 None"""
+        return None
+
+    def search(self, query, limit=10):
+        """返回按相关度排序的学生档案ID列表"""
+        return []
+
+
+class SQLiteSearchBackend(BaseSearchBackend):
+    available = True
+
+    def index(self, profile_id, document):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {SQLITE_TABLE} WHERE rowid = %s', [profile_id])
+            cursor.execute(
+                f'INSERT INTO {SQLITE_TABLE} (rowid, sid, name, username, pinyin, phone) VALUES (%s, %s, %s, %s, %s, %s)',
+                [profile_id, document['sid'], document['name'], document['username'], document['pinyin'], document['phone']],
+            )
+
+    def remove(self, profile_id):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {SQLITE_TABLE} WHERE rowid = %s', [profile_id])
+
+    def clear(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {SQLITE_TABLE}')
+
+    @staticmethod
+    def to_fts_query(query):
+        """中文按逐字短语匹配，字母数字按前缀匹配，多个词之间为 AND"""
+        parts = []
+        for term in _terms(query):
+            if _CJK.search(term):
+                parts.append('"%s"' % ' '.join(term))
+            else:
+                parts.append('"%s"*' % term)
+        return ' AND '.join(parts)
+
+    def match_sql(self, query):
+        fts_query = self.to_fts_query(query)
+        if not fts_query:
+            return None
+        return f'SELECT rowid FROM {SQLITE_TABLE} WHERE {SQLITE_TABLE} MATCH %s', [fts_query]
+
+    def search(self, query, limit=10):
+        fts_query = self.to_fts_query(query)
+        if not fts_query:
+            return []
+        weights = ', '.join(str(weight) for weight in SQLITE_COLUMN_WEIGHTS)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid FROM {SQLITE_TABLE} WHERE {SQLITE_TABLE} MATCH %s '
+                f'ORDER BY bm25({SQLITE_TABLE}, {weights}) LIMIT %s',
+                [fts_query, limit],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+
+class PostgresSearchBackend(BaseSearchBackend):
+    available = True
+
+    def index(self, profile_id, document):
+        # 各列按重要程度设置 A-D 权重
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                INSERT INTO {POSTGRES_TABLE} (student_id, document) VALUES (
+                    %s,
+                    setweight(to_tsvector('simple', %s), 'A') ||
+                    setweight(to_tsvector('simple', %s), 'B') ||
+                    setweight(to_tsvector('simple', %s), 'C') ||
+                    setweight(to_tsvector('simple', %s), 'D')
+                )
+                ON CONFLICT (student_id) DO UPDATE SET document = EXCLUDED.document
+                """,
+                [profile_id, document['sid'], document['name'] + ' ' + document['username'],
+                 document['pinyin'], document['phone']],
+            )
+
+    def remove(self, profile_id):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {POSTGRES_TABLE} WHERE student_id = %s', [profile_id])
+
+    def clear(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'TRUNCATE {POSTGRES_TABLE}')
+
+    @staticmethod
+    def to_tsquery(query):
+        parts = []
+        for term in _terms(query):
+            if _CJK.search(term):
+                parts.append(' <-> '.join(term))
+            else:
+                parts.append(f'{term}:*')
+        return ' & '.join(parts)
+
+    def match_sql(self, query):
+        tsquery = self.to_tsquery(query)
+        if not tsquery:
+            return None
+        return (f"SELECT student_id FROM {POSTGRES_TABLE} WHERE document @@ to_tsquery('simple', %s)", [tsquery])
+
+    def search(self, query, limit=10):
+        tsquery = self.to_tsquery(query)
+        if not tsquery:
+            return []
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT student_id FROM {POSTGRES_TABLE}, to_tsquery('simple', %s) query "
+                f"WHERE document @@ query ORDER BY ts_rank(document, query) DESC LIMIT %s",
+                [tsquery, limit],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+
+class FallbackSearchBackend(BaseSearchBackend):
+    """不支持全文检索的数据库：搜索时直接查 StudentProfile"""
+
+    def search(self, query, limit=10):
+        from django.db.models import Q
+        from .models import StudentProfile
+
+        query = (query or '').strip()
+        if not query:
+            return []
+        return list(StudentProfile.objects.filter(
+            Q(student_id__istartswith=query) |
+            Q(real_name__icontains=query) |
+            Q(user__username__istartswith=query) |
+            Q(phone__endswith=query)
+        ).values_list('id', flat=True)[:limit])
+
+
+def get_backend():
+    if connection.vendor == 'sqlite':
+        return SQLiteSearchBackend()
+    if connection.vendor == 'postgresql':
+        return PostgresSearchBackend()
+    return FallbackSearchBackend()
+
+
+def index_profile(profile, username=None):
+    if username is None:
+        username = profile.user.username if profile.user_id else ''
+    get_backend().index(profile.pk, build_document(profile.student_id, profile.real_name, username, profile.phone))
+
+
+def remove_profile(profile_id):
+    get_backend().remove(profile_id)
+
+
+def search_profile_ids(query, limit=10):
+    return get_backend().search(query, limit)
+
+
+def rebuild_index(chunk_size=2000):
+    """全量重建索引，返回索引的档案数"""
+    from django.db import transaction
+    from .models import StudentProfile
+
+    backend = get_backend()
+    count = 0
+    with transaction.atomic():
+        backend.clear()
+        rows = StudentProfile.objects.values_list(
+            'id', 'student_id', 'real_name', 'user__username', 'phone'
+        ).iterator(chunk_size=chunk_size)
+        for profile_id, student_id, real_name, username, phone in rows:
+            backend.index(profile_id, build_document(student_id, real_name, username, phone))
+            count += 1
+    return count
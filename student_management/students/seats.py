@@ -0,0 +1,151 @@
+"""
+课程名额：占座、释放和候补补选。
+
+已选人数保存在 Course.enrolled_count 中，占座只需要一条带条件的 UPDATE：
+    UPDATE course SET enrolled_count = enrolled_count + 1
+    WHERE id = %s AND (capacity IS NULL OR enrolled_count < capacity)
+数据库对同一行的更新是串行的，影响 1 行表示抢到名额，影响 0 行表示已满。
+不需要“先查询再写入”，并发提交时也不会超卖；重复提交由选课记录的唯一约束拦截。
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q
+
+from .models import Course, Enrollment, CourseWaitlist
+
+ENROLLED = 'enrolled'
+WAITLISTED = 'waitlisted'
+
+
+class EnrollmentError(Exception):
+    pass
+
+
+class AlreadyEnrolled(EnrollmentError):
+    pass
+
+
+class AlreadyWaitlisted(EnrollmentError):
+    pass
+
+
+class CourseFull(EnrollmentError):
+    pass
+
+
+def claim_seat(course_id):
+    """尝试占用一个名额，成功返回 True"""
+    return Course.objects.filter(
+        Q(capacity__isnull=True) | Q(enrolled_count__lt=F('capacity')),
+        pk=course_id,
+    ).update(enrolled_count=F('enrolled_count') + 1) == 1
+
+
+def adjust_enrolled_count(course_id, delta):
+    courses = Course.objects.filter(pk=course_id)
+    if delta < 0:
+        courses = courses.filter(enrolled_count__gte=-delta)
+    courses.update(enrolled_count=F('enrolled_count') + delta)
+
+
+def release_seat(course_id, promote=True):
+    """
+    释放一个名额；事务提交后再补选候补学生，避免课程本身正在被删除时补选。
+    promote=False 只归还名额，用于撤销刚刚占用的名额（如基准测试），不改变候补队列。
+    """
+    adjust_enrolled_count(course_id, -1)
+    if promote:
+        transaction.on_commit(lambda: promote_waitlist(course_id))
+
+
+def enroll(student, course, semester, academic_year, major=None):
+    """
+    为学生选课，返回 (ENROLLED, 选课记录) 或 (WAITLISTED, 候补记录)。
+    已选、已在候补或课程已满（且不允许候补）时抛出对应的 EnrollmentError。
+    """
+    major_id = major.pk if major is not None else student.major_id
+
+    with transaction.atomic():
+        # 先占座（获得写锁）再做检查：SQLite 中先读后写的事务在并发时无法等待锁，只能直接失败
+        claimed = claim_seat(course.pk)
+        if Enrollment.objects.filter(student=student, course=course).exists():
+            # 抛出异常会连同占用的名额一起回滚
+            raise AlreadyEnrolled('您已经选择了该课程！')
+
+        if claimed:
+            enrollment = Enrollment(
+                student=student,
+                course=course,
+                major_id=major_id,
+                semester=semester,
+                academic_year=academic_year,
+            )
+            enrollment._seat_claimed = True
+            try:
+                with transaction.atomic():
+                    enrollment.save()
+            except IntegrityError:
+                # 同一学生的并发重复提交
+                raise AlreadyEnrolled('您已经选择了该课程！')
+            CourseWaitlist.objects.filter(student=student, course=course, semester=semester).delete()
+            return ENROLLED, enrollment
+
+        if not course.waitlist_enabled:
+            raise CourseFull(f'课程 {course.name} 已满员！')
+        try:
+            with transaction.atomic():
+                entry = CourseWaitlist.objects.create(
+                    student=student,
+                    course=course,
+                    major_id=major_id,
+                    semester=semester,
+                    academic_year=academic_year,
+                )
+        except IntegrityError:
+            raise AlreadyWaitlisted('您已在该课程的候补队列中！')
+        return WAITLISTED, entry
+
+
+def promote_waitlist(course_id):
+    """有空余名额时按先后顺序把候补学生转为正式选课，返回新建的选课记录"""
+    promoted = []
+    while True:
+        with transaction.atomic():
+            # 先占座（获得写锁）再读取队首，保证读到的是最新的候补队列
+            if not claim_seat(course_id):
+                break
+            entry = CourseWaitlist.objects.select_for_update().filter(course_id=course_id).order_by('id').first()
+            if entry is None:
+                adjust_enrolled_count(course_id, -1)
+                break
+            entry.delete()
+            enrollment = Enrollment(
+                student_id=entry.student_id,
+                course_id=course_id,
+                major_id=entry.major_id,
+                semester=entry.semester,
+                academic_year=entry.academic_year,
+            )
+            enrollment._seat_claimed = True
+            try:
+                with transaction.atomic():
+                    enrollment.save()
+            except IntegrityError:
+                # 该学生已通过其他途径选上，归还名额并继续处理下一位
+                adjust_enrolled_count(course_id, -1)
+                continue
+            promoted.append(enrollment)
+    return promoted
+
+
+def recount_enrolled(course_ids=None):
+    """按选课记录重新统计已选人数，返回被校正的课程数"""
+    from django.db.models import Count
+
+    courses = Course.objects.annotate(actual=Count('enrollment'))
+    if course_ids is not None:
+        courses = courses.filter(pk__in=course_ids)
+    drifted = [course for course in courses if course.enrolled_count != course.actual]
+    for course in drifted:
+        course.enrolled_count = course.actual
+    Course.objects.bulk_update(drifted, ['enrolled_count'])
+    return len(drifted)
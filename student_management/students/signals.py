@@ -0,0 +1,303 @@
+"""
+跨模块的模型信号：
+- 把 User / StudentProfile / Enrollment / Course 的变更作为事件推送给实时事件流；
+- 把 students 和 accounts 两个应用所有业务模型的变更写入 ChangeLog；
+- 维护面板统计计数器 StatCounter；
+- 维护学生档案全文检索索引；
+- 课程变更时使可选课程目录缓存失效；
+- 院系、专业、课程变更时使参考数据快照失效。
+"""
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from .models import Department, Major, StudentProfile, Enrollment, Course, StudentAcademicSummary, ChangeLog, StatCounter
+from .realtime import broadcaster
+from . import search
+from .catalog import bump_catalog_version
+from .reference import bump_reference_version
+
+User = get_user_model()
+
+
+def dashboard_snapshot():
+    """管理员面板统计数据，每次变更只读取一次计数器，供所有连接共享"""
+    return StatCounter.dashboard_stats()
+
+
+def serialize_change(instance):
+    """只使用实例上已有的字段生成事件数据，不产生额外查询"""
+    if isinstance(instance, User):
+        return {
+            'id': instance.pk,
+            'username': instance.username,
+            'full_name': instance.get_full_name() or instance.username,
+            'role': instance.role,
+            'created_at': instance.created_at,
+        }
+    if isinstance(instance, StudentProfile):
+        return {
+            'id': instance.pk,
+            'user_id': instance.user_id,
+            'student_id': instance.student_id,
+            'name': instance.real_name,
+            'enrollment_status': instance.enrollment_status,
+            'updated_at': instance.updated_at,
+        }
+    if isinstance(instance, Enrollment):
+        return {
+            'id': instance.pk,
+            'student_id': instance.student_id,
+            'course_id': instance.course_id,
+            'semester': instance.semester,
+            'academic_year': instance.academic_year,
+            'grade': instance.grade,
+        }
+    if isinstance(instance, (Department, Major)):
+        return {
+            'id': instance.pk,
+            'name': instance.name,
+            'code': instance.code,
+        }
+    if isinstance(instance, Course):
+        return {
+            'id': instance.pk,
+            'name': instance.name,
+            'code': instance.code,
+            'course_type': instance.course_type,
+            'updated_at': instance.updated_at,
+        }
+    return {'id': instance.pk}
+
+
+def publish_change(instance, action):
+    """事务提交后广播变更；没有在线订阅者时直接跳过"""
+    if not broadcaster.has_subscribers():
+        return
+    event_type = instance._meta.model_name
+    data = serialize_change(instance)
+    data['action'] = action
+
+    def _publish():
+        if not broadcaster.has_subscribers():
+            return
+        data['stats'] = dashboard_snapshot()
+        broadcaster.publish(event_type, data)
+
+    transaction.on_commit(_publish)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_save, sender=StudentProfile)
+@receiver(post_save, sender=Enrollment)
+@receiver(post_save, sender=Course)
+def broadcast_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    publish_change(instance, 'created' if created else 'updated')
+
+
+@receiver(post_delete, sender=User)
+@receiver(post_delete, sender=StudentProfile)
+@receiver(post_delete, sender=Enrollment)
+@receiver(post_delete, sender=Course)
+def broadcast_delete(sender, instance, **kwargs):
+    publish_change(instance, 'deleted')
+
+
+# 派生表和日志本身不记录变更
+CHANGELOG_EXCLUDED_MODELS = {ChangeLog, StudentAcademicSummary, StatCounter}
+
+
+def record_change(instance, action):
+    ChangeLog.objects.create(
+        model=instance._meta.label_lower,
+        object_id=instance.pk,
+        action=action,
+        payload=serialize_change(instance),
+    )
+
+
+def log_save(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    if raw:
+        return
+    # 登录时只更新 last_login，不是业务数据变更
+    if update_fields is not None and set(update_fields) <= {'last_login'}:
+        return
+    record_change(instance, 'created' if created else 'updated')
+
+
+def log_delete(sender, instance, **kwargs):
+    record_change(instance, 'deleted')
+
+
+for _model in list(apps.get_app_config('students').get_models()) + list(apps.get_app_config('accounts').get_models()):
+    if _model in CHANGELOG_EXCLUDED_MODELS:
+        continue
+    post_save.connect(log_save, sender=_model, dispatch_uid=f'changelog_save_{_model._meta.label_lower}')
+    post_delete.connect(log_delete, sender=_model, dispatch_uid=f'changelog_delete_{_model._meta.label_lower}')
+
+
+# ---------------------------------------------------------------------------
+# 统计计数器
+# ---------------------------------------------------------------------------
+
+def _user_role(user_id):
+    return User.objects.filter(pk=user_id).values_list('role', flat=True).first()
+
+
+def _profile_keys(enrollment_status, department_id, major_id):
+    keys = [f'profiles:status:{enrollment_status}']
+    if department_id:
+        keys.append(f'profiles:department:{department_id}')
+    if major_id:
+        keys.append(f'profiles:major:{major_id}')
+    return keys
+
+
+@receiver(pre_save, sender=User)
+def remember_user_role(sender, instance, raw=False, update_fields=None, **kwargs):
+    instance._counter_previous_role = None
+    # 只更新部分字段（如登录时的 last_login）且不含角色时，角色不会变化
+    if update_fields is not None and 'role' not in update_fields:
+        return
+    if not raw and instance.pk:
+        instance._counter_previous_role = _user_role(instance.pk)
+
+
+@receiver(post_save, sender=User)
+def count_user_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        StatCounter.increment({'users': 1, f'users:role:{instance.role}': 1})
+        return
+    previous = getattr(instance, '_counter_previous_role', None)
+    if previous is None or previous == instance.role:
+        return
+    deltas = {f'users:role:{previous}': -1, f'users:role:{instance.role}': 1}
+    if StudentProfile.objects.filter(user=instance).exists():
+        if previous == 'student':
+            deltas['profiles:student_users'] = -1
+        elif instance.role == 'student':
+            deltas['profiles:student_users'] = 1
+    StatCounter.increment(deltas)
+
+
+@receiver(post_delete, sender=User)
+def count_user_delete(sender, instance, **kwargs):
+    # 级联删除时学生档案先于用户删除，档案计数已在档案的信号中处理
+    StatCounter.increment({'users': -1, f'users:role:{instance.role}': -1})
+
+
+@receiver(pre_save, sender=StudentProfile)
+def remember_profile_counters(sender, instance, raw=False, **kwargs):
+    instance._counter_previous = None
+    if not raw and instance.pk:
+        instance._counter_previous = StudentProfile.objects.filter(pk=instance.pk).values(
+            'user_id', 'enrollment_status', 'department_id', 'major_id'
+        ).first()
+
+
+@receiver(post_save, sender=StudentProfile)
+def count_profile_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    deltas = {}
+    previous = getattr(instance, '_counter_previous', None)
+    if created or previous is None:
+        deltas['profiles'] = 1
+        if _user_role(instance.user_id) == 'student':
+            deltas['profiles:student_users'] = 1
+    else:
+        for key in _profile_keys(previous['enrollment_status'], previous['department_id'], previous['major_id']):
+            deltas[key] = deltas.get(key, 0) - 1
+        if previous['user_id'] != instance.user_id:
+            deltas['profiles:student_users'] = (
+                (1 if _user_role(instance.user_id) == 'student' else 0) -
+                (1 if _user_role(previous['user_id']) == 'student' else 0)
+            )
+    for key in _profile_keys(instance.enrollment_status, instance.department_id, instance.major_id):
+        deltas[key] = deltas.get(key, 0) + 1
+    StatCounter.increment(deltas)
+
+
+@receiver(post_delete, sender=StudentProfile)
+def count_profile_delete(sender, instance, **kwargs):
+    deltas = {'profiles': -1}
+    for key in _profile_keys(instance.enrollment_status, instance.department_id, instance.major_id):
+        deltas[key] = -1
+    if _user_role(instance.user_id) == 'student':
+        deltas['profiles:student_users'] = -1
+    StatCounter.increment(deltas)
+
+
+@receiver(post_save, sender=Department)
+@receiver(post_save, sender=Major)
+def count_reference_save(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        StatCounter.increment({f'{sender._meta.model_name}s': 1})
+
+
+@receiver(post_delete, sender=Department)
+@receiver(post_delete, sender=Major)
+def count_reference_delete(sender, instance, **kwargs):
+    StatCounter.increment({f'{sender._meta.model_name}s': -1})
+
+
+# ---------------------------------------------------------------------------
+# 全文检索索引
+# ---------------------------------------------------------------------------
+
+@receiver(post_save, sender=StudentProfile)
+def index_profile_on_save(sender, instance, raw=False, **kwargs):
+    if not raw:
+        search.index_profile(instance)
+
+
+@receiver(post_delete, sender=StudentProfile)
+def remove_profile_from_index(sender, instance, **kwargs):
+    search.remove_profile(instance.pk)
+
+
+@receiver(post_save, sender=User)
+def reindex_profile_on_username_change(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    # 用户名只在 User 上，修改后需要同步到对应档案的索引
+    if raw or created or (update_fields is not None and 'username' not in update_fields):
+        return
+    if not instance.is_dirty('username'):
+        return
+    profile = StudentProfile.objects.filter(user=instance).first()
+    if profile is not None:
+        search.index_profile(profile, username=instance.username)
+
+
+# ---------------------------------------------------------------------------
+# 可选课程目录缓存
+# ---------------------------------------------------------------------------
+
+@receiver(post_save, sender=Course)
+@receiver(post_delete, sender=Course)
+def invalidate_course_catalog(sender, instance, raw=False, **kwargs):
+    if not raw:
+        transaction.on_commit(bump_catalog_version)
+
+
+# ---------------------------------------------------------------------------
+# 参考数据快照
+# ---------------------------------------------------------------------------
+
+@receiver(post_save, sender=Department)
+@receiver(post_save, sender=Major)
+@receiver(post_save, sender=Course)
+@receiver(post_delete, sender=Department)
+@receiver(post_delete, sender=Major)
+@receiver(post_delete, sender=Course)
+def invalidate_reference_data(sender, instance, raw=False, **kwargs):
+    if not raw:
+        # 立即递增一次，本事务内的后续读取能看到修改；
+        # 提交后再递增一次，丢弃其他进程在提交前按旧数据重新加载的快照
+        bump_reference_version()
+        transaction.on_commit(bump_reference_version)
@@ -0,0 +1,2259 @@
+from decimal import Decimal
+
+import asyncio
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection, connections, transaction, OperationalError
+from django.db.utils import ConnectionHandler
+from asgiref.sync import async_to_sync
+from django.core.cache import cache
+from django.test import (AsyncRequestFactory, LiveServerTestCase, RequestFactory, SimpleTestCase, TestCase,
+                         TransactionTestCase, override_settings)
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts import urls as accounts_urls
+from accounts import views_api as accounts_api, views_api_async as accounts_api_async
+from student_management.sqlite_backend.base import DatabaseWrapper, WriterLock, is_network_path
+from student_management.query_budget import QueryBudgetExceeded, assert_query_budget, fingerprint
+from . import seats
+from . import urls as students_urls
+from . import views_api, views_api_async
+from .queries import filter_student_profiles
+from .models import Department, Major, Course, Enrollment, StudentProfile, CourseWaitlist, StudentAcademicSummary, StatCounter, ChangeLog
+
+User = get_user_model()
+
+
+# 测试中不需要慢速的 PBKDF2
+FAST_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+
+SUMMARY_FIELDS = [
+    'enrollment_count', 'total_credits', 'graded_count', 'grade_points_total',
+    'score_total', 'score_count', 'gpa', 'average_score', 'semester_breakdown',
+]
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS)
+class AcademicSummaryTests(TestCase):
+    """信号增量维护的成绩汇总与从选课记录全量重建的结果一致"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.department = Department.objects.create(name='计算机学院', code='CS')
+        cls.major = Major.objects.create(name='软件工程', code='SE', department=cls.department)
+        cls.profile = create_students(1, cls.department, cls.major, prefix='summary_student')[0]
+        cls.courses = [
+            Course.objects.create(name=f'课程{i}', code=f'S{i:03d}', course_type='required',
+                                  credits=Decimal('3.0'), hours=48)
+            for i in range(3)
+        ]
+
+    def enroll(self, course, **kwargs):
+        return Enrollment.objects.create(student=self.profile, course=course, major=self.major,
+                                         semester='1', academic_year='2024-2025', **kwargs)
+
+    def assertMatchesRebuild(self):
+        summary = StudentAcademicSummary.objects.get(student=self.profile)
+        incremental = {field: getattr(summary, field) for field in SUMMARY_FIELDS}
+        StudentAcademicSummary.rebuild(student_ids=[self.profile.id])
+        summary.refresh_from_db()
+        self.assertEqual(incremental, {field: getattr(summary, field) for field in SUMMARY_FIELDS})
+
+    def test_insert(self):
+        self.enroll(self.courses[0], grade='A', score=Decimal('95'))
+        self.enroll(self.courses[1])
+        self.assertMatchesRebuild()
+        self.assertEqual(StudentAcademicSummary.objects.get(student=self.profile).enrollment_count, 2)
+
+    def test_grade_change(self):
+        enrollment = self.enroll(self.courses[0])
+        enrollment.grade, enrollment.score = 'B', Decimal('85')
+        enrollment.save()
+        self.assertMatchesRebuild()
+        self.assertEqual(StudentAcademicSummary.objects.get(student=self.profile).gpa, Decimal('3.00'))
+
+    def test_delete(self):
+        self.enroll(self.courses[0], grade='A', score=Decimal('95'))
+        self.enroll(self.courses[1], grade='C', score=Decimal('72')).delete()
+        self.assertMatchesRebuild()
+        self.assertEqual(StudentAcademicSummary.objects.get(student=self.profile).enrollment_count, 1)
+
+    def test_credit_change(self):
+        self.enroll(self.courses[0], grade='A', score=Decimal('95'))
+        self.enroll(self.courses[1])
+        course = self.courses[0]
+        course.credits = Decimal('4.5')
+        course.save()
+        self.assertMatchesRebuild()
+        self.assertEqual(StudentAcademicSummary.objects.get(student=self.profile).total_credits, Decimal('7.5'))
+
+    def test_missing_summary_is_rebuilt_from_enrollments(self):
+        # 已有选课记录但还没有汇总（例如迁移前的数据），下一次保存不能只从这一条开始累加
+        first = self.enroll(self.courses[0], grade='A', score=Decimal('95'))
+        self.enroll(self.courses[1], grade='B', score=Decimal('85'))
+        StudentAcademicSummary.objects.filter(student=self.profile).delete()
+
+        first.grade = 'C'
+        first.save()
+        self.assertMatchesRebuild()
+        summary = StudentAcademicSummary.objects.get(student=self.profile)
+        self.assertEqual(summary.enrollment_count, 2)
+        self.assertEqual(summary.gpa, Decimal('2.50'))
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS)
+class EventStreamTests(TestCase):
+    """实时事件流：一次变更只编码一次并分发给所有订阅者，断开连接时取消订阅，WSGI 下退回轮询"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user('events_admin', password='pass', role='admin')
+        cls.teacher = User.objects.create_user('events_teacher', password='pass', role='teacher')
+
+    def test_broadcaster_fan_out_history_and_overflow(self):
+        from students.realtime import Broadcaster
+
+        async def scenario():
+            broadcaster = Broadcaster(history_size=2, max_pending=2)
+            first, second = broadcaster.subscribe(), broadcaster.subscribe()
+            event_id = broadcaster.publish('course', {'name': '数据结构'})
+            message = await first.get(1)
+            self.assertIs(await second.get(1), message)  # 同一份字节数据
+            self.assertEqual(message, f'id: {event_id}\nevent: course\ndata: {{"name": "数据结构"}}\n\n'.encode())
+            self.assertEqual(await first.get(0.01), b'')  # 超时返回心跳
+
+            first.close()
+            self.assertEqual(broadcaster.subscriber_count, 1)
+            broadcaster.publish('course', {'n': 2})
+            broadcaster.publish('course', {'n': 3})
+            # 按 Last-Event-ID 补发历史事件
+            replay = broadcaster.subscribe(last_event_id=event_id)
+            self.assertIn(b'"n": 2', await replay.get(1))
+            self.assertIn(b'"n": 3', await replay.get(1))
+
+            # 消费太慢的订阅者被断开：已排队的消息取完后返回 None
+            broadcaster.publish('course', {'n': 4})
+            await asyncio.sleep(0)
+            self.assertTrue(second.closed)
+            self.assertIsNotNone(await second.get(1))
+            self.assertIsNotNone(await second.get(1))
+            self.assertIsNone(await second.get(1))
+
+        async_to_sync(scenario)()
+
+    async def test_model_change_reaches_every_subscriber_once(self):
+        from unittest import mock
+        from asgiref.sync import sync_to_async
+        from django.test import AsyncClient
+        from students import signals
+        from students.realtime import broadcaster
+
+        url = reverse('accounts:api_event_stream')
+        responses = []
+        for _ in range(2):
+            client = AsyncClient()
+            await client.aforce_login(self.admin)
+            response = await client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response['Content-Type'], 'text/event-stream')
+            stream = aiter(response.streaming_content)
+            self.assertEqual(await anext(stream), b'retry: 3000\n\n')
+            responses.append((response, stream))
+        self.assertEqual(broadcaster.subscriber_count, 2)
+
+        def create_course():
+            with self.captureOnCommitCallbacks(execute=True):
+                Course.objects.create(name='实时课程', code='RT101', course_type='required',
+                                      credits=Decimal('2.0'), hours=32)
+
+        with mock.patch.object(signals, 'dashboard_snapshot', wraps=signals.dashboard_snapshot) as snapshot, \
+                mock.patch.object(broadcaster, 'publish', wraps=broadcaster.publish) as publish:
+            await sync_to_async(create_course)()
+        self.assertEqual((snapshot.call_count, publish.call_count), (1, 1))
+
+        messages = [await asyncio.wait_for(anext(stream), 5) for _, stream in responses]
+        self.assertIs(messages[0], messages[1])
+        self.assertIn(b'event: course', messages[0])
+        self.assertIn('实时课程'.encode(), messages[0])
+
+        # 客户端断开时 ASGIHandler 调用 response.close()，订阅随之回收
+        for response, _ in responses:
+            response.close()
+        self.assertEqual(broadcaster.subscriber_count, 0)
+
+    def test_wsgi_falls_back_to_polling(self):
+        url = reverse('accounts:api_event_stream')
+        self.client.force_login(self.admin)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.json()['fallback'], 'polling')
+        self.client.force_login(self.teacher)
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS, CHANGELOG_PAGE_SIZE=2)
+class ChangeLogTests(TestCase):
+    """变更日志：信号按序写入，/api/changes/ 按游标分页，压缩后过旧的游标要求全量刷新"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user('changelog_admin', password='pass', role='admin')
+        cls.department = Department.objects.create(name='计算机学院', code='CS')
+        cls.major = Major.objects.create(name='软件工程', code='SE', department=cls.department)
+
+    def create_course(self, code):
+        return Course.objects.create(name=f'课程{code}', code=code, course_type='required',
+                                     credits=Decimal('3.0'), hours=48)
+
+    def changes(self, user, **params):
+        request = RequestFactory().get('/', params)
+        request.user = user
+        response = views_api.api_changes(request)
+        return response.status_code, json.loads(response.content)
+
+    def head(self):
+        return self.changes(self.admin)[1]['next']
+
+    def test_signals_record_created_updated_deleted(self):
+        since = self.head()
+        course = self.create_course('C001')
+        course.name = '改名'
+        course.save()
+        course_id = course.pk
+        course.delete()
+        rows = list(ChangeLog.objects.filter(seq__gt=since).values_list('model', 'object_id', 'action'))
+        self.assertEqual(rows, [('students.course', course_id, action) for action in ('created', 'updated', 'deleted')])
+        self.assertEqual(ChangeLog.objects.filter(seq__gt=since)[1].payload['name'], '改名')
+
+    def test_cursor_paging_returns_every_change_once(self):
+        since = self.head()
+        codes = [self.create_course(f'P{i:03d}').code for i in range(5)]
+
+        seen, pages, cursor = [], 0, since
+        while True:
+            status, data = self.changes(self.admin, since=cursor)
+            self.assertEqual(status, 200)
+            self.assertLessEqual(len(data['changes']), 2)
+            self.assertFalse(data['reset'])
+            seen += data['changes']
+            pages += 1
+            cursor = data['next']
+            if not data['has_more']:
+                break
+        self.assertEqual(pages, 3)
+        self.assertEqual([change['data']['code'] for change in seen], codes)
+        self.assertEqual([change['seq'] for change in seen], sorted({change['seq'] for change in seen}))
+        self.assertEqual(cursor, self.head())
+        # 已同步到最新的客户端再次请求得到空结果，游标不变
+        self.assertEqual(self.changes(self.admin, since=cursor)[1], {'changes': [], 'next': cursor, 'has_more': False, 'reset': False})
+
+    def test_model_filter_and_student_scope(self):
+        own, other = create_students(2, self.department, self.major, prefix='changelog_student')
+        since = self.head()
+        course = self.create_course('S001')
+        for profile in (own, other):
+            Enrollment.objects.create(student=profile, course=course, major=self.major,
+                                      semester='1', academic_year='2024-2025')
+        _, data = self.changes(own.user, since=since)
+        self.assertEqual(
+            [(change['model'], change['action']) for change in data['changes']],
+            [('students.course', 'created'), ('students.enrollment', 'created')],
+        )
+        self.assertEqual(data['changes'][1]['data']['student_id'], own.pk)
+
+        _, data = self.changes(self.admin, since=since, models='students.enrollment')
+        self.assertEqual({change['model'] for change in data['changes']}, {'students.enrollment'})
+
+        teacher = User.objects.create_user('changelog_teacher', password='pass', role='teacher')
+        self.assertEqual(self.changes(teacher, since=since)[0], 403)
+        self.assertEqual(self.changes(self.admin, since='abc')[0], 400)
+
+    def test_compaction_deletes_old_rows_in_batches_and_resets_stale_cursors(self):
+        since = self.head()
+        for i in range(5):
+            self.create_course(f'K{i:03d}')
+        seqs = list(ChangeLog.objects.filter(seq__gt=since).values_list('seq', flat=True))
+        ChangeLog.objects.filter(seq__lte=seqs[2]).update(created_at=timezone.now() - timedelta(days=10))
+        expected = ChangeLog.objects.filter(seq__lte=seqs[2]).count()
+        first = ChangeLog.objects.order_by('seq').first().seq
+
+        with CaptureQueriesContext(connection) as queries:
+            deleted = ChangeLog.compact(timezone.now() - timedelta(days=7), batch_size=2)
+        self.assertEqual(deleted, expected)
+        self.assertEqual(ChangeLog.objects.order_by('seq').first().seq, seqs[3])
+        # 每批按序号范围删除 2 条
+        batches = [q['sql'] for q in queries if q['sql'].startswith('DELETE')]
+        self.assertEqual(len(batches), (seqs[2] - first) // 2 + 1)
+
+        # 游标落在已删除范围内：客户端需要全量刷新；刚好同步到保留期边界的游标可以继续
+        self.assertTrue(self.changes(self.admin, since=seqs[0])[1]['reset'])
+        _, data = self.changes(self.admin, since=seqs[2])
+        self.assertFalse(data['reset'])
+        self.assertEqual([change['seq'] for change in data['changes']], seqs[3:5])
+        self.assertEqual(ChangeLog.compact(timezone.now() - timedelta(days=7)), 0)
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS)
+class StatCounterTests(TestCase):
+    """信号维护的计数器始终等于 reconcile() 统计出的真实值"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.department = Department.objects.create(name='计算机学院', code='CS')
+        cls.major = Major.objects.create(name='软件工程', code='SE', department=cls.department)
+        StatCounter.reconcile()
+
+    def assertNoDrift(self):
+        self.assertEqual(StatCounter.reconcile(), {})
+
+    def test_create(self):
+        create_students(2, self.department, self.major, prefix='counter_student')
+        User.objects.create_user('counter_teacher', password='pass', role='teacher')
+        self.assertNoDrift()
+        stats = StatCounter.dashboard_stats()
+        self.assertEqual((stats['total_students'], stats['total_teachers'], stats['total_student_profiles']), (2, 1, 2))
+
+    def test_role_change(self):
+        user = User.objects.create_user('counter_user', password='pass', role='student')
+        user.role = 'teacher'
+        user.save()
+        self.assertNoDrift()
+        self.assertEqual(StatCounter.dashboard_stats()['total_students'], 0)
+
+    def test_profile_change(self):
+        profile = create_students(1, self.department, self.major, prefix='counter_student')[0]
+        other = Major.objects.create(name='网络工程', code='NE', department=self.department)
+        profile.major = other
+        profile.enrollment_status = 'suspended'
+        profile.save()
+        self.assertNoDrift()
+
+    def test_delete(self):
+        profiles = create_students(2, self.department, self.major, prefix='counter_student')
+        profiles[0].user.delete()
+        profiles[1].delete()
+        Major.objects.filter(pk=self.major.pk).delete()
+        self.assertNoDrift()
+        self.assertEqual(StatCounter.dashboard_stats()['pending_profiles'], 1)
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS)
+class StudentImportTests(TestCase):
+    """批量导入：分批写入并补齐信号派生的数据，逐行报告校验错误，仅校验时不写入"""
+
+    HEADER = '学号,真实姓名,性别,身份证号,所属院系,专业,密码\n'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user('import_admin', password='pass', role='admin')
+        cls.department = Department.objects.create(name='计算机学院', code='CS')
+        cls.major = Major.objects.create(name='软件工程', code='SE', department=cls.department)
+        StatCounter.reconcile()
+
+    def csv_file(self, *rows):
+        from io import BytesIO
+        return BytesIO((self.HEADER + ''.join(f'{row}\n' for row in rows)).encode('utf-8-sig'))
+
+    def run_import(self, *rows, **options):
+        from .importers import StudentImporter, read_rows
+
+        options.setdefault('workers', 1)
+        file = self.csv_file(*rows)
+        file.name = 'students.csv'
+        return StudentImporter(**options).run(read_rows(file))
+
+    def test_imports_in_batches_and_updates_derived_data(self):
+        from .search import search_profile_ids
+
+        rows = [f'2024{i:04d},导入学生{i},男,,CS,软件工程,' for i in range(5)]
+        rows[0] = '20240000,导入学生0,女,11010120000101001X,计算机学院,SE,secret'
+        changes_before = ChangeLog.objects.count()
+        batches = []
+
+        with CaptureQueriesContext(connection) as queries:
+            result = self.run_import(*rows, batch_size=2, workers=2, progress=lambda r: batches.append(r.created))
+        self.assertEqual((result.total, result.created, result.errors), (5, 5, []))
+        self.assertEqual(batches, [2, 4, 5])
+        user_inserts = [q for q in queries if q['sql'].startswith('INSERT INTO "accounts_user"')]
+        self.assertEqual(len(user_inserts), 3)
+
+        profile = StudentProfile.objects.select_related('user').get(student_id='20240000')
+        self.assertEqual((profile.gender, profile.department, profile.major), ('F', self.department, self.major))
+        self.assertEqual((profile.user.username, profile.user.role), ('20240000', 'student'))
+        self.assertTrue(profile.user.check_password('secret'))
+        self.assertTrue(User.objects.get(username='20240001').check_password('123456'))
+        # 跳过的信号由导入器补齐
+        self.assertEqual(StatCounter.reconcile(), {})
+        self.assertEqual(ChangeLog.objects.count() - changes_before, 10)
+        self.assertEqual(search_profile_ids('导入学生3'), [StudentProfile.objects.get(student_id='20240003').pk])
+
+    def test_validation_errors_are_reported_per_row(self):
+        create_students(1, self.department, self.major, prefix='import_existing')
+        existing = StudentProfile.objects.get().student_id
+        result = self.run_import(
+            '20240100,正常学生,男,110101200001010011,CS,SE,',
+            '20240101,,男,,CS,SE,',                           # 缺少姓名
+            '20240102,院系错误,男,,XX,SE,',                   # 院系不存在
+            '20240100,重复学号,男,,CS,SE,',                   # 文件内学号重复
+            f'{existing},已有学号,男,,CS,SE,',                # 数据库中已有学号
+            '20240105,重复身份证,女,110101200001010011,CS,SE,',  # 文件内身份证号重复
+            batch_size=3,
+        )
+        self.assertEqual(result.created, 1)
+        errors = dict(result.errors)
+        self.assertEqual(sorted(errors), [3, 4, 5, 6, 7])
+        self.assertIn('真实姓名', errors[3])
+        self.assertIn('院系“XX”不存在', errors[4])
+        self.assertIn('学号 20240100 已存在', errors[5])
+        self.assertIn(f'学号 {existing} 已存在', errors[6])
+        self.assertIn('身份证号', errors[7])
+        self.assertTrue(StudentProfile.objects.filter(student_id='20240100', real_name='正常学生').exists())
+
+    def test_dry_run_validates_without_writing(self):
+        users, profiles, changes = User.objects.count(), StudentProfile.objects.count(), ChangeLog.objects.count()
+        result = self.run_import('20240200,校验学生,男,,CS,SE,', '20240201,,男,,CS,SE,', dry_run=True)
+        self.assertEqual((result.created, [row for row, _ in result.errors]), (1, [3]))
+        self.assertEqual((User.objects.count(), StudentProfile.objects.count(), ChangeLog.objects.count()),
+                         (users, profiles, changes))
+
+    def test_command_and_upload_view(self):
+        import tempfile
+        from io import StringIO
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        from django.core.management import call_command
+
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', encoding='utf-8-sig', delete=False) as file:
+            file.write(self.HEADER + '20240300,命令学生,男,,CS,SE,\n20240301,,男,,CS,SE,\n')
+        self.addCleanup(os.remove, file.name)
+        out = StringIO()
+        call_command('import_students', file.name, '--workers', '1', '--dry-run', stdout=out)
+        self.assertIn('第 3 行', out.getvalue())
+        self.assertIn('[仅校验]', out.getvalue())
+        self.assertFalse(StudentProfile.objects.filter(student_id='20240300').exists())
+
+        self.client.force_login(self.admin)
+        upload = SimpleUploadedFile('students.csv', (self.HEADER + '20240302,上传学生,女,,CS,SE,\n').encode())
+        from unittest import mock
+        with mock.patch('students.importers.ProcessPoolExecutor') as pool:
+            response = self.client.post(reverse('students:student_import'), {'file': upload})
+        pool.assert_not_called()  # 上传页面在请求中直接哈希，不启动进程池
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['result'].created, 1)
+        self.assertTrue(StudentProfile.objects.filter(student_id='20240302', user__username='20240302').exists())
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS)
+class ExportTests(TestCase):
+    """导出：CSV 流式输出带 BOM 和表头，复用列表页筛选，查询次数与行数无关"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user('export_admin', password='pass', role='admin')
+        cls.department = Department.objects.create(name='计算机学院', code='CS')
+        cls.other_department = Department.objects.create(name='数学学院', code='MA')
+        cls.major = Major.objects.create(name='软件工程', code='SE', department=cls.department)
+        cls.course = Course.objects.create(name='数据结构', code='CS201', course_type='required',
+                                           credits=Decimal('3.0'), hours=48)
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def add_students(self, count, department=None, offset=0):
+        profiles = create_students(count, department or self.department, self.major, prefix=f'export{offset}_')
+        for profile in profiles:
+            Enrollment.objects.create(student=profile, course=self.course, major=self.major,
+                                      semester='1', academic_year='2024-2025', grade='A', score=Decimal('92'))
+        return profiles
+
+    def export(self, name, params=None):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse(f'students:{name}'), params or {})
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(response.streaming)
+            content = b''.join(response.streaming_content).decode('utf-8')
+        return content, len(queries)
+
+    def test_student_export_streams_filtered_rows(self):
+        from .exports import STUDENT_PROFILE_COLUMNS
+
+        self.add_students(3)
+        self.add_students(2, department=self.other_department, offset=1)
+        content, _ = self.export('student_profile_export', {'department': self.department.id})
+        self.assertTrue(content.startswith('\ufeff学号,真实姓名,用户名,'))
+        lines = content.lstrip('\ufeff').splitlines()
+        self.assertEqual(lines[0].split(','), [header for header, _ in STUDENT_PROFILE_COLUMNS])
+        # 管理员自身也有档案但不属于该院系，只剩 3 名学生
+        self.assertEqual(len(lines), 4)
+        self.assertTrue(all(',计算机学院,' in line for line in lines[1:]))
+        self.assertIn(',男,', lines[1])  # 选项字段输出显示文字
+
+    def test_enrollment_export_streams_filtered_rows(self):
+        from .exports import ENROLLMENT_COLUMNS
+
+        profiles = self.add_students(3)
+        content, _ = self.export('enrollment_export', {'student': profiles[0].id})
+        lines = content.lstrip('\ufeff').splitlines()
+        self.assertTrue(content.startswith('\ufeff学号,'))
+        self.assertEqual(lines[0].split(','), [header for header, _ in ENROLLMENT_COLUMNS])
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(lines[1].startswith(f'{profiles[0].student_id},'))
+        self.assertIn(',CS201,数据结构,', lines[1])
+
+    def test_export_query_count_is_constant(self):
+        self.add_students(2)
+        small = [self.export(name)[1] for name in ('student_profile_export', 'enrollment_export')]
+        self.add_students(30, offset=1)
+        large = [self.export(name)[1] for name in ('student_profile_export', 'enrollment_export')]
+        self.assertEqual(small, large)
+
+    def test_command(self):
+        import tempfile
+        from io import StringIO
+        from django.core.management import call_command
+        from django.core.management.base import CommandError
+
+        profiles = self.add_students(2)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'transcripts.csv')
+            err = StringIO()
+            call_command('export_students', '--transcripts', '--output', path,
+                         '--student', str(profiles[1].id), '--chunk-size', '1', stderr=err)
+            with open(path, encoding='utf-8') as file:
+                lines = file.read().splitlines()
+        self.assertIn('成功导出 1 行', err.getvalue())
+        self.assertTrue(lines[0].startswith('\ufeff学号,'))
+        self.assertEqual([line.split(',')[0] for line in lines[1:]], [profiles[1].student_id])
+
+        with self.assertRaisesMessage(CommandError, '--output'):
+            call_command('export_students', '--format', 'xlsx')
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS)
+class StudentSearchTests(TestCase):
+    """全文检索索引随档案和用户名的修改同步，联想搜索接口限制返回条数"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user('search_admin', password='pass', role='admin')
+        cls.profiles = []
+        for i, (name, phone) in enumerate([('张三丰', '13800001234'), ('张无忌', '13900005678'), ('李寻欢', '13700009999')]):
+            user = User.objects.create_user(f'search_user{i}', password='pass', role='student')
+            profile = StudentProfile.objects.get(user=user)
+            profile.student_id = f'2024{i:04d}'
+            profile.real_name = name
+            profile.phone = phone
+            profile.save()
+            cls.profiles.append(profile)
+
+    def search(self, query, limit=10):
+        from .search import search_profile_ids
+        return search_profile_ids(query, limit)
+
+    def test_sqlite_backend_matches_each_column(self):
+        zhang, wuji, li = self.profiles
+        self.assertEqual(self.search('20240002'), [li.id])
+        self.assertEqual(sorted(self.search('张')), sorted([zhang.id, wuji.id]))
+        self.assertEqual(self.search('无忌'), [wuji.id])
+        self.assertEqual(self.search('search_user2'), [li.id])
+        self.assertEqual(self.search('5678'), [wuji.id])
+        self.assertEqual(self.search('张 1234'), [zhang.id])
+        self.assertEqual(self.search(''), [])
+
+    def test_fallback_backend(self):
+        from .search import FallbackSearchBackend
+
+        backend = FallbackSearchBackend()
+        self.assertEqual(sorted(backend.search('张')), sorted([self.profiles[0].id, self.profiles[1].id]))
+        self.assertEqual(sorted(backend.search('2024000')), sorted(profile.id for profile in self.profiles))
+        self.assertEqual(len(backend.search('2024000', limit=2)), 2)
+        self.assertEqual(backend.search('9999'), [self.profiles[2].id])
+
+    def test_migration_backfills_existing_profiles(self):
+        import importlib
+        from .search import get_backend
+        from .queries import filter_student_profiles
+
+        # 迁移前就存在的档案不在索引中
+        get_backend().clear()
+        self.assertEqual(self.search('李寻欢'), [])
+        migration = importlib.import_module('students.migrations.0019_backfill_search_index')
+        migration.backfill_search_index(None, None)
+        self.assertEqual(self.search('李寻欢'), [self.profiles[2].id])
+        self.assertEqual(list(filter_student_profiles(StudentProfile.objects.all(), {'search': '无忌'})),
+                         [self.profiles[1]])
+
+    def test_profile_edit_reindexes(self):
+        profile = self.profiles[2]
+        profile.real_name = '王五'
+        profile.save()
+        self.assertEqual(self.search('王五'), [profile.id])
+        self.assertEqual(self.search('寻欢'), [])
+
+    def test_username_change_reindexes(self):
+        user = self.profiles[0].user
+        user.username = 'renamed_user'
+        user.save()
+        self.assertEqual(self.search('renamed'), [self.profiles[0].id])
+        self.assertEqual(self.search('search_user0'), [])
+
+    def test_delete_removes_from_index(self):
+        profile = self.profiles[1]
+        profile.delete()
+        self.assertEqual(self.search('无忌'), [])
+
+    def test_limit_is_bounded(self):
+        self.client.force_login(self.admin)
+        url = reverse('students:api_student_search')
+        for limit, expected in [('-1', 1), ('0', 1), ('2', 2), ('abc', 3), ('1000', 3)]:
+            with self.subTest(limit=limit):
+                response = self.client.get(url, {'q': '2024', 'limit': limit})
+                self.assertEqual(response.json()['count'], expected)
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS)
+class KeysetPaginationTests(TestCase):
+    """键集分页：前后翻页不重不漏，created_at 相同时按 id 定序，无效游标回到第一页"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user('page_admin', password='pass', role='admin')
+        cls.department = Department.objects.create(name='计算机学院', code='CS')
+        cls.major = Major.objects.create(name='软件工程', code='SE', department=cls.department)
+        # 学生列表每页 20 条，用户列表每页 10 条，都要翻过多页
+        profiles = create_students(23, cls.department, cls.major, prefix='page_student')
+        # 一半记录的创建时间完全相同，只能靠 id 区分先后
+        tied = timezone.now() - timedelta(days=1)
+        tied_ids = [profile.pk for profile in profiles[5:17]]
+        StudentProfile.objects.filter(pk__in=tied_ids).update(created_at=tied)
+        User.objects.filter(studentprofile__pk__in=tied_ids).update(created_at=tied)
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def paginator(self, per_page=4):
+        from .pagination import KeysetPaginator
+        return KeysetPaginator(StudentProfile.objects.all(), per_page)
+
+    def expected_ids(self):
+        return list(StudentProfile.objects.order_by('-created_at', 'id').values_list('id', flat=True))
+
+    def walk(self, fetch):
+        """从第一页沿 next_cursor 翻到末页，返回每页的 id 列表"""
+        pages = []
+        cursor = None
+        while True:
+            ids, cursor = fetch(cursor)
+            pages.append(ids)
+            if cursor is None:
+                return pages
+
+    def test_forward_and_backward_cursors(self):
+        paginator = self.paginator()
+        pages = []
+        page = paginator.page(None)
+        self.assertFalse(page.has_previous())
+        self.assertIsNone(page.previous_cursor)
+        while True:
+            pages.append([profile.pk for profile in page])
+            if not page.has_next():
+                break
+            page = paginator.page(page.next_cursor)
+
+        expected = self.expected_ids()
+        self.assertEqual(sum(pages, []), expected)
+        self.assertEqual([len(ids) for ids in pages], [4, 4, 4, 4, 4, 3])
+        # 末页没有下一页
+        self.assertIsNone(page.next_cursor)
+        self.assertTrue(page.has_previous())
+
+        # 从末页沿 previous_cursor 往回翻，得到相同的页
+        backward = []
+        while True:
+            backward.insert(0, [profile.pk for profile in page])
+            if not page.has_previous():
+                break
+            page = paginator.page(page.previous_cursor)
+            self.assertTrue(page.has_next())
+        self.assertEqual(backward, pages)
+
+    def test_last_cursor_returns_last_page(self):
+        paginator = self.paginator()
+        last = paginator.page(paginator.page(None).last_cursor)
+        self.assertEqual([profile.pk for profile in last], self.expected_ids()[-4:])
+        self.assertFalse(last.has_next())
+        self.assertTrue(last.has_previous())
+
+    def test_equal_created_at_breaks_ties_by_id(self):
+        from .pagination import KeysetPaginator
+
+        StudentProfile.objects.update(created_at=timezone.now())
+        paginator = KeysetPaginator(StudentProfile.objects.values('id', 'created_at'), 2)
+
+        def fetch(cursor):
+            page = paginator.page(cursor)
+            return [row['id'] for row in page], page.next_cursor
+
+        pages = self.walk(fetch)
+        self.assertEqual(sum(pages, []), sorted(StudentProfile.objects.values_list('id', flat=True)))
+
+    def test_invalid_cursor_falls_back_to_first_page(self):
+        from .pagination import InvalidCursor, encode_cursor, get_page
+
+        paginator = self.paginator()
+        first = [profile.pk for profile in paginator.page(None)]
+        tampered = [
+            'not-a-cursor!',
+            encode_cursor(['2024-01-01T00:00:00'], 'n'),          # 字段个数不符
+            encode_cursor(['yesterday', 1], 'n'),                  # 值无法解析
+            encode_cursor(['2024-01-01T00:00:00', 1], 'x'),       # 未知方向
+        ]
+        for cursor in tampered:
+            with self.subTest(cursor=cursor):
+                with self.assertRaises(InvalidCursor):
+                    paginator.page(cursor)
+                self.assertEqual([profile.pk for profile in get_page(paginator, cursor)], first)
+
+        response = self.client.get(reverse('students:student_profile_list'), {'cursor': tampered[0]})
+        self.assertEqual([profile.pk for profile in response.context['page_obj']], self.expected_ids()[:20])
+        response = self.client.get(reverse('accounts:api_users'), {'cursor': tampered[0]})
+        self.assertEqual(response.status_code, 400)
+
+    def test_list_views_cover_every_row_once(self):
+        def html_page(url, key):
+            def fetch(cursor):
+                page = self.client.get(url, {'cursor': cursor} if cursor else {}).context[key]
+                return [obj.pk for obj in page], page.next_cursor
+            return fetch
+
+        def api_users(cursor):
+            params = {'limit': 4, **({'cursor': cursor} if cursor else {})}
+            data = self.client.get(reverse('accounts:api_users'), params).json()
+            return [user['id'] for user in data['results']], data['next_cursor']
+
+        user_ids = list(User.objects.order_by('-created_at', 'id').values_list('id', flat=True))
+        for name, fetch, expected in (
+            ('user_list', html_page(reverse('accounts:user_list'), 'users'), user_ids),
+            ('student_profile_list', html_page(reverse('students:student_profile_list'), 'page_obj'),
+             self.expected_ids()),
+            ('api_users', api_users, user_ids),
+        ):
+            with self.subTest(name):
+                pages = self.walk(fetch)
+                self.assertGreater(len(pages), 1)
+                self.assertEqual(sum(pages, []), expected)
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS)
+class ListQueryBudgetTests(TestCase):
+    """列表页的查询次数必须固定，不能随记录数增长（N+1）"""
+
+    # 会话、当前用户、数据查询、筛选下拉选项等，与每页行数无关
+    LIST_QUERY_BUDGET = 10
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user('budget_admin', password='pass', role='admin')
+        cls.department = Department.objects.create(name='计算机学院', code='CS')
+        cls.major = Major.objects.create(name='软件工程', code='SE', department=cls.department)
+        cls.courses = [
+            Course.objects.create(name=f'课程{i}', code=f'C{i:03d}', course_type='required',
+                                  credits=Decimal('2.0'), hours=32)
+            for i in range(3)
+        ]
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def add_enrollments(self, count, offset=0):
+        for i in range(offset, offset + count):
+            user = User.objects.create_user(f'budget_student{i}', password='pass', role='student')
+            profile = StudentProfile.objects.get(user=user)
+            profile.department = self.department
+            profile.major = self.major
+            profile.save()
+            for course in self.courses:
+                Enrollment.objects.create(
+                    student=profile, course=course, major=self.major,
+                    semester='1', academic_year='2024-2025',
+                    grade='A' if i % 2 else None, score=Decimal('95') if i % 2 else None,
+                )
+
+    def count_queries(self, url, params=None):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url, params or {})
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries)
+
+    def assert_constant_budget(self, url, params=None):
+        self.add_enrollments(2)
+        # 预热参考数据快照，只比较稳定状态下的查询次数
+        self.count_queries(url, params)
+        small = self.count_queries(url, params)
+        self.add_enrollments(20, offset=2)
+        large = self.count_queries(url, params)
+        self.assertEqual(small, large, f'{url} 的查询次数随数据量增长：{small} -> {large}')
+        self.assertLessEqual(large, self.LIST_QUERY_BUDGET)
+
+    def test_enrollment_list_budget(self):
+        self.assert_constant_budget(reverse('students:enrollment_list'))
+
+    def test_enrollment_grade_list_budget(self):
+        self.assert_constant_budget(reverse('students:enrollment_grade_list'),
+                                    {'department': self.department.id, 'grade_status': 'graded'})
+
+    def test_course_list_budget(self):
+        self.assert_constant_budget(reverse('students:course_list'))
+
+    def test_major_list_budget(self):
+        for i in range(5):
+            Major.objects.create(name=f'专业{i}', code=f'M{i}', department=self.department)
+        self.assert_constant_budget(reverse('students:major_list'))
+
+    def test_enrollment_filters(self):
+        self.add_enrollments(4)
+        url = reverse('students:enrollment_grade_list')
+        response = self.client.get(url, {'course': self.courses[0].id, 'grade_status': 'ungraded'})
+        self.assertEqual(len(response.context['enrollments']), 2)
+        response = self.client.get(url, {'academic_year': '2023-2024'})
+        self.assertEqual(len(response.context['enrollments']), 0)
+
+    def test_enrollment_list_pages_cover_all_rows(self):
+        self.add_enrollments(20)
+        url = reverse('students:enrollment_list')
+        seen = []
+        params = {}
+        while True:
+            page = self.client.get(url, params).context['page_obj']
+            seen.extend(enrollment.id for enrollment in page)
+            if not page.has_next():
+                break
+            params = {'cursor': page.next_cursor}
+        self.assertEqual(sorted(seen), sorted(Enrollment.objects.values_list('id', flat=True)))
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS)
+class GradeSheetTests(TestCase):
+    """成绩单整批保存只写入真正修改的行"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user('sheet_admin', password='pass', role='admin')
+        department = Department.objects.create(name='计算机学院', code='CS')
+        major = Major.objects.create(name='软件工程', code='SE', department=department)
+        cls.course = Course.objects.create(name='编译原理', code='CP101', course_type='required',
+                                           credits=Decimal('3.0'), hours=48)
+        students = create_students(3, department, major, prefix='sheet_student')
+        cls.letter_only, cls.scored, cls.edited = [
+            Enrollment.objects.create(student=student, course=cls.course, major=major,
+                                      semester='1', academic_year='2024-2025', **grade)
+            for student, grade in zip(students, [
+                {'grade': 'B'},
+                {'grade': 'A', 'score': Decimal('92')},
+                {},
+            ])
+        ]
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def post_sheet(self, values):
+        """模拟提交名单表单：每行都带上渲染时的分数"""
+        data = {}
+        for enrollment, value in values.items():
+            data[f'score_{enrollment.pk}'] = value
+            data[f'original_{enrollment.pk}'] = '' if enrollment.score is None else str(enrollment.score)
+        return self.client.post(reverse('students:grade_sheet', args=[self.course.pk]), data)
+
+    def test_untouched_rows_keep_their_grades(self):
+        response = self.post_sheet({
+            self.letter_only: '',
+            self.scored: '92.00',
+            self.edited: '75',
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['result'].updated, 1)
+
+        self.letter_only.refresh_from_db()
+        self.assertEqual((self.letter_only.grade, self.letter_only.score), ('B', None))
+        self.scored.refresh_from_db()
+        self.assertEqual((self.scored.grade, self.scored.score), ('A', Decimal('92')))
+        self.edited.refresh_from_db()
+        self.assertEqual(self.edited.score, Decimal('75'))
+        self.assertEqual(self.edited.grade, Enrollment.grade_for_score(Decimal('75')))
+
+    def test_blank_without_original_keeps_letter_grade(self):
+        from .grading import GradeSheet
+
+        result = GradeSheet(self.course).apply({self.letter_only.pk: ''})
+        self.assertEqual((result.updated, result.unchanged), (0, 1))
+        self.letter_only.refresh_from_db()
+        self.assertEqual(self.letter_only.grade, 'B')
+
+    def test_clearing_a_score_clears_the_grade(self):
+        self.post_sheet({self.scored: ''})
+        self.scored.refresh_from_db()
+        self.assertEqual((self.scored.grade, self.scored.score), (None, None))
+
+
+def create_students(count, department, major, prefix='seat_student'):
+    profiles = []
+    for i in range(count):
+        user = User.objects.create_user(f'{prefix}{i}', password='pass', role='student')
+        profile = StudentProfile.objects.get(user=user)
+        profile.department = department
+        profile.major = major
+        profile.save()
+        profiles.append(profile)
+    return profiles
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS)
+class CourseSeatTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.department = Department.objects.create(name='计算机学院', code='CS')
+        cls.major = Major.objects.create(name='软件工程', code='SE', department=cls.department)
+        cls.course = Course.objects.create(name='数据库', code='DB101', course_type='required',
+                                           credits=Decimal('3.0'), hours=48, capacity=2, waitlist_enabled=True)
+        cls.students = create_students(4, cls.department, cls.major)
+
+    def enroll(self, student):
+        return seats.enroll(student, self.course, '秋季学期', '2024-2025')
+
+    def test_enroll_until_full_then_waitlist(self):
+        self.assertEqual(self.enroll(self.students[0])[0], seats.ENROLLED)
+        self.assertEqual(self.enroll(self.students[1])[0], seats.ENROLLED)
+        status, entry = self.enroll(self.students[2])
+        self.assertEqual(status, seats.WAITLISTED)
+        self.assertEqual(entry.position, 1)
+        self.assertEqual(self.enroll(self.students[3])[1].position, 2)
+        self.course.refresh_from_db()
+        self.assertEqual(self.course.enrolled_count, 2)
+
+    def test_duplicate_submissions_are_rejected(self):
+        self.enroll(self.students[0])
+        with self.assertRaises(seats.AlreadyEnrolled):
+            self.enroll(self.students[0])
+        self.enroll(self.students[1])
+        self.enroll(self.students[2])
+        with self.assertRaises(seats.AlreadyWaitlisted):
+            self.enroll(self.students[2])
+        self.course.refresh_from_db()
+        self.assertEqual(self.course.enrolled_count, 2)
+
+    def test_full_course_without_waitlist(self):
+        Course.objects.filter(pk=self.course.pk).update(waitlist_enabled=False)
+        self.course.refresh_from_db()
+        self.enroll(self.students[0])
+        self.enroll(self.students[1])
+        with self.assertRaises(seats.CourseFull):
+            self.enroll(self.students[2])
+
+    def test_freed_seat_promotes_waitlist_in_order(self):
+        for student in self.students:
+            self.enroll(student)
+        with self.captureOnCommitCallbacks(execute=True):
+            Enrollment.objects.get(student=self.students[0], course=self.course).delete()
+        self.assertTrue(Enrollment.objects.filter(student=self.students[2], course=self.course).exists())
+        self.assertFalse(Enrollment.objects.filter(student=self.students[3], course=self.course).exists())
+        self.assertEqual(list(CourseWaitlist.objects.values_list('student_id', flat=True)), [self.students[3].id])
+        self.course.refresh_from_db()
+        self.assertEqual(self.course.enrolled_count, 2)
+
+    def test_release_without_promotion_keeps_waitlist(self):
+        for student in self.students:
+            self.enroll(student)
+        enrollment = Enrollment.objects.get(student=self.students[0], course=self.course)
+        enrollment._seat_skip_promotion = True
+        with self.captureOnCommitCallbacks(execute=True):
+            enrollment.delete()
+        self.assertEqual(CourseWaitlist.objects.filter(course=self.course).count(), 2)
+        self.course.refresh_from_db()
+        self.assertEqual(self.course.enrolled_count, 1)
+
+    def test_capacity_increase_promotes_waitlist(self):
+        for student in self.students:
+            self.enroll(student)
+        course = Course.objects.get(pk=self.course.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            course.capacity = 3
+            course.save()
+        self.assertTrue(Enrollment.objects.filter(student=self.students[2], course=self.course).exists())
+        self.assertEqual(list(CourseWaitlist.objects.values_list('student_id', flat=True)), [self.students[3].id])
+
+        # 缩容或只修改其他字段不触发补选
+        from unittest import mock
+        for capacity in (3, 2):
+            with mock.patch.object(seats, 'promote_waitlist') as promote:
+                with self.captureOnCommitCallbacks(execute=True):
+                    course.capacity = capacity
+                    course.save()
+            promote.assert_not_called()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            course.capacity = None
+            course.save()
+        self.assertFalse(CourseWaitlist.objects.exists())
+        self.course.refresh_from_db()
+        self.assertEqual(self.course.enrolled_count, 4)
+
+    def test_saving_course_keeps_enrolled_count(self):
+        stale = Course.objects.get(pk=self.course.pk)
+        self.enroll(self.students[0])
+        stale.name = '数据库原理'
+        stale.save()
+        self.course.refresh_from_db()
+        self.assertEqual(self.course.enrolled_count, 1)
+
+    def test_admin_created_enrollment_is_counted(self):
+        Enrollment.objects.create(student=self.students[0], course=self.course, major=self.major,
+                                  semester='秋季学期', academic_year='2024-2025')
+        self.course.refresh_from_db()
+        self.assertEqual(self.course.enrolled_count, 1)
+        self.assertEqual(seats.recount_enrolled(), 0)
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS)
+class CourseSeatConcurrencyTests(TransactionTestCase):
+    """大量学生同时提交选课，不能超出课程容量，也不能重复选课"""
+
+    CAPACITY = 10
+    SUBMITTERS = 40
+
+    def setUp(self):
+        self.department = Department.objects.create(name='计算机学院', code='CS')
+        self.major = Major.objects.create(name='软件工程', code='SE', department=self.department)
+        self.course = Course.objects.create(name='算法', code='ALG101', course_type='required',
+                                            credits=Decimal('3.0'), hours=48,
+                                            capacity=self.CAPACITY, waitlist_enabled=True)
+        self.students = create_students(self.SUBMITTERS, self.department, self.major)
+
+    def submit_concurrently(self, submissions):
+        barrier = threading.Barrier(len(submissions))
+        outcomes = []
+        lock = threading.Lock()
+
+        def submit(student):
+            barrier.wait()
+            try:
+                # SQLite 写锁冲突时像浏览器重新提交一样重试；其他数据库不会进入这个分支
+                for attempt in range(50):
+                    try:
+                        status = seats.enroll(student, self.course, '秋季学期', '2024-2025')[0]
+                        break
+                    except OperationalError:
+                        time.sleep(0.01 * (attempt + 1))
+                else:
+                    status = 'locked'
+            except seats.EnrollmentError as e:
+                status = type(e).__name__
+            finally:
+                connection.close()
+            with lock:
+                outcomes.append(status)
+
+        threads = [threading.Thread(target=submit, args=(student,)) for student in submissions]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return outcomes
+
+    def test_no_overbooking_under_concurrent_submissions(self):
+        # 每个学生提交两次，模拟重复点击
+        outcomes = self.submit_concurrently(self.students + self.students)
+
+        self.course.refresh_from_db()
+        enrolled = Enrollment.objects.filter(course=self.course)
+        waitlisted = CourseWaitlist.objects.filter(course=self.course)
+        self.assertNotIn('locked', outcomes)
+        self.assertEqual(enrolled.count(), self.CAPACITY)
+        self.assertEqual(self.course.enrolled_count, self.CAPACITY)
+        self.assertEqual(outcomes.count(seats.ENROLLED), self.CAPACITY)
+        self.assertEqual(waitlisted.count(), self.SUBMITTERS - self.CAPACITY)
+        # 每个学生要么选上、要么在候补队列中，且只出现一次
+        student_ids = list(enrolled.values_list('student_id', flat=True)) + list(waitlisted.values_list('student_id', flat=True))
+        self.assertEqual(sorted(student_ids), sorted(student.id for student in self.students))
+
+        # 退课后按候补顺序补选
+        first_waiting = list(waitlisted.values_list('student_id', flat=True)[:3])
+        for enrollment in list(enrolled[:3]):
+            enrollment.delete()
+        self.course.refresh_from_db()
+        self.assertEqual(self.course.enrolled_count, self.CAPACITY)
+        self.assertEqual(Enrollment.objects.filter(course=self.course).count(), self.CAPACITY)
+        self.assertTrue(set(first_waiting) <= set(Enrollment.objects.filter(course=self.course).values_list('student_id', flat=True)))
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS)
+class CourseCatalogTests(TestCase):
+    """可选课程目录：按学期/年级缓存，课程修改后版本号失效，每个学生只查询一次已选课程"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.department = Department.objects.create(name='计算机学院', code='CS')
+        cls.major = Major.objects.create(name='软件工程', code='SE', department=cls.department)
+        cls.courses = {
+            code: Course.objects.create(name=name, code=code, course_type=course_type, credits=Decimal('3.0'),
+                                        hours=48, semester=semester, academic_year=year)
+            for code, name, course_type, semester, year in [
+                ('C1', '程序设计', 'required', '1', '2024-2025'),
+                ('C2', '离散数学', 'required', '1', '2024-2025'),
+                ('C3', '数据结构', 'required', '3', '2024-2025'),
+                ('C4', '艺术欣赏', 'elective', '4', '2025-2026'),
+            ]
+        }
+        cls.student = create_students(1, cls.department, cls.major, prefix='catalog_student')[0]
+
+    def setUp(self):
+        cache.clear()
+
+    def codes(self, courses):
+        return [course.code for course in courses]
+
+    def ordered(self, *codes):
+        """目录的排序：课程类型、名称"""
+        return sorted(codes, key=lambda code: (self.courses[code].course_type, self.courses[code].name))
+
+    def test_catalog_scopes_and_cache(self):
+        from .catalog import get_catalog
+
+        self.assertEqual(self.codes(get_catalog('2024-2025', '1')), self.ordered('C1', 'C2'))
+        self.assertEqual(self.codes(get_catalog(grade_level='2')), self.ordered('C3', 'C4'))
+        self.assertEqual(self.codes(get_catalog()), self.ordered('C1', 'C2', 'C3', 'C4'))
+        with self.assertNumQueries(0):
+            get_catalog('2024-2025', '1')
+            get_catalog(grade_level='2')
+            get_catalog()
+
+    def test_available_courses_uses_one_query_per_student(self):
+        from .catalog import available_courses_for, catalog_scope
+
+        student = self.student
+        student.current_semester, student.current_academic_year = '1', '2024-2025'
+        self.assertEqual(catalog_scope(student), ('2024-2025', '1', None))
+        Enrollment.objects.create(student=student, course=self.courses['C1'], major=self.major,
+                                  semester='1', academic_year='2024-2025')
+        available_courses_for(student)
+        with self.assertNumQueries(1):
+            self.assertEqual(self.codes(available_courses_for(student)), ['C2'])
+
+        student.current_semester = None
+        student.grade_level = '2'
+        self.assertEqual(catalog_scope(student), (None, None, '2'))
+        self.assertEqual(self.codes(available_courses_for(student)), self.ordered('C3', 'C4'))
+
+    def test_course_changes_invalidate_catalog(self):
+        from .catalog import catalog_version, get_catalog
+
+        get_catalog()
+        version = catalog_version()
+        with self.captureOnCommitCallbacks(execute=True):
+            course = Course.objects.create(name='操作系统', code='C5', course_type='required',
+                                           credits=Decimal('3.0'), hours=48)
+        self.assertGreater(catalog_version(), version)
+        self.assertIn('C5', self.codes(get_catalog()))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            course.name = '编译原理'
+            course.save()
+        self.assertIn('编译原理', [c.name for c in get_catalog()])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            course.delete()
+        self.assertNotIn('C5', self.codes(get_catalog()))
+
+    def test_selection_page_and_admin_form_use_catalog(self):
+        from .forms import AdminEnrollmentForm
+
+        enrollment = Enrollment.objects.create(student=self.student, course=self.courses['C2'], major=self.major,
+                                               semester='1', academic_year='2024-2025')
+        self.client.force_login(self.student.user)
+        response = self.client.get(reverse('students:course_selection'))
+        self.assertEqual(self.codes(response.context['available_courses']), self.ordered('C1', 'C3', 'C4'))
+
+        form = AdminEnrollmentForm(data={'student': self.student.pk})
+        self.assertNotIn(self.courses['C2'].pk, [pk for pk, _ in form.fields['course'].choices if pk])
+        # 编辑已有选课记录时保留当前课程
+        form = AdminEnrollmentForm(instance=enrollment)
+        self.assertIn(self.courses['C2'].pk, [pk for pk, _ in form.fields['course'].choices if pk])
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS)
+class ReferenceDataTests(TestCase):
+    """参考数据快照：同一版本内不查数据库，院系、专业、课程修改后所有进程在下一次读取时重新加载"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.department = Department.objects.create(name='计算机学院', code='CS')
+        cls.major = Major.objects.create(name='软件工程', code='SE', department=cls.department)
+        cls.course = Course.objects.create(name='数据结构', code='CS101', course_type='required',
+                                           credits=Decimal('3.0'), hours=48)
+
+    def setUp(self):
+        from . import reference
+
+        self.reference = reference
+        cache.clear()
+        reference._snapshot = None
+
+    def test_snapshot_reused_within_version(self):
+        from .forms import AdminEnrollmentForm, EnrollmentForm, StudentProfileForm
+
+        snapshot = self.reference.get_reference_data()
+        self.assertEqual(snapshot.major_choices, [(self.major.pk, str(self.major))])
+        self.assertEqual(snapshot.department_choices, [(self.department.pk, '计算机学院')])
+        self.assertEqual(snapshot.course_choices, [(self.course.pk, str(self.course))])
+        with self.assertNumQueries(0):
+            self.assertIs(self.reference.get_reference_data(), snapshot)
+            # 表单的下拉选项和院系-专业联动都来自快照（学生下拉框不属于参考数据，不在此列）
+            for form, fields in [
+                (StudentProfileForm(), ['department', 'major']),
+                (EnrollmentForm(), ['course', 'semester', 'academic_year']),
+                (AdminEnrollmentForm(), ['course', 'major', 'semester', 'academic_year']),
+            ]:
+                for name in fields:
+                    str(form[name])
+            [major.department.name for major in snapshot.majors]
+            [list(department.major_set.all()) for department in snapshot.departments]
+
+    def test_model_changes_bump_version(self):
+        get = self.reference.get_reference_data
+        for change in (
+            lambda: Department.objects.create(name='数学学院', code='MA'),
+            lambda: Major.objects.create(name='网络工程', code='NE', department=self.department),
+            lambda: Course.objects.filter(pk=self.course.pk).first().save(),
+            lambda: Major.objects.get(code='NE').delete(),
+        ):
+            before = get()
+            with self.captureOnCommitCallbacks(execute=True):
+                change()
+            self.assertIsNot(get(), before)
+            self.assertGreater(get().version, before.version)
+
+        snapshot = get()
+        self.assertEqual({department.code for department in snapshot.departments}, {'CS', 'MA'})
+        self.assertEqual([major.code for major in snapshot.majors], ['SE'])
+
+    def test_other_process_picks_up_change_on_next_read(self):
+        stale = self.reference.get_reference_data()
+        # 另一个进程修改了数据：只有共享缓存中的版本号变化，本进程的快照仍是旧的
+        Department.objects.filter(pk=self.department.pk).update(name='信息学院')
+        self.reference.bump_reference_version()
+        with self.assertNumQueries(3):  # 院系、专业（预取）、课程
+            snapshot = self.reference.get_reference_data()
+        self.assertIsNot(snapshot, stale)
+        self.assertEqual(snapshot.department_by_id[self.department.pk].name, '信息学院')
+        self.assertEqual(stale.department_by_id[self.department.pk].name, '计算机学院')
+
+
+class SQLiteCacheTests(SimpleTestCase):
+    """共享缓存后端：本地 LRU 与共享文件一致、add/incr 跨进程原子、标签失效、单飞和提前重算"""
+
+    def setUp(self):
+        import tempfile
+
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = f'{directory.name}/cache.sqlite3'
+
+    def make_cache(self, other_process=False, **options):
+        from student_management.cache_backend import LocalTier, SQLiteCache
+
+        cache = SQLiteCache(self.path, {'OPTIONS': options})
+        if other_process:
+            # 同一进程内的实例共用本地层，另一个进程有自己的本地层
+            cache._tier = LocalTier(int(options.get('LOCAL_MAX_ENTRIES', 1000)))
+        self.addCleanup(lambda: cache._db.close())
+        return cache
+
+    def run_processes(self, count, target):
+        import multiprocessing
+
+        context = multiprocessing.get_context('fork')
+        processes = [context.Process(target=target) for _ in range(count)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join(30)
+        self.assertEqual([process.exitcode for process in processes], [0] * count)
+
+    def test_local_tier_is_bounded_lru_of_copies(self):
+        cache = self.make_cache(LOCAL_MAX_ENTRIES=2)
+        for key in 'abc':
+            cache.set(key, [key])
+        cache.get('b')
+        cache.set('d', ['d'])
+        self.assertEqual(len(cache._tier.entries), 2)
+        self.assertEqual(cache.get('a'), ['a'])  # 被本地层淘汰后从共享文件读取
+
+        value = cache.get('b')
+        value.append('changed')
+        self.assertEqual(cache.get('b'), ['b'])
+
+    def test_writes_from_other_process_visible_after_local_timeout(self):
+        cache = self.make_cache(LOCAL_TIMEOUT=0.2)
+        other = self.make_cache(other_process=True, LOCAL_TIMEOUT=0.2)
+
+        cache.set('course', 1)
+        self.assertEqual(other.get('course'), 1)
+        cache.set('course', 2)
+        self.assertEqual(cache.get('course'), 2)  # 本进程的写入立即可见
+        self.assertEqual(other.get('course'), 1)
+        time.sleep(0.25)
+        self.assertEqual(other.get('course'), 2)
+
+        other.delete('course')
+        self.assertIsNone(other.get('course'))
+
+    def test_add_and_incr_are_atomic_across_processes(self):
+        cache = self.make_cache(LOCAL_MAX_ENTRIES=0)
+        cache.set('counter', 0)
+
+        def worker():
+            try:
+                if cache.add('winner', os.getpid()):
+                    cache.incr('winners')
+                for _ in range(25):
+                    cache.incr('counter')
+            except Exception:
+                os._exit(1)
+            os._exit(0)
+
+        cache.set('winners', 0)
+        self.run_processes(4, worker)
+        self.assertEqual(cache.get('counter'), 100)
+        self.assertEqual(cache.get('winners'), 1)
+        self.assertFalse(cache.add('winner', 'again'))
+        cache.set('expired', 1, timeout=0.01)
+        time.sleep(0.02)
+        self.assertTrue(cache.add('expired', 2))
+        with self.assertRaises(ValueError):
+            cache.incr('missing')
+
+    def test_invalidate_tags(self):
+        cache = self.make_cache()
+        cache.set('a', 1, tags=['courses'])
+        cache.set('b', 2, tags=['courses', 'majors'])
+        cache.set('c', 3, tags=['majors'])
+        cache.set('d', 4)
+        other = self.make_cache(other_process=True)
+        self.assertEqual(other.get_many(['a', 'b', 'c', 'd']), {'a': 1, 'b': 2, 'c': 3, 'd': 4})
+
+        self.assertEqual(cache.invalidate_tags(['courses']), 2)
+        self.assertEqual(cache.get_many(['a', 'b', 'c', 'd']), {'c': 3, 'd': 4})
+        # 重新写入时不带标签，之前的标签随之清除
+        cache.set('c', 3)
+        self.assertEqual(cache.invalidate_tags(['majors']), 0)
+        self.assertEqual(cache.get('c'), 3)
+
+    def test_get_or_set_single_flight_across_processes(self):
+        cache = self.make_cache()
+        other = self.make_cache(other_process=True)
+        started, release = threading.Event(), threading.Event()
+        calls, results = [], {}
+
+        def slow():
+            calls.append('cache')
+            started.set()
+            release.wait(5)
+            return 'computed'
+
+        def fast():
+            calls.append('other')
+            return 'duplicate'
+
+        first = threading.Thread(target=lambda: results.setdefault('cache', cache.get_or_set('report', slow)))
+        first.start()
+        self.assertTrue(started.wait(5))
+        second = threading.Thread(target=lambda: results.setdefault('other', other.get_or_set('report', fast)))
+        second.start()
+        time.sleep(0.1)  # other 正在等待租约
+        release.set()
+        first.join(5)
+        second.join(5)
+        self.assertEqual(calls, ['cache'])
+        self.assertEqual(results, {'cache': 'computed', 'other': 'computed'})
+
+    def test_get_or_set_recomputes_early_near_expiry(self):
+        from unittest import mock
+
+        cache = self.make_cache()
+        other = self.make_cache(other_process=True)
+        with mock.patch('student_management.cache_backend.random.random', return_value=0.5):
+            # 重算耗时远小于剩余时间：不提前重算
+            cache.set('report', 'old', timeout=60, delta=0.001)
+            self.assertEqual(cache.get_or_set('report', lambda: 'new'), 'old')
+
+            # 重算耗时接近剩余时间：提前重算；其他进程持有租约时返回旧值
+            cache.set('report', 'old', timeout=60, delta=100)
+            self.assertTrue(other._acquire_lease(cache.make_key('report')))
+            self.assertEqual(cache.get_or_set('report', lambda: 'new'), 'old')
+            other._release_lease(cache.make_key('report'))
+            self.assertEqual(cache.get_or_set('report', lambda: 'new', timeout=60), 'new')
+        self.assertEqual(cache.get('report'), 'new')
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS)
+class SessionBackendTests(TestCase):
+    """合并写入的会话后端：没有变化不写，数据变化或过期时间超出余量才写；登录、退出同时清掉缓存和数据库"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('session_student', password='pass', role='student')
+
+    def session_writes(self, queries):
+        return [q['sql'] for q in queries if re.match(r'(INSERT|UPDATE|DELETE)\b.*"django_session"', q['sql'])]
+
+    def store(self, session_key=None):
+        from student_management.session_backend import SessionStore
+        return SessionStore(session_key)
+
+    def cached(self, session_key):
+        from django.core.cache import caches
+        from student_management.session_backend import KEY_PREFIX
+        return caches[settings.SESSION_CACHE_ALIAS].get(KEY_PREFIX + session_key)
+
+    def in_db(self, session_key):
+        from django.contrib.sessions.models import Session
+        return Session.objects.filter(session_key=session_key).exists()
+
+    def test_unchanged_request_does_not_write(self):
+        from unittest import mock
+        from student_management.session_backend import SessionStore
+
+        self.client.post(reverse('accounts:login'), {'username': 'session_student', 'password': 'pass'})
+        url = reverse('accounts:api_user_notifications')
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as queries, \
+                mock.patch.object(SessionStore, '_remember', autospec=True) as remember:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.session_writes(queries), [])
+        remember.assert_not_called()
+        # Cookie 仍然按滑动过期每次刷新
+        self.assertIn(settings.SESSION_COOKIE_NAME, response.cookies)
+
+    def test_data_change_writes(self):
+        store = self.store()
+        store['step'] = 1
+        store.save()
+        store = self.store(store.session_key)
+        store.load()
+        store['step'] = 2
+        with CaptureQueriesContext(connection) as queries:
+            store.save()
+        self.assertEqual(len(self.session_writes(queries)), 1)
+        self.assertEqual(self.store(store.session_key).load()['step'], 2)
+        self.assertEqual(self.cached(store.session_key)[0]['step'], 2)
+
+    def test_expiry_beyond_headroom_writes(self):
+        from unittest import mock
+
+        store = self.store()
+        store['step'] = 1
+        store.save()
+        threshold = settings.SESSION_EXPIRY_REFRESH_THRESHOLD
+        for elapsed, writes in [(threshold // 2, 0), (threshold + 1, 1)]:
+            with self.subTest(elapsed=elapsed):
+                store = self.store(store.session_key)
+                store.load()
+                later = timezone.now() + timedelta(seconds=elapsed)
+                with mock.patch('django.utils.timezone.now', return_value=later), \
+                        CaptureQueriesContext(connection) as queries:
+                    store.save()
+                self.assertEqual(len(self.session_writes(queries)), writes)
+
+    def test_cycle_key_on_login_invalidates_cache_and_db(self):
+        store = self.store()
+        store['cart'] = 'x'
+        store.save()
+        old_key = store.session_key
+        self.assertIsNotNone(self.cached(old_key))
+
+        self.client.cookies[settings.SESSION_COOKIE_NAME] = old_key
+        self.client.post(reverse('accounts:login'), {'username': 'session_student', 'password': 'pass'})
+        new_key = self.client.cookies[settings.SESSION_COOKIE_NAME].value
+        self.assertNotEqual(new_key, old_key)
+        self.assertFalse(self.in_db(old_key))
+        self.assertIsNone(self.cached(old_key))
+        self.assertTrue(self.in_db(new_key))
+
+    def test_flush_on_logout_invalidates_cache_and_db(self):
+        self.client.post(reverse('accounts:login'), {'username': 'session_student', 'password': 'pass'})
+        key = self.client.cookies[settings.SESSION_COOKIE_NAME].value
+        self.assertTrue(self.in_db(key))
+        self.client.post(reverse('accounts:logout'))
+        self.assertFalse(self.in_db(key))
+        self.assertIsNone(self.cached(key))
+
+    def test_clear_expired_deletes_in_batches(self):
+        from django.contrib.sessions.models import Session
+        from student_management.session_backend import SessionStore
+
+        past = timezone.now() - timedelta(days=1)
+        Session.objects.bulk_create([Session(session_key=f'expired{i:02d}', session_data='', expire_date=past)
+                                     for i in range(5)])
+        live = self.store()
+        live.save()
+
+        self.assertEqual(SessionStore.clear_expired(batch_size=2, max_batches=1), 2)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(SessionStore.clear_expired(batch_size=2), 3)
+        self.assertEqual(len(self.session_writes(queries)), 2)
+        self.assertEqual(list(Session.objects.values_list('session_key', flat=True)), [live.session_key])
+
+    def test_sweep_sessions_command(self):
+        from io import StringIO
+        from django.core.management import call_command
+
+        out = StringIO()
+        call_command('sweep_sessions', stdout=out)
+        self.assertIn('清理完成', out.getvalue())
+        out = StringIO()
+        with override_settings(SESSION_ENGINE='django.contrib.sessions.backends.db'):
+            call_command('sweep_sessions', stdout=out)
+        self.assertIn('不支持分批清理', out.getvalue())
+
+
+class SQLiteBackendTests(SimpleTestCase):
+    """生产模式后端：忙重试只发生在事务外，单写者锁在提交和回滚时释放"""
+
+    ALIAS = 'sqlite_backend_test'
+
+    def setUp(self):
+        import tempfile
+
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = f'{directory.name}/test.sqlite3'
+        handler = ConnectionHandler({'default': {
+            'ENGINE': 'student_management.sqlite_backend',
+            'NAME': self.path,
+            'OPTIONS': {
+                'timeout': 0.05,
+                'transaction_mode': 'IMMEDIATE',
+                'init_command': 'PRAGMA journal_mode=WAL',
+                'busy_retries': 3,
+                'busy_backoff': 0.001,
+                'single_writer': True,
+            },
+        }})
+        self.db = DatabaseWrapper(handler.settings['default'], self.ALIAS)
+        connections[self.ALIAS] = self.db
+        self.addCleanup(self.db.close)
+        self.addCleanup(connections.__delitem__, self.ALIAS)
+        with self.db.cursor() as cursor:
+            cursor.execute('CREATE TABLE t (id INTEGER PRIMARY KEY, value TEXT)')
+
+    def flaky(self, failures):
+        """前 failures 次调用抛出 database is locked，之后成功"""
+        calls = []
+
+        def method(query, *args):
+            calls.append(query)
+            if len(calls) <= failures:
+                raise sqlite3.OperationalError('database is locked')
+            return 'ok'
+        return method, calls
+
+    def test_busy_error_is_retried_outside_transaction(self):
+        method, calls = self.flaky(2)
+        with self.db.cursor() as cursor:
+            self.assertEqual(cursor.cursor._run(method, 'INSERT INTO t (value) VALUES (1)'), 'ok')
+        self.assertEqual(len(calls), 3)
+
+    def test_retries_are_limited(self):
+        method, calls = self.flaky(10)
+        with self.db.cursor() as cursor, self.assertRaises(sqlite3.OperationalError):
+            cursor.cursor._run(method, 'SELECT 1')
+        self.assertEqual(len(calls), 4)
+
+    def test_busy_error_is_not_retried_inside_transaction(self):
+        method, calls = self.flaky(1)
+        with self.assertRaises(sqlite3.OperationalError):
+            with transaction.atomic(using=self.ALIAS), self.db.cursor() as cursor:
+                cursor.cursor._run(method, 'INSERT INTO t (value) VALUES (1)')
+        self.assertEqual(len(calls), 1)
+
+    def test_writer_lock_released_on_commit(self):
+        other = WriterLock(f'{self.path}.writer.lock', timeout=0.05)
+        self.addCleanup(other.close)
+        with transaction.atomic(using=self.ALIAS):
+            with self.db.cursor() as cursor:
+                cursor.execute("INSERT INTO t (value) VALUES ('a')")
+            self.assertTrue(self.db.writer_lock.held)
+            with self.assertRaises(sqlite3.OperationalError):
+                other.acquire()
+        self.assertFalse(self.db.writer_lock.held)
+        other.acquire()
+        other.release()
+
+    def test_writer_lock_released_on_rollback(self):
+        other = WriterLock(f'{self.path}.writer.lock', timeout=0.05)
+        self.addCleanup(other.close)
+        with self.assertRaises(ValueError):
+            with transaction.atomic(using=self.ALIAS):
+                with self.db.cursor() as cursor:
+                    cursor.execute("INSERT INTO t (value) VALUES ('a')")
+                raise ValueError
+        self.assertFalse(self.db.writer_lock.held)
+        other.acquire()
+        other.release()
+        with self.db.cursor() as cursor:
+            cursor.execute('SELECT COUNT(*) FROM t')
+            self.assertEqual(cursor.fetchone()[0], 0)
+
+    def test_autocommit_write_takes_and_releases_lock(self):
+        with self.db.cursor() as cursor:
+            cursor.execute("INSERT INTO t (value) VALUES ('a')")
+        self.assertFalse(self.db.writer_lock.held)
+
+    def test_network_paths(self):
+        import tempfile
+
+        with tempfile.NamedTemporaryFile('w', suffix='mounts', delete=False) as mounts:
+            mounts.write('/dev/sda1 / ext4 rw 0 0\n//server/share /mnt/team\\040share cifs rw 0 0\n')
+        self.addCleanup(os.unlink, mounts.name)
+        self.assertTrue(is_network_path('\\\\server\\share\\team_shared.db'))
+        self.assertTrue(is_network_path('/mnt/team share/shared_data/team_shared.db', mounts.name))
+        self.assertFalse(is_network_path('/mnt/team/shared_data/team_shared.db', mounts.name))
+        self.assertFalse(is_network_path('/srv/app/team_shared.db', mounts.name))
+
+
+@override_settings(REPLICA_MAX_STALENESS=60, REPLICA_AUTO_REFRESH=True)
+class ReplicaRoutingTests(SimpleTestCase):
+    """只读副本：过期回退主库、写请求后读己之写、写入始终走主库（测试库是 MIRROR，这里替换配置检查和缓存）"""
+
+    def setUp(self):
+        from unittest import mock
+        from django.core.cache.backends.locmem import LocMemCache
+        from student_management import replica
+
+        self.replica = replica
+        self.real_replica_configured = replica.replica_configured
+        self.cache = LocMemCache('replica-tests', {})
+        self.cache.clear()
+        for target, value in [('replica_configured', lambda: True), ('_cache', lambda: self.cache)]:
+            patcher = mock.patch.object(replica, target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.user = self.make_user(1)
+
+    def make_user(self, pk):
+        from types import SimpleNamespace
+        return SimpleNamespace(pk=pk, is_authenticated=True)
+
+    def refreshed(self, seconds_ago=0):
+        self.cache.set(self.replica.REFRESHED_AT_KEY, time.time() - seconds_ago, None)
+
+    def test_stale_replica_falls_back_to_primary(self):
+        from unittest import mock
+
+        with mock.patch.object(self.replica.threading, 'Thread') as thread:
+            self.assertFalse(self.replica.can_read_replica(self.user))  # 还没有副本
+            self.refreshed(seconds_ago=61)
+            self.assertFalse(self.replica.can_read_replica(self.user))
+        # 每次回退都在后台触发刷新
+        self.assertEqual(thread.call_count, 2)
+
+        with mock.patch.object(self.replica.threading, 'Thread') as thread:
+            self.cache.set(self.replica.REFRESH_LOCK_KEY, 1)  # 其他进程正在刷新时不重复触发
+            self.assertFalse(self.replica.can_read_replica(self.user))
+            thread.assert_not_called()
+
+        self.refreshed(seconds_ago=1)
+        self.assertTrue(self.replica.can_read_replica(self.user))
+
+    def test_write_request_pins_reads_to_primary_until_refresh(self):
+        from student_management.replica import ReadYourWritesMiddleware
+
+        self.refreshed(seconds_ago=1)
+        factory = RequestFactory()
+        middleware = ReadYourWritesMiddleware(lambda request: None)
+        for method in ('get', 'post'):
+            request = getattr(factory, method)('/')
+            request.user = self.user
+            middleware(request)
+            self.assertEqual(self.replica.can_read_replica(self.user), method == 'get')
+
+        # 其他用户不受影响
+        self.assertTrue(self.replica.can_read_replica(self.make_user(2)))
+
+        last_write = self.cache.get(self.replica.LAST_WRITE_KEY.format(self.user.pk))
+        self.cache.set(self.replica.REFRESHED_AT_KEY, last_write + 1, None)
+        self.assertTrue(self.replica.can_read_replica(self.user))
+
+    def test_use_replica_routes_reads_and_keeps_writes_on_default(self):
+        from student_management.replica import ReplicaRouter, use_replica
+
+        router = ReplicaRouter()
+        routed = []
+
+        @use_replica
+        def view(request):
+            from django.http import HttpResponse
+            routed.append((router.db_for_read(Course), router.db_for_write(Course)))
+            return HttpResponse()
+
+        request = RequestFactory().get('/')
+        request.user = self.user
+        view(request)
+        self.refreshed()
+        view(request)
+        self.assertEqual(routed, [(None, 'default'), ('replica', 'default')])
+        # 视图结束后恢复为主库
+        self.assertIsNone(router.db_for_read(Course))
+        self.assertFalse(router.allow_migrate('replica', 'students'))
+        self.assertIsNone(router.allow_migrate('default', 'students'))
+
+
+    def test_replica_disabled_on_windows(self):
+        from types import SimpleNamespace
+        from unittest import mock
+
+        fake_settings = SimpleNamespace(DATABASES={'default': {}, 'replica': {}})
+        fake_connections = {'default': SimpleNamespace(is_in_memory_db=lambda: False)}
+        with mock.patch.object(self.replica, 'settings', fake_settings), \
+                mock.patch.object(self.replica, 'connections', fake_connections):
+            self.assertTrue(self.real_replica_configured())
+            # Windows 上副本文件被打开时无法替换，不启用副本
+            with mock.patch.object(self.replica.os, 'name', 'nt'):
+                self.assertFalse(self.real_replica_configured())
+
+class ExplainQueryPlanTests(TestCase):
+    """热点查询的执行计划不能退化为全表扫描（EXPLAIN QUERY PLAN 中出现不带索引的 SCAN）"""
+
+    # SCAN 后面紧跟表名且没有 USING INDEX / USING COVERING INDEX，即全表扫描
+    FULL_SCAN = re.compile(r'\bSCAN (\w+)(?! USING (?:COVERING )?INDEX)\b')
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('plan_student', password='pass', role='student')
+        cls.profile = StudentProfile.objects.get(user=cls.user)
+
+    def hot_queries(self):
+        now = timezone.now()
+        today = now.date()
+        return {
+            # 学生面板、选课页：本人当前学年学期的选课
+            'student_current_term_enrollments': Enrollment.objects.filter(
+                student=self.profile, academic_year='2024-2025', semester='秋季学期'),
+            'student_recent_enrollments': Enrollment.objects.filter(
+                student=self.profile, created_at__gte=now - timedelta(days=7)).order_by('-created_at')[:5],
+            'student_enrolled_course_ids': Enrollment.objects.filter(
+                student=self.profile).values_list('course_id', flat=True),
+            # 选课变更接口
+            'enrollment_changes': Enrollment.objects.filter(
+                created_at__gt=now - timedelta(minutes=30)).order_by('-created_at')[:20],
+            'enrollments_today': Enrollment.objects.filter(enrollment_date=today).values('id'),
+            'enrollments_this_week': Enrollment.objects.filter(
+                enrollment_date__gte=today - timedelta(days=7)).values('id'),
+            # 学生档案
+            'profile_updates': StudentProfile.objects.filter(
+                updated_at__gt=now - timedelta(minutes=5)).order_by('-updated_at')[:10],
+            'profile_list_by_status': filter_student_profiles(
+                StudentProfile.objects.all(), {'status': 'enrolled'}).order_by('-created_at', 'id')[:20],
+            'profile_by_user': StudentProfile.objects.filter(user=self.user),
+            # 课程
+            'course_updates': Course.objects.filter(
+                updated_at__gt=now - timedelta(hours=1)).order_by('-updated_at')[:10],
+            # 用户
+            'recent_users': User.objects.filter(created_at__gte=now - timedelta(days=1)).order_by('-created_at')[:5],
+            'pending_profiles': User.objects.filter(role='student').exclude(
+                id__in=StudentProfile.objects.values_list('user_id', flat=True)).order_by('-created_at')[:5],
+            'email_taken': User.objects.filter(email='someone@example.com').values('id')[:1],
+            'username_taken': User.objects.filter(username='someone').values('id')[:1],
+        }
+
+    def test_hot_queries_use_indexes(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('执行计划格式只针对 SQLite')
+        for name, queryset in self.hot_queries().items():
+            with self.subTest(query=name):
+                plan = queryset.explain()
+                scans = self.FULL_SCAN.findall(plan)
+                self.assertFalse(scans, f'{name} 全表扫描了 {", ".join(scans)}：\n{plan}')
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS, QUERY_BUDGET_MODE='raise')
+class QueryBudgetMiddlewareTests(TestCase):
+    """每个路由都有查询预算，逐行查询外键之类的 N+1 会被指纹识别出来"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user('query_admin', password='pass', role='admin')
+        cls.department = Department.objects.create(name='计算机学院', code='CS')
+        cls.major = Major.objects.create(name='软件工程', code='SE', department=cls.department)
+        cls.course = Course.objects.create(name='数据库', code='DB101', course_type='required',
+                                           credits=Decimal('3.0'), hours=48)
+        for profile in create_students(8, cls.department, cls.major, prefix='query_student'):
+            Enrollment.objects.create(student=profile, course=cls.course, major=cls.major,
+                                      semester='1', academic_year='2024-2025')
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def test_every_route_has_budget(self):
+        for module in (students_urls, accounts_urls):
+            for pattern in module.urlpatterns:
+                view_name = f'{module.app_name}:{pattern.name}'
+                with self.subTest(view=view_name):
+                    self.assertIn(view_name, settings.QUERY_BUDGETS)
+
+    def test_fingerprint_ignores_parameters(self):
+        self.assertEqual(
+            fingerprint('SELECT * FROM t WHERE id = 1 AND name = \'a\''),
+            fingerprint('SELECT * FROM t WHERE id = 25 AND name = \'b\''),
+        )
+        self.assertEqual(
+            fingerprint('SELECT * FROM t WHERE id IN (%s, %s)'),
+            fingerprint('SELECT * FROM t WHERE id IN (%s, %s, %s, %s)'),
+        )
+        self.assertNotEqual(fingerprint('SELECT * FROM t1'), fingerprint('SELECT * FROM t2'))
+
+    def test_per_row_foreign_key_access_is_flagged(self):
+        with self.assertRaisesMessage(QueryBudgetExceeded, 'N+1'):
+            with assert_query_budget('students:enrollment_list'):
+                [enrollment.student.real_name for enrollment in Enrollment.objects.all()]
+
+    def test_pages_within_budget(self):
+        # 中间件处于 raise 模式，超出预算时请求直接抛出异常
+        for view_name in ('students:enrollment_list', 'students:enrollment_grade_list', 'students:student_profile_list',
+                          'students:course_list', 'accounts:student_profile_list_admin', 'accounts:user_list',
+                          'accounts:api_recent_users', 'accounts:api_users', 'students:api_student_profiles'):
+            with self.subTest(view=view_name):
+                self.assertLess(self.client.get(reverse(view_name)).status_code, 400)
+
+
+class MetricsTests(SimpleTestCase):
+    """Prometheus 指标：直方图累计输出、已退出进程的文件只由本机归档、抓取端点的访问控制"""
+
+    LABELS = {'alias': 'metrics_test'}
+
+    def setUp(self):
+        import tempfile
+
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        override = override_settings(METRICS_ENABLED=True, METRICS_DIR=self.directory)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def write_process_file(self, host, pid, amount, name=None):
+        from student_management import metrics
+
+        values = {('sqlite_busy_retries_total', tuple(self.LABELS.items())): amount}
+        path = os.path.join(self.directory, name or f'process-{host}-{pid}-1.json')
+        metrics._write_atomic(path, metrics._dump(values))
+        return path
+
+    def dead_pid(self):
+        import subprocess
+        import sys
+
+        process = subprocess.Popen([sys.executable, '-c', 'pass'])
+        process.wait()
+        return process.pid
+
+    def test_render_text_histogram_is_cumulative(self):
+        from student_management import metrics
+
+        registry = metrics.Registry()
+        for value in (0.001, 0.02, 0.02, 20):
+            registry.observe('django_template_render_seconds', {'template': 'home.html'}, value)
+        registry.inc('sqlite_busy_retries_total', self.LABELS, 2)
+        text = metrics.render_text(registry.values)
+
+        def sample(series):
+            return re.search(rf'^{re.escape(series)} (\S+)$', text, re.M).group(1)
+
+        name = 'django_template_render_seconds'
+        self.assertEqual(sample(f'{name}_bucket{{template="home.html",le="0.005"}}'), '1')
+        self.assertEqual(sample(f'{name}_bucket{{template="home.html",le="0.025"}}'), '3')
+        self.assertEqual(sample(f'{name}_bucket{{template="home.html",le="10"}}'), '3')
+        self.assertEqual(sample(f'{name}_bucket{{template="home.html",le="+Inf"}}'), '4')
+        self.assertEqual(sample(f'{name}_count{{template="home.html"}}'), '4')
+        self.assertAlmostEqual(float(sample(f'{name}_sum{{template="home.html"}}')), 20.041)
+        self.assertEqual(sample('sqlite_busy_retries_total{alias="metrics_test"}'), '2')
+        self.assertIn('# TYPE django_template_render_seconds histogram', text)
+
+    def test_collect_archives_only_dead_processes_on_this_host(self):
+        from student_management import metrics
+
+        key = ('sqlite_busy_retries_total', tuple(self.LABELS.items()))
+        dead = self.write_process_file(metrics.HOSTNAME, self.dead_pid(), 1)
+        alive = self.write_process_file(metrics.HOSTNAME, os.getpid(), 10)
+        remote = self.write_process_file('other-host', self.dead_pid(), 100)
+
+        self.assertEqual(metrics.collect()[key], 111)
+        self.assertFalse(os.path.exists(dead))
+        self.assertTrue(os.path.exists(alive))
+        self.assertTrue(os.path.exists(remote))
+        self.assertEqual(metrics._load(os.path.join(self.directory, metrics.ARCHIVE_NAME))[key], 1)
+        # 再次汇总不会重复计入已归档或其他主机的文件
+        self.assertEqual(metrics.collect()[key], 111)
+
+    def test_legacy_file_names_are_archived_once(self):
+        from student_management import metrics
+
+        key = ('sqlite_busy_retries_total', tuple(self.LABELS.items()))
+        legacy = self.write_process_file(None, None, 5, name=f'process-{os.getpid()}-1.json')
+        self.assertIsNone(metrics._file_owner(legacy))
+        self.assertEqual(metrics.collect()[key], 5)
+        self.assertFalse(os.path.exists(legacy))
+        self.assertEqual(metrics.collect()[key], 5)
+
+    def test_failed_flush_does_not_break_request(self):
+        from unittest import mock
+        from django.http import HttpResponse
+        from student_management import metrics
+
+        middleware = metrics.MetricsMiddleware(lambda request: HttpResponse('ok'))
+        metrics.registry.flushed_at = 0.0  # 不受 METRICS_FLUSH_INTERVAL 节流
+        # Windows 上抓取端点打开着目标文件时 os.replace 抛出 PermissionError
+        with mock.patch.object(metrics.os, 'replace', side_effect=PermissionError), \
+                self.assertLogs('student_management.metrics', 'WARNING'):
+            response = middleware(RequestFactory().get('/'))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(metrics.registry.dirty)
+        self.assertEqual([name for name in os.listdir(self.directory) if name.endswith('.tmp')], [])
+        metrics.registry.flush(force=True)
+        self.assertFalse(metrics.registry.dirty)
+        self.assertTrue(os.path.exists(metrics.registry.path))
+
+    def test_collect_reaps_without_fcntl(self):
+        from types import SimpleNamespace
+        from unittest import mock
+        from student_management import metrics
+
+        calls = []
+        msvcrt = SimpleNamespace(LK_LOCK=1, LK_UNLCK=0, locking=lambda fd, mode, size: calls.append(mode))
+        dead = self.write_process_file(metrics.HOSTNAME, self.dead_pid(), 1)
+        with mock.patch.object(metrics, 'fcntl', None), mock.patch.object(metrics, 'msvcrt', msvcrt, create=True):
+            metrics.collect()
+        self.assertEqual(calls, [1, 0])
+        self.assertFalse(os.path.exists(dead))
+
+    def test_process_file_name_includes_host(self):
+        from student_management import metrics
+
+        registry = metrics.Registry()
+        self.assertEqual(metrics._file_owner(registry.path), (metrics.HOSTNAME, os.getpid()))
+        self.assertEqual(metrics._file_owner('process-web-01-42-1.json'), ('web-01', 42))
+
+    def test_metrics_view_access_control(self):
+        from student_management.metrics import metrics_view
+
+        factory = RequestFactory()
+        self.assertEqual(metrics_view(factory.get('/metrics', REMOTE_ADDR='127.0.0.1')).status_code, 200)
+        self.assertEqual(metrics_view(factory.get('/metrics', REMOTE_ADDR='10.0.0.8')).status_code, 403)
+        with override_settings(METRICS_TOKEN='secret'):
+            for header, status in [('Bearer secret', 200), ('Bearer wrong', 403), ('secret', 403)]:
+                with self.subTest(header=header):
+                    request = factory.get('/metrics', REMOTE_ADDR='10.0.0.8', HTTP_AUTHORIZATION=header)
+                    self.assertEqual(metrics_view(request).status_code, status)
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS)
+class GenerateLoadDataTests(TestCase):
+    """压测数据：同一种子生成相同的数据并补齐派生数据，--clear 只删除生成的数据"""
+
+    OPTIONS = ['--students', '6', '--courses', '16', '--enrollments', '60', '--batch-size', '4', '--prefix', 'LT']
+
+    @classmethod
+    def setUpTestData(cls):
+        department = Department.objects.create(name='计算机学院', code='CS')
+        Major.objects.create(name='软件工程', code='SE', department=department)
+        # 小写前缀的真实用户不能被 --clear 误删
+        cls.real_user = User.objects.create_user('lt20240000001', password='pass', role='student')
+
+    def generate(self, *args):
+        from io import StringIO
+        from django.core.management import call_command
+
+        out = StringIO()
+        call_command('generate_load_data', *self.OPTIONS, *args, stdout=out)
+        return re.search(r'数据校验和 ([0-9a-f]{8})', out.getvalue()).group(1)
+
+    def generated_counts(self):
+        return (
+            User.objects.filter(username__regex=r'^LT[0-9]{11}$').count(),
+            StudentProfile.objects.filter(student_id__regex=r'^LT[0-9]{11}$').count(),
+            Course.objects.filter(code__regex=r'^LT[0-9]{4}$').count(),
+            Enrollment.objects.count(),
+        )
+
+    def test_generate_and_clear(self):
+        from django.core.management.base import CommandError
+
+        checksum = self.generate()
+        users, profiles, courses, enrollments = self.generated_counts()
+        self.assertEqual((users, profiles, courses), (6, 6, 16))
+        self.assertGreater(enrollments, 0)
+        # 生成时跳过的信号已统一补齐
+        self.assertEqual(StatCounter.reconcile(), {})
+        self.assertEqual(seats.recount_enrolled(), 0)
+        self.assertEqual(StudentAcademicSummary.objects.filter(enrollment_count__gt=0).count(),
+                         Enrollment.objects.values('student').distinct().count())
+
+        with self.assertRaises(CommandError):
+            self.generate()
+        # 同一种子重新生成，数据完全相同
+        self.assertEqual(self.generate('--clear'), checksum)
+        self.assertEqual(self.generated_counts(), (users, profiles, courses, enrollments))
+
+        self.generate('--clear', '--students', '0', '--courses', '0', '--enrollments', '0')
+        self.assertEqual(self.generated_counts(), (0, 0, 0, 0))
+        self.assertTrue(User.objects.filter(pk=self.real_user.pk).exists())
+        self.assertEqual(StatCounter.reconcile(), {})
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS)
+class BenchmarkViewsTests(TestCase):
+    """视图基准测试：测试客户端模式跑通场景并还原选课数据，与基线比较出现回归时报错"""
+
+    SCENARIOS = ['student_dashboard', 'course_selection_submit', 'api_users']
+
+    @classmethod
+    def setUpTestData(cls):
+        User.objects.create_user('bench_admin', password='pass', role='admin')
+        department = Department.objects.create(name='计算机学院', code='CS')
+        major = Major.objects.create(name='软件工程', code='SE', department=department)
+        Course.objects.create(name='数据库', code='DB101', course_type='required',
+                              credits=Decimal('3.0'), hours=48, capacity=10)
+        create_students(2, department, major, prefix='bench_student')
+
+    def setUp(self):
+        import tempfile
+
+        cache.clear()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.output = os.path.join(directory.name, 'baseline.json')
+
+    def benchmark(self, *args):
+        from io import StringIO
+        from django.core.management import call_command
+
+        out = StringIO()
+        call_command('benchmark_views', '--server', 'client', '--iterations', '2', '--warmup', '1',
+                     '--only', *self.SCENARIOS, *args, stdout=out)
+        return out.getvalue()
+
+    def test_client_run_writes_baseline_and_restores_data(self):
+        from unittest import mock
+
+        before = (Enrollment.objects.count(), CourseWaitlist.objects.count(),
+                  Course.objects.values_list('enrolled_count', flat=True).get())
+        with mock.patch.object(seats, 'enroll', wraps=seats.enroll) as enroll:
+            self.benchmark('--output', self.output)
+        # 每次提交都真正选上了课程，随后被撤销
+        self.assertEqual(enroll.call_count, 3)
+        self.assertEqual((Enrollment.objects.count(), CourseWaitlist.objects.count(),
+                          Course.objects.values_list('enrolled_count', flat=True).get()), before)
+
+        with open(self.output, encoding='utf-8') as f:
+            report = json.load(f)
+        self.assertEqual(report['meta']['server'], 'client')
+        self.assertEqual(list(report['results']), self.SCENARIOS)
+        for name, row in report['results'].items():
+            with self.subTest(name):
+                self.assertEqual((row['requests'], row['errors']), (2, 0))
+                self.assertGreater(row['queries_per_request'], 0)
+
+    def test_compare_fails_on_regression(self):
+        from django.core.management.base import CommandError
+
+        self.benchmark('--output', self.output)
+        with open(self.output, encoding='utf-8') as f:
+            report = json.load(f)
+        # 基线的延迟放宽到不可能超过，只比较 SQL 条数
+        for row in report['results'].values():
+            row['p95_ms'] = 60000
+        with open(self.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f)
+        self.assertIn('没有回归', self.benchmark('--compare', self.output))
+
+        report['results']['api_users']['queries_per_request'] = 1
+        with open(self.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f)
+        with self.assertRaisesMessage(CommandError, 'api_users'):
+            self.benchmark('--compare', self.output)
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS)
+class LoadTestRegistrationTests(LiveServerTestCase):
+    """选课日压测：对测试服务器跑一轮短压测，数据检查通过，清理只删除本次压测产生的记录"""
+
+    def setUp(self):
+        cache.clear()
+        User.objects.create_user('admin', password='admin123', role='admin')
+        department = Department.objects.create(name='计算机学院', code='CS')
+        self.major = Major.objects.create(name='软件工程', code='SE', department=department)
+        # 一门只有 1 个名额、允许候补的热门课，一门不限人数
+        self.courses = [
+            Course.objects.create(name='数据库', code='DB101', course_type='required', credits=Decimal('3.0'),
+                                  hours=48, capacity=1, waitlist_enabled=True),
+            Course.objects.create(name='操作系统', code='OS101', course_type='required', credits=Decimal('3.0'),
+                                  hours=48),
+        ]
+        # 学号格式与 generate_load_data 一致（前缀 + 11 位数字）
+        create_students(2, department, self.major, prefix='LD2024000000')
+        self.other = create_students(1, department, self.major, prefix='load_other')[0]
+        Enrollment.objects.create(student=self.other, course=self.courses[1], major=self.major,
+                                  semester='秋季学期', academic_year='2024-2025')
+
+    def test_short_run_checks_and_cleans_up(self):
+        import tempfile
+        from io import StringIO
+        from django.core.management import call_command
+
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, 'report.json')
+            out = StringIO()
+            call_command('load_test_registration', '--url', self.live_server_url, '--stages', '2s:2',
+                         '--think-time', '0', '--double-submit', '0', '--courses-per-student', '2',
+                         '--poll-interval', '0.5', '--admins', '1', '--password', 'pass', '--timeout', '10',
+                         '--output', output, stdout=out)
+            with open(output, encoding='utf-8') as f:
+                report = json.load(f)
+
+        outcomes = report['enrollment_outcomes']
+        self.assertGreater(outcomes.get('enrolled', 0), 0)
+        for bad in ('login_failed', 'admin_login_failed', 'http_error', 'unknown', 'failed', 'sqlite_locked'):
+            self.assertNotIn(bad, outcomes)
+        self.assertIn('api_recent_users', report['requests'])
+        self.assertEqual(report['database'], {'duplicate_enrollments': 0, 'count_mismatches': 0, 'over_capacity': 0})
+
+        # 压测的选课和候补都已删除，名额全部归还，其他学生的选课不受影响
+        self.assertIn('已清理压测产生的', out.getvalue())
+        self.assertEqual(list(Enrollment.objects.values_list('student_id', flat=True)), [self.other.pk])
+        self.assertFalse(CourseWaitlist.objects.exists())
+        self.assertEqual([course.enrolled_count for course in Course.objects.order_by('id')], [0, 1])
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS)
+class ProfileSyncTests(TestCase):
+    """用户保存时只把真正修改过的联系信息同步到学生档案，登录不写学生档案"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('sync_student', password='pass', role='student',
+                                            email='old@example.com', phone='13800000000')
+        cls.profile = StudentProfile.objects.get(user=cls.user)
+        StudentProfile.objects.filter(pk=cls.profile.pk).update(real_name='张三', updated_at=timezone.now() - timedelta(days=1))
+
+    def profile_writes(self, queries):
+        return [q['sql'] for q in queries if q['sql'].startswith('UPDATE "students_studentprofile"')]
+
+    def test_login_does_not_write_profile(self):
+        before = StudentProfile.objects.get(pk=self.profile.pk).updated_at
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse('accounts:login'), {'username': 'sync_student', 'password': 'pass'})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.profile_writes(queries), [])
+        self.assertEqual(StudentProfile.objects.get(pk=self.profile.pk).updated_at, before)
+
+    def test_unchanged_save_skips_profile(self):
+        user = User.objects.get(pk=self.user.pk)
+        with CaptureQueriesContext(connection) as queries:
+            user.save()
+        self.assertEqual(self.profile_writes(queries), [])
+
+    def test_only_changed_fields_are_written(self):
+        user = User.objects.get(pk=self.user.pk)
+        user.phone = '13911112222'
+        with CaptureQueriesContext(connection) as queries:
+            user.save()
+        writes = self.profile_writes(queries)
+        self.assertEqual(len(writes), 1)
+        self.assertNotIn('"email"', writes[0])
+        self.assertNotIn('"real_name"', writes[0])
+
+        profile = StudentProfile.objects.get(pk=self.profile.pk)
+        self.assertEqual(profile.phone, '13911112222')
+        # 只改手机号时不会用用户名覆盖档案中的真实姓名
+        self.assertEqual(profile.real_name, '张三')
+        self.assertGreater(profile.updated_at, timezone.now() - timedelta(hours=1))
+
+    def test_name_change_updates_real_name(self):
+        user = User.objects.get(pk=self.user.pk)
+        user.last_name, user.first_name = '李', '四'
+        user.save(update_fields=['first_name', 'last_name'])
+        self.assertEqual(StudentProfile.objects.get(pk=self.profile.pk).real_name, '李四')
+
+
+class AsyncApiViewTests(TestCase):
+    """异步 JSON 接口与同步版本返回相同的内容"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user('async_admin', password='pass', role='admin')
+        cls.student = User.objects.create_user('async_student', password='pass', role='student', phone='13800000001')
+        cls.teacher = User.objects.create_user('async_teacher', password='pass', role='teacher')
+        department = Department.objects.create(name='计算机学院', code='CS')
+        major = Major.objects.create(name='软件工程', code='SE', department=department)
+        profile = StudentProfile.objects.get(user=cls.student)
+        profile.department, profile.major = department, major
+        profile.save()
+        course = Course.objects.create(name='数据结构', code='CS101', course_type='required',
+                                       credits=Decimal('3.0'), hours=48, capacity=30)
+        Enrollment.objects.create(student=profile, course=course, major=major, semester='秋季学期', academic_year='2024-2025')
+
+    def responses(self, user, module, async_module, name, params=None, method='get'):
+        """同一请求分别交给同步和异步视图，返回去掉时间戳后的 (状态码, JSON)"""
+        def result(response):
+            data = json.loads(response.content)
+            data.pop('timestamp', None)
+            return response.status_code, data
+
+        cache.clear()
+        request = getattr(RequestFactory(), method)('/', params or {})
+        request.user = user
+        sync_result = result(getattr(module, name)(request))
+
+        cache.clear()
+        request = getattr(AsyncRequestFactory(), method)('/', params or {})
+
+        async def auser():
+            return user
+        request.user, request.auser = user, auser
+        async_result = result(async_to_sync(getattr(async_module, name))(request))
+        return sync_result, async_result
+
+    def test_same_response_as_sync_views(self):
+        cases = [
+            (self.student, views_api, views_api_async, 'api_student_status', None),
+            (self.teacher, views_api, views_api_async, 'api_student_status', None),
+            (self.student, views_api, views_api_async, 'api_course_updates', None),
+            (self.admin, views_api, views_api_async, 'api_enrollment_changes', None),
+            (self.admin, views_api, views_api_async, 'api_changes', None),
+            (self.student, views_api, views_api_async, 'api_changes', {'since': '0'}),
+            (self.admin, views_api, views_api_async, 'api_changes', {'since': 'x'}),
+            (self.admin, views_api, views_api_async, 'api_student_profiles', {'limit': '1'}),
+            (self.admin, views_api, views_api_async, 'api_student_profiles', {'cursor': 'bad'}),
+            (self.admin, accounts_api, accounts_api_async, 'api_pending_profiles_count', None),
+            (self.admin, accounts_api, accounts_api_async, 'api_recent_users', None),
+            (self.admin, accounts_api, accounts_api_async, 'api_users', {'limit': '2'}),
+            (self.admin, accounts_api, accounts_api_async, 'api_student_profiles_updates', None),
+            (self.admin, accounts_api, accounts_api_async, 'api_user_notifications', None),
+            (self.student, accounts_api, accounts_api_async, 'api_user_notifications', None),
+        ]
+        for user, module, async_module, name, params in cases:
+            with self.subTest(view=name, user=user.username, params=params):
+                sync_result, async_result = self.responses(user, module, async_module, name, params)
+                self.assertEqual(async_result, sync_result)
@@ -1,6 +1,10 @@
 from django.urls import path
+from django.conf import settings
 from . import views
-from . import views_api
+from . import views_api, views_api_async
+
+# ASGI 下使用异步版本的 JSON 接口，URL 名称不变
+api = views_api_async if settings.ASYNC_API_VIEWS else views_api
 
 app_name = 'students'
 
@@ -29,6 +33,8 @@ urlpatterns = [
     # StudentProfile URLs
     path('students/', views.student_profile_list, name='student_profile_list'),
     path('students/create/', views.student_profile_create, name='student_profile_create'),
+    path('students/import/', views.student_import, name='student_import'),
+    path('students/export/', views.student_profile_export, name='student_profile_export'),
     path('students/<int:pk>/update/', views.student_profile_update, name='student_profile_update'),
     path('students/<int:pk>/delete/', views.student_profile_delete, name='student_profile_delete'),
 
@@ -37,10 +43,12 @@ urlpatterns = [
     path('enrollments/create/', views.EnrollmentCreateView.as_view(), name='enrollment_create'),
     path('enrollments/<int:pk>/update/', views.EnrollmentUpdateView.as_view(), name='enrollment_update'),
     path('enrollments/<int:pk>/delete/', views.EnrollmentDeleteView.as_view(), name='enrollment_delete'),
+    path('enrollments/export/', views.enrollment_export, name='enrollment_export'),
 
     # Grade Management URLs
     path('grades/', views.enrollment_grade_list, name='enrollment_grade_list'),
     path('grades/<int:pk>/update/', views.grade_update, name='grade_update'),
+    path('courses/<int:course_pk>/grades/', views.grade_sheet, name='grade_sheet'),
 
     # Student specific URLs
     path('my-enrollments/', views.my_enrollments, name='my_enrollments'),
@@ -48,7 +56,10 @@ urlpatterns = [
     path('course-selection/submit/', views.course_selection_submit, name='course_selection_submit'),
 
     # API 端点
-    path('api/student-status/', views_api.api_student_status, name='api_student_status'),
-    path('api/course-updates/', views_api.api_course_updates, name='api_course_updates'),
-    path('api/enrollment-changes/', views_api.api_enrollment_changes, name='api_enrollment_changes'),
+    path('api/student-status/', api.api_student_status, name='api_student_status'),
+    path('api/course-updates/', api.api_course_updates, name='api_course_updates'),
+    path('api/enrollment-changes/', api.api_enrollment_changes, name='api_enrollment_changes'),
+    path('api/changes/', api.api_changes, name='api_changes'),
+    path('api/students/', api.api_student_profiles, name='api_student_profiles'),
+    path('api/student-search/', api.api_student_search, name='api_student_search'),
 ]
\ No newline at end of file
@@ -6,10 +6,17 @@ from django.views.generic import ListView, CreateView, UpdateView, DeleteView
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.urls import reverse_lazy
 from django.db.models import Q
-from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
 from django.db import IntegrityError, transaction
-from .models import StudentProfile, Department, Major, Course, Enrollment
+from .models import StudentProfile, Department, Major, Course, Enrollment, StatCounter
 from .forms import StudentProfileForm, DepartmentForm, MajorForm, CourseForm, EnrollmentForm, AdminEnrollmentForm, GradeForm
+from .queries import (
+    filter_student_profiles, filter_enrollments, filter_courses, approximate_profile_count, enrollment_list_queryset,
+)
+from .pagination import KeysetPaginator, KeysetPaginationMixin, get_page
+from . import seats
+from .catalog import available_courses_for
+from .reference import get_reference_data
+from student_management.replica import use_replica
 
 User = get_user_model()
 
@@ -70,6 +77,19 @@ class MajorListView(LoginRequiredMixin, AdminRequiredMixin, ListView):
     model = Major
     template_name = 'students/major_list.html'
     context_object_name = 'majors'
+    paginate_by = 20
+
+    def get_queryset(self):
+        majors = Major.objects.select_related('department').order_by('department__name', 'code')
+        department_id = self.request.GET.get('department')
+        if department_id:
+            majors = majors.filter(department_id=department_id)
+        return majors
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['departments'] = get_reference_data().departments
+        return context
 
 class MajorCreateView(LoginRequiredMixin, AdminRequiredMixin, CreateView):
     model = Major
@@ -93,6 +113,17 @@ class CourseListView(LoginRequiredMixin, AdminRequiredMixin, ListView):
     model = Course
     template_name = 'students/course_list.html'
     context_object_name = 'courses'
+    paginate_by = 20
+
+    def get_queryset(self):
+        return filter_courses(Course.objects.order_by('code'), self.request.GET)
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['course_type_choices'] = Course.COURSE_TYPE_CHOICES
+        context['semester_choices'] = Course.SEMESTER_CHOICES
+        context['academic_year_choices'] = Course.ACADEMIC_YEAR_CHOICES
+        return context
 
 class CourseCreateView(LoginRequiredMixin, AdminRequiredMixin, CreateView):
     model = Course
@@ -113,56 +144,23 @@ class CourseDeleteView(LoginRequiredMixin, AdminRequiredMixin, DeleteView):
 
 # StudentProfile CRUD操作
 @login_required
+@use_replica
 def student_profile_list(request):
     if request.user.role != 'admin':
         messages.error(request, '您没有权限访问此页面！')
         return redirect('home')
 
-    # 获取查询参数
-    search_query = request.GET.get('search', '').strip()
-    department_id = request.GET.get('department', '')
-    status = request.GET.get('status', '')
-    gender = request.GET.get('gender', '')
-
     # 构建查询
     students = StudentProfile.objects.all().select_related('user', 'department', 'major')
+    students = filter_student_profiles(students, request.GET)
 
-    # 搜索功能
-    if search_query:
-        students = students.filter(
-            Q(student_id__icontains=search_query) |
-            Q(real_name__icontains=search_query) |
-            Q(class_name__icontains=search_query) |
-            Q(user__username__icontains=search_query)
-        )
-
-    # 院系筛选
-    if department_id:
-        students = students.filter(department_id=department_id)
-
-    # 学籍状态筛选
-    if status:
-        students = students.filter(enrollment_status=status)
-
-    # 性别筛选
-    if gender:
-        students = students.filter(gender=gender)
-
-    # 排序
-    students = students.order_by('-created_at')
-
-    # 分页
-    paginator = Paginator(students, 20)  # 每页显示20条
-    page = request.GET.get('page', 1)
-    try:
-        page_obj = paginator.page(page)
-    except PageNotAnInteger:
-        page_obj = paginator.page(1)
-    except EmptyPage:
-        page_obj = paginator.page(paginator.num_pages)
+    # 键集分页：按 (-created_at, id) 定位，深页和首页代价相同，不再执行 COUNT(*)
+    stats = StatCounter.dashboard_stats()
+    paginator = KeysetPaginator(students, 20, approximate_count=approximate_profile_count(request.GET, stats))
+    page_obj = get_page(paginator, request.GET.get('cursor'))
 
     # 获取所有院系用于筛选
-    departments = Department.objects.all()
+    departments = get_reference_data().departments
 
     context = {
         'students': page_obj,
@@ -170,10 +168,10 @@ def student_profile_list(request):
         'page_obj': page_obj,
         'is_paginated': page_obj.has_other_pages(),
         # 统计数据
-        'total_students': StudentProfile.objects.count(),
-        'enrolled_students': StudentProfile.objects.filter(enrollment_status='enrolled').count(),
-        'total_departments': Department.objects.count(),
-        'total_majors': Major.objects.count(),
+        'total_students': stats['total_student_profiles'],
+        'enrolled_students': stats['enrolled_students'],
+        'total_departments': stats['total_departments'],
+        'total_majors': stats['total_majors'],
     }
 
     return render(request, 'students/student_profile_list_clean.html', context)
@@ -209,7 +207,7 @@ def student_profile_create(request):
     else:
         form = StudentProfileForm()
 
-    departments = Department.objects.all()
+    departments = get_reference_data().departments
     return render(request, 'students/student_profile_form.html', {
         'form': form,
         'departments': departments
@@ -232,7 +230,7 @@ def student_profile_update(request, pk):
     else:
         form = StudentProfileForm(instance=student_profile)
 
-    departments = Department.objects.all()
+    departments = get_reference_data().departments
     return render(request, 'students/student_profile_form.html', {
         'form': form,
         'departments': departments
@@ -264,11 +262,100 @@ def student_profile_delete(request, pk):
 
     return render(request, 'students/student_profile_confirm_delete.html', {'student_profile': student_profile})
 
+@login_required
+def student_import(request):
+    if request.user.role != 'admin':
+        messages.error(request, '您没有权限访问此页面！')
+        return redirect('home')
+
+    result = None
+    if request.method == 'POST':
+        upload = request.FILES.get('file')
+        if not upload:
+            messages.error(request, '请选择要导入的文件！')
+        else:
+            from .importers import StudentImporter, ImportFileError, read_rows
+            try:
+                # 在请求中不启动进程池（Windows 下每个子进程都要重新导入 Django），大批量导入请使用 import_students 命令
+                importer = StudentImporter(workers=1, dry_run=bool(request.POST.get('dry_run')))
+                result = importer.run(read_rows(upload))
+                if result.errors:
+                    messages.warning(request, result.summary())
+                else:
+                    messages.success(request, result.summary())
+            except ImportFileError as e:
+                messages.error(request, f'导入失败：{str(e)}')
+
+    return render(request, 'students/student_import.html', {'result': result})
+
+def _export_response(request, queryset, columns, filename):
+    """CSV 流式返回；XLSX 需要完整写出后才能下载"""
+    from django.http import StreamingHttpResponse, FileResponse
+    from .exports import iter_csv, write_xlsx
+    import tempfile
+
+    if request.GET.get('format') == 'xlsx':
+        output = tempfile.TemporaryFile()
+        try:
+            write_xlsx(output, queryset, columns)
+        except RuntimeError as e:
+            output.close()
+            messages.error(request, str(e))
+            return redirect('students:student_profile_list')
+        output.seek(0)
+        return FileResponse(output, as_attachment=True, filename=f'{filename}.xlsx')
+
+    response = StreamingHttpResponse(iter_csv(queryset, columns), content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{filename}.csv"'
+    return response
+
+@login_required
+@use_replica
+def student_profile_export(request):
+    if request.user.role != 'admin':
+        messages.error(request, '您没有权限访问此页面！')
+        return redirect('home')
+
+    from .exports import STUDENT_PROFILE_COLUMNS, student_profile_queryset
+    students = filter_student_profiles(student_profile_queryset(), request.GET)
+    return _export_response(request, students, STUDENT_PROFILE_COLUMNS, 'students')
+
+@login_required
+@use_replica
+def enrollment_export(request):
+    if request.user.role != 'admin':
+        messages.error(request, '您没有权限访问此页面！')
+        return redirect('home')
+
+    from .exports import ENROLLMENT_COLUMNS, enrollment_queryset
+    enrollments = filter_enrollments(enrollment_queryset(), request.GET)
+    return _export_response(request, enrollments, ENROLLMENT_COLUMNS, 'transcripts')
+
 # Enrollment CRUD操作
-class EnrollmentListView(LoginRequiredMixin, AdminRequiredMixin, ListView):
+def enrollment_filter_context():
+    """选课列表和成绩列表共用的筛选下拉选项"""
+    reference = get_reference_data()
+    return {
+        'courses': reference.courses,
+        'departments': reference.departments,
+        'semester_choices': Course.SEMESTER_CHOICES,
+        'academic_year_choices': Course.ACADEMIC_YEAR_CHOICES,
+        'grade_choices': Enrollment.GRADE_CHOICES,
+    }
+
+class EnrollmentListView(LoginRequiredMixin, AdminRequiredMixin, KeysetPaginationMixin, ListView):
     model = Enrollment
     template_name = 'students/enrollment_list.html'
     context_object_name = 'enrollments'
+    paginate_by = 50
+
+    def get_queryset(self):
+        return enrollment_list_queryset(self.request.GET)
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context.update(enrollment_filter_context())
+        return context
 
 class EnrollmentCreateView(LoginRequiredMixin, AdminRequiredMixin, CreateView):
     model = Enrollment
@@ -289,13 +376,23 @@ class EnrollmentDeleteView(LoginRequiredMixin, AdminRequiredMixin, DeleteView):
 
 # 成绩录入和管理
 @login_required
+@use_replica
 def enrollment_grade_list(request):
     if request.user.role != 'admin':
         messages.error(request, '您没有权限访问此页面！')
         return redirect('home')
 
-    enrollments = Enrollment.objects.all().select_related('student', 'course')
-    return render(request, 'students/enrollment_grade_list.html', {'enrollments': enrollments})
+    # 键集分页 + 字段投影，20 万条选课记录时每页仍只有固定的几次查询
+    paginator = KeysetPaginator(enrollment_list_queryset(request.GET), 50)
+    page_obj = get_page(paginator, request.GET.get('cursor'))
+
+    context = {
+        'enrollments': page_obj,
+        'page_obj': page_obj,
+        'is_paginated': page_obj.has_other_pages(),
+    }
+    context.update(enrollment_filter_context())
+    return render(request, 'students/enrollment_grade_list.html', context)
 
 @login_required
 def grade_update(request, pk):
@@ -316,6 +413,56 @@ def grade_update(request, pk):
 
     return render(request, 'students/grade_form.html', {'form': form, 'enrollment': enrollment})
 
+@login_required
+def grade_sheet(request, course_pk):
+    """按课程整批录入成绩：提交名单中的全部分数或上传 CSV，一个事务写回"""
+    if request.user.role != 'admin':
+        messages.error(request, '您没有权限访问此页面！')
+        return redirect('home')
+
+    from .grading import GradeSheet, GradeSheetError
+
+    course = get_object_or_404(Course, pk=course_pk)
+    academic_year = request.GET.get('academic_year') or ''
+    semester = request.GET.get('semester') or ''
+    sheet = GradeSheet(course, academic_year=academic_year, semester=semester)
+
+    result = None
+    if request.method == 'POST':
+        dry_run = bool(request.POST.get('dry_run'))
+        upload = request.FILES.get('file')
+        try:
+            if upload:
+                result = sheet.apply_csv(upload, dry_run=dry_run)
+            else:
+                scores = {
+                    key[len('score_'):]: value
+                    for key, value in request.POST.items() if key.startswith('score_')
+                }
+                originals = {
+                    key[len('original_'):]: value
+                    for key, value in request.POST.items() if key.startswith('original_')
+                }
+                result = sheet.apply(scores, dry_run=dry_run, originals=originals)
+            if result.errors:
+                messages.warning(request, result.summary())
+            else:
+                messages.success(request, result.summary())
+        except GradeSheetError as e:
+            messages.error(request, f'成绩录入失败：{str(e)}')
+
+    context = {
+        'course': course,
+        'roster': sheet.roster(),
+        'result': result,
+        'academic_year': academic_year,
+        'semester': semester,
+        'semester_choices': Course.SEMESTER_CHOICES,
+        'academic_year_choices': Course.ACADEMIC_YEAR_CHOICES,
+        'grade_bands': Enrollment.GRADE_CHOICES,
+    }
+    return render(request, 'students/grade_sheet.html', context)
+
 # 学生查看自己的选课和成绩
 @login_required
 def my_enrollments(request):
@@ -358,17 +505,8 @@ def course_selection(request):
         else:
             current_semester = "秋季学期"
 
-        # 获取当前学期的已选课程
-        enrolled_courses = Enrollment.objects.filter(
-            student=student_profile,
-            academic_year=current_academic_year,
-            semester=current_semester
-        ).values_list('course_id', flat=True)
-
-        # 获取所有可选课程（排除当前学期已选的）
-        available_courses = Course.objects.exclude(
-            id__in=enrolled_courses
-        ).order_by('course_type', 'name')
+        # 候选课程来自按学期/年级共享的目录缓存，只在内存中排除本人已选的课程
+        available_courses = available_courses_for(student_profile)
 
         context = {
             'available_courses': available_courses,
@@ -430,19 +568,16 @@ def course_selection_submit(request):
             messages.error(request, '您还没有设置专业信息，请联系管理员设置专业后再进行选课！')
             return redirect('students:course_selection')
 
-        # 检查是否已选过该课程
-        if Enrollment.objects.filter(student=student_profile, course=course).exists():
-            messages.error(request, '您已经选择了该课程！')
+        # 占座和创建选课记录在同一个事务中完成，并发提交也不会超出课程容量
+        try:
+            status, record = seats.enroll(student_profile, course, semester, academic_year)
+        except seats.EnrollmentError as e:
+            messages.error(request, str(e))
             return redirect('students:course_selection')
 
-        # 创建选课记录
-        enrollment = Enrollment.objects.create(
-            student=student_profile,
-            course=course,
-            major=student_profile.major,
-            semester=semester,
-            academic_year=academic_year
-        )
+        if status == seats.WAITLISTED:
+            messages.info(request, f'课程 {course.name} 已满员，您已进入候补队列（第 {record.position} 位），有空位时将自动为您补选。')
+            return redirect('students:course_selection')
 
         messages.success(request, f'成功选择课程：{course.name}！')
         return redirect('students:my_enrollments')
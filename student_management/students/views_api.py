@@ -2,9 +2,14 @@ from django.http import JsonResponse
 from django.contrib.auth.decorators import login_required
 from django.views.decorators.http import require_http_methods
 from django.core.cache import cache
+from django.conf import settings
+from django.db.models import Q
 from django.utils import timezone
 from datetime import timedelta
-from .models import StudentProfile, Enrollment, Course
+from .models import StudentProfile, Enrollment, Course, ChangeLog
+from .pagination import KeysetPaginator, InvalidCursor, page_size
+from .queries import filter_student_profiles, approximate_profile_count
+from student_management.replica import use_replica
 
 @login_required
 @require_http_methods(["GET"])
@@ -165,6 +170,137 @@ def api_enrollment_changes(request):
         'timestamp': timezone.now().isoformat()
     })
 
+@login_required
+@require_http_methods(["GET"])
+def api_changes(request):
+    """
+    API: 基于游标的增量变更（?since=<seq>）
+    不带 since 时只返回当前最新游标，客户端从此处开始同步
+    """
+    user = request.user
+    if user.role not in ['admin', 'student']:
+        return JsonResponse({'error': '无权限'}, status=403)
+
+    limit = getattr(settings, 'CHANGELOG_PAGE_SIZE', 500)
+    latest_seq = ChangeLog.objects.order_by('-seq').values_list('seq', flat=True).first() or 0
+
+    since = request.GET.get('since')
+    if since in (None, ''):
+        return JsonResponse({'changes': [], 'next': latest_seq, 'has_more': False, 'reset': False})
+    try:
+        since = int(since)
+    except ValueError:
+        return JsonResponse({'error': 'since 参数必须是整数'}, status=400)
+
+    # 游标早于保留期内最早的日志，说明中间的变更已被压缩，客户端需要全量刷新
+    oldest_seq = ChangeLog.objects.order_by('seq').values_list('seq', flat=True).first()
+    reset = oldest_seq is not None and since < oldest_seq - 1
+
+    # 只读取主键上的 (since, since+limit] 范围
+    changes = ChangeLog.objects.filter(seq__gt=since)
+    if user.role == 'student':
+        profile_id = StudentProfile.objects.filter(user=user).values_list('id', flat=True).first()
+        changes = changes.filter(
+            Q(model='students.course') |
+            Q(model='students.enrollment', payload__student_id=profile_id) |
+            Q(model='students.studentprofile', object_id=profile_id or 0)
+        )
+    models_param = request.GET.get('models')
+    if models_param:
+        changes = changes.filter(model__in=models_param.split(','))
+
+    rows = list(changes.order_by('seq')[:limit + 1])
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    next_seq = rows[-1].seq if has_more else max(since, latest_seq)
+
+    return JsonResponse({
+        'changes': [row.as_delta() for row in rows],
+        'next': next_seq,
+        'has_more': has_more,
+        'reset': reset,
+    })
+
+def student_profiles_page(params):
+    """api_student_profiles 的响应数据，同步和异步视图共用；游标无效时抛出 InvalidCursor"""
+    students = filter_student_profiles(StudentProfile.objects.all(), params).values(
+        'id', 'student_id', 'real_name', 'gender', 'enrollment_status',
+        'department__name', 'major__name', 'grade_level', 'created_at',
+    )
+    paginator = KeysetPaginator(students, page_size(params), approximate_count=approximate_profile_count(params))
+    page = paginator.page(params.get('cursor'))
+
+    return {
+        'results': [{
+            'id': student['id'],
+            'student_id': student['student_id'],
+            'name': student['real_name'],
+            'gender': student['gender'],
+            'enrollment_status': student['enrollment_status'],
+            'department': student['department__name'],
+            'major': student['major__name'],
+            'grade_level': student['grade_level'],
+            'created_at': student['created_at'].isoformat(),
+        } for student in page],
+        'next_cursor': page.next_cursor,
+        'previous_cursor': page.previous_cursor,
+        'approximate_count': page.approximate_count,
+    }
+
+@login_required
+@require_http_methods(["GET"])
+@use_replica
+def api_student_profiles(request):
+    """
+    API: 学生档案列表（键集分页，?cursor=&limit=，筛选参数与列表页相同）
+    """
+    if request.user.role != 'admin':
+        return JsonResponse({'error': '无权限'}, status=403)
+
+    try:
+        return JsonResponse(student_profiles_page(request.GET))
+    except InvalidCursor as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+def search_limit(params):
+    """联想搜索的条数，限制在 1-50（SQLite 的 LIMIT -1 表示不限条数）"""
+    try:
+        return max(1, min(int(params.get('limit', 10)), 50))
+    except ValueError:
+        return 10
+
+def student_search_results(query, limit):
+    """api_student_search 的结果列表，同步和异步视图共用"""
+    from .search import search_profile_ids
+
+    ids = search_profile_ids(query, limit) if query else []
+    rows = {
+        row['id']: row for row in StudentProfile.objects.filter(id__in=ids).values(
+            'id', 'student_id', 'real_name', 'department__name', 'major__name'
+        )
+    }
+    return [{
+        'id': row['id'],
+        'student_id': row['student_id'],
+        'name': row['real_name'],
+        'department': row['department__name'],
+        'major': row['major__name'],
+    } for row in (rows.get(profile_id) for profile_id in ids) if row]
+
+@login_required
+@require_http_methods(["GET"])
+def api_student_search(request):
+    """
+    API: 学生档案联想搜索（学号、姓名、拼音、手机尾号，按相关度排序）
+    """
+    if request.user.role != 'admin':
+        return JsonResponse({'error': '无权限'}, status=403)
+
+    query = request.GET.get('q', '').strip()
+    results = student_search_results(query, search_limit(request.GET))
+
+    return JsonResponse({'query': query, 'results': results, 'count': len(results)})
+
 def get_current_semester():
     """
     获取当前学期信息
@@ -0,0 +1,267 @@
+"""
+JSON 接口的异步版本，返回内容与 views_api 中的同步视图完全相同。
+
+在 ASGI 下使用（settings.ASYNC_API_VIEWS）：登录检查通过 request.auser() 读取会话和用户，
+等待数据库时不占用工作线程；同一个视图中互不依赖的查询通过 async_db.gather 同时执行。
+"""
+from django.http import JsonResponse
+from django.contrib.auth.decorators import login_required
+from django.views.decorators.http import require_http_methods
+from django.core.cache import cache
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from datetime import timedelta
+from .models import StudentProfile, Enrollment, Course, ChangeLog
+from .pagination import InvalidCursor
+from .views_api import get_current_semester, student_profiles_page, student_search_results, search_limit
+from student_management import async_db
+from student_management.replica import use_replica
+
+@login_required
+@require_http_methods(["GET"])
+async def api_student_status(request):
+    """
+    API: 获取学生状态信息
+    """
+    user = await request.auser()
+
+    if user.role != 'student':
+        return JsonResponse({'error': '无权限'}, status=403)
+
+    try:
+        profile = await async_db.run(
+            lambda: StudentProfile.objects.select_related('department', 'major').get(user=user)
+        )
+    except StudentProfile.DoesNotExist:
+        return JsonResponse({
+            'profile_status': 'missing',
+            'is_complete': False,
+            'has_updates': True,
+            'message': '您还没有学生档案，请联系管理员创建',
+            'timestamp': timezone.now().isoformat()
+        })
+
+    # 检查档案完整性
+    is_profile_complete = all([
+        profile.department,
+        profile.major,
+        profile.real_name,
+        profile.phone
+    ])
+
+    profile_status = 'complete' if is_profile_complete else 'incomplete'
+
+    # 最近的选课记录和当前学期的选课数同时查询
+    current_semester = get_current_semester()
+    recent_enrollments, current_enrollments = await async_db.gather(
+        lambda: list(Enrollment.objects.filter(
+            student=profile,
+            created_at__gte=timezone.now() - timedelta(days=7)
+        ).select_related('course').order_by('-created_at')[:5]),
+        lambda: Enrollment.objects.filter(
+            student=profile,
+            semester=current_semester['semester'],
+            academic_year=current_semester['year']
+        ).count(),
+    )
+
+    enrollments_data = [{
+        'course_name': enrollment.course.name,
+        'course_code': enrollment.course.code,
+        'semester': enrollment.semester,
+        'academic_year': enrollment.academic_year,
+        'enrolled_at': enrollment.enrollment_date.isoformat()
+    } for enrollment in recent_enrollments]
+
+    return JsonResponse({
+        'profile_status': profile_status,
+        'is_complete': is_profile_complete,
+        'new_enrollments': enrollments_data,
+        'current_semester_courses': current_enrollments,
+        'student_id': profile.student_id,
+        'department': profile.department.name if profile.department else None,
+        'major': profile.major.name if profile.major else None,
+        'has_updates': len(enrollments_data) > 0,
+        'timestamp': timezone.now().isoformat()
+    })
+
+@login_required
+@require_http_methods(["GET"])
+async def api_course_updates(request):
+    """
+    API: 获取课程更新信息
+    """
+    user = await request.auser()
+    if user.role not in ['student', 'teacher']:
+        return JsonResponse({'error': '无权限'}, status=403)
+
+    cache_key = f'course_updates_{user.id}'
+    last_check = await cache.aget(cache_key, timezone.now() - timedelta(hours=1))
+
+    # 获取最近更新的课程（取出列表后判断，省去一次 exists 查询）
+    updated_courses = await async_db.run(lambda: list(Course.objects.filter(
+        updated_at__gt=last_check
+    ).order_by('-updated_at')[:10]))
+
+    courses_data = [{
+        'id': course.id,
+        'name': course.name,
+        'code': course.code,
+        'course_type': course.course_type,
+        'credits': float(course.credits),
+        'updated_at': course.updated_at.isoformat()
+    } for course in updated_courses]
+
+    # 更新缓存
+    await cache.aset(cache_key, timezone.now(), timeout=3600)  # 缓存1小时
+
+    return JsonResponse({
+        'has_updates': bool(courses_data),
+        'updated_courses': courses_data,
+        'count': len(courses_data),
+        'timestamp': timezone.now().isoformat()
+    })
+
+@login_required
+@require_http_methods(["GET"])
+async def api_enrollment_changes(request):
+    """
+    API: 获取选课变更信息
+    """
+    user = await request.auser()
+    if user.role != 'admin':
+        return JsonResponse({'error': '无权限'}, status=403)
+
+    cache_key = 'enrollment_changes_last_check'
+    last_check = await cache.aget(cache_key, timezone.now() - timedelta(minutes=30))
+
+    # 最近的选课变更和三项统计同时查询
+    now = timezone.now()
+    recent_enrollments, total_today, total_this_week, total_this_month = await async_db.gather(
+        lambda: list(Enrollment.objects.filter(
+            created_at__gt=last_check
+        ).select_related('student__user', 'course').order_by('-created_at')[:20]),
+        lambda: Enrollment.objects.filter(enrollment_date=now.date()).count(),
+        lambda: Enrollment.objects.filter(enrollment_date__gte=now - timedelta(days=7)).count(),
+        lambda: Enrollment.objects.filter(enrollment_date__gte=now - timedelta(days=30)).count(),
+    )
+
+    enrollments_data = [{
+        'id': enrollment.id,
+        'student_name': enrollment.student.real_name,
+        'student_username': enrollment.student.user.username,
+        'course_name': enrollment.course.name,
+        'course_code': enrollment.course.code,
+        'semester': enrollment.semester,
+        'academic_year': enrollment.academic_year,
+        'enrolled_at': enrollment.enrollment_date.isoformat()
+    } for enrollment in recent_enrollments]
+
+    # 更新缓存
+    await cache.aset(cache_key, timezone.now(), timeout=1800)  # 缓存30分钟
+
+    return JsonResponse({
+        'has_updates': bool(enrollments_data),
+        'recent_enrollments': enrollments_data,
+        'count': len(enrollments_data),
+        'stats': {
+            'total_today': total_today,
+            'total_this_week': total_this_week,
+            'total_this_month': total_this_month,
+        },
+        'timestamp': timezone.now().isoformat()
+    })
+
+@login_required
+@require_http_methods(["GET"])
+async def api_changes(request):
+    """
+    API: 基于游标的增量变更（?since=<seq>）
+    不带 since 时只返回当前最新游标，客户端从此处开始同步
+    """
+    user = await request.auser()
+    if user.role not in ['admin', 'student']:
+        return JsonResponse({'error': '无权限'}, status=403)
+
+    limit = getattr(settings, 'CHANGELOG_PAGE_SIZE', 500)
+
+    def latest():
+        return ChangeLog.objects.order_by('-seq').values_list('seq', flat=True).first() or 0
+
+    since = request.GET.get('since')
+    if since in (None, ''):
+        latest_seq = await async_db.run(latest)
+        return JsonResponse({'changes': [], 'next': latest_seq, 'has_more': False, 'reset': False})
+    try:
+        since = int(since)
+    except ValueError:
+        return JsonResponse({'error': 'since 参数必须是整数'}, status=400)
+
+    # 最新游标、保留期内最早的游标和学生档案 id 互不依赖，同时查询
+    latest_seq, oldest_seq, profile_id = await async_db.gather(
+        latest,
+        lambda: ChangeLog.objects.order_by('seq').values_list('seq', flat=True).first(),
+        lambda: (
+            StudentProfile.objects.filter(user=user).values_list('id', flat=True).first()
+            if user.role == 'student' else None
+        ),
+    )
+
+    # 游标早于保留期内最早的日志，说明中间的变更已被压缩，客户端需要全量刷新
+    reset = oldest_seq is not None and since < oldest_seq - 1
+
+    # 只读取主键上的 (since, since+limit] 范围
+    changes = ChangeLog.objects.filter(seq__gt=since)
+    if user.role == 'student':
+        changes = changes.filter(
+            Q(model='students.course') |
+            Q(model='students.enrollment', payload__student_id=profile_id) |
+            Q(model='students.studentprofile', object_id=profile_id or 0)
+        )
+    models_param = request.GET.get('models')
+    if models_param:
+        changes = changes.filter(model__in=models_param.split(','))
+
+    rows = await async_db.run(lambda: list(changes.order_by('seq')[:limit + 1]))
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    next_seq = rows[-1].seq if has_more else max(since, latest_seq)
+
+    return JsonResponse({
+        'changes': [row.as_delta() for row in rows],
+        'next': next_seq,
+        'has_more': has_more,
+        'reset': reset,
+    })
+
+@login_required
+@require_http_methods(["GET"])
+@use_replica
+async def api_student_profiles(request):
+    """
+    API: 学生档案列表（键集分页，?cursor=&limit=，筛选参数与列表页相同）
+    """
+    user = await request.auser()
+    if user.role != 'admin':
+        return JsonResponse({'error': '无权限'}, status=403)
+
+    try:
+        return JsonResponse(await async_db.run(student_profiles_page, request.GET))
+    except InvalidCursor as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+@login_required
+@require_http_methods(["GET"])
+async def api_student_search(request):
+    """
+    API: 学生档案联想搜索（学号、姓名、拼音、手机尾号，按相关度排序）
+    """
+    user = await request.auser()
+    if user.role != 'admin':
+        return JsonResponse({'error': '无权限'}, status=403)
+
+    query = request.GET.get('q', '').strip()
+    results = await async_db.run(student_search_results, query, search_limit(request.GET))
+
+    return JsonResponse({'query': query, 'results': results, 'count': len(results)})